@@ -10,17 +10,22 @@ from flask_wtf.csrf import CSRFProtect
 from flask_talisman import Talisman
 from flask_limiter import Limiter
 from flask_limiter.util import get_remote_address
+from werkzeug.exceptions import HTTPException
 from decouple import config
 from dotenv import load_dotenv
 import sys
 import os
 sys.path.append(os.path.join(os.path.dirname(__file__), 'utils'))
 from app.utils.logging import setup_logging
+from app.utils.compression import CompressionMiddleware
+from app.utils.health import ProbeSessionInterface
 
 # Extensões globais
 csrf = CSRFProtect()
 db = SQLAlchemy()
 login_manager = LoginManager()
+talisman = Talisman()
+limiter = Limiter(get_remote_address, default_limits=["200 per day", "50 per hour"])
 
 
 def create_app():
@@ -43,6 +48,64 @@ def create_app():
         app.config['REMEMBER_COOKIE_SECURE'] = True
         app.config['PREFERRED_URL_SCHEME'] = 'https'
 
+    # Uploads
+    app.config['UPLOAD_DIR'] = os.path.abspath(
+        os.environ.get('UPLOAD_DIR', os.path.join(base_dir, 'uploads')))
+    app.config['MAX_CONTENT_LENGTH'] = int(os.environ.get('MAX_FILE_SIZE', 10485760))
+    app.config['USE_X_SENDFILE'] = os.environ.get('USE_X_SENDFILE', '0') == '1'
+    app.config['DERIVATIVE_SIZES'] = (128, 512)
+    app.config['DERIVATIVE_WORKERS'] = int(os.environ.get('DERIVATIVE_WORKERS', 2))
+    app.config['DERIVATIVE_MEMORY_LIMIT'] = int(os.environ.get('DERIVATIVE_MEMORY_LIMIT', 512))  # MB
+
+    # Notificações em tempo real (SSE)
+    app.config['SSE_MAX_CONNECTIONS'] = int(os.environ.get('SSE_MAX_CONNECTIONS', 25))  # por worker
+    app.config['SSE_HEARTBEAT'] = int(os.environ.get('SSE_HEARTBEAT', 15))
+    app.config['SSE_MAX_DURATION'] = int(os.environ.get('SSE_MAX_DURATION', 300))
+    app.config['SSE_POLL_INTERVAL'] = float(os.environ.get('SSE_POLL_INTERVAL', 1.0))
+
+    # Agenda: expedientes em hora local, atendimentos em UTC
+    app.config['CLINIC_TIMEZONE'] = os.environ.get('CLINIC_TIMEZONE', 'America/Sao_Paulo')
+    app.config['AGENDA_SLOT_MINUTES'] = int(os.environ.get('AGENDA_SLOT_MINUTES', 5))
+    app.config['RECURRENCE_HORIZON_DAYS'] = int(os.environ.get('RECURRENCE_HORIZON_DAYS', 365))
+    app.config['WAITLIST_CANDIDATES'] = int(os.environ.get('WAITLIST_CANDIDATES', 5))
+
+    # Sincronização offline: limites de um lote (descomprimido)
+    app.config['SYNC_MAX_BYTES'] = int(os.environ.get('SYNC_MAX_BYTES', 8 * 1024 * 1024))
+    app.config['SYNC_MAX_ITEMS'] = int(os.environ.get('SYNC_MAX_ITEMS', 5000))
+
+    # Probes de saúde
+    app.config['HEALTH_CHECK_INTERVAL'] = int(os.environ.get('HEALTH_CHECK_INTERVAL', 10))
+    app.config['HEALTH_MIN_FREE_MB'] = int(os.environ.get('HEALTH_MIN_FREE_MB', 100))
+
+    # Executor compartilhado das views assíncronas
+    app.config['OFFLOAD_WORKERS'] = int(os.environ.get('OFFLOAD_WORKERS', 16))
+
+    # Logging (frações de DEBUG/INFO mantidas pela amostragem)
+    app.config['LOG_LEVEL'] = os.environ.get('LOG_LEVEL', 'info')
+    app.config['LOG_DIR'] = os.environ.get('LOG_DIR', 'logs')
+    app.config['LOG_SAMPLE_DEBUG'] = float(os.environ.get('LOG_SAMPLE_DEBUG', 1.0))
+    app.config['LOG_SAMPLE_INFO'] = float(os.environ.get('LOG_SAMPLE_INFO', 1.0))
+
+    # Métricas (token opcional exigido como Bearer em /metrics)
+    app.config['METRICS_TOKEN'] = os.environ.get('METRICS_TOKEN')
+
+    # Tracing por requisição (traces amostrados ou lentos vão para TRACE_FILE)
+    app.config['TRACE_SAMPLE_RATE'] = float(os.environ.get('TRACE_SAMPLE_RATE', 0.01))
+    app.config['TRACE_SLOW_MS'] = int(os.environ.get('TRACE_SLOW_MS', 500))
+    app.config['TRACE_FILE'] = os.environ.get(
+        'TRACE_FILE', os.path.join(app.config['LOG_DIR'], 'traces.jsonl'))
+
+    # Profiling por amostragem (token de admin ou fração do tráfego)
+    app.config['PROFILE_DIR'] = os.environ.get(
+        'PROFILE_DIR', os.path.join(app.config['LOG_DIR'], 'profiles'))
+    app.config['PROFILE_SAMPLE_RATE'] = float(os.environ.get('PROFILE_SAMPLE_RATE', 0.0))
+    app.config['PROFILE_INTERVAL_MS'] = float(os.environ.get('PROFILE_INTERVAL_MS', 5))
+    app.config['PROFILE_TOKEN_MAX_AGE'] = int(os.environ.get('PROFILE_TOKEN_MAX_AGE', 3600))
+
+    # Compressão de respostas
+    app.config['COMPRESS_MIN_SIZE'] = int(os.environ.get('COMPRESS_MIN_SIZE', 500))
+    app.config['COMPRESS_LEVEL'] = int(os.environ.get('COMPRESS_LEVEL', 6))
+
     # Garantir que o diretório instance existe
     try:
         if not os.path.exists(instance_path):
@@ -58,21 +121,65 @@ def create_app():
     login_manager.init_app(app)
     login_manager.login_view = 'auth.login'
 
-    # Segurança
-    talisman = Talisman(app)
-    limiter = Limiter(
-        get_remote_address,
-        app=app,
-        default_limits=["200 per day", "50 per hour"]
-    )
+    # Segurança (RATELIMIT_ENABLED=0 só para testes de carga)
+    app.config['RATELIMIT_ENABLED'] = os.environ.get('RATELIMIT_ENABLED', '1') == '1'
+    talisman.init_app(app)
+    limiter.init_app(app)
+
+    # Probes de saúde não abrem sessão
+    app.session_interface = ProbeSessionInterface()
 
     # Registrar blueprints
     from .routes import main
     from .routes.health import health
     from .auth.routes import auth
+    from .auth.admin_routes import admin
+    from .auth.security_routes import security
+    from .uploads.routes import uploads
+    from .search.routes import search
+    from .notifications.routes import notifications
+    from .scheduling.routes import agenda
+    from .patients.routes import patients
+    from .clinical.routes import clinical
+    from .reports.routes import reports
+    from .sync.routes import sync
+    from .waitlist.routes import waitlist
     app.register_blueprint(main)
     app.register_blueprint(health)  # Registra blueprint de health check
     app.register_blueprint(auth, url_prefix='/auth')
+    app.register_blueprint(admin)  # url_prefix='/admin' definido no blueprint
+    app.register_blueprint(security, url_prefix='/security')
+    app.register_blueprint(uploads, url_prefix='/uploads')
+    app.register_blueprint(search)
+    app.register_blueprint(notifications, url_prefix='/notifications')
+    app.register_blueprint(agenda, url_prefix='/agenda')
+    app.register_blueprint(patients, url_prefix='/patients')
+    app.register_blueprint(clinical, url_prefix='/clinical')
+    app.register_blueprint(reports, url_prefix='/reports')
+    app.register_blueprint(sync, url_prefix='/sync')
+    app.register_blueprint(waitlist, url_prefix='/waitlist')
+
+    # Índice de busca textual (indexação incremental a cada flush)
+    from .search import index as search_index
+    search_index.init_app(app)
+    from .patients import search as patient_search
+    patient_search.init_app(app)
+
+    # Resumo diário da agenda (atualizado a cada flush de atendimentos)
+    from .scheduling import summary as agenda_summary
+    agenda_summary.init_app(app)
+
+    # Agregados diários dos relatórios (recalculados pela fila após o commit)
+    from .reports import aggregates as report_aggregates
+    report_aggregates.init_app(app)
+
+    # Busca de encaixes na fila de espera quando um horário é liberado
+    from .waitlist import matching as waitlist_matching
+    waitlist_matching.init_app(app)
+
+    # Markdown renderizado e sanitizado na gravação
+    from .utils import rich_text
+    rich_text.init_app(app)
 
     # Registrar comandos CLI
     from . import cli
@@ -81,10 +188,31 @@ def create_app():
     # Configurar logging
     setup_logging(app)
 
+    # Compressão gzip incremental das respostas dinâmicas
+    app.wsgi_app = CompressionMiddleware(
+        app.wsgi_app,
+        min_size=app.config['COMPRESS_MIN_SIZE'],
+        level=app.config['COMPRESS_LEVEL']
+    )
+
+    # Métricas Prometheus (/metrics); mede também o tempo de compressão
+    from .utils import metrics
+    metrics.init_app(app)
+
+    # Profiling sob demanda
+    from .utils import profiling
+    profiling.init_app(app)
+
+    # Tracing: camada mais externa, para cobrir sessão, views e middlewares
+    from .utils import tracing
+    tracing.init_app(app)
+
     # Tratamento global de exceções
     @app.errorhandler(Exception)
     def handle_exception(e):
         """Tratamento global de exceções."""
+        if isinstance(e, HTTPException):  # abort(403), 405 etc. mantêm o status
+            return e
         app.logger.exception('Erro não tratado: %s', e)
         return render_template('errors/500.html', error=e), 500
 
@@ -2,6 +2,7 @@ from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_required, current_user
 from ..models import InviteToken, db, Role
 from .decorators import role_required
+from datetime import datetime
 
 admin = Blueprint('admin', __name__, url_prefix='/admin')
 
@@ -10,7 +11,7 @@ admin = Blueprint('admin', __name__, url_prefix='/admin')
 @role_required(Role.ADMIN)
 def list_invites():
     invites = InviteToken.query.order_by(InviteToken.created_at.desc()).all()
-    return render_template('admin/invites.html', invites=invites)
+    return render_template('admin/invites.html', invites=invites, now=datetime.utcnow())
 
 @admin.route('/invites/new', methods=['POST'])
 @login_required
@@ -1,5 +1,5 @@
 from functools import wraps
-from flask import abort
+from flask import abort, current_app
 from flask_login import current_user
 from ..models import Role
 
@@ -9,6 +9,6 @@ def role_required(role):
         def decorated_function(*args, **kwargs):
             if not current_user.is_authenticated or current_user.role != role:
                 abort(403)
-            return f(*args, **kwargs)
+            return current_app.ensure_sync(f)(*args, **kwargs)
         return decorated_function
     return decorator
\ No newline at end of file
@@ -2,14 +2,22 @@ from flask_wtf import FlaskForm
 from wtforms import StringField, PasswordField, BooleanField, SubmitField, EmailField, SelectField, TextAreaField
 from wtforms.validators import DataRequired, Length, Email, EqualTo, ValidationError, Optional
 from ..models import User
+from ..utils.tracing import span
 
-class LoginForm(FlaskForm):
+class BaseForm(FlaskForm):
+    """Formulário base: a validação aparece como fase no trace da requisição."""
+
+    def validate(self, extra_validators=None):
+        with span('form.validate', form=type(self).__name__):
+            return super().validate(extra_validators=extra_validators)
+
+class LoginForm(BaseForm):
     email = EmailField('Email', validators=[DataRequired(), Email()])
     password = PasswordField('Senha', validators=[DataRequired()])
     remember = BooleanField('Lembrar-me')
     submit = SubmitField('Entrar')
 
-class RegistrationForm(FlaskForm):
+class RegistrationForm(BaseForm):
     username = StringField('Nome de usuário', validators=[DataRequired(), Length(min=3, max=50)])
     email = EmailField('Email', validators=[DataRequired(), Email()])
     password = PasswordField('Senha', validators=[DataRequired(), Length(min=6)])
@@ -24,7 +32,7 @@ class RegistrationForm(FlaskForm):
         if User.query.filter_by(email=field.data).first():
             raise ValidationError('Este email já está cadastrado.')
 
-class ProfileUpdateForm(FlaskForm):
+class ProfileUpdateForm(BaseForm):
     username = StringField('Nome de usuário', validators=[DataRequired(), Length(min=3, max=50)])
     email = EmailField('Email', validators=[DataRequired(), Email()])
     full_name = StringField('Nome completo', validators=[Optional(), Length(max=100)])
@@ -46,20 +54,20 @@ class ProfileUpdateForm(FlaskForm):
             if User.query.filter_by(email=field.data).first():
                 raise ValidationError('Este email já está cadastrado.')
 
-class PasswordResetRequestForm(FlaskForm):
+class PasswordResetRequestForm(BaseForm):
     email = EmailField('Email', validators=[DataRequired(), Email()])
     submit = SubmitField('Solicitar redefinição de senha')
 
-class PasswordResetForm(FlaskForm):
+class PasswordResetForm(BaseForm):
     password = PasswordField('Nova senha', validators=[DataRequired(), Length(min=6)])
     password2 = PasswordField('Confirmar nova senha', validators=[DataRequired(), EqualTo('password')])
     submit = SubmitField('Redefinir senha')
 
-class TwoFactorSetupForm(FlaskForm):
+class TwoFactorSetupForm(BaseForm):
     code = StringField('Código de verificação', validators=[DataRequired(), Length(min=6, max=6)])
     submit = SubmitField('Verificar')
 
-class AdminUserCreateForm(FlaskForm):
+class AdminUserCreateForm(BaseForm):
     username = StringField('Nome de usuário', validators=[DataRequired(), Length(min=3, max=50)])
     email = EmailField('Email', validators=[DataRequired(), Email()])
     role = SelectField('Perfil', choices=[
@@ -78,7 +86,7 @@ class AdminUserCreateForm(FlaskForm):
         if User.query.filter_by(email=field.data).first():
             raise ValidationError('Este email já está cadastrado.')
 
-class InviteUserForm(FlaskForm):
+class InviteUserForm(BaseForm):
     email = EmailField('Email', validators=[DataRequired(), Email()])
     role = SelectField('Perfil', choices=[
         ('user', 'Usuário'),
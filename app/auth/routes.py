@@ -3,7 +3,7 @@ Rotas de autenticação e registro de usuários do sistema Equidade.
 Inclui login, logout, registro e recuperação de senha.
 """
 
-from flask import Blueprint, render_template, redirect, url_for, flash, request, session
+from flask import Blueprint, render_template, redirect, url_for, flash, request, session, jsonify, current_app
 from werkzeug.security import check_password_hash
 from flask_login import login_user, logout_user, current_user, login_required
 from .forms import LoginForm, RegistrationForm
@@ -12,6 +12,7 @@ from .. import db
 from .decorators import role_required
 from datetime import datetime
 from .admin_routes import InviteToken
+from ..utils.profiling import make_token
 
 auth = Blueprint('auth', __name__)
 
@@ -67,7 +68,7 @@ def register():
         
     return render_template('auth/register.html', form=form)
 
-@auth.route('/logout')
+@auth.route('/logout', methods=['GET', 'POST'])
 @login_required
 def logout():
     """Rota para logout de usuários."""
@@ -82,6 +83,18 @@ def admin_dashboard():
     """Rota para o painel do administrador."""
     return render_template('admin/dashboard.html')
 
+@auth.route('/admin/profile-token')
+@login_required
+@role_required(Role.ADMIN)
+def profile_token():
+    """Emite o token que ativa o profiling das suas próprias requisições (X-Profile)."""
+    token = make_token(current_app.config['SECRET_KEY'], current_user.id)
+    return jsonify({
+        'token': token,
+        'header': 'X-Profile',
+        'expires_in': current_app.config['PROFILE_TOKEN_MAX_AGE']
+    })
+
 @auth.route('/perfil')
 @login_required
 def perfil():
@@ -110,7 +123,7 @@ def admin_users():
         # Lógica para atualizar roles com proteção CSRF
         pass
     
-    return render_template('admin/users.html', users=users)
+    return render_template('admin/users.html', users=users, Role=Role)
 
 
 @auth.route('/cadastro', methods=['GET', 'POST'])
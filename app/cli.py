@@ -1,5 +1,6 @@
 import click
 from flask.cli import with_appcontext
+from sqlalchemy import text
 from . import db
 from .models import User, Role
 import os
@@ -152,7 +153,7 @@ def verify_system():
     """Verify system integrity and configuration."""
     try:
         click.echo('Checking database connection...')
-        db.session.execute('SELECT 1')
+        db.session.execute(text('SELECT 1'))
         click.echo('✓ Database connection OK')
         
         click.echo('Checking admin users...')
@@ -169,6 +170,128 @@ def verify_system():
     except Exception as e:
         click.echo(f'Error during system verification: {e}')
 
+@click.command('seed-synthetic')
+@click.option('--users', default=0, show_default=True, help='Users to create')
+@click.option('--invites', default=0, show_default=True, help='Invite tokens to create')
+@click.option('--activities', default=0, show_default=True, help='Admin activity rows to create')
+@click.option('--password', default=None, help='Password of every synthetic user (default: random, printed)')
+@click.option('--seed', default=42, show_default=True, help='Random seed (same seed, same data)')
+@click.option('--batch-size', default=50000, show_default=True, help='Rows per batch')
+@click.option('--force', is_flag=True, help='Seed even when FLASK_ENV is production')
+@with_appcontext
+def seed_synthetic(users, invites, activities, password, seed, batch_size, force):
+    """Bulk-insert deterministic synthetic data for performance testing."""
+    import secrets
+    import time
+    from flask import current_app
+    from .services.synthetic import seed_synthetic as run_seed
+
+    if current_app.config['ENV'] == 'production' and not force:
+        click.echo('Refusing to seed synthetic users in production (FLASK_ENV=production); '
+                   'use --force to override.')
+        return
+    if password is None:
+        password = secrets.token_urlsafe(12)
+        click.echo(f'Synthetic users password: {password}')
+
+    started = time.perf_counter()
+    try:
+        counts = run_seed(db.engine, users=users, invites=invites, activities=activities,
+                          password=password, seed=seed, batch_size=batch_size)
+    except Exception as e:
+        click.echo(f'Error seeding synthetic data: {e}')
+        return
+    elapsed = time.perf_counter() - started
+    total = sum(counts.values())
+    for table, count in counts.items():
+        click.echo(f'{table}: {count} rows')
+    click.echo(f'{total} rows in {elapsed:.1f}s ({total / elapsed if elapsed else 0:,.0f} rows/s)')
+
+@click.command('rebuild-agenda-summary')
+@click.option('--batch-size', default=5000, show_default=True, help='Appointments read per batch')
+@with_appcontext
+def rebuild_agenda_summary(batch_size):
+    """Recompute the per-day agenda summaries from all appointments."""
+    import time
+    from .scheduling.series import clinic_timezone
+    from .scheduling.summary import rebuild
+
+    started = time.perf_counter()
+    try:
+        with db.engine.begin() as connection:
+            rows = rebuild(connection, clinic_timezone(), batch_size=batch_size)
+    except Exception as e:
+        click.echo(f'Error rebuilding agenda summary: {e}')
+        return
+    click.echo(f'{rows} summary rows rebuilt in {time.perf_counter() - started:.1f}s')
+
+@click.command('rebuild-report-aggregates')
+@click.option('--batch-size', default=5000, show_default=True, help='Appointments read per batch')
+@with_appcontext
+def rebuild_report_aggregates(batch_size):
+    """Recompute the daily report aggregates from all appointments."""
+    import time
+    from .scheduling.series import clinic_timezone
+    from .reports.aggregates import rebuild
+
+    started = time.perf_counter()
+    try:
+        with db.engine.begin() as connection:
+            rows = rebuild(connection, clinic_timezone(), batch_size=batch_size)
+    except Exception as e:
+        click.echo(f'Error rebuilding report aggregates: {e}')
+        return
+    click.echo(f'{rows} report rows rebuilt in {time.perf_counter() - started:.1f}s')
+
+@click.command('rerender-markdown')
+@click.option('--batch-size', default=500, show_default=True, help='Rows rendered per batch')
+@click.option('--workers', default=None, type=int, help='Render processes (default: CPU count, 0: no pool)')
+@click.option('--all', 'force', is_flag=True, help='Re-render every row, not only stale ones')
+@with_appcontext
+def rerender_markdown(batch_size, workers, force):
+    """Rebuild the stored HTML of markdown fields after ALLOWED_TAGS changes."""
+    import time
+    from security.sanitization import SANITIZER_VERSION
+    from .utils.rich_text import rerender
+
+    started = time.perf_counter()
+    try:
+        with db.engine.connect() as connection:
+            counts = rerender(connection, batch_size=batch_size, workers=workers, force=force)
+    except Exception as e:
+        click.echo(f'Error re-rendering markdown: {e}')
+        return
+    for field, count in counts.items():
+        click.echo(f'{field}: {count} rows')
+    click.echo(f'Sanitizer version {SANITIZER_VERSION}, {time.perf_counter() - started:.1f}s')
+
+@click.group('profiles')
+def profiles():
+    """Inspect sampled request profiles."""
+
+@profiles.command('report')
+@click.option('--endpoint', default=None, help='Only this endpoint (e.g. auth.login)')
+@click.option('--top', default=15, show_default=True, help='Hotspots per endpoint')
+@with_appcontext
+def profiles_report(endpoint, top):
+    """Aggregate stored profiles and print the hotspots per endpoint."""
+    from flask import current_app
+    from .utils.profiling import load_profiles, hotspots
+
+    directory = current_app.config['PROFILE_DIR']
+    aggregated = load_profiles(directory, endpoint)
+    if not aggregated:
+        click.echo(f'No profiles found in {directory}')
+        return
+
+    ranked = sorted(aggregated.items(), key=lambda item: sum(item[1][1].values()), reverse=True)
+    for name, (count, stacks) in ranked:
+        total = sum(stacks.values())
+        click.echo(f'\n{name}: {count} profiles, {total} samples')
+        click.echo(f'{"self %":>8} {"total %":>8}  frame')
+        for frame, own, inclusive in hotspots(stacks, top):
+            click.echo(f'{100.0 * own / total:>7.1f}% {100.0 * inclusive / total:>7.1f}%  {frame}')
+
 def init_app(app):
     """Register CLI commands."""
     app.cli.add_command(create_admin)
@@ -179,3 +302,8 @@ def init_app(app):
     app.cli.add_command(deactivate_user)
     app.cli.add_command(backup_db)
     app.cli.add_command(verify_system)
+    app.cli.add_command(seed_synthetic)
+    app.cli.add_command(rebuild_agenda_summary)
+    app.cli.add_command(rebuild_report_aggregates)
+    app.cli.add_command(rerender_markdown)
+    app.cli.add_command(profiles)
@@ -0,0 +1,160 @@
+"""
+Registro e leitura de evoluções clínicas.
+
+A linha do tempo lê só cabeçalhos da versão atual de cada evolução, em
+páginas por chave (``noted_at``, ``id``): cada página é uma busca no
+índice ``ix_clinical_note_timeline`` a partir do cursor, com o mesmo custo
+na primeira página e na milésima. O texto é carregado por ``note_text``
+quando a evolução é aberta.
+"""
+
+import base64
+from datetime import datetime, timezone
+from sqlalchemy import exists, or_, tuple_
+from sqlalchemy.exc import IntegrityError
+from sqlalchemy.orm import aliased, raiseload
+from .. import db
+from ..models import ClinicalNote, ClinicalNoteBody, Professional
+from ..models.clinical import PREVIEW_LENGTH
+from ..scheduling.booking import to_utc
+
+
+class StaleNoteVersion(Exception):
+    """A versão corrigida já tinha sido substituída por outra correção."""
+
+    def __init__(self, note_id):
+        self.note_id = note_id
+        super().__init__('Esta versão da evolução já foi corrigida; abra a versão atual.')
+
+
+class InvalidNote(ValueError):
+    """Título, motivo ou profissional da evolução inválido."""
+
+
+def check_header(title=None, reason=None, professional_id=None):
+    """
+    Confere tipo e tamanho do título e do motivo da correção e se o
+    profissional existe; levanta ``InvalidNote`` antes de chegar ao banco.
+    """
+    for label, value, column in (('Título', title, ClinicalNote.title),
+                                 ('Motivo da correção', reason, ClinicalNote.correction_reason)):
+        if value is None:
+            continue
+        if not isinstance(value, str):
+            raise InvalidNote(f'{label} inválido')
+        if len(value) > column.type.length:
+            raise InvalidNote(f'{label} longo demais (máximo de {column.type.length} caracteres)')
+    if professional_id is not None and (
+            not isinstance(professional_id, int) or isinstance(professional_id, bool)
+            or db.session.get(Professional, professional_id) is None):
+        raise InvalidNote('Profissional inexistente')
+
+
+def _preview(content):
+    return ' '.join(content.split())[:PREVIEW_LENGTH]
+
+
+def _save(note, content, commit):
+    note.preview = _preview(content)
+    note.body_size = len(content)
+    note.body = ClinicalNoteBody(content=content)
+    db.session.add(note)
+    try:
+        if commit:
+            db.session.commit()
+        else:
+            db.session.flush()
+    except IntegrityError as error:
+        if commit:
+            db.session.rollback()
+        if note.supersedes_id is not None:
+            raise StaleNoteVersion(note.supersedes_id) from error
+        raise
+    return note
+
+
+def add_note(patient_id, content, author_id=None, professional_id=None, title=None,
+             noted_at=None, commit=True):
+    """Registra uma evolução nova; com ``commit=False`` só grava na transação aberta."""
+    return _save(ClinicalNote(
+        patient_id=patient_id,
+        professional_id=professional_id,
+        author_id=author_id,
+        noted_at=to_utc(noted_at or datetime.now(timezone.utc)),
+        title=title,
+    ), content, commit)
+
+
+def correct_note(note, content, author_id=None, title=None, reason=None, commit=True):
+    """
+    Registra uma correção como nova versão; a anterior continua gravada.
+    Levanta ``StaleNoteVersion`` se ``note`` já foi corrigida.
+    """
+    if is_superseded(note.id):
+        raise StaleNoteVersion(note.id)
+    return _save(ClinicalNote(
+        patient_id=note.patient_id,
+        professional_id=note.professional_id,
+        author_id=author_id,
+        noted_at=note.noted_at,
+        title=note.title if title is None else title,
+        version=note.version + 1,
+        root_id=note.root_id or note.id,
+        supersedes_id=note.id,
+        correction_reason=reason,
+    ), content, commit)
+
+
+def is_superseded(note_id):
+    return db.session.query(exists().where(ClinicalNote.supersedes_id == note_id)).scalar()
+
+
+def _current():
+    newer = aliased(ClinicalNote)
+    return ~exists().where(newer.supersedes_id == ClinicalNote.id)
+
+
+def encode_cursor(note):
+    raw = f'{to_utc(note.noted_at).isoformat()}|{note.id}'
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """``(noted_at, id)`` do cursor; ``ValueError`` se inválido."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        noted_at, note_id = raw.rsplit('|', 1)
+        return to_utc(datetime.fromisoformat(noted_at)), int(note_id)
+    except (ValueError, UnicodeDecodeError) as error:
+        raise ValueError('Cursor inválido.') from error
+
+
+def timeline(patient_id, limit=20, cursor=None):
+    """
+    Cabeçalhos da versão atual de cada evolução do paciente, da mais recente
+    para a mais antiga. Devolve ``(notas, próximo cursor ou None)``.
+    """
+    query = (ClinicalNote.query
+             .options(raiseload(ClinicalNote.body))
+             .filter(ClinicalNote.patient_id == patient_id, _current())
+             .order_by(ClinicalNote.noted_at.desc(), ClinicalNote.id.desc()))
+    if cursor:
+        query = query.filter(tuple_(ClinicalNote.noted_at, ClinicalNote.id) < decode_cursor(cursor))
+    notes = query.limit(limit + 1).all()
+    next_cursor = encode_cursor(notes[limit - 1]) if len(notes) > limit else None
+    return notes[:limit], next_cursor
+
+
+def note_text(note_id):
+    """Texto completo da versão (a única leitura do corpo)."""
+    return db.session.query(ClinicalNoteBody.content).filter_by(note_id=note_id).scalar()
+
+
+def versions(note):
+    """Todas as versões da evolução, da original à atual."""
+    root = note.root_id or note.id
+    return (ClinicalNote.query
+            .options(raiseload(ClinicalNote.body))
+            .filter(or_(ClinicalNote.id == root, ClinicalNote.root_id == root))
+            .order_by(ClinicalNote.version)
+            .all())
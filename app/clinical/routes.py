@@ -0,0 +1,112 @@
+"""
+Rotas do prontuário: linha do tempo, leitura e registro de evoluções.
+"""
+
+from flask import Blueprint, request, jsonify, abort
+from flask_login import login_required, current_user
+from .. import db
+from ..models import ClinicalNote, Patient
+from ..scheduling.booking import to_utc
+from . import notes
+
+clinical = Blueprint('clinical', __name__)
+
+
+def _header(note):
+    return {
+        'id': note.id,
+        'patient_id': note.patient_id,
+        'professional_id': note.professional_id,
+        'author_id': note.author_id,
+        'noted_at': to_utc(note.noted_at).isoformat(),
+        'title': note.title,
+        'preview': note.preview,
+        'body_size': note.body_size,
+        'version': note.version,
+        'supersedes_id': note.supersedes_id,
+        'correction_reason': note.correction_reason,
+    }
+
+
+def _content():
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict):
+        data = {}
+    content = data.get('content')
+    if not isinstance(content, str) or not content.strip():
+        return data, None
+    return data, content.strip()
+
+
+@clinical.route('/patients/<int:patient_id>/notes')
+@login_required
+def patient_timeline(patient_id):
+    """Página da linha do tempo (só cabeçalhos); ``cursor`` vem da página anterior."""
+    limit = min(max(request.args.get('limit', 20, type=int), 1), 100)
+    try:
+        page, next_cursor = notes.timeline(patient_id, limit=limit,
+                                           cursor=request.args.get('cursor'))
+    except ValueError as e:
+        return jsonify({'error': str(e)}), 400
+    return jsonify({'notes': [_header(note) for note in page], 'next_cursor': next_cursor})
+
+
+@clinical.route('/patients/<int:patient_id>/notes', methods=['POST'])
+@login_required
+def create_note(patient_id):
+    """Registra uma evolução (JSON com ``content`` e, opcionalmente, ``title``)."""
+    if db.session.get(Patient, patient_id) is None:
+        abort(404)
+    data, content = _content()
+    if content is None:
+        return jsonify({'error': 'Texto da evolução vazio'}), 400
+    try:
+        notes.check_header(title=data.get('title'), professional_id=data.get('professional_id'))
+    except notes.InvalidNote as e:
+        return jsonify({'error': str(e)}), 400
+    note = notes.add_note(patient_id, content, author_id=current_user.id,
+                          professional_id=data.get('professional_id'), title=data.get('title'))
+    return jsonify(_header(note)), 201
+
+
+@clinical.route('/notes/<int:note_id>')
+@login_required
+def show_note(note_id):
+    """Cabeçalho e texto completo de uma versão."""
+    note = db.session.get(ClinicalNote, note_id)
+    if note is None:
+        abort(404)
+    return jsonify(dict(_header(note), content=notes.note_text(note_id),
+                        superseded=notes.is_superseded(note_id)))
+
+
+@clinical.route('/notes/<int:note_id>/versions')
+@login_required
+def note_versions(note_id):
+    """Todas as versões da evolução, da original à atual."""
+    note = db.session.get(ClinicalNote, note_id)
+    if note is None:
+        abort(404)
+    return jsonify({'versions': [_header(version) for version in notes.versions(note)]})
+
+
+@clinical.route('/notes/<int:note_id>/corrections', methods=['POST'])
+@login_required
+def correct_note(note_id):
+    """Registra a correção de uma versão (JSON com ``content`` e ``reason``)."""
+    note = db.session.get(ClinicalNote, note_id)
+    if note is None:
+        abort(404)
+    data, content = _content()
+    if content is None:
+        return jsonify({'error': 'Texto da evolução vazio'}), 400
+    try:
+        notes.check_header(title=data.get('title'), reason=data.get('reason'))
+    except notes.InvalidNote as e:
+        return jsonify({'error': str(e)}), 400
+    try:
+        correction = notes.correct_note(note, content, author_id=current_user.id,
+                                        title=data.get('title'), reason=data.get('reason'))
+    except notes.StaleNoteVersion as e:
+        return jsonify({'error': str(e)}), 409
+    return jsonify(_header(correction)), 201
@@ -8,14 +8,16 @@ from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 import secrets
 from datetime import datetime, timedelta
-from . import db
+from .. import db, login_manager
+from ..utils.tracing import traced
+import json
 import pyotp
 
 class Role(Enum):
     USER = 'user'
     ADMIN = 'admin'
 
-from . import db
+from .. import db
 from flask_login import UserMixin
 
 class User(db.Model, UserMixin):
@@ -45,6 +47,29 @@ class User(db.Model, UserMixin):
     def __repr__(self):
         return f'<User {self.username}>'
 
+    def generate_2fa_secret(self):
+        """Gera um segredo para autenticação de dois fatores."""
+        self.two_factor_secret = pyotp.random_base32()
+        return self.two_factor_secret
+
+    def verify_2fa_code(self, code):
+        """Verifica se o código da autenticação de dois fatores é válido."""
+        totp = pyotp.TOTP(self.two_factor_secret)
+        return totp.verify(code)
+
+    def generate_backup_codes(self):
+        """Gera códigos de backup para autenticação de dois fatores."""
+        codes = [secrets.token_hex(4) for _ in range(10)]
+        self.backup_codes = generate_password_hash(json.dumps(codes))
+        return codes
+
+
+@login_manager.user_loader
+@traced('flask_login.user_loader')
+def load_user(user_id):
+    """Carrega o usuário da sessão (medido como fase do trace)."""
+    return db.session.get(User, int(user_id))
+
 
 class UserActivity(db.Model):
     id = db.Column(db.Integer, primary_key=True)
@@ -75,18 +100,55 @@ class InviteToken(db.Model):
         """Gera um token único para convites."""
         return secrets.token_urlsafe(32)
 
-    def generate_2fa_secret(self):
-        """Gera um segredo para autenticação de dois fatores."""
-        self.two_factor_secret = pyotp.random_base32()
-        return self.two_factor_secret
 
-    def verify_2fa_code(self, code):
-        """Verifica se o código da autenticação de dois fatores é válido."""
-        totp = pyotp.TOTP(self.two_factor_secret)
-        return totp.verify(code)
+class Upload(db.Model):
+    """Metadados de um arquivo enviado; o conteúdo fica no repositório por hash."""
+    id = db.Column(db.Integer, primary_key=True)
+    sha256 = db.Column(db.String(64), nullable=False, index=True)
+    size = db.Column(db.BigInteger, nullable=False)
+    filename = db.Column(db.String(255), nullable=False)
+    content_type = db.Column(db.String(100), nullable=False)
+    category = db.Column(db.String(20), nullable=False)
+    description = db.Column(db.Text)
+    extracted_text = db.Column(db.Text)  # preenchido pelo pool (app.uploads.derivatives)
+    uploaded_by = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
 
-    def generate_backup_codes(self):
-        """Gera códigos de backup para autenticação de dois fatores."""
-        codes = [secrets.token_hex(4) for _ in range(10)]
-        self.backup_codes = generate_password_hash(json.dumps(codes))
-        return codes
+    uploader = db.relationship('User', foreign_keys=[uploaded_by])
+
+
+class SearchEntry(db.Model):
+    """Entrada do índice de busca; o FTS5/tsvector é criado em app.search.index."""
+    __tablename__ = 'search_entry'
+    __table_args__ = (db.UniqueConstraint('kind', 'object_id'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    kind = db.Column(db.String(30), nullable=False)
+    object_id = db.Column(db.Integer, nullable=False)
+    title = db.Column(db.Text, nullable=False, default='')
+    body = db.Column(db.Text, nullable=False, default='')
+
+
+class Notification(db.Model):
+    """Notificação do servidor para um usuário, entregue via SSE."""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), nullable=False, index=True)
+    kind = db.Column(db.String(30), nullable=False, default='info')
+    payload = db.Column(db.Text, nullable=False)
+    created_at = db.Column(db.DateTime, default=datetime.utcnow)
+
+    def to_event(self):
+        """Converte a notificação no evento enviado pelo stream."""
+        data = json.loads(self.payload)
+        data['kind'] = self.kind
+        return {'id': self.id, 'data': data}
+
+
+from .scheduling import (  # noqa: E402
+    Room, Professional, Appointment, AppointmentStatus, WorkingHours, Absence,
+    AppointmentSeries, SeriesException, AgendaDay)
+from .patients import Patient  # noqa: E402
+from .clinical import ClinicalNote, ClinicalNoteBody  # noqa: E402
+from .reports import ReportDay  # noqa: E402
+from .sync import SyncBatch  # noqa: E402
+from .waitlist import WaitlistEntry, WaitlistStatus, WaitlistWindow  # noqa: E402
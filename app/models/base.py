@@ -1,7 +1,9 @@
+import zlib
 from datetime import datetime
-from sqlalchemy import Column, Integer, DateTime, Boolean
-from sqlalchemy.ext.declarative import declarative_base
+from sqlalchemy import Column, Integer, DateTime, Boolean, LargeBinary
+from sqlalchemy.orm import declarative_base
 from sqlalchemy.sql import func
+from sqlalchemy.types import TypeDecorator
 
 class TimestampMixin:
     created_at = Column(DateTime, server_default=func.now())
@@ -11,4 +13,35 @@ class SoftDeleteMixin:
     is_deleted = Column(Boolean, default=False)
     deleted_at = Column(DateTime, nullable=True)
 
-Base = declarative_base()
\ No newline at end of file
+class CompressedText(TypeDecorator):
+    """
+    Texto gravado como bytes UTF-8, comprimido com zlib a partir de
+    ``threshold`` bytes. O primeiro byte diz como o resto foi gravado.
+    """
+    impl = LargeBinary
+    cache_ok = True
+
+    PLAIN, ZLIB = b'p', b'z'
+
+    def __init__(self, threshold=1024, level=6):
+        super().__init__()
+        self.threshold = threshold
+        self.level = level
+
+    def process_bind_param(self, value, dialect):
+        if value is None:
+            return None
+        data = value.encode('utf-8')
+        if len(data) >= self.threshold:
+            return self.ZLIB + zlib.compress(data, self.level)
+        return self.PLAIN + data
+
+    def process_result_value(self, value, dialect):
+        if value is None:
+            return None
+        value = bytes(value)
+        if value[:1] == self.ZLIB:
+            return zlib.decompress(value[1:]).decode('utf-8')
+        return value[1:].decode('utf-8')
+
+Base = declarative_base()
@@ -0,0 +1,102 @@
+"""
+Evoluções clínicas (prontuário), gravadas só por inserção.
+
+O cabeçalho (``clinical_note``) é leve: paciente, autor, horário, título e
+uma prévia do texto, o bastante para a linha do tempo. O texto completo
+fica em ``clinical_note_body``, comprimido acima de
+``BODY_COMPRESS_MIN_BYTES`` e carregado só quando a evolução é aberta.
+
+Uma evolução nunca é alterada nem excluída: a correção é uma nova versão
+que aponta para a anterior (``supersedes_id``, único, então duas correções
+simultâneas da mesma versão não passam juntas). Além do bloqueio no ORM,
+triggers no banco recusam ``UPDATE`` e ``DELETE`` nas duas tabelas.
+"""
+
+from datetime import datetime, timezone
+from sqlalchemy import event, text
+from .. import db
+from .base import CompressedText
+
+BODY_COMPRESS_MIN_BYTES = 1024
+PREVIEW_LENGTH = 160
+APPEND_ONLY = 'clinical_note_append_only'
+
+
+class ClinicalNote(db.Model):
+    """Cabeçalho de uma versão de evolução clínica."""
+    __tablename__ = 'clinical_note'
+    __table_args__ = (
+        # Linha do tempo do paciente, paginada por (noted_at, id)
+        db.Index('ix_clinical_note_timeline', 'patient_id', 'noted_at', 'id'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    patient_id = db.Column(db.Integer, db.ForeignKey('patient.id'), nullable=False)
+    professional_id = db.Column(db.Integer, db.ForeignKey('professional.id'))
+    author_id = db.Column(db.Integer, db.ForeignKey('user.id'))
+    noted_at = db.Column(db.DateTime(timezone=True), nullable=False)  # horário clínico, em UTC
+    recorded_at = db.Column(db.DateTime(timezone=True), nullable=False,
+                            default=lambda: datetime.now(timezone.utc))
+    title = db.Column(db.String(200))
+    preview = db.Column(db.String(PREVIEW_LENGTH), nullable=False, default='')
+    body_size = db.Column(db.Integer, nullable=False, default=0)  # caracteres do texto
+    version = db.Column(db.Integer, nullable=False, default=1)
+    root_id = db.Column(db.Integer, db.ForeignKey('clinical_note.id'), index=True)  # nulo na 1ª versão
+    supersedes_id = db.Column(db.Integer, db.ForeignKey('clinical_note.id'), unique=True)
+    correction_reason = db.Column(db.String(200))
+
+    patient = db.relationship('Patient', foreign_keys=[patient_id])
+    professional = db.relationship('Professional', foreign_keys=[professional_id])
+    author = db.relationship('User', foreign_keys=[author_id])
+    body = db.relationship('ClinicalNoteBody', uselist=False, back_populates='note')
+
+    def __repr__(self):
+        return f'<ClinicalNote {self.id} v{self.version}>'
+
+
+class ClinicalNoteBody(db.Model):
+    """Texto de uma versão; ``content`` só é lido quando acessado."""
+    __tablename__ = 'clinical_note_body'
+
+    note_id = db.Column(db.Integer, db.ForeignKey('clinical_note.id'), primary_key=True)
+    content = db.deferred(db.Column(CompressedText(threshold=BODY_COMPRESS_MIN_BYTES),
+                                    nullable=False))
+
+    note = db.relationship('ClinicalNote', back_populates='body')
+
+
+def _refuse_change(mapper, connection, target):
+    raise ValueError('Evoluções clínicas não são alteradas: registre uma correção.')
+
+
+for _model in (ClinicalNote, ClinicalNoteBody):
+    event.listen(_model, 'before_update', _refuse_change)
+    event.listen(_model, 'before_delete', _refuse_change)
+
+
+def sqlite_ddl(table):
+    return [f"""CREATE TRIGGER IF NOT EXISTS {table}_no_{action} BEFORE {action.upper()} ON {table}
+                BEGIN SELECT RAISE(ABORT, '{APPEND_ONLY}'); END"""
+            for action in ('update', 'delete')]
+
+
+def postgres_ddl(table):
+    return [
+        f"""CREATE OR REPLACE FUNCTION {APPEND_ONLY}() RETURNS trigger AS $$
+            BEGIN RAISE EXCEPTION '{APPEND_ONLY}'; END $$ LANGUAGE plpgsql""",
+        f"""CREATE OR REPLACE TRIGGER {table}_append_only BEFORE UPDATE OR DELETE ON {table}
+            FOR EACH ROW EXECUTE FUNCTION {APPEND_ONLY}()""",
+    ]
+
+
+def create_append_only_ddl(connection, table):
+    """Cria os triggers que recusam alterações na tabela."""
+    ddl = postgres_ddl if connection.dialect.name == 'postgresql' else sqlite_ddl
+    for statement in ddl(table):
+        connection.execute(text(statement))
+
+
+@event.listens_for(ClinicalNote.__table__, 'after_create')
+@event.listens_for(ClinicalNoteBody.__table__, 'after_create')
+def _after_create(target, connection, **kw):
+    create_append_only_ddl(connection, target.name)
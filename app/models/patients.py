@@ -0,0 +1,56 @@
+"""
+Modelo de pacientes.
+
+Além dos dados cadastrais, cada paciente guarda as colunas de busca usadas
+pelo autocompletar da recepção (``app.patients.search``): o nome sem
+acentos e em minúsculas e os dígitos do CPF e do telefone. Elas são
+recalculadas a cada gravação pela sessão; cargas em massa usam
+``search_fields``.
+"""
+
+import re
+from sqlalchemy import event
+from .. import db
+from .base import TimestampMixin, SoftDeleteMixin
+from ..search.index import normalize
+
+_NON_DIGITS = re.compile(r'\D')
+_SPACES = re.compile(r'\s+')
+
+
+def digits(value):
+    return _NON_DIGITS.sub('', value or '')
+
+
+def search_fields(name, cpf=None, phone=None):
+    """``(search_name, search_digits)`` de um paciente."""
+    search_name = _SPACES.sub(' ', normalize(name)).strip()
+    return search_name, ' '.join(filter(None, (digits(cpf), digits(phone))))
+
+
+class Patient(db.Model, TimestampMixin, SoftDeleteMixin):
+    """Paciente atendido pela clínica."""
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(150), nullable=False)
+    cpf = db.Column(db.String(14), unique=True)
+    phone = db.Column(db.String(20))
+    email = db.Column(db.String(120))
+    birth_date = db.Column(db.Date)
+    search_name = db.Column(db.String(150), nullable=False, default='')
+    search_digits = db.Column(db.String(40), nullable=False, default='')
+    # Concorrência otimista: todo UPDATE pela sessão confere e incrementa
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+
+    __mapper_args__ = {'version_id_col': version}
+
+    def refresh_search_fields(self):
+        self.search_name, self.search_digits = search_fields(self.name, self.cpf, self.phone)
+
+    def __repr__(self):
+        return f'<Patient {self.name}>'
+
+
+@event.listens_for(Patient, 'before_insert')
+@event.listens_for(Patient, 'before_update')
+def _refresh_search_fields(mapper, connection, target):
+    target.refresh_search_fields()
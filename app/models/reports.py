@@ -0,0 +1,27 @@
+"""
+Agregados diários dos relatórios gerenciais.
+"""
+
+from datetime import datetime, timezone
+from .. import db
+
+
+class ReportDay(db.Model):
+    """
+    Números de um dia (hora local) de um profissional: atendimentos por
+    status, minutos ocupados e faturamento dos realizados. Recalculado em
+    segundo plano depois de cada commit que toca o dia
+    (``app.reports.aggregates``); os relatórios leem só estas linhas.
+    """
+    __tablename__ = 'report_day'
+
+    professional_id = db.Column(db.Integer, db.ForeignKey('professional.id'), primary_key=True)
+    day = db.Column(db.Date, primary_key=True, index=True)
+    scheduled = db.Column(db.Integer, nullable=False, default=0)
+    completed = db.Column(db.Integer, nullable=False, default=0)
+    no_show = db.Column(db.Integer, nullable=False, default=0)
+    cancelled = db.Column(db.Integer, nullable=False, default=0)
+    booked_minutes = db.Column(db.Integer, nullable=False, default=0)  # só atendimentos ativos
+    revenue_cents = db.Column(db.BigInteger, nullable=False, default=0)  # só realizados
+    refreshed_at = db.Column(db.DateTime(timezone=True), nullable=False,
+                             default=lambda: datetime.now(timezone.utc))
@@ -0,0 +1,272 @@
+"""
+Modelos da agenda: salas, profissionais e atendimentos.
+
+Dois atendimentos ativos (não cancelados nem excluídos) do mesmo
+profissional, ou da mesma sala, não podem se sobrepor. A regra é garantida
+pelo próprio banco, sem travar a tabela:
+
+- no PostgreSQL, por restrições de exclusão GiST sobre ``tstzrange``;
+- no SQLite, por triggers que consultam o índice parcial
+  ``(recurso, starts_at)``. Como os atendimentos ativos de um recurso são
+  disjuntos, basta olhar o último que começa antes do fim do novo: há
+  conflito se ele termina depois do início. Uma busca O(log n) no índice.
+
+Os triggers rodam com a trava de escrita do SQLite, e a restrição de
+exclusão serializa inserções concorrentes no PostgreSQL; duas reservas
+simultâneas do mesmo horário nunca passam juntas.
+"""
+
+from enum import Enum
+from sqlalchemy import event, text
+from .. import db
+from .base import TimestampMixin, SoftDeleteMixin
+
+PROFESSIONAL_CONFLICT = 'appointment_professional_conflict'
+ROOM_CONFLICT = 'appointment_room_conflict'
+
+# Mesmo predicado nos índices parciais, nos triggers e nas consultas,
+# para que o SQLite reconheça o índice parcial
+ACTIVE_SQL = "status <> 'CANCELLED' AND NOT is_deleted"
+
+
+class AppointmentStatus(Enum):
+    SCHEDULED = 'scheduled'
+    COMPLETED = 'completed'
+    NO_SHOW = 'no_show'
+    CANCELLED = 'cancelled'
+
+
+class Room(db.Model, TimestampMixin, SoftDeleteMixin):
+    """Sala (ou recurso físico) de uma unidade."""
+    id = db.Column(db.Integer, primary_key=True)
+    name = db.Column(db.String(100), nullable=False)
+    unit = db.Column(db.String(100))
+
+    def __repr__(self):
+        return f'<Room {self.name}>'
+
+
+class Professional(db.Model, TimestampMixin, SoftDeleteMixin):
+    """Profissional que atende; opcionalmente ligado a uma conta de usuário."""
+    id = db.Column(db.Integer, primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), unique=True)
+    name = db.Column(db.String(100), nullable=False)
+    specialty = db.Column(db.String(100), index=True)
+
+    user = db.relationship('User', foreign_keys=[user_id])
+
+    def __repr__(self):
+        return f'<Professional {self.name}>'
+
+
+class Appointment(db.Model, TimestampMixin, SoftDeleteMixin):
+    """Atendimento no intervalo ``[starts_at, ends_at)``, em UTC."""
+    __table_args__ = (
+        db.CheckConstraint('ends_at > starts_at', name='appointment_valid_interval'),
+        db.Index('ix_appointment_professional_active', 'professional_id', 'starts_at',
+                 sqlite_where=text(ACTIVE_SQL),
+                 postgresql_where=text(ACTIVE_SQL)),
+        db.Index('ix_appointment_room_active', 'room_id', 'starts_at',
+                 sqlite_where=text(ACTIVE_SQL),
+                 postgresql_where=text(ACTIVE_SQL)),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    professional_id = db.Column(db.Integer, db.ForeignKey('professional.id'), nullable=False)
+    room_id = db.Column(db.Integer, db.ForeignKey('room.id'))
+    starts_at = db.Column(db.DateTime(timezone=True), nullable=False)
+    ends_at = db.Column(db.DateTime(timezone=True), nullable=False)
+    status = db.Column(db.Enum(AppointmentStatus), default=AppointmentStatus.SCHEDULED,
+                       nullable=False)
+    notes = db.Column(db.Text)  # markdown
+    notes_html = db.Column(db.Text)  # HTML sanitizado de ``notes`` (app.utils.rich_text)
+    notes_html_version = db.Column(db.String(12))
+    price_cents = db.Column(db.Integer)  # valor cobrado, em centavos
+    created_by = db.Column(db.Integer, db.ForeignKey('user.id'))
+    # Concorrência otimista: todo UPDATE pela sessão confere e incrementa
+    version = db.Column(db.Integer, nullable=False, default=1, server_default='1')
+
+    professional = db.relationship('Professional', foreign_keys=[professional_id])
+    room = db.relationship('Room', foreign_keys=[room_id])
+    creator = db.relationship('User', foreign_keys=[created_by])
+
+    __mapper_args__ = {'version_id_col': version}
+
+    @property
+    def is_active(self):
+        return self.status != AppointmentStatus.CANCELLED and not self.is_deleted
+
+    def __repr__(self):
+        return f'<Appointment {self.id} {self.starts_at:%Y-%m-%d %H:%M}>'
+
+
+# Colunas cujo valor anterior os listeners de flush leem do histórico (resumo
+# da agenda, agregados dos relatórios e fila de espera)
+HISTORY_TRACKED = ('professional_id', 'room_id', 'starts_at', 'ends_at', 'status', 'is_deleted')
+
+
+def _load_previous(target, value, oldvalue, initiator):
+    # Com ``active_history`` o valor antigo é carregado antes da troca, mesmo
+    # com o objeto expirado, e fica no histórico do atributo
+    pass
+
+
+for _name in HISTORY_TRACKED:
+    event.listen(getattr(Appointment, _name), 'set', _load_previous, active_history=True)
+
+
+class WorkingHours(db.Model, TimestampMixin):
+    """
+    Expediente semanal de um profissional ou de uma sala, em hora local da
+    clínica. Um recurso sem expediente cadastrado é considerado sempre aberto.
+    """
+    __tablename__ = 'working_hours'
+    __table_args__ = (
+        db.CheckConstraint('(professional_id IS NULL) <> (room_id IS NULL)',
+                           name='working_hours_one_resource'),
+        db.CheckConstraint('end_time > start_time', name='working_hours_valid_interval'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    professional_id = db.Column(db.Integer, db.ForeignKey('professional.id'), index=True)
+    room_id = db.Column(db.Integer, db.ForeignKey('room.id'), index=True)
+    weekday = db.Column(db.SmallInteger, nullable=False)  # 0 = segunda-feira
+    start_time = db.Column(db.Time, nullable=False)
+    end_time = db.Column(db.Time, nullable=False)
+
+
+class Absence(db.Model, TimestampMixin, SoftDeleteMixin):
+    """Ausência de um profissional ou bloqueio de uma sala, em UTC."""
+    __table_args__ = (
+        db.CheckConstraint('(professional_id IS NULL) <> (room_id IS NULL)',
+                           name='absence_one_resource'),
+        db.CheckConstraint('ends_at > starts_at', name='absence_valid_interval'),
+        db.Index('ix_absence_professional', 'professional_id', 'starts_at'),
+        db.Index('ix_absence_room', 'room_id', 'starts_at'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    professional_id = db.Column(db.Integer, db.ForeignKey('professional.id'))
+    room_id = db.Column(db.Integer, db.ForeignKey('room.id'))
+    starts_at = db.Column(db.DateTime(timezone=True), nullable=False)
+    ends_at = db.Column(db.DateTime(timezone=True), nullable=False)
+    reason = db.Column(db.String(200))
+
+
+
+class AppointmentSeries(db.Model, TimestampMixin, SoftDeleteMixin):
+    """
+    Atendimento recorrente: a regra (subconjunto do RRULE) é guardada uma vez
+    e as ocorrências são geradas sob demanda (``app.scheduling.recurrence``).
+    Cancelar a série inteira é excluí-la (``is_deleted``).
+    """
+    __tablename__ = 'appointment_series'
+
+    id = db.Column(db.Integer, primary_key=True)
+    professional_id = db.Column(db.Integer, db.ForeignKey('professional.id'), nullable=False,
+                                index=True)
+    room_id = db.Column(db.Integer, db.ForeignKey('room.id'), index=True)
+    dtstart = db.Column(db.DateTime(timezone=True), nullable=False)  # primeira ocorrência
+    duration_minutes = db.Column(db.Integer, nullable=False)
+    rule = db.Column(db.String(200), nullable=False)  # ex.: FREQ=WEEKLY;BYDAY=MO,WE;COUNT=24
+    last_ends_at = db.Column(db.DateTime(timezone=True))  # nulo se a série não termina
+    notes = db.Column(db.Text)  # markdown
+    notes_html = db.Column(db.Text)  # HTML sanitizado de ``notes`` (app.utils.rich_text)
+    notes_html_version = db.Column(db.String(12))
+    created_by = db.Column(db.Integer, db.ForeignKey('user.id'))
+
+    professional = db.relationship('Professional', foreign_keys=[professional_id])
+    room = db.relationship('Room', foreign_keys=[room_id])
+    exceptions = db.relationship('SeriesException', back_populates='series',
+                                 cascade='all, delete-orphan')
+
+    def __repr__(self):
+        return f'<AppointmentSeries {self.id} {self.rule}>'
+
+
+class SeriesException(db.Model, TimestampMixin):
+    """Ocorrência cancelada ou movida; só as exceções são gravadas."""
+    __tablename__ = 'series_exception'
+    __table_args__ = (db.UniqueConstraint('series_id', 'original_start'),)
+
+    id = db.Column(db.Integer, primary_key=True)
+    series_id = db.Column(db.Integer, db.ForeignKey('appointment_series.id'), nullable=False)
+    original_start = db.Column(db.DateTime(timezone=True), nullable=False)
+    is_cancelled = db.Column(db.Boolean, nullable=False, default=False)
+    starts_at = db.Column(db.DateTime(timezone=True))  # novo horário, se movida
+    ends_at = db.Column(db.DateTime(timezone=True))
+
+    series = db.relationship('AppointmentSeries', back_populates='exceptions')
+
+
+class AgendaDay(db.Model):
+    """
+    Resumo de um dia (hora local) da agenda de um profissional, sala ou
+    unidade: contagem por status, primeiro início, último fim e minutos
+    ocupados. Mantido a cada gravação de atendimento
+    (``app.scheduling.summary``); as visões de mês e semana leem só estas
+    linhas.
+    """
+    __tablename__ = 'agenda_day'
+
+    scope = db.Column(db.String(20), primary_key=True)  # professional, room ou unit
+    scope_key = db.Column(db.String(100), primary_key=True)  # id ou nome da unidade
+    day = db.Column(db.Date, primary_key=True)
+    scheduled = db.Column(db.Integer, nullable=False, default=0)
+    completed = db.Column(db.Integer, nullable=False, default=0)
+    no_show = db.Column(db.Integer, nullable=False, default=0)
+    cancelled = db.Column(db.Integer, nullable=False, default=0)
+    booked_minutes = db.Column(db.Integer, nullable=False, default=0)
+    first_starts_at = db.Column(db.DateTime(timezone=True))  # só atendimentos ativos
+    last_ends_at = db.Column(db.DateTime(timezone=True))
+
+
+def _sqlite_check(resource, message, exclude_self):
+    """Aborta se o último atendimento ativo do recurso que começa antes do fim invade o início."""
+    other = ' AND id <> NEW.id' if exclude_self else ''
+    return f"""
+        SELECT RAISE(ABORT, '{message}')
+        WHERE NEW.{resource} IS NOT NULL AND (
+            SELECT ends_at FROM appointment
+            WHERE {resource} = NEW.{resource} AND {ACTIVE_SQL}{other}
+              AND starts_at < NEW.ends_at
+            ORDER BY starts_at DESC LIMIT 1
+        ) > NEW.starts_at;"""
+
+
+SQLITE_DDL = [
+    f"""CREATE TRIGGER IF NOT EXISTS appointment_conflict_bi BEFORE INSERT ON appointment
+        WHEN NEW.status <> 'CANCELLED' AND NOT NEW.is_deleted BEGIN
+        {_sqlite_check('professional_id', PROFESSIONAL_CONFLICT, False)}
+        {_sqlite_check('room_id', ROOM_CONFLICT, False)}
+    END""",
+    f"""CREATE TRIGGER IF NOT EXISTS appointment_conflict_bu
+        BEFORE UPDATE OF professional_id, room_id, starts_at, ends_at, status, is_deleted
+        ON appointment WHEN NEW.status <> 'CANCELLED' AND NOT NEW.is_deleted BEGIN
+        {_sqlite_check('professional_id', PROFESSIONAL_CONFLICT, True)}
+        {_sqlite_check('room_id', ROOM_CONFLICT, True)}
+    END""",
+]
+
+POSTGRES_DDL = [
+    # Necessária para combinar igualdade de inteiros com sobreposição no GiST
+    "CREATE EXTENSION IF NOT EXISTS btree_gist",
+    f"""ALTER TABLE appointment ADD CONSTRAINT {PROFESSIONAL_CONFLICT}
+        EXCLUDE USING gist (professional_id WITH =, tstzrange(starts_at, ends_at, '[)') WITH &&)
+        WHERE ({ACTIVE_SQL})""",
+    f"""ALTER TABLE appointment ADD CONSTRAINT {ROOM_CONFLICT}
+        EXCLUDE USING gist (room_id WITH =, tstzrange(starts_at, ends_at, '[)') WITH &&)
+        WHERE (room_id IS NOT NULL AND {ACTIVE_SQL})""",
+]
+
+
+def create_conflict_ddl(connection):
+    """Cria as restrições de conflito específicas do banco."""
+    statements = POSTGRES_DDL if connection.dialect.name == 'postgresql' else SQLITE_DDL
+    for statement in statements:
+        connection.execute(text(statement))
+
+
+@event.listens_for(Appointment.__table__, 'after_create')
+def _after_create(target, connection, **kw):
+    create_conflict_ddl(connection)
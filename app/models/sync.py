@@ -0,0 +1,23 @@
+"""
+Lotes de sincronização offline já aplicados.
+"""
+
+from datetime import datetime, timezone
+from .. import db
+from .base import CompressedText
+
+
+class SyncBatch(db.Model):
+    """
+    Lote enviado pelo aplicativo, identificado pelo id gerado no aparelho.
+    Guarda a resposta devolvida: o reenvio do mesmo lote (ex.: a conexão caiu
+    antes da resposta chegar) recebe a mesma resposta sem aplicar nada de novo.
+    """
+    __tablename__ = 'sync_batch'
+
+    id = db.Column(db.String(64), primary_key=True)
+    user_id = db.Column(db.Integer, db.ForeignKey('user.id'), index=True)
+    received_at = db.Column(db.DateTime(timezone=True), nullable=False,
+                            default=lambda: datetime.now(timezone.utc))
+    items = db.Column(db.Integer, nullable=False, default=0)
+    response = db.Column(CompressedText(), nullable=False, default='')
@@ -0,0 +1,83 @@
+"""
+Fila de espera para encaixes.
+
+Cada pedido (``WaitlistEntry``) é de um paciente, para um profissional ou
+para qualquer profissional de uma especialidade, com uma duração e janelas
+preferidas da semana em hora local (``WaitlistWindow``). As janelas levam
+o profissional e a especialidade do pedido e são a estrutura de busca:
+um horário liberado procura, pelos índices, só as janelas do mesmo
+profissional (ou da especialidade) naquele dia da semana que começam antes
+do horário. Quando o pedido sai da fila, as janelas são apagadas.
+"""
+
+from datetime import datetime, timezone
+from enum import Enum
+from sqlalchemy import text
+from .. import db
+
+
+class WaitlistStatus(Enum):
+    WAITING = 'waiting'
+    BOOKED = 'booked'
+    REMOVED = 'removed'
+
+
+class WaitlistEntry(db.Model):
+    """Pedido de encaixe de um paciente."""
+    __tablename__ = 'waitlist_entry'
+    __table_args__ = (
+        db.CheckConstraint('professional_id IS NOT NULL OR specialty IS NOT NULL',
+                           name='waitlist_entry_target'),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    patient_id = db.Column(db.Integer, db.ForeignKey('patient.id'), nullable=False, index=True)
+    professional_id = db.Column(db.Integer, db.ForeignKey('professional.id'))
+    specialty = db.Column(db.String(100))  # qualquer profissional dela, se não houver profissional
+    duration_minutes = db.Column(db.Integer, nullable=False)
+    priority = db.Column(db.Integer, nullable=False, default=0)  # maior primeiro
+    earliest_day = db.Column(db.Date)  # não encaixar antes
+    latest_day = db.Column(db.Date)  # nem depois
+    status = db.Column(db.Enum(WaitlistStatus), nullable=False, default=WaitlistStatus.WAITING)
+    notes = db.Column(db.Text)
+    created_by = db.Column(db.Integer, db.ForeignKey('user.id'))
+    created_at = db.Column(db.DateTime(timezone=True), nullable=False,
+                           default=lambda: datetime.now(timezone.utc))
+    last_offered_at = db.Column(db.DateTime(timezone=True))
+
+    patient = db.relationship('Patient', foreign_keys=[patient_id])
+    professional = db.relationship('Professional', foreign_keys=[professional_id])
+    creator = db.relationship('User', foreign_keys=[created_by])
+    windows = db.relationship('WaitlistWindow', back_populates='entry',
+                              cascade='all, delete-orphan')
+
+    def __repr__(self):
+        return f'<WaitlistEntry {self.id} {self.status.value}>'
+
+
+class WaitlistWindow(db.Model):
+    """
+    Janela preferida ``[start_minute, end_minute)`` de um dia da semana
+    (0 = segunda), em minutos desde a meia-noite local.
+    """
+    __tablename__ = 'waitlist_window'
+    __table_args__ = (
+        db.CheckConstraint('end_minute > start_minute', name='waitlist_window_valid'),
+        db.Index('ix_waitlist_window_professional', 'professional_id', 'weekday', 'start_minute',
+                 sqlite_where=text('professional_id IS NOT NULL'),
+                 postgresql_where=text('professional_id IS NOT NULL')),
+        db.Index('ix_waitlist_window_specialty', 'specialty', 'weekday', 'start_minute',
+                 sqlite_where=text('professional_id IS NULL'),
+                 postgresql_where=text('professional_id IS NULL')),
+    )
+
+    id = db.Column(db.Integer, primary_key=True)
+    entry_id = db.Column(db.Integer, db.ForeignKey('waitlist_entry.id', ondelete='CASCADE'),
+                         nullable=False, index=True)
+    professional_id = db.Column(db.Integer)  # copiados do pedido, para os índices
+    specialty = db.Column(db.String(100))
+    weekday = db.Column(db.SmallInteger, nullable=False)
+    start_minute = db.Column(db.SmallInteger, nullable=False)
+    end_minute = db.Column(db.SmallInteger, nullable=False)
+
+    entry = db.relationship('WaitlistEntry', back_populates='windows')
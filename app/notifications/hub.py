@@ -0,0 +1,175 @@
+"""
+Distribuição de notificações do servidor via Server-Sent Events.
+
+Cada worker mantém um ``NotificationHub`` em memória com as filas dos
+streams abertos. A entrega entre workers passa pelo banco: uma única thread
+por processo (``DatabaseRelay``) busca as notificações novas e as repassa
+às filas locais, em vez de cada aba fazer polling com autenticação e
+consulta própria.
+"""
+
+import json
+import logging
+import os
+import queue
+import threading
+from flask import current_app
+from .. import db
+
+logger = logging.getLogger(__name__)
+
+_lock = threading.Lock()
+
+# Colocado na fila de um stream substituído por outro do mesmo usuário
+EVICTED = object()
+
+
+class NotificationHub:
+    """
+    Fan-out em processo, com limite de conexões simultâneas por worker. No
+    limite, um stream novo substitui o mais antigo do mesmo usuário (em geral
+    de uma página que já foi fechada e só seria notada no próximo heartbeat).
+    """
+
+    def __init__(self, max_connections=25, queue_size=100):
+        self.max_connections = max_connections
+        self.queue_size = queue_size
+        self._lock = threading.Lock()
+        self._subscribers = {}
+        self._count = 0
+
+    @property
+    def connections(self):
+        return self._count
+
+    def subscribe(self, user_id):
+        """
+        Abre uma fila para o usuário. No limite de conexões, encerra o stream
+        mais antigo do usuário; sem nenhum dele, retorna ``None``.
+        """
+        with self._lock:
+            queues = self._subscribers.get(user_id)
+            if self._count >= self.max_connections:
+                if not queues:
+                    return None
+                oldest = next(iter(queues))
+                del queues[oldest]
+                self._count -= 1
+                _evict(oldest)
+            q = queue.Queue(maxsize=self.queue_size)
+            # dict em vez de set: mantém a ordem de abertura
+            self._subscribers.setdefault(user_id, {})[q] = None
+            self._count += 1
+            return q
+
+    def unsubscribe(self, user_id, q):
+        with self._lock:
+            queues = self._subscribers.get(user_id)
+            if queues and q in queues:
+                del queues[q]
+                self._count -= 1
+                if not queues:
+                    del self._subscribers[user_id]
+
+    def publish(self, user_id, event):
+        """Entrega o evento às filas locais do usuário sem bloquear."""
+        with self._lock:
+            queues = list(self._subscribers.get(user_id, ()))
+        for q in queues:
+            try:
+                q.put_nowait(event)
+            except queue.Full:
+                # O cliente recupera o que perdeu via Last-Event-ID ao reconectar
+                pass
+
+
+def _evict(q):
+    """Avisa o stream que ele foi substituído; o que estava na fila volta pelo replay."""
+    while True:
+        try:
+            q.put_nowait(EVICTED)
+            return
+        except queue.Full:
+            try:
+                q.get_nowait()
+            except queue.Empty:
+                pass
+
+
+class DatabaseRelay(threading.Thread):
+    """Thread que repassa ao hub local as notificações gravadas por qualquer worker."""
+
+    def __init__(self, app, hub, interval=1.0):
+        super().__init__(name='notification-relay', daemon=True)
+        self.app = app
+        self.hub = hub
+        self.interval = interval
+        self.stopped = threading.Event()
+
+    def run(self):
+        from ..models import Notification
+
+        cursor = None
+        with self.app.app_context():
+            while not self.stopped.wait(self.interval):
+                if not self.hub.connections:
+                    continue
+                try:
+                    # Streams novos recuperam o histórico pelo replay, não pelo relay
+                    if cursor is None:
+                        cursor = db.session.query(db.func.max(Notification.id)).scalar() or 0
+                    rows = (Notification.query
+                            .filter(Notification.id > cursor)
+                            .order_by(Notification.id)
+                            .limit(500)
+                            .all())
+                    for row in rows:
+                        self.hub.publish(row.user_id, row.to_event())
+                        cursor = row.id
+                except Exception:
+                    logger.exception('Falha ao repassar notificações')
+                finally:
+                    db.session.remove()
+
+    def stop(self):
+        self.stopped.set()
+
+
+def get_hub(app=None):
+    """
+    Retorna o hub deste processo, iniciando o relay sob demanda. O PID é
+    conferido para que workers criados por fork não herdem a thread do pai.
+    """
+    app = app or current_app._get_current_object()
+    state = app.extensions.get('notifications')
+    if state is None or state['pid'] != os.getpid():
+        with _lock:  # duas primeiras requisições simultâneas criariam dois hubs
+            state = app.extensions.get('notifications')
+            if state is None or state['pid'] != os.getpid():
+                hub = NotificationHub(max_connections=app.config['SSE_MAX_CONNECTIONS'])
+                relay = DatabaseRelay(app, hub, interval=app.config['SSE_POLL_INTERVAL'])
+                relay.start()
+                state = app.extensions['notifications'] = {
+                    'pid': os.getpid(), 'hub': hub, 'relay': relay}
+    return state['hub']
+
+
+def notify(user_id, message, kind='info', **data):
+    """
+    Registra uma notificação para o usuário. A gravação acompanha a
+    transação do chamador; a entrega acontece após o commit.
+    """
+    from ..models import Notification
+
+    notification = Notification(
+        user_id=user_id,
+        kind=kind,
+        payload=json.dumps(dict(data, message=message))
+    )
+    db.session.add(notification)
+    return notification
+
+
+def format_event(event):
+    """Serializa o evento no formato text/event-stream."""
+    return f"id: {event['id']}\ndata: {json.dumps(event['data'])}\n\n"
@@ -0,0 +1,81 @@
+"""
+Rota de stream de notificações (Server-Sent Events).
+"""
+
+import queue
+import time
+from flask import Blueprint, Response, request, current_app
+from flask_login import login_required, current_user
+from ..models import Notification
+from .. import db
+from .hub import EVICTED, get_hub, format_event
+
+notifications = Blueprint('notifications', __name__)
+
+
+@notifications.route('/stream')
+@login_required
+def stream():
+    """
+    Stream SSE das notificações do usuário logado. Reenvia o que foi perdido
+    desde ``Last-Event-ID`` e mantém a conexão viva com heartbeats.
+    """
+    hub = get_hub()
+    user_id = current_user.id
+    subscription = hub.subscribe(user_id)
+    if subscription is None:  # o cliente tenta de novo (ver app.js)
+        return Response('Limite de conexões atingido', status=503,
+                        headers={'Retry-After': '10'})
+
+    try:
+        last_id = int(request.headers.get('Last-Event-ID')
+                      or request.args.get('last_event_id') or 0)
+    except ValueError:
+        last_id = 0
+
+    # Inscrição antes do replay: nada gravado entre as duas etapas se perde
+    backlog = []
+    if last_id:
+        backlog = [row.to_event() for row in Notification.query
+                   .filter(Notification.user_id == user_id, Notification.id > last_id)
+                   .order_by(Notification.id)
+                   .limit(100)]
+    # O stream não usa o banco: libera a conexão antes de começar
+    db.session.remove()
+
+    config = current_app.config
+    return Response(
+        _event_stream(hub, user_id, subscription, backlog, last_id,
+                      config['SSE_HEARTBEAT'], config['SSE_MAX_DURATION']),
+        mimetype='text/event-stream',
+        headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'}
+    )
+
+
+def _event_stream(hub, user_id, subscription, backlog, last_id, heartbeat, max_duration):
+    deadline = time.monotonic() + max_duration
+    try:
+        yield 'retry: 5000\n\n'
+        for event in backlog:
+            last_id = event['id']
+            yield format_event(event)
+
+        # Streams têm duração máxima para devolver a thread ao worker;
+        # o navegador reconecta sozinho usando Last-Event-ID
+        while time.monotonic() < deadline:
+            try:
+                event = subscription.get(timeout=heartbeat)
+            except queue.Empty:
+                yield ': ping\n\n'
+                continue
+            if event is EVICTED:
+                # Outro stream do usuário ocupou a vaga: demora mais a voltar
+                # para duas abas não se derrubarem a cada reconexão
+                yield 'retry: 60000\n\n'
+                return
+            if event['id'] <= last_id:
+                continue
+            last_id = event['id']
+            yield format_event(event)
+    finally:
+        hub.unsubscribe(user_id, subscription)
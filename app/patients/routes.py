@@ -0,0 +1,23 @@
+"""
+Rotas de pacientes.
+"""
+
+from flask import Blueprint, request, jsonify
+from flask_login import login_required
+from .. import db
+from .search import typeahead
+
+patients = Blueprint('patients', __name__)
+
+
+@patients.route('/typeahead')
+@login_required
+def patient_typeahead():
+    """Pacientes que casam com o nome, CPF ou telefone parcial em ``q``."""
+    query = request.args.get('q', '').strip()
+    limit = min(max(request.args.get('limit', 10, type=int), 1), 50)
+    results = typeahead(db.session.connection(), query, limit=limit)
+    for patient in results:
+        if patient['birth_date'] is not None:
+            patient['birth_date'] = str(patient['birth_date'])
+    return jsonify({'query': query, 'results': results})
@@ -0,0 +1,166 @@
+"""
+Autocompletar de pacientes para a recepção.
+
+A busca usa as colunas normalizadas do paciente (``search_name`` sem
+acentos, ``search_digits`` com CPF e telefone só em dígitos) em duas fases:
+
+1. nomes que começam com o texto digitado ("joao sil" -> "joao silva ..."),
+   por uma faixa do índice B-tree de ``search_name``, já em ordem
+   alfabética e sem ordenar nada;
+2. se faltar resultado, nomes com algum termo começando por cada palavra
+   digitada, em qualquer posição ("sil" acha "maria da silva"): FTS5 com
+   índice de prefixos no SQLite, ``pg_trgm`` (GIN) no PostgreSQL.
+
+Fragmentos numéricos (parte do CPF ou do telefone, com ou sem pontuação)
+filtram por trigramas de ``search_digits`` nos dois bancos.
+"""
+
+import re
+from sqlalchemy import bindparam, event, text
+from ..models.patients import digits
+from ..search.index import query_terms
+
+MIN_DIGITS = 3
+
+SQLITE_DDL = [
+    "CREATE INDEX IF NOT EXISTS ix_patient_search_name ON patient (search_name)",
+    """CREATE VIRTUAL TABLE IF NOT EXISTS patient_name_fts USING fts5(
+        search_name, content='patient', content_rowid='id', prefix='1 2 3')""",
+    """CREATE VIRTUAL TABLE IF NOT EXISTS patient_digits_fts USING fts5(
+        search_digits, content='patient', content_rowid='id', tokenize='trigram')""",
+    """CREATE TRIGGER IF NOT EXISTS patient_search_ai AFTER INSERT ON patient BEGIN
+        INSERT INTO patient_name_fts(rowid, search_name) VALUES (new.id, new.search_name);
+        INSERT INTO patient_digits_fts(rowid, search_digits) VALUES (new.id, new.search_digits);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS patient_search_ad AFTER DELETE ON patient BEGIN
+        INSERT INTO patient_name_fts(patient_name_fts, rowid, search_name)
+        VALUES ('delete', old.id, old.search_name);
+        INSERT INTO patient_digits_fts(patient_digits_fts, rowid, search_digits)
+        VALUES ('delete', old.id, old.search_digits);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS patient_search_au AFTER UPDATE OF search_name, search_digits
+        ON patient BEGIN
+        INSERT INTO patient_name_fts(patient_name_fts, rowid, search_name)
+        VALUES ('delete', old.id, old.search_name);
+        INSERT INTO patient_digits_fts(patient_digits_fts, rowid, search_digits)
+        VALUES ('delete', old.id, old.search_digits);
+        INSERT INTO patient_name_fts(rowid, search_name) VALUES (new.id, new.search_name);
+        INSERT INTO patient_digits_fts(rowid, search_digits) VALUES (new.id, new.search_digits);
+    END""",
+]
+
+POSTGRES_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS pg_trgm",
+    "CREATE INDEX IF NOT EXISTS ix_patient_search_name ON patient (search_name text_pattern_ops)",
+    # O espaço inicial faz '% sil%' casar com o começo de qualquer termo, inclusive o primeiro
+    """CREATE INDEX IF NOT EXISTS ix_patient_search_name_trgm
+        ON patient USING GIN ((' ' || search_name) gin_trgm_ops)""",
+    """CREATE INDEX IF NOT EXISTS ix_patient_search_digits_trgm
+        ON patient USING GIN (search_digits gin_trgm_ops)""",
+]
+
+COLUMNS = 'p.id, p.name, p.cpf, p.phone, p.birth_date'
+
+
+def create_patient_search_ddl(connection):
+    """Cria as estruturas específicas do banco (FTS5 ou pg_trgm)."""
+    statements = POSTGRES_DDL if connection.dialect.name == 'postgresql' else SQLITE_DDL
+    for statement in statements:
+        connection.execute(text(statement))
+
+
+def parse_query(query):
+    """Separa a consulta em termos do nome e fragmento numérico."""
+    terms = query_terms(query)
+    names = [term for term in terms if not term.isdigit()]
+    fragment = digits(query) if any(term.isdigit() for term in terms) else ''
+    return names, fragment
+
+
+def _next_prefix(prefix):
+    # Menor texto maior que todos os que começam com ``prefix``
+    return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+def _like(value):
+    return re.sub(r'([%_\\])', r'\\\1', value)
+
+
+def _digits_filter(dialect, params, fragment):
+    if len(fragment) < MIN_DIGITS:
+        return ''
+    if dialect == 'postgresql':
+        params['digits'] = f'%{_like(fragment)}%'
+        return "AND p.search_digits LIKE :digits ESCAPE '\\'"
+    params['digits'] = f'"{fragment}"'
+    return 'AND p.id IN (SELECT rowid FROM patient_digits_fts WHERE patient_digits_fts MATCH :digits)'
+
+
+def typeahead(connection, query, limit=10):
+    """
+    Até ``limit`` pacientes ativos que casam com ``query``, como
+    dicionários ``id``, ``name``, ``cpf``, ``phone`` e ``birth_date``.
+    """
+    names, fragment = parse_query(query)
+    if not names and len(fragment) < MIN_DIGITS:
+        return []
+
+    dialect = connection.dialect.name
+    params = {'limit': limit}
+    digits_filter = _digits_filter(dialect, params, fragment)
+    found = []
+
+    if names:
+        # 1. Nomes que começam com o que foi digitado, em ordem alfabética
+        params['low'] = ' '.join(names)
+        params['high'] = _next_prefix(params['low'])
+        found = connection.execute(text(f"""
+            SELECT {COLUMNS} FROM patient p
+            WHERE p.search_name >= :low AND p.search_name < :high AND NOT p.is_deleted
+                {digits_filter}
+            ORDER BY p.search_name
+            LIMIT :limit
+        """), params).mappings().all()
+
+    if len(found) < limit:
+        # 2. Termos em qualquer posição do nome (ou só o fragmento numérico)
+        params['limit'] = limit - len(found)
+        params['seen'] = [row['id'] for row in found]
+        source, order = 'patient p', 'p.search_name'
+        if not names and dialect == 'postgresql':
+            where = digits_filter.removeprefix('AND ')
+        elif not names:
+            source = 'patient_digits_fts f JOIN patient p ON p.id = f.rowid'
+            where, order = 'patient_digits_fts MATCH :digits', 'f.rowid'
+        elif dialect == 'postgresql':
+            params.update({f'term{n}': f'% {_like(term)}%' for n, term in enumerate(names)})
+            params['query'] = ' '.join(names)
+            where = ' AND '.join(f"(' ' || p.search_name) LIKE :term{n} ESCAPE '\\'"
+                                 for n in range(len(names))) + f' {digits_filter}'
+            order = 'similarity(p.search_name, :query) DESC, p.search_name'
+        else:
+            # O FTS5 entrega os acertos em ordem de rowid: a leitura para ao
+            # completar o limite, sem ordenar todos os que casam
+            params['names'] = ' '.join(f'"{term}"*' for term in names)
+            source = 'patient_name_fts f JOIN patient p ON p.id = f.rowid'
+            where, order = f'patient_name_fts MATCH :names {digits_filter}', 'f.rowid'
+        found += connection.execute(text(f"""
+            SELECT {COLUMNS} FROM {source}
+            WHERE {where} AND NOT p.is_deleted AND p.id NOT IN :seen
+            ORDER BY {order}
+            LIMIT :limit
+        """).bindparams(bindparam('seen', expanding=True)), params).mappings().all()
+
+    return [dict(row) for row in found]
+
+
+def init_app(app):
+    """Registra a criação das estruturas de busca de pacientes."""
+    from ..models import Patient
+
+    if not event.contains(Patient.__table__, 'after_create', _after_create):
+        event.listen(Patient.__table__, 'after_create', _after_create)
+
+
+def _after_create(target, connection, **kw):
+    create_patient_search_ddl(connection)
@@ -0,0 +1,226 @@
+"""
+Agregados diários dos relatórios (``report_day``), mantidos pela fila.
+
+Cada flush anota os dias ``(profissional, dia local)`` tocados por
+atendimentos gravados; depois do commit eles entram no conjunto de dias
+pendentes, e um único job no executor compartilhado
+(``app.utils.concurrency``) os recalcula. Rajadas de gravações no mesmo dia
+viram um recálculo só, e a requisição não espera pelos relatórios.
+
+O recálculo lê os atendimentos daquele profissional naquele dia (uma busca
+no índice ``(professional_id, starts_at)``) e grava a linha inteira sob uma
+trava do dia, então jobs de workers diferentes não gravam uma leitura velha
+por cima de uma nova. Dias que falham voltam para a fila. A fila vive na
+memória do worker: o que estava pendente num reinício, e as gravações em
+massa que não passam pela sessão, só entram com
+``flask rebuild-report-aggregates``, que deve rodar periodicamente (README).
+"""
+
+import logging
+import os
+import threading
+from datetime import datetime, timedelta, timezone
+from sqlalchemy import bindparam, event, inspect, text
+from sqlalchemy.orm import Session
+from .. import db
+from ..models import Appointment, ReportDay
+from ..scheduling.booking import to_utc
+from ..scheduling.series import clinic_timezone
+from ..scheduling.summary import day_bounds, local_day
+from ..utils import jobs
+
+logger = logging.getLogger(__name__)
+
+COUNTERS = ('scheduled', 'completed', 'no_show', 'cancelled', 'booked_minutes', 'revenue_cents')
+
+# Colunas do atendimento que mudam os agregados
+TRACKED = ('professional_id', 'starts_at', 'ends_at', 'status', 'is_deleted', 'price_cents')
+
+SESSION_KEY = 'report_days'
+JOB_QUEUE = 'reports'
+
+UPSERT_SQL = """
+    INSERT INTO report_day (professional_id, day, scheduled, completed, no_show, cancelled,
+                            booked_minutes, revenue_cents, refreshed_at)
+    VALUES (:professional_id, :day, :scheduled, :completed, :no_show, :cancelled,
+            :booked_minutes, :revenue_cents, :refreshed_at)
+    ON CONFLICT (professional_id, day) DO UPDATE SET
+        scheduled = excluded.scheduled,
+        completed = excluded.completed,
+        no_show = excluded.no_show,
+        cancelled = excluded.cancelled,
+        booked_minutes = excluded.booked_minutes,
+        revenue_cents = excluded.revenue_cents,
+        refreshed_at = excluded.refreshed_at
+"""
+
+_lock = threading.Lock()
+
+
+def _lock_day(connection, professional_id, day):
+    """
+    Trava o dia até o fim da transação, antes da leitura. No PostgreSQL é uma
+    trava consultiva por ``(profissional, dia)``; o SQLite tem uma única
+    trava de escrita, tomada já aqui em vez de só na gravação.
+    """
+    if connection.dialect.name == 'sqlite':
+        connection.execute(text('UPDATE professional SET id = id WHERE id = :id'),
+                           {'id': professional_id})
+    else:
+        connection.execute(text('SELECT pg_advisory_xact_lock(:professional_id, :day)'),
+                           {'professional_id': professional_id, 'day': day.toordinal()})
+
+
+def day_values(rows):
+    """Agregados de um dia a partir de ``(starts_at, ends_at, status, price_cents)``."""
+    values = dict.fromkeys(COUNTERS, 0)
+    for starts_at, ends_at, status, price_cents in rows:
+        values[status.lower()] += 1
+        if status != 'CANCELLED':
+            values['booked_minutes'] += int((to_utc(ends_at) - to_utc(starts_at))
+                                            // timedelta(minutes=1))
+        if status == 'COMPLETED':
+            values['revenue_cents'] += price_cents or 0
+    return values
+
+
+def refresh(connection, days, tz):
+    """Recalcula as linhas ``(professional_id, dia)`` de ``days``."""
+    select = text(
+        'SELECT starts_at, ends_at, status, price_cents FROM appointment '
+        'WHERE professional_id = :professional_id AND starts_at >= :start AND starts_at < :end '
+        'AND NOT is_deleted'
+    ).bindparams(bindparam('start', type_=db.DateTime(timezone=True)),
+                 bindparam('end', type_=db.DateTime(timezone=True))
+                 ).columns(starts_at=db.DateTime(timezone=True), ends_at=db.DateTime(timezone=True))
+    upsert = text(UPSERT_SQL).bindparams(bindparam('day', type_=db.Date),
+                                         bindparam('refreshed_at', type_=db.DateTime(timezone=True)))
+    delete = text('DELETE FROM report_day WHERE professional_id = :professional_id AND day = :day'
+                  ).bindparams(bindparam('day', type_=db.Date))
+
+    now = datetime.now(timezone.utc)
+    # Em ordem: dois jobs tomam as travas na mesma sequência, sem deadlock
+    for professional_id, day in sorted(days):
+        _lock_day(connection, professional_id, day)
+        start, end = day_bounds(day, tz)
+        values = day_values(connection.execute(select, {
+            'professional_id': professional_id, 'start': start, 'end': end}).all())
+        key = {'professional_id': professional_id, 'day': day}
+        if any(values[name] for name in ('scheduled', 'completed', 'no_show', 'cancelled')):
+            connection.execute(upsert, dict(key, refreshed_at=now, **values))
+        else:
+            connection.execute(delete, key)
+
+
+def rebuild(connection, tz, batch_size=5000):
+    """
+    Recalcula todos os agregados lendo os atendimentos em ordem. Devolve
+    quantas linhas foram gravadas.
+    """
+    from ..services.synthetic import insert_rows
+
+    rows_by_day = {}
+    result = connection.execution_options(yield_per=batch_size).execute(text(
+        'SELECT professional_id, starts_at, ends_at, status, price_cents FROM appointment '
+        'WHERE NOT is_deleted'
+    ).columns(starts_at=db.DateTime(timezone=True), ends_at=db.DateTime(timezone=True)))
+    for professional_id, starts_at, ends_at, status, price_cents in result:
+        key = (professional_id, local_day(starts_at, tz))
+        values = day_values([(starts_at, ends_at, status, price_cents)])
+        summary = rows_by_day.setdefault(key, dict.fromkeys(COUNTERS, 0))
+        for name in COUNTERS:
+            summary[name] += values[name]
+
+    connection.execute(ReportDay.__table__.delete())
+    now = datetime.now(timezone.utc)
+    columns = ('professional_id', 'day') + COUNTERS + ('refreshed_at',)
+    insert_rows(connection, 'report_day', columns,
+                [key + tuple(values[name] for name in COUNTERS) + (now,)
+                 for key, values in rows_by_day.items()], batch_size)
+    return len(rows_by_day)
+
+
+def _days(appointment, previous, tz):
+    values = {}
+    for name in ('professional_id', 'starts_at'):
+        if previous:
+            history = inspect(appointment).attrs[name].history
+            found = history.deleted or history.unchanged or history.added
+            values[name] = found[0] if found else None
+        else:
+            values[name] = getattr(appointment, name)
+    if values['professional_id'] is None or values['starts_at'] is None:
+        return set()
+    return {(values['professional_id'], local_day(values['starts_at'], tz))}
+
+
+def _collect_flushed(session, flush_context):
+    """Anota na sessão os dias tocados neste flush."""
+    tz = None
+    days = session.info.setdefault(SESSION_KEY, set())
+    for appointment in session.new:
+        if isinstance(appointment, Appointment):
+            tz = tz or clinic_timezone()
+            days |= _days(appointment, False, tz)
+    for appointment in session.dirty:
+        if isinstance(appointment, Appointment) and any(
+                inspect(appointment).attrs[name].history.has_changes() for name in TRACKED):
+            tz = tz or clinic_timezone()
+            days |= _days(appointment, True, tz) | _days(appointment, False, tz)
+    for appointment in session.deleted:
+        if isinstance(appointment, Appointment):
+            tz = tz or clinic_timezone()
+            days |= _days(appointment, True, tz)
+
+
+def _queue(app):
+    queue = app.extensions.get('report_queue')
+    if queue is None or queue['pid'] != os.getpid():  # worker recém-criado por fork
+        queue = app.extensions['report_queue'] = {'pid': os.getpid(), 'days': set(),
+                                                  'future': None}
+    return queue
+
+
+def enqueue(app, days):
+    """Põe os dias na fila; dispara o job se nenhum estiver rodando. Devolve o ``Future``."""
+    with _lock:
+        queue = _queue(app)
+        queue['days'] |= set(days)
+        if queue['future'] is None:
+            queue['future'] = jobs.submit(app, JOB_QUEUE, _drain, app)
+        return queue['future']
+
+
+def _drain(app):
+    with app.app_context():
+        tz = clinic_timezone()
+        while True:
+            with _lock:
+                queue = _queue(app)
+                days, queue['days'] = queue['days'], set()
+                if not days:
+                    queue['future'] = None
+                    return
+            try:
+                with db.engine.begin() as connection:
+                    refresh(connection, days, tz)
+            except Exception as e:
+                logger.warning('Falha ao atualizar agregados de %d dia(s): %s', len(days), e)
+                # De volta à fila; a próxima gravação dispara nova tentativa
+                with _lock:
+                    queue = _queue(app)
+                    queue['days'] |= days
+                    queue['future'] = None
+                return
+
+
+def wait(app=None, timeout=None):
+    """Espera a fila da aplicação esvaziar (testes e desligamento)."""
+    jobs.wait(JOB_QUEUE, app, timeout)
+
+
+def init_app(app):
+    """Registra a anotação dos dias a cada flush e o enfileiramento no commit."""
+    if not event.contains(Session, 'after_flush', _collect_flushed):
+        event.listen(Session, 'after_flush', _collect_flushed)
+    jobs.on_commit(SESSION_KEY, enqueue)
@@ -0,0 +1,148 @@
+"""
+Exportação de relatórios em CSV e XLSX, linha a linha.
+
+Os geradores recebem um iterável de linhas (normalmente uma consulta com
+``yield_per``) e devolvem blocos de bytes de até ``CHUNK_SIZE``; nada além
+de um bloco fica em memória, então o tamanho do período não muda o
+consumo do worker.
+
+O XLSX é escrito direto como pacote OOXML (zip com o XML da planilha em
+``inlineStr``), sem biblioteca de planilhas: o ``zipfile`` grava as
+entradas em fluxo, com descritores de dados, num destino que não volta
+atrás.
+"""
+
+import codecs
+import csv
+import io
+import zipfile
+from datetime import date, datetime
+from decimal import Decimal
+from xml.sax.saxutils import escape
+
+CHUNK_SIZE = 64 * 1024
+
+# Início de célula que planilhas interpretam como fórmula
+FORMULA_PREFIXES = ('=', '+', '-', '@', '\t', '\r')
+
+CSV_MIMETYPE = 'text/csv; charset=utf-8'
+XLSX_MIMETYPE = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+
+
+def _csv_cell(value):
+    """Texto que começaria uma fórmula vai com ``'`` na frente e abre como texto."""
+    if isinstance(value, str) and value.startswith(FORMULA_PREFIXES):
+        return "'" + value
+    return value
+
+
+def csv_stream(header, rows):
+    """
+    CSV (UTF-8 com BOM, para o Excel reconhecer acentos) em blocos. No XLSX
+    as células de texto são ``inlineStr`` e nunca viram fórmula.
+    """
+    buffer = io.StringIO()
+    writer = csv.writer(buffer)
+    buffer.write(codecs.BOM_UTF8.decode('utf-8'))
+    writer.writerow(header)
+    for row in rows:
+        writer.writerow([_csv_cell(value) for value in row])
+        if buffer.tell() >= CHUNK_SIZE:
+            yield buffer.getvalue().encode('utf-8')
+            buffer.seek(0)
+            buffer.truncate()
+    if buffer.tell():
+        yield buffer.getvalue().encode('utf-8')
+
+
+class _Sink:
+    """Destino só de escrita do zip; ``take`` devolve o que foi escrito desde a última vez."""
+
+    def __init__(self):
+        self._parts = []
+        self.size = 0
+
+    def write(self, data):
+        self._parts.append(bytes(data))
+        self.size += len(data)
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def take(self):
+        data = b''.join(self._parts)
+        self._parts.clear()
+        self.size = 0
+        return data
+
+
+CONTENT_TYPES = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Types xmlns="http://schemas.openxmlformats.org/package/2006/content-types">
+<Default Extension="rels" ContentType="application/vnd.openxmlformats-package.relationships+xml"/>
+<Default Extension="xml" ContentType="application/xml"/>
+<Override PartName="/xl/workbook.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.sheet.main+xml"/>
+<Override PartName="/xl/worksheets/sheet1.xml" ContentType="application/vnd.openxmlformats-officedocument.spreadsheetml.worksheet+xml"/>
+</Types>"""
+
+ROOT_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/officeDocument" Target="xl/workbook.xml"/>
+</Relationships>"""
+
+WORKBOOK = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<workbook xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main" xmlns:r="http://schemas.openxmlformats.org/officeDocument/2006/relationships">
+<sheets><sheet name="{name}" sheetId="1" r:id="rId1"/></sheets>
+</workbook>"""
+
+WORKBOOK_RELS = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<Relationships xmlns="http://schemas.openxmlformats.org/package/2006/relationships">
+<Relationship Id="rId1" Type="http://schemas.openxmlformats.org/officeDocument/2006/relationships/worksheet" Target="worksheets/sheet1.xml"/>
+</Relationships>"""
+
+SHEET_START = """<?xml version="1.0" encoding="UTF-8" standalone="yes"?>
+<worksheet xmlns="http://schemas.openxmlformats.org/spreadsheetml/2006/main"><sheetData>"""
+
+SHEET_END = '</sheetData></worksheet>'
+
+
+def _cell(value):
+    if value is None:
+        return '<c/>'
+    if isinstance(value, bool):
+        return f'<c t="b"><v>{int(value)}</v></c>'
+    if isinstance(value, (int, float, Decimal)):
+        return f'<c><v>{value}</v></c>'
+    if isinstance(value, (date, datetime)):
+        value = value.isoformat()
+    return f'<c t="inlineStr"><is><t>{escape(str(value))}</t></is></c>'
+
+
+def _row(values):
+    return '<row>' + ''.join(_cell(value) for value in values) + '</row>'
+
+
+def xlsx_stream(header, rows, sheet_name='Relatório'):
+    """Planilha XLSX de uma aba em blocos; datas saem como texto ISO."""
+    sink = _Sink()
+    with zipfile.ZipFile(sink, 'w', compression=zipfile.ZIP_DEFLATED) as package:
+        package.writestr('[Content_Types].xml', CONTENT_TYPES)
+        package.writestr('_rels/.rels', ROOT_RELS)
+        package.writestr('xl/workbook.xml', WORKBOOK.format(name=escape(sheet_name[:31], {'"': '&quot;'})))
+        package.writestr('xl/_rels/workbook.xml.rels', WORKBOOK_RELS)
+        with package.open('xl/worksheets/sheet1.xml', 'w', force_zip64=True) as sheet:
+            pending = [SHEET_START, _row(header)]
+            size = 0
+            for row in rows:
+                line = _row(row)
+                pending.append(line)
+                size += len(line)
+                if size >= CHUNK_SIZE:
+                    sheet.write(''.join(pending).encode('utf-8'))
+                    pending.clear()
+                    size = 0
+                    if sink.size:
+                        yield sink.take()
+            pending.append(SHEET_END)
+            sheet.write(''.join(pending).encode('utf-8'))
+    yield sink.take()
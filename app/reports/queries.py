@@ -0,0 +1,135 @@
+"""
+Consultas dos relatórios gerenciais.
+
+Os números agregados vêm só de ``report_day``: o custo depende do número de
+dias e profissionais do período, não do histórico de atendimentos. Apenas a
+exportação detalhada (``appointment_rows``) lê os atendimentos, em fluxo.
+"""
+
+from collections import Counter
+from datetime import timedelta
+from sqlalchemy import func
+from .. import db
+from ..models import Appointment, Professional, ReportDay, WorkingHours
+from ..scheduling.series import clinic_timezone
+from ..scheduling.summary import day_bounds
+
+GROUPS = ('professional', 'specialty')
+
+_SUMS = tuple(func.coalesce(func.sum(getattr(ReportDay, name)), 0).label(name) for name in (
+    'scheduled', 'completed', 'no_show', 'cancelled', 'booked_minutes', 'revenue_cents'))
+
+
+def weekday_counts(first_day, last_day):
+    """Quantas vezes cada dia da semana (0 = segunda) aparece em ``[first_day, last_day]``."""
+    days = (last_day - first_day).days + 1
+    counts = Counter({weekday: days // 7 for weekday in range(7)})
+    for offset in range(days % 7):
+        counts[(first_day + timedelta(days=offset)).weekday()] += 1
+    return counts
+
+
+def open_minutes(first_day, last_day):
+    """Minutos de expediente de cada profissional no período (sem ausências)."""
+    counts = weekday_counts(first_day, last_day)
+    minutes = Counter()
+    for hours in WorkingHours.query.filter(WorkingHours.professional_id.isnot(None)):
+        length = ((hours.end_time.hour * 60 + hours.end_time.minute)
+                  - (hours.start_time.hour * 60 + hours.start_time.minute))
+        minutes[hours.professional_id] += length * counts[hours.weekday]
+    return minutes
+
+
+def _rates(row, open_total):
+    attended = row['completed'] + row['no_show']
+    row['no_show_rate'] = round(row['no_show'] / attended, 4) if attended else None
+    row['open_minutes'] = open_total
+    row['occupancy'] = round(row['booked_minutes'] / open_total, 4) if open_total else None
+    return row
+
+
+def _check_group(group):
+    if group not in GROUPS:
+        raise ValueError(f'Agrupamento inválido: {group}')
+
+
+def group_totals(first_day, last_day, group='professional'):
+    """Somas de ``report_day`` do período por profissional ou por especialidade."""
+    _check_group(group)
+    period = (ReportDay.day >= first_day, ReportDay.day <= last_day)
+    if group == 'professional':
+        query = (db.session.query(Professional.id, Professional.name, Professional.specialty, *_SUMS)
+                 .join(ReportDay, ReportDay.professional_id == Professional.id)
+                 .filter(*period)
+                 .group_by(Professional.id, Professional.name, Professional.specialty)
+                 .order_by(Professional.name))
+        return [row._asdict() | {'professional_id': row.id} for row in query]
+    query = (db.session.query(Professional.specialty, *_SUMS)
+             .join(ReportDay, ReportDay.professional_id == Professional.id)
+             .filter(*period)
+             .group_by(Professional.specialty)
+             .order_by(Professional.specialty))
+    return [row._asdict() for row in query]
+
+
+def group_open_minutes(first_day, last_day, group='professional'):
+    """Minutos de expediente do período por profissional (id) ou por especialidade."""
+    _check_group(group)
+    minutes = open_minutes(first_day, last_day)
+    if group == 'professional':
+        return minutes
+    specialties = dict(db.session.query(Professional.id, Professional.specialty))
+    open_by_specialty = Counter()
+    for professional_id, total in minutes.items():
+        open_by_specialty[specialties.get(professional_id)] += total
+    return open_by_specialty
+
+
+def with_rates(rows, minutes, group='professional'):
+    """Junta as somas ao expediente e calcula taxa de faltas e ocupação."""
+    key = 'id' if group == 'professional' else 'specialty'
+    return [_rates(row, minutes.get(row[key], 0)) for row in rows]
+
+
+def professional_report(first_day, last_day, group='professional'):
+    """
+    Faturamento, faltas e ocupação do período, por profissional ou por
+    especialidade. ``no_show_rate`` considera só atendimentos que já
+    aconteceriam (realizados e faltas); ``occupancy`` é a fração do
+    expediente cadastrado ocupada (``None`` sem expediente). As duas
+    leituras são independentes (a view as faz em paralelo).
+    """
+    return with_rates(group_totals(first_day, last_day, group),
+                      group_open_minutes(first_day, last_day, group), group)
+
+
+def daily_rows(first_day, last_day, professional_id=None):
+    """Linhas de ``report_day`` do período, lidas aos poucos (para exportação)."""
+    query = (db.session.query(ReportDay.day, Professional.name, Professional.specialty,
+                              ReportDay.scheduled, ReportDay.completed, ReportDay.no_show,
+                              ReportDay.cancelled, ReportDay.booked_minutes,
+                              ReportDay.revenue_cents)
+             .join(Professional, Professional.id == ReportDay.professional_id)
+             .filter(ReportDay.day >= first_day, ReportDay.day <= last_day)
+             .order_by(ReportDay.day, Professional.name)
+             .execution_options(yield_per=1000))
+    if professional_id is not None:
+        query = query.filter(ReportDay.professional_id == professional_id)
+    return query
+
+
+def appointment_rows(first_day, last_day, professional_id=None):
+    """Atendimentos do período (dias locais), lidos aos poucos (para exportação)."""
+    tz = clinic_timezone()
+    query = (db.session.query(Appointment.id, Appointment.starts_at, Appointment.ends_at,
+                              Professional.name, Professional.specialty, Appointment.status,
+                              Appointment.price_cents)
+             .join(Professional, Professional.id == Appointment.professional_id)
+             .filter(Appointment.starts_at >= day_bounds(first_day, tz)[0],
+                     Appointment.starts_at < day_bounds(last_day, tz)[1],
+                     Appointment.is_deleted.is_(False))
+             .order_by(Appointment.starts_at, Appointment.id)
+             .execution_options(yield_per=1000))
+    if professional_id is not None:
+        query = query.filter(Appointment.professional_id == professional_id)
+    return query
@@ -0,0 +1,96 @@
+"""
+Relatórios gerenciais: faturamento por profissional, faltas e ocupação.
+Restritos a administradores.
+
+As consultas leem os agregados diários (``report_day``); as exportações
+são enviadas em fluxo, sem montar o arquivo em memória.
+"""
+
+import asyncio
+from datetime import date, datetime
+from enum import Enum
+from flask import Blueprint, Response, jsonify, request, stream_with_context
+from flask_login import login_required
+from ..auth.decorators import role_required
+from ..models import Role
+from ..scheduling.booking import to_utc
+from ..utils.concurrency import run_blocking
+from . import export, queries
+
+reports = Blueprint('reports', __name__)
+
+EXPORTS = {
+    'daily': (('Dia', 'Profissional', 'Especialidade', 'Agendados', 'Realizados', 'Faltas',
+               'Cancelados', 'Minutos ocupados', 'Faturamento (centavos)'),
+              queries.daily_rows),
+    'appointments': (('Atendimento', 'Início', 'Fim', 'Profissional', 'Especialidade', 'Status',
+                      'Valor (centavos)'),
+                     queries.appointment_rows),
+}
+
+FORMATS = {
+    'csv': (export.csv_stream, export.CSV_MIMETYPE),
+    'xlsx': (export.xlsx_stream, export.XLSX_MIMETYPE),
+}
+
+
+def _period():
+    """``(primeiro dia, último dia)`` de ``start``/``end``; padrão: o mês corrente."""
+    today = date.today()
+    try:
+        first_day = date.fromisoformat(request.args.get('start') or today.replace(day=1).isoformat())
+        last_day = date.fromisoformat(request.args.get('end') or today.isoformat())
+    except ValueError:
+        return None
+    return (first_day, last_day) if first_day <= last_day else None
+
+
+def _invalid_period():
+    return jsonify({'error': 'Período inválido; use start e end como AAAA-MM-DD'}), 400
+
+
+def _plain(value):
+    if isinstance(value, datetime):
+        return to_utc(value).isoformat()
+    return value.value if isinstance(value, Enum) else value
+
+
+@reports.route('/professionals')
+@login_required
+@role_required(Role.ADMIN)
+async def professional_report():
+    """
+    Faturamento, taxa de faltas e ocupação por profissional (``group=specialty``
+    agrupa). As somas e o expediente são lidos em paralelo no executor.
+    """
+    period = _period()
+    if period is None:
+        return _invalid_period()
+    group = request.args.get('group', 'professional')
+    if group not in queries.GROUPS:
+        return jsonify({'error': f'Agrupamento inválido: {group}'}), 400
+    totals, minutes = await asyncio.gather(
+        run_blocking(queries.group_totals, *period, group),
+        run_blocking(queries.group_open_minutes, *period, group))
+    return jsonify({'start': period[0].isoformat(), 'end': period[1].isoformat(),
+                    'rows': queries.with_rates(totals, minutes, group)})
+
+
+@reports.route('/export/<kind>.<fmt>')
+@login_required
+@role_required(Role.ADMIN)
+def export_report(kind, fmt):
+    """Exporta ``daily`` (agregados) ou ``appointments`` (detalhe) em CSV ou XLSX."""
+    if kind not in EXPORTS or fmt not in FORMATS:
+        return jsonify({'error': 'Exportação inexistente'}), 404
+    period = _period()
+    if period is None:
+        return _invalid_period()
+    header, rows = EXPORTS[kind]
+    stream, mimetype = FORMATS[fmt]
+    professional_id = request.args.get('professional_id', type=int)
+    body = stream(header, ([_plain(value) for value in row]
+                           for row in rows(*period, professional_id=professional_id)))
+    filename = f'{kind}_{period[0].isoformat()}_{period[1].isoformat()}.{fmt}'
+    return Response(stream_with_context(body), mimetype=mimetype, headers={
+        'Content-Disposition': f'attachment; filename="{filename}"'})
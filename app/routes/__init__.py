@@ -1,7 +1,7 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request
 from flask_login import login_user, logout_user, login_required, current_user
-from .models import User
-from . import db
+from ..models import User
+from .. import db
 from werkzeug.security import generate_password_hash, check_password_hash
 
 main = Blueprint('main', __name__)
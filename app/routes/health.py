@@ -1,20 +1,54 @@
-from flask import Blueprint, jsonify
-from app import db
+"""
+Probes de saúde.
+
+- ``/livez``: o processo está respondendo (sem I/O).
+- ``/readyz``: último resultado das verificações de banco, cache e disco,
+  atualizado em segundo plano; ``?deep=1`` executa as verificações na hora,
+  no máximo uma vez por ``HEALTH_CHECK_INTERVAL`` (as demais reaproveitam o
+  resultado), já que a rota é pública e fica fora do rate limit.
+- ``/health``: alias de ``/readyz`` mantido para configurações existentes.
+
+As rotas ficam fora do rate limit, da sessão e do redirecionamento HTTPS.
+"""
+
+from flask import Blueprint, jsonify, request, current_app
+from app import limiter, talisman
+from app.utils.health import get_monitor
 
 health = Blueprint('health', __name__)
+limiter.exempt(health)
+
+VERSION = '1.0.0'
+
+
+@health.route('/livez')
+@talisman(force_https=False)
+def livez():
+    return jsonify({'status': 'alive'}), 200
+
+
+@health.route('/readyz')
+@talisman(force_https=False)
+def readyz():
+    monitor = get_monitor()
+    if request.args.get('deep') == '1':
+        monitor.refresh(max_age=current_app.config['HEALTH_CHECK_INTERVAL'])
+    results, age = monitor.snapshot()
+
+    if results is None:
+        return jsonify({'status': 'starting'}), 503
+
+    stale = age > current_app.config['HEALTH_CHECK_INTERVAL'] * 3
+    healthy = not stale and all(r['status'] != 'fail' for r in results.values())
+    return jsonify({
+        'status': 'healthy' if healthy else 'unhealthy',
+        'checks': results,
+        'age_seconds': round(age, 1),
+        'version': VERSION
+    }), 200 if healthy else 503
+
 
 @health.route('/health')
+@talisman(force_https=False)
 def healthcheck():
-    try:
-        # Verifica conexão com banco de dados
-        db.session.execute('SELECT 1')
-        return jsonify({
-            'status': 'healthy',
-            'database': 'connected',
-            'version': '1.0.0'
-        }), 200
-    except Exception as e:
-        return jsonify({
-            'status': 'unhealthy',
-            'error': str(e)
-        }), 500
+    return readyz()
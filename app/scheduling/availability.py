@@ -0,0 +1,266 @@
+"""
+Busca vetorizada de horários livres.
+
+A janela pesquisada vira uma grade de slots (``AGENDA_SLOT_MINUTES``, 5 min
+por padrão) e cada recurso uma linha de uma matriz booleana sobre ela:
+expediente, menos ausências, atendimentos e ocorrências de séries. As
+matrizes são montadas com somas cumulativas sobre todos os intervalos de
+uma vez, sem laço por atendimento; outra soma cumulativa diz, para cada
+slot, se dali cabe uma sequência livre da duração pedida mais as folgas.
+Cada grupo ("algum destes profissionais", "alguma destas salas", os
+compromissos do paciente) vira um vetor, e os vetores são combinados por E
+lógico.
+"""
+
+from collections import namedtuple
+from datetime import datetime, time, timedelta, timezone
+from itertools import chain
+from zoneinfo import ZoneInfo
+import numpy as np
+from flask import current_app
+from sqlalchemy import bindparam, text
+from .. import db
+from ..models.scheduling import ACTIVE_SQL
+from .booking import RESOURCES, to_utc
+from .recurrence import occurrences
+from .series import load_series
+
+FreeSlot = namedtuple('FreeSlot', 'starts_at ends_at professional_id room_id')
+
+# Tabelas que ocupam um recurso, com o filtro das linhas que valem
+BUSY_SOURCES = (('appointment', ACTIVE_SQL), ('absence', 'NOT is_deleted'))
+
+# Janela inicial da busca pelos primeiros horários; dobra enquanto faltar
+SEARCH_CHUNK = timedelta(days=7)
+
+
+def _naive_utc(value):
+    return to_utc(value).replace(tzinfo=None)
+
+
+class SlotGrid:
+    """Grade de slots de ``step`` minutos cobrindo ``[start, end)``, em UTC."""
+
+    def __init__(self, start, end, step=5):
+        start, end = _naive_utc(start), _naive_utc(end)
+        # Começa na hora cheia para que o alinhamento dos inícios seja por relógio
+        self.origin = np.datetime64(start.replace(minute=0, second=0, microsecond=0), 's')
+        self.step = step
+        self.unit = np.timedelta64(step * 60, 's')
+        self.size = int(self.index([end], round_up=True)[0])
+
+    def index(self, values, round_up=False):
+        """Posição de cada instante na grade (arredondada para baixo ou para cima)."""
+        offsets = np.asarray(values, dtype='datetime64[s]') - self.origin
+        if round_up:
+            return -((-offsets) // self.unit)
+        return offsets // self.unit
+
+    def at(self, index):
+        """Instante (UTC) do início do slot."""
+        value = (self.origin + int(index) * self.unit).astype(datetime)
+        return value.replace(tzinfo=timezone.utc)
+
+    def cover(self, count, rows, starts, ends, inner=False):
+        """
+        Matriz ``count x size`` marcando os slots tocados por cada intervalo
+        ``[starts, ends)`` da linha correspondente. Com ``inner``, só os slots
+        inteiramente contidos (para expedientes).
+        """
+        first = np.clip(self.index(starts, round_up=inner), 0, self.size)
+        last = np.clip(self.index(ends, round_up=not inner), 0, self.size)
+        keep = first < last
+        rows, first, last = np.asarray(rows)[keep], first[keep], last[keep]
+        width = self.size + 1
+        diff = (np.bincount(rows * width + first, minlength=count * width)
+                - np.bincount(rows * width + last, minlength=count * width))
+        covered = np.cumsum(diff.reshape(count, width)[:, :self.size], axis=1, dtype=np.int32)
+        return covered > 0
+
+
+def fits(free, length):
+    """``fits[r, i]``: os slots ``i .. i+length-1`` estão todos livres no recurso ``r``."""
+    total = np.zeros((free.shape[0], free.shape[1] + 1), dtype=np.int32)
+    np.cumsum(free, axis=1, dtype=np.int32, out=total[:, 1:])
+    return (total[:, length:] - total[:, :-length]) == length
+
+
+def _epoch(name):
+    # Segundos desde 1970 (UTC) saem como inteiros, sem conversão de data por linha
+    if db.engine.dialect.name == 'postgresql':
+        return f'CAST(extract(epoch FROM {name}) AS BIGINT)'
+    return f"CAST(strftime('%s', {name}) AS INTEGER)"
+
+
+def _rows_for(ids, fetched):
+    order = np.argsort(ids)
+    return order[np.searchsorted(ids[order], fetched)]
+
+
+def load_intervals(tables, column, ids, start, end):
+    """Intervalos ``(linhas, inícios, fins)`` das tabelas que tocam ``[start, end)``."""
+    query = text(' UNION ALL '.join(
+        f'SELECT {column}, {_epoch("starts_at")}, {_epoch("ends_at")} FROM {table} '
+        f'WHERE {condition} AND {column} IN :ids AND starts_at < :end AND ends_at > :start'
+        for table, condition in tables
+    )).bindparams(bindparam('ids', expanding=True),
+                  bindparam('start', type_=db.DateTime(timezone=True)),
+                  bindparam('end', type_=db.DateTime(timezone=True)))
+    result = db.session.execute(query, {'ids': [int(i) for i in ids], 'start': to_utc(start),
+                                        'end': to_utc(end)})
+    found = np.fromiter(chain.from_iterable(result), dtype=np.int64).reshape(-1, 3)
+    return (_rows_for(ids, found[:, 0]), found[:, 1].astype('datetime64[s]'),
+            found[:, 2].astype('datetime64[s]'))
+
+
+def _minutes(values):
+    # O SQLite devolve TIME como texto 'HH:MM:SS' em consultas textuais
+    return np.array([value.hour * 60 + value.minute if isinstance(value, time)
+                     else int(value[:2]) * 60 + int(value[3:5]) for value in values])
+
+
+def working_hours(grid, column, ids, tz):
+    """Matriz do expediente semanal (hora local) de cada recurso sobre a grade."""
+    found = db.session.execute(
+        text(f'SELECT {column}, weekday, start_time, end_time FROM working_hours '
+             f'WHERE {column} IN :ids').bindparams(bindparam('ids', expanding=True)),
+        {'ids': [int(i) for i in ids]}).all()
+    open_all_day = np.ones(len(ids), dtype=bool)
+    if not found:
+        return np.broadcast_to(open_all_day[:, None], (len(ids), grid.size))
+
+    owners, weekdays, starts, ends = zip(*found)
+    rows = _rows_for(ids, np.asarray(owners))
+    open_all_day[rows] = False
+    weekdays = np.asarray(weekdays)
+    starts, ends = _minutes(starts), _minutes(ends)
+
+    # Dias locais cobertos pela grade, com o deslocamento UTC de cada um
+    first_day = (grid.origin.astype(datetime).replace(tzinfo=timezone.utc).astimezone(tz).date()
+                 - timedelta(days=1))
+    days = [first_day + timedelta(days=n)
+            for n in range(grid.size * grid.step // 1440 + 3)]
+    offsets = np.array([tz.utcoffset(datetime.combine(day, time(12))) // timedelta(minutes=1)
+                        for day in days])
+    day_starts = np.array(days, dtype='datetime64[D]').astype('datetime64[m]') - offsets
+    day_weekdays = np.array([day.weekday() for day in days])
+
+    all_rows, all_starts, all_ends = [], [], []
+    for weekday in range(7):
+        entries = np.flatnonzero(weekdays == weekday)
+        midnight = day_starts[day_weekdays == weekday]
+        if not len(entries) or not len(midnight):
+            continue
+        all_rows.append(np.repeat(rows[entries][None, :], len(midnight), axis=0).ravel())
+        all_starts.append((midnight[:, None] + starts[entries][None, :]).ravel())
+        all_ends.append((midnight[:, None] + ends[entries][None, :]).ravel())
+
+    covered = grid.cover(len(ids), np.concatenate(all_rows), np.concatenate(all_starts),
+                         np.concatenate(all_ends), inner=True)
+    return covered | open_all_day[:, None]
+
+
+def series_intervals(kind, ids, tz, window_start, window_end):
+    """Ocorrências de séries na janela, no mesmo formato de ``load_intervals``."""
+    column = RESOURCES[kind]
+    found = [(getattr(series, column), _naive_utc(occurrence.starts_at),
+              _naive_utc(occurrence.ends_at))
+             for series in load_series(column, ids.tolist(), window_start, window_end)
+             for occurrence in occurrences(series, window_start, window_end, tz)]
+    if not found:
+        empty = np.array([], dtype='datetime64[s]')
+        return np.array([], dtype=np.int64), empty, empty
+    owners, starts, ends = zip(*found)
+    return (_rows_for(ids, np.asarray(owners)), np.array(starts, dtype='datetime64[s]'),
+            np.array(ends, dtype='datetime64[s]'))
+
+
+def availability(grid, kind, ids, tz, window_start, window_end):
+    """
+    Matrizes ``recursos x slots`` do expediente e da ocupação (atendimentos,
+    ausências e ocorrências de séries) de cada recurso.
+    """
+    column = RESOURCES[kind]
+    ids = np.asarray(ids, dtype=np.int64)
+    rows, starts, ends = (np.concatenate(parts) for parts in zip(
+        load_intervals(BUSY_SOURCES, column, ids, window_start, window_end),
+        series_intervals(kind, ids, tz, window_start, window_end)))
+    return working_hours(grid, column, ids, tz), grid.cover(len(ids), rows, starts, ends)
+
+
+def _slots(value, step):
+    return -(-value // timedelta(minutes=step))
+
+
+def find_free_slots(duration, start, end, professional_ids=None, room_ids=None, busy=(),
+                    buffer=timedelta(0), align=None, limit=10, step=None, tz=None):
+    """
+    Primeiros ``limit`` horários que começam em ``[start, end)`` em que algum
+    dos profissionais e alguma das salas (quando informados) estão livres
+    por ``duration`` dentro do expediente, com ``buffer`` de folga para
+    outros atendimentos e ausências, sem tocar os intervalos de ``busy``
+    (ex.: outros compromissos do paciente). ``align`` restringe os inícios
+    (ex.: de 15 em 15 minutos); ``limit=None`` devolve todos.
+
+    Devolve ``FreeSlot`` em ordem cronológica; em cada grupo é escolhido o
+    primeiro recurso livre, na ordem em que os ids foram passados. A janela
+    é percorrida em blocos crescentes, parando quando ``limit`` é atingido.
+    """
+    if not professional_ids and not room_ids:
+        raise ValueError('Informe ao menos um profissional ou uma sala.')
+    search = dict(
+        duration=duration, buffer=buffer,
+        groups=[(kind, list(ids)) for kind, ids in (('professional', professional_ids),
+                                                   ('room', room_ids)) if ids],
+        busy=[(_naive_utc(s), _naive_utc(e)) for s, e in busy],
+        step=step or current_app.config['AGENDA_SLOT_MINUTES'],
+        tz=tz or ZoneInfo(current_app.config['CLINIC_TIMEZONE']),
+    )
+    search['align'] = _slots(align or timedelta(minutes=search['step']), search['step'])
+
+    start, end = to_utc(start), to_utc(end)
+    if limit is None:
+        return _search(start, end, None, **search)
+
+    slots, chunk = [], SEARCH_CHUNK
+    while start < end and len(slots) < limit:
+        stop = min(start + chunk, end)
+        slots += _search(start, stop, limit - len(slots), **search)
+        start, chunk = stop, chunk * 2
+    return slots
+
+
+def _search(start, end, limit, duration, buffer, groups, busy, step, tz, align):
+    """Busca numa única grade; os inícios ficam em ``[start, end)``."""
+    length, margin = _slots(duration, step), _slots(buffer, step)
+    window_start, window_end = start - buffer, end + duration + buffer
+    grid = SlotGrid(window_start, window_end, step)
+    run = length + 2 * margin
+    if grid.size < run:
+        return []
+
+    # Inícios possíveis: o atendimento cabe no expediente a partir de ``begins``,
+    # e a folga em volta dele começa em ``begins - margin``
+    begins = np.arange(grid.size - run + 1) + margin
+    wanted = ((begins >= grid.index([_naive_utc(start)], round_up=True)[0])
+              & (begins < grid.index([_naive_utc(end)], round_up=True)[0])
+              & (begins % align == 0))
+
+    fitted = []
+    for kind, ids in groups:
+        opened, occupied = availability(grid, kind, ids, tz, window_start, window_end)
+        fit = fits(opened, length)[:, begins] & fits(~occupied, run)
+        fitted.append((kind, ids, fit))
+        wanted &= fit.any(axis=0)
+    if busy:
+        starts, ends = zip(*busy)
+        blocked = grid.cover(1, np.zeros(len(starts), dtype=np.int64), starts, ends)
+        wanted &= fits(~blocked, length)[0, begins]
+
+    slots = []
+    for position in np.flatnonzero(wanted)[:limit]:
+        chosen = {kind: ids[int(np.argmax(fit[:, position]))] for kind, ids, fit in fitted}
+        starts_at = grid.at(position + margin)
+        slots.append(FreeSlot(starts_at, starts_at + duration,
+                              chosen.get('professional'), chosen.get('room')))
+    return slots
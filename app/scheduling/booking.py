@@ -0,0 +1,140 @@
+"""
+Reserva, remarcação e cancelamento de atendimentos.
+
+A regra de conflito mora no banco (ver ``app.models.scheduling``): a reserva
+grava direto, sem consulta prévia nem trava, e traduz a violação da
+restrição em ``SchedulingConflict``. Assim duas reservas simultâneas do
+mesmo horário nunca passam juntas. Ocorrências de séries recorrentes não
+existem como linhas; contra elas a checagem é feita antes de gravar, com o
+profissional e a sala travados até o commit (``lock_resources``), para que
+uma série e uma reserva (ou duas séries) não passem juntas pela checagem.
+"""
+
+from datetime import timezone
+from sqlalchemy import select, text
+from sqlalchemy.exc import IntegrityError
+from .. import db
+from ..models import Appointment, AppointmentStatus, Professional, Room
+from ..models.scheduling import ACTIVE_SQL, PROFESSIONAL_CONFLICT, ROOM_CONFLICT
+
+RESOURCES = {'professional': 'professional_id', 'room': 'room_id'}
+
+
+class SchedulingConflict(Exception):
+    """O intervalo colide com outro atendimento (ou série) do profissional ou da sala."""
+
+    def __init__(self, resource, conflicting_id=None, series_id=None):
+        self.resource = resource
+        self.conflicting_id = conflicting_id
+        self.series_id = series_id
+        label = 'o profissional' if resource == 'professional' else 'a sala'
+        super().__init__(f'Horário indisponível para {label}.')
+
+
+def to_utc(value):
+    """Normaliza para UTC; datas sem fuso são tratadas como UTC."""
+    if value.tzinfo is None:
+        return value.replace(tzinfo=timezone.utc)
+    return value.astimezone(timezone.utc)
+
+
+def find_conflict(resource, resource_id, starts_at, ends_at, exclude_id=None):
+    """
+    Id do atendimento ativo do recurso que colide com ``[starts_at, ends_at)``,
+    ou ``None``. Uma busca no índice parcial: o último que começa antes do fim.
+    """
+    column = RESOURCES[resource]
+    query = (select(Appointment.id, Appointment.ends_at)
+             .where(text(ACTIVE_SQL), getattr(Appointment, column) == resource_id,
+                    Appointment.starts_at < to_utc(ends_at))
+             .order_by(Appointment.starts_at.desc())
+             .limit(1))
+    if exclude_id is not None:
+        query = query.where(Appointment.id != exclude_id)
+    row = db.session.execute(query).first()
+    if row is not None and to_utc(row.ends_at) > to_utc(starts_at):
+        return row.id
+    return None
+
+
+def _conflict_resource(error):
+    message = str(error.orig)
+    if PROFESSIONAL_CONFLICT in message:
+        return 'professional'
+    if ROOM_CONFLICT in message:
+        return 'room'
+    return None
+
+
+def lock_resources(professional_id, room_id=None):
+    """
+    Trava, até o fim da transação, as gravações que conferem ocorrências de
+    séries do profissional e da sala. No PostgreSQL são travadas as linhas do
+    profissional e da sala (sempre nessa ordem, sem deadlock); o SQLite tem
+    uma única trava de escrita, tomada já aqui em vez de só no INSERT.
+    """
+    if db.session.get_bind().dialect.name == 'sqlite':
+        db.session.execute(text('UPDATE professional SET id = id WHERE id = :id'),
+                           {'id': professional_id})
+        return
+    db.session.execute(select(Professional.id).where(Professional.id == professional_id)
+                       .with_for_update())
+    if room_id is not None:
+        db.session.execute(select(Room.id).where(Room.id == room_id).with_for_update())
+
+
+def _save(appointment):
+    """Grava e confirma; converte a violação da regra de conflito em ``SchedulingConflict``."""
+    from .series import find_series_conflict
+
+    with db.session.no_autoflush:
+        values = (appointment.id, appointment.professional_id, appointment.room_id,
+                  appointment.starts_at, appointment.ends_at)
+        lock_resources(values[1], values[2])
+        for resource, resource_id in (('professional', values[1]), ('room', values[2])):
+            occurrence = resource_id and find_series_conflict(resource, resource_id, *values[3:])
+            if occurrence:
+                db.session.rollback()
+                raise SchedulingConflict(resource, series_id=occurrence.series_id)
+    try:
+        db.session.add(appointment)
+        db.session.flush()
+    except IntegrityError as error:
+        db.session.rollback()
+        resource = _conflict_resource(error)
+        if resource is None:
+            raise
+        appointment_id, professional_id, room_id, starts_at, ends_at = values
+        resource_id = professional_id if resource == 'professional' else room_id
+        raise SchedulingConflict(resource, find_conflict(
+            resource, resource_id, starts_at, ends_at, exclude_id=appointment_id)) from error
+    db.session.commit()
+    return appointment
+
+
+def book_appointment(professional_id, starts_at, ends_at, room_id=None, notes=None,
+                     created_by=None, price_cents=None):
+    """Reserva o intervalo; levanta ``SchedulingConflict`` se estiver ocupado."""
+    return _save(Appointment(
+        professional_id=professional_id,
+        room_id=room_id,
+        starts_at=to_utc(starts_at),
+        ends_at=to_utc(ends_at),
+        notes=notes,
+        price_cents=price_cents,
+        created_by=created_by,
+    ))
+
+
+def reschedule_appointment(appointment, starts_at, ends_at):
+    """Move o atendimento para outro intervalo, com a mesma regra de conflito."""
+    appointment.starts_at = to_utc(starts_at)
+    appointment.ends_at = to_utc(ends_at)
+    return _save(appointment)
+
+
+def cancel_appointment(appointment):
+    """Cancela o atendimento, liberando o horário do profissional e da sala."""
+    appointment.status = AppointmentStatus.CANCELLED
+    db.session.commit()
+    return appointment
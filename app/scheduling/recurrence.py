@@ -0,0 +1,166 @@
+"""
+Regras de recorrência (subconjunto do RRULE da RFC 5545) expandidas sob demanda.
+
+Suportado: ``FREQ=DAILY|WEEKLY|MONTHLY``, ``INTERVAL``, ``BYDAY`` (só
+semanal), ``COUNT`` e ``UNTIL``. A série guarda apenas a regra; ``expand``
+é um gerador que salta direto para o período da janela pedida (diário e
+semanal, por aritmética; o mensal percorre os meses desde o início) e para
+ao passar do fim dela. As datas são calculadas na hora local da clínica:
+uma sessão das 14h continua às 14h mesmo se o deslocamento UTC mudar.
+"""
+
+import heapq
+from collections import namedtuple
+from datetime import datetime, timedelta, timezone
+from functools import lru_cache
+from operator import attrgetter
+from .booking import to_utc
+
+WEEKDAYS = ('MO', 'TU', 'WE', 'TH', 'FR', 'SA', 'SU')
+
+Rule = namedtuple('Rule', 'freq interval byday count until')
+Occurrence = namedtuple('Occurrence', 'series_id original_start starts_at ends_at status')
+
+FAR_FUTURE = datetime(9000, 1, 1, tzinfo=timezone.utc)
+
+
+def _parse_until(value):
+    if 'T' in value:
+        parsed = datetime.strptime(value.rstrip('Z'), '%Y%m%dT%H%M%S')
+    else:
+        parsed = datetime.combine(datetime.strptime(value, '%Y%m%d').date(), datetime.max.time())
+    return parsed.replace(tzinfo=timezone.utc)
+
+
+@lru_cache(maxsize=1024)
+def parse_rule(text):
+    """Converte ``FREQ=...;...`` em ``Rule``; levanta ``ValueError`` se não suportada."""
+    parts = {}
+    for item in text.strip().upper().removeprefix('RRULE:').split(';'):
+        if not item:
+            continue
+        key, separator, value = item.partition('=')
+        if not separator:
+            raise ValueError(f'Parte inválida na regra: {item}')
+        parts[key] = value
+
+    freq = parts.pop('FREQ', None)
+    if freq not in ('DAILY', 'WEEKLY', 'MONTHLY'):
+        raise ValueError(f'FREQ não suportada: {freq}')
+    interval = int(parts.pop('INTERVAL', 1))
+    if interval < 1:
+        raise ValueError('INTERVAL deve ser positivo.')
+    byday = ()
+    if 'BYDAY' in parts:
+        if freq != 'WEEKLY':
+            raise ValueError('BYDAY só é suportado em regras semanais.')
+        days = parts.pop('BYDAY').split(',')
+        if not set(days) <= set(WEEKDAYS):
+            raise ValueError(f'BYDAY inválido: {",".join(days)}')
+        byday = tuple(sorted({WEEKDAYS.index(day) for day in days}))
+    count = int(parts.pop('COUNT')) if 'COUNT' in parts else None
+    until = _parse_until(parts.pop('UNTIL')) if 'UNTIL' in parts else None
+    if count is not None and until is not None:
+        raise ValueError('COUNT e UNTIL não podem ser usados juntos.')
+    if parts:
+        raise ValueError(f'Partes não suportadas: {", ".join(sorted(parts))}')
+    return Rule(freq, interval, byday, count, until)
+
+
+def _candidates(rule, first, since):
+    """``(índice, início local)`` em ordem, a partir do período que contém ``since``."""
+    if rule.freq == 'DAILY':
+        period = max(0, (since.date() - first.date()).days // rule.interval)
+        while True:
+            yield period, first + timedelta(days=period * rule.interval)
+            period += 1
+
+    elif rule.freq == 'WEEKLY':
+        days = rule.byday or (first.weekday(),)
+        monday = first - timedelta(days=first.weekday())
+        # Dias da primeira semana anteriores ao início não contam para o COUNT
+        skipped = sum(1 for day in days if day < first.weekday())
+        period = max(0, (since.date() - monday.date()).days // 7 // rule.interval)
+        while True:
+            week = monday + timedelta(weeks=period * rule.interval)
+            for position, day in enumerate(days):
+                index = period * len(days) + position - skipped
+                if index >= 0:
+                    yield index, week + timedelta(days=day)
+            period += 1
+
+    else:  # MONTHLY, no mesmo dia do mês; meses sem esse dia são pulados
+        index = month = 0
+        while True:
+            year, month_index = divmod(first.month - 1 + month * rule.interval, 12)
+            month += 1
+            try:
+                local = first.replace(year=first.year + year, month=month_index + 1)
+            except ValueError:
+                continue
+            yield index, local
+            index += 1
+
+
+def expand(rule, dtstart, duration, window_start, window_end, tz):
+    """
+    Gera ``(índice, início UTC)`` das ocorrências que tocam
+    ``[window_start, window_end)``, sem materializar as anteriores.
+    """
+    first = to_utc(dtstart).astimezone(tz).replace(tzinfo=None)
+    window_start, window_end = to_utc(window_start), to_utc(window_end)
+    since = (window_start - duration).astimezone(tz).replace(tzinfo=None)
+    for index, local in _candidates(rule, first, since):
+        if rule.count is not None and index >= rule.count:
+            return
+        starts_at = local.replace(tzinfo=tz).astimezone(timezone.utc)
+        if (rule.until is not None and starts_at > rule.until) or starts_at >= window_end:
+            return
+        if starts_at + duration > window_start:
+            yield index, starts_at
+
+
+def last_end(rule, dtstart, duration, tz):
+    """Fim da última ocorrência de uma regra finita; ``None`` se ela não termina."""
+    if rule.count is None and rule.until is None:
+        return None
+    last = None
+    for _, starts_at in expand(rule, dtstart, duration, dtstart, FAR_FUTURE, tz):
+        last = starts_at
+    return last + duration if last is not None else to_utc(dtstart)
+
+
+def occurrences(series, window_start, window_end, tz, include_cancelled=False):
+    """
+    Ocorrências de uma série em ``[window_start, window_end)``, em ordem de
+    início, com as exceções aplicadas: canceladas somem (ou vêm com status
+    ``cancelled``), movidas aparecem no novo horário, inclusive quando o
+    horário original está fora da janela.
+    """
+    rule = parse_rule(series.rule)
+    duration = timedelta(minutes=series.duration_minutes)
+    window_start, window_end = to_utc(window_start), to_utc(window_end)
+    changed = {to_utc(exception.original_start): exception for exception in series.exceptions}
+
+    def regular():
+        for _, starts_at in expand(rule, series.dtstart, duration, window_start, window_end, tz):
+            exception = changed.get(starts_at)
+            if exception is None:
+                yield Occurrence(series.id, starts_at, starts_at, starts_at + duration, 'scheduled')
+            elif exception.is_cancelled and include_cancelled:
+                yield Occurrence(series.id, starts_at, starts_at, starts_at + duration, 'cancelled')
+
+    moved = sorted((Occurrence(series.id, original, to_utc(exception.starts_at),
+                               to_utc(exception.ends_at), 'moved')
+                    for original, exception in changed.items()
+                    if not exception.is_cancelled
+                    and to_utc(exception.starts_at) < window_end
+                    and to_utc(exception.ends_at) > window_start),
+                   key=attrgetter('starts_at'))
+    return heapq.merge(regular(), moved, key=attrgetter('starts_at'))
+
+
+def merge_occurrences(all_series, window_start, window_end, tz, include_cancelled=False):
+    """Ocorrências de várias séries numa única sequência ordenada."""
+    return heapq.merge(*(occurrences(series, window_start, window_end, tz, include_cancelled)
+                         for series in all_series), key=attrgetter('starts_at'))
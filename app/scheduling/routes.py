@@ -0,0 +1,87 @@
+"""
+Visões de agenda por profissional, sala ou unidade.
+
+Mês e semana devolvem só o resumo de cada dia (``agenda_day``); os
+atendimentos de um dia são buscados quando ele é aberto.
+"""
+
+import calendar
+from datetime import date, timedelta
+from flask import Blueprint, abort, jsonify
+from flask_login import login_required
+from . import summary
+
+agenda = Blueprint('agenda', __name__)
+
+
+def _check_scope(scope, key):
+    if scope not in summary.SCOPES:
+        abort(404)
+    if scope != 'unit' and not key.isdigit():
+        abort(404)
+
+
+def _parse_day(value):
+    try:
+        return date.fromisoformat(value)
+    except ValueError:
+        return None
+
+
+def _invalid_day():
+    return jsonify({'error': 'Data inválida; use AAAA-MM-DD'}), 400
+
+
+def _iso(value):
+    return value.isoformat() if value is not None else None
+
+
+def _days_response(scope, key, first_day, last_day):
+    days = summary.calendar_days(scope, key, first_day, last_day)
+    return jsonify({
+        'scope': scope, 'key': key,
+        'start': first_day.isoformat(), 'end': last_day.isoformat(),
+        'days': [dict(values, day=day.isoformat(),
+                      first_starts_at=_iso(values['first_starts_at']),
+                      last_ends_at=_iso(values['last_ends_at']))
+                 for day, values in days.items()],
+    })
+
+
+@agenda.route('/<scope>/<key>/month/<int:year>/<int:month>')
+@login_required
+def month_view(scope, key, year, month):
+    """Resumo de cada dia do mês."""
+    _check_scope(scope, key)
+    if not (1 <= year <= 9999 and 1 <= month <= 12):  # fora do alcance de ``date``
+        abort(404)
+    last = calendar.monthrange(year, month)[1]
+    return _days_response(scope, key, date(year, month, 1), date(year, month, last))
+
+
+@agenda.route('/<scope>/<key>/week/<day>')
+@login_required
+def week_view(scope, key, day):
+    """Resumo de cada dia da semana (de segunda a domingo) que contém ``day``."""
+    _check_scope(scope, key)
+    parsed = _parse_day(day)
+    if parsed is None:
+        return _invalid_day()
+    monday = parsed - timedelta(days=parsed.weekday())
+    return _days_response(scope, key, monday, monday + timedelta(days=6))
+
+
+@agenda.route('/<scope>/<key>/day/<day>')
+@login_required
+def day_view(scope, key, day):
+    """Atendimentos e ocorrências de séries do dia, em ordem de início."""
+    _check_scope(scope, key)
+    parsed = _parse_day(day)
+    if parsed is None:
+        return _invalid_day()
+    entries = summary.day_detail(scope, key, parsed)
+    return jsonify({
+        'scope': scope, 'key': key, 'day': day,
+        'entries': [dict(entry, starts_at=_iso(entry['starts_at']), ends_at=_iso(entry['ends_at']))
+                    for entry in entries],
+    })
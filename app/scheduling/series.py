@@ -0,0 +1,236 @@
+"""
+Séries de atendimentos recorrentes.
+
+Só a regra e as exceções (ocorrências canceladas ou movidas) são gravadas.
+Checagens de conflito e agendas expandem as séries apenas na janela
+consultada: uma reserva avulsa olha as ocorrências do próprio intervalo e
+uma série nova é conferida até o seu fim ou até ``RECURRENCE_HORIZON_DAYS``.
+Diferente dos atendimentos avulsos, o conflito com séries é verificado pela
+aplicação, não por uma restrição do banco; por isso toda gravação que
+confere séries trava antes o profissional e a sala (``lock_resources``).
+"""
+
+from bisect import bisect_left
+from datetime import timedelta
+from zoneinfo import ZoneInfo
+from flask import current_app
+from sqlalchemy import or_
+from sqlalchemy.orm import selectinload
+from .. import db
+from ..models import AppointmentSeries, SeriesException
+from .booking import RESOURCES, SchedulingConflict, find_conflict, lock_resources, to_utc
+from .recurrence import expand, last_end, merge_occurrences, parse_rule
+
+
+def clinic_timezone():
+    return ZoneInfo(current_app.config['CLINIC_TIMEZONE'])
+
+
+def load_series(column, ids, window_start, window_end):
+    """Séries ativas dos recursos que podem ter ocorrências na janela, com as exceções."""
+    return (AppointmentSeries.query
+            .options(selectinload(AppointmentSeries.exceptions))
+            .filter(getattr(AppointmentSeries, column).in_(ids),
+                    AppointmentSeries.is_deleted == False,  # noqa: E712
+                    AppointmentSeries.dtstart < to_utc(window_end),
+                    or_(AppointmentSeries.last_ends_at.is_(None),
+                        AppointmentSeries.last_ends_at > to_utc(window_start)))
+            .all())
+
+
+def series_occurrences(resource, ids, window_start, window_end, include_cancelled=False):
+    """Ocorrências das séries dos recursos na janela, em ordem de início."""
+    series = load_series(RESOURCES[resource], ids, window_start, window_end)
+    return merge_occurrences(series, window_start, window_end, clinic_timezone(), include_cancelled)
+
+
+def find_series_conflict(resource, resource_id, starts_at, ends_at, exclude=None):
+    """
+    Primeira ocorrência de série do recurso que colide com o intervalo, ou
+    ``None``. ``exclude`` é o par ``(série, início original)`` sendo movido.
+    """
+    for occurrence in series_occurrences(resource, [resource_id], starts_at, ends_at):
+        if (occurrence.series_id, occurrence.original_start) != exclude:
+            return occurrence
+    return None
+
+
+def _first_overlap(mine, others):
+    """Primeira ocorrência de ``others`` que colide com os intervalos (ordenados) de ``mine``."""
+    starts = [start for start, _ in mine]
+    for other in others:
+        position = bisect_left(starts, other.ends_at) - 1
+        if position >= 0 and mine[position][1] > other.starts_at:
+            return other
+    return None
+
+
+def _check(series, since, tz):
+    """Confere as ocorrências da série a partir de ``since`` contra avulsos e outras séries."""
+    horizon = since + timedelta(days=current_app.config['RECURRENCE_HORIZON_DAYS'])
+    end = min(series.last_ends_at or horizon, horizon)
+    duration = timedelta(minutes=series.duration_minutes)
+    mine = [(start, start + duration)
+            for _, start in expand(parse_rule(series.rule), series.dtstart, duration, since, end, tz)]
+
+    for resource, resource_id in (('professional', series.professional_id), ('room', series.room_id)):
+        if resource_id is None:
+            continue
+        for start, stop in mine:
+            conflicting = find_conflict(resource, resource_id, start, stop)
+            if conflicting is not None:
+                raise SchedulingConflict(resource, conflicting)
+        others = (occurrence for occurrence in series_occurrences(resource, [resource_id], since, end)
+                  if occurrence.series_id != series.id)
+        overlap = _first_overlap(mine, others)
+        if overlap is not None:
+            raise SchedulingConflict(resource, series_id=overlap.series_id)
+
+
+def create_series(professional_id, dtstart, duration, rule, room_id=None, notes=None,
+                  created_by=None):
+    """Cria a série (``rule`` no formato RRULE) se nenhuma ocorrência colidir."""
+    tz = clinic_timezone()
+    dtstart = to_utc(dtstart)
+    series = AppointmentSeries(
+        professional_id=professional_id,
+        room_id=room_id,
+        dtstart=dtstart,
+        duration_minutes=duration // timedelta(minutes=1),
+        rule=rule.upper(),
+        last_ends_at=last_end(parse_rule(rule.upper()), dtstart, duration, tz),
+        notes=notes,
+        created_by=created_by,
+    )
+    with db.session.no_autoflush:
+        lock_resources(professional_id, room_id)
+        try:
+            _check(series, dtstart, tz)
+        except SchedulingConflict:
+            db.session.rollback()
+            raise
+    db.session.add(series)
+    db.session.commit()
+    return series
+
+
+def _validate_occurrence(series, original_start, tz):
+    duration = timedelta(minutes=series.duration_minutes)
+    found = [start for _, start in expand(parse_rule(series.rule), series.dtstart, duration,
+                                          original_start, original_start + timedelta(seconds=1), tz)]
+    if original_start not in found:
+        raise ValueError('A série não tem ocorrência nesse horário.')
+
+
+def _exception_for(series, original_start, tz):
+    original_start = to_utc(original_start)
+    _validate_occurrence(series, original_start, tz)
+    for exception in series.exceptions:
+        if to_utc(exception.original_start) == original_start:
+            return exception
+    exception = SeriesException(original_start=original_start)
+    series.exceptions.append(exception)
+    return exception
+
+
+def cancel_occurrence(series, original_start):
+    """Cancela uma ocorrência (pelo horário original), gravando só a exceção."""
+    exception = _exception_for(series, original_start, clinic_timezone())
+    exception.is_cancelled = True
+    exception.starts_at = exception.ends_at = None
+    db.session.commit()
+    return exception
+
+
+def move_occurrence(series, original_start, starts_at, ends_at):
+    """Move uma ocorrência para outro intervalo, com a mesma checagem de conflito."""
+    tz = clinic_timezone()
+    original_start, starts_at, ends_at = to_utc(original_start), to_utc(starts_at), to_utc(ends_at)
+    _validate_occurrence(series, original_start, tz)
+    with db.session.no_autoflush:
+        lock_resources(series.professional_id, series.room_id)
+        for resource, resource_id in (('professional', series.professional_id),
+                                      ('room', series.room_id)):
+            if resource_id is None:
+                continue
+            conflicting = find_conflict(resource, resource_id, starts_at, ends_at)
+            if conflicting is not None:
+                db.session.rollback()
+                raise SchedulingConflict(resource, conflicting)
+            occurrence = find_series_conflict(resource, resource_id, starts_at, ends_at,
+                                              exclude=(series.id, original_start))
+            if occurrence is not None:
+                db.session.rollback()
+                raise SchedulingConflict(resource, series_id=occurrence.series_id)
+
+    exception = _exception_for(series, original_start, tz)
+    exception.is_cancelled = False
+    exception.starts_at, exception.ends_at = starts_at, ends_at
+    if series.last_ends_at is not None and ends_at > to_utc(series.last_ends_at):
+        series.last_ends_at = ends_at
+    db.session.commit()
+    return exception
+
+
+def _without_limits(rule):
+    return ';'.join(part for part in rule.upper().split(';')
+                    if part and not part.startswith(('COUNT=', 'UNTIL=')))
+
+
+def reschedule_series(series, since, dtstart, duration=None, rule=None):
+    """
+    Remarca a série a partir de ``since``: a série atual termina antes dele
+    e uma nova começa em ``dtstart`` (com nova duração/regra, se dadas),
+    herdando o que restava do ``COUNT`` ou o ``UNTIL``. Custa o mesmo para
+    uma série de 10 ou de 500 ocorrências. Devolve a nova série.
+    """
+    tz = clinic_timezone()
+    since, dtstart = to_utc(since), to_utc(dtstart)
+    old_rule = parse_rule(series.rule)
+    old_duration = timedelta(minutes=series.duration_minutes)
+    duration = duration or old_duration
+    done = sum(1 for _, start in expand(old_rule, series.dtstart, old_duration,
+                                        series.dtstart, since, tz) if start < since)
+
+    new_rule = (rule or _without_limits(series.rule)).upper()
+    parsed = parse_rule(new_rule)
+    if parsed.count is None and parsed.until is None:
+        if old_rule.count is not None:
+            if old_rule.count - done <= 0:
+                raise ValueError('A série já terminou antes dessa data.')
+            new_rule = f'{_without_limits(new_rule)};COUNT={old_rule.count - done}'
+        elif old_rule.until is not None:
+            new_rule = f'{_without_limits(new_rule)};UNTIL={old_rule.until:%Y%m%dT%H%M%SZ}'
+
+    with db.session.no_autoflush:
+        lock_resources(series.professional_id, series.room_id)
+        if done:
+            series.rule = f'{_without_limits(series.rule)};COUNT={done}'
+            series.last_ends_at = last_end(parse_rule(series.rule), series.dtstart, old_duration, tz)
+        else:
+            series.is_deleted = True
+        # As exceções futuras se referem aos horários antigos
+        for exception in list(series.exceptions):
+            if to_utc(exception.original_start) >= since:
+                series.exceptions.remove(exception)
+
+        replacement = AppointmentSeries(
+            professional_id=series.professional_id,
+            room_id=series.room_id,
+            dtstart=dtstart,
+            duration_minutes=duration // timedelta(minutes=1),
+            rule=new_rule,
+            last_ends_at=last_end(parse_rule(new_rule), dtstart, duration, tz),
+            notes=series.notes,
+            created_by=series.created_by,
+        )
+    db.session.flush()
+    try:
+        with db.session.no_autoflush:
+            _check(replacement, dtstart, tz)
+    except SchedulingConflict:
+        db.session.rollback()
+        raise
+    db.session.add(replacement)
+    db.session.commit()
+    return replacement
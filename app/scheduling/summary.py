@@ -0,0 +1,330 @@
+"""
+Resumo diário da agenda por profissional, sala e unidade (``agenda_day``).
+
+Cada flush que grava atendimentos aplica, na mesma transação, a diferença
+entre o estado anterior e o novo de cada um: as contagens e os minutos
+ocupados são somados no banco (``ON CONFLICT ... DO UPDATE``, seguro com
+gravações concorrentes), o primeiro início e o último fim só crescem; quando
+um atendimento ativo sai do dia, os extremos daquele dia são recalculados
+pelo índice parcial de atendimentos ativos. Gravações em massa que não
+passam pela sessão (ex.: ``insert_rows``) e mudanças da unidade de uma sala
+pedem ``flask rebuild-agenda-summary``.
+"""
+
+from collections import defaultdict
+from datetime import datetime, time, timedelta
+from sqlalchemy import bindparam, event, inspect, text
+from sqlalchemy.orm import Session
+from .. import db
+from ..models import AgendaDay, Appointment, AppointmentStatus, Room, WorkingHours
+from ..models.scheduling import ACTIVE_SQL
+from .booking import to_utc
+from .recurrence import merge_occurrences
+from .series import clinic_timezone, load_series
+
+SCOPES = ('professional', 'room', 'unit')
+COUNTERS = ('scheduled', 'completed', 'no_show', 'cancelled', 'booked_minutes')
+
+# Colunas do atendimento que mudam o resumo; o valor antigo é sempre carregado
+# (``HISTORY_TRACKED`` em ``app.models.scheduling``)
+TRACKED = ('professional_id', 'room_id', 'starts_at', 'ends_at', 'status', 'is_deleted')
+
+# Atendimentos de um escopo: ``:key`` é o id ou o nome da unidade
+SCOPE_FILTERS = {
+    'professional': 'professional_id = :key',
+    'room': 'room_id = :key',
+    'unit': 'room_id IN (SELECT id FROM room WHERE unit = :key)',
+}
+
+UPSERT_SQL = """
+    INSERT INTO agenda_day (scope, scope_key, day, scheduled, completed, no_show, cancelled,
+                            booked_minutes, first_starts_at, last_ends_at)
+    VALUES (:scope, :scope_key, :day, :scheduled, :completed, :no_show, :cancelled,
+            :booked_minutes, :first_starts_at, :last_ends_at)
+    ON CONFLICT (scope, scope_key, day) DO UPDATE SET
+        scheduled = agenda_day.scheduled + excluded.scheduled,
+        completed = agenda_day.completed + excluded.completed,
+        no_show = agenda_day.no_show + excluded.no_show,
+        cancelled = agenda_day.cancelled + excluded.cancelled,
+        booked_minutes = agenda_day.booked_minutes + excluded.booked_minutes,
+        first_starts_at = CASE WHEN agenda_day.first_starts_at IS NULL
+                                 OR excluded.first_starts_at < agenda_day.first_starts_at
+                               THEN excluded.first_starts_at ELSE agenda_day.first_starts_at END,
+        last_ends_at = CASE WHEN agenda_day.last_ends_at IS NULL
+                              OR excluded.last_ends_at > agenda_day.last_ends_at
+                            THEN excluded.last_ends_at ELSE agenda_day.last_ends_at END
+"""
+
+_DATES = (bindparam('day', type_=db.Date),
+          bindparam('start', type_=db.DateTime(timezone=True)),
+          bindparam('end', type_=db.DateTime(timezone=True)))
+
+
+def _bounds_sql(scope):
+    where = f"{SCOPE_FILTERS[scope]} AND {ACTIVE_SQL} AND starts_at >= :start AND starts_at < :end"
+    return text(f"""
+        UPDATE agenda_day SET
+            first_starts_at = (SELECT min(starts_at) FROM appointment WHERE {where}),
+            last_ends_at = (SELECT max(ends_at) FROM appointment WHERE {where})
+        WHERE scope = :scope AND scope_key = :scope_key AND day = :day
+    """).bindparams(*_DATES)
+
+
+def local_day(value, tz):
+    return to_utc(value).astimezone(tz).date()
+
+
+def day_bounds(day, tz):
+    """Início e fim (UTC) do dia local."""
+    start = datetime.combine(day, time(), tzinfo=tz)
+    end = datetime.combine(day + timedelta(days=1), time(), tzinfo=tz)
+    return to_utc(start), to_utc(end)
+
+
+def _scope_param(scope, key):
+    return key if scope == 'unit' else int(key)
+
+
+def contributions(professional_id, room_id, unit, starts_at, ends_at, status, tz):
+    """
+    Linhas ``(escopo, chave, dia)`` e valores com que um atendimento entra
+    no resumo. ``status`` é o nome do membro de ``AppointmentStatus``.
+    """
+    active = status != 'CANCELLED'
+    values = dict.fromkeys(COUNTERS, 0)
+    values[status.lower()] = 1
+    if active:
+        values['booked_minutes'] = int((to_utc(ends_at) - to_utc(starts_at)) // timedelta(minutes=1))
+    values['first_starts_at'] = to_utc(starts_at) if active else None
+    values['last_ends_at'] = to_utc(ends_at) if active else None
+
+    day = local_day(starts_at, tz)
+    keys = [('professional', str(professional_id))]
+    if room_id is not None:
+        keys.append(('room', str(room_id)))
+        if unit:
+            keys.append(('unit', unit))
+    return [((scope, key, day), values) for scope, key in keys]
+
+
+def _state(appointment, previous):
+    """Valores do atendimento antes (``previous``) ou depois do flush."""
+    values = {}
+    for name in TRACKED:
+        if previous:
+            history = inspect(appointment).attrs[name].history
+            found = history.deleted or history.unchanged or history.added
+            values[name] = found[0] if found else None
+        else:
+            values[name] = getattr(appointment, name)
+    if values['is_deleted'] or values['starts_at'] is None:
+        return None
+    status = values['status'] or AppointmentStatus.SCHEDULED
+    values['status'] = status.name if isinstance(status, AppointmentStatus) else status
+    return values
+
+
+def apply_changes(connection, states, tz):
+    """
+    Aplica ``(sinal, estado)`` ao resumo: ``+1`` para o estado gravado,
+    ``-1`` para o que ele substituiu.
+    """
+    rooms = {state['room_id'] for _, state in states if state['room_id'] is not None}
+    units = dict(connection.execute(
+        text('SELECT id, unit FROM room WHERE id IN :ids').bindparams(
+            bindparam('ids', expanding=True)), {'ids': sorted(rooms)}).all()) if rooms else {}
+
+    deltas = defaultdict(lambda: dict.fromkeys(COUNTERS, 0))
+    bounds, removed, shrunk = {}, set(), set()
+    for sign, state in states:
+        for key, values in contributions(state['professional_id'], state['room_id'],
+                                         units.get(state['room_id']), state['starts_at'],
+                                         state['ends_at'], state['status'], tz):
+            for counter in COUNTERS:
+                deltas[key][counter] += sign * values[counter]
+            if sign < 0:
+                removed.add(key)
+                if values['first_starts_at'] is not None:
+                    shrunk.add(key)
+            elif values['first_starts_at'] is not None:
+                first, last = bounds.get(key, (values['first_starts_at'], values['last_ends_at']))
+                bounds[key] = (min(first, values['first_starts_at']),
+                               max(last, values['last_ends_at']))
+
+    connection.execute(text(UPSERT_SQL).bindparams(
+        bindparam('day', type_=db.Date),
+        bindparam('first_starts_at', type_=db.DateTime(timezone=True)),
+        bindparam('last_ends_at', type_=db.DateTime(timezone=True))), [
+        dict(scope=scope, scope_key=key, day=day, **counters,
+             first_starts_at=bounds.get((scope, key, day), (None, None))[0],
+             last_ends_at=bounds.get((scope, key, day), (None, None))[1])
+        for (scope, key, day), counters in deltas.items()])
+
+    # Um atendimento ativo saiu do dia: os extremos vêm de novo da tabela
+    for scope, key, day in sorted(shrunk):
+        start, end = day_bounds(day, tz)
+        connection.execute(_bounds_sql(scope), {'scope': scope, 'scope_key': key, 'day': day,
+                                                'key': _scope_param(scope, key),
+                                                'start': start, 'end': end})
+    if removed:
+        connection.execute(text(
+            'DELETE FROM agenda_day WHERE scope = :scope AND scope_key = :scope_key '
+            'AND day = :day AND scheduled = 0 AND completed = 0 AND no_show = 0 AND cancelled = 0'
+        ).bindparams(bindparam('day', type_=db.Date)),
+            [{'scope': scope, 'scope_key': key, 'day': day} for scope, key, day in removed])
+
+
+def _summarize_flushed(session, flush_context):
+    """Leva ao resumo os atendimentos gravados neste flush."""
+    states = []
+    for appointment in session.new:
+        if isinstance(appointment, Appointment):
+            states.append((1, _state(appointment, previous=False)))
+    for appointment in session.dirty:
+        if isinstance(appointment, Appointment) and session.is_modified(appointment):
+            states.append((-1, _state(appointment, previous=True)))
+            states.append((1, _state(appointment, previous=False)))
+    for appointment in session.deleted:
+        if isinstance(appointment, Appointment):
+            states.append((-1, _state(appointment, previous=True)))
+    states = [(sign, state) for sign, state in states if state is not None]
+    if states:
+        apply_changes(session.connection(), states, clinic_timezone())
+
+
+def rebuild(connection, tz, batch_size=5000):
+    """
+    Recalcula todo o resumo a partir dos atendimentos, lendo-os em ordem e
+    acumulando só as linhas do resumo. Devolve quantas linhas foram gravadas.
+    """
+    from ..services.synthetic import insert_rows
+
+    days = {}
+    result = connection.execution_options(yield_per=batch_size).execute(text(
+        'SELECT a.professional_id, a.room_id, r.unit, a.starts_at, a.ends_at, a.status '
+        'FROM appointment a LEFT JOIN room r ON r.id = a.room_id '
+        'WHERE NOT a.is_deleted'
+    ).columns(starts_at=db.DateTime(timezone=True), ends_at=db.DateTime(timezone=True)))
+    for row in result:
+        for key, values in contributions(*row, tz):
+            summary = days.get(key)
+            if summary is None:
+                days[key] = dict(values)
+                continue
+            for counter in COUNTERS:
+                summary[counter] += values[counter]
+            if values['first_starts_at'] is not None:
+                summary['first_starts_at'] = min(filter(None, (summary['first_starts_at'],
+                                                               values['first_starts_at'])))
+                summary['last_ends_at'] = max(filter(None, (summary['last_ends_at'],
+                                                            values['last_ends_at'])))
+
+    connection.execute(AgendaDay.__table__.delete())
+    columns = ('scope', 'scope_key', 'day') + COUNTERS + ('first_starts_at', 'last_ends_at')
+    insert_rows(connection, 'agenda_day', columns,
+                [key + tuple(values[name] for name in columns[3:]) for key, values in days.items()],
+                batch_size)
+    return len(days)
+
+
+def _series_for(scope, key, window_start, window_end):
+    if scope == 'professional':
+        return load_series('professional_id', [int(key)], window_start, window_end)
+    if scope == 'room':
+        return load_series('room_id', [int(key)], window_start, window_end)
+    rooms = [room.id for room in Room.query.filter_by(unit=key, is_deleted=False)]
+    return load_series('room_id', rooms, window_start, window_end) if rooms else []
+
+
+def _open_minutes(scope, key):
+    """Minutos de expediente por dia da semana, ou ``None`` se não houver expediente."""
+    query = WorkingHours.query
+    if scope == 'professional':
+        query = query.filter_by(professional_id=int(key))
+    elif scope == 'room':
+        query = query.filter_by(room_id=int(key))
+    else:
+        query = query.join(Room, Room.id == WorkingHours.room_id).filter(Room.unit == key)
+    minutes = defaultdict(int)
+    for hours in query:
+        minutes[hours.weekday] += ((hours.end_time.hour * 60 + hours.end_time.minute)
+                                   - (hours.start_time.hour * 60 + hours.start_time.minute))
+    return minutes or None
+
+
+def _as_dict(summary):
+    return {name: getattr(summary, name) for name in COUNTERS + ('first_starts_at', 'last_ends_at')}
+
+
+def calendar_days(scope, key, first_day, last_day):
+    """
+    Resumo de cada dia de ``[first_day, last_day]`` com atendimentos, para as
+    visões de mês e semana: lê só ``agenda_day`` e expande as séries
+    recorrentes apenas nessa janela. ``occupancy`` é a fração do expediente
+    ocupada (``None`` sem expediente cadastrado).
+    """
+    tz = clinic_timezone()
+    days = {row.day: _as_dict(row) for row in AgendaDay.query.filter(
+        AgendaDay.scope == scope, AgendaDay.scope_key == str(key),
+        AgendaDay.day >= first_day, AgendaDay.day <= last_day)}
+
+    window_start, window_end = day_bounds(first_day, tz)[0], day_bounds(last_day, tz)[1]
+    for occurrence in merge_occurrences(_series_for(scope, key, window_start, window_end),
+                                        window_start, window_end, tz, include_cancelled=True):
+        day = local_day(occurrence.starts_at, tz)
+        if not first_day <= day <= last_day:
+            continue
+        summary = days.setdefault(day, dict.fromkeys(COUNTERS, 0) | {
+            'first_starts_at': None, 'last_ends_at': None})
+        if occurrence.status == 'cancelled':
+            summary['cancelled'] += 1
+            continue
+        summary['scheduled'] += 1
+        summary['booked_minutes'] += (occurrence.ends_at - occurrence.starts_at) // timedelta(minutes=1)
+        summary['first_starts_at'] = min(filter(None, (summary['first_starts_at'] and to_utc(
+            summary['first_starts_at']), occurrence.starts_at)))
+        summary['last_ends_at'] = max(filter(None, (summary['last_ends_at'] and to_utc(
+            summary['last_ends_at']), occurrence.ends_at)))
+
+    opened = _open_minutes(scope, key)
+    for day, summary in days.items():
+        available = opened.get(day.weekday()) if opened else None
+        summary['occupancy'] = (round(summary['booked_minutes'] / available, 3)
+                                if available else None)
+    return dict(sorted(days.items()))
+
+
+def day_detail(scope, key, day):
+    """Atendimentos e ocorrências de séries de um dia, em ordem de início."""
+    tz = clinic_timezone()
+    start, end = day_bounds(day, tz)
+    query = Appointment.query.filter(Appointment.is_deleted == False,  # noqa: E712
+                                     Appointment.starts_at >= start, Appointment.starts_at < end)
+    if scope == 'professional':
+        query = query.filter(Appointment.professional_id == int(key))
+    elif scope == 'room':
+        query = query.filter(Appointment.room_id == int(key))
+    else:
+        query = query.join(Room, Room.id == Appointment.room_id).filter(Room.unit == key)
+
+    entries = [{'appointment_id': appointment.id, 'series_id': None,
+                'professional_id': appointment.professional_id, 'room_id': appointment.room_id,
+                'starts_at': to_utc(appointment.starts_at), 'ends_at': to_utc(appointment.ends_at),
+                'status': appointment.status.value}
+               for appointment in query]
+    series = _series_for(scope, key, start, end)
+    resources = {item.id: (item.professional_id, item.room_id) for item in series}
+    for occurrence in merge_occurrences(series, start, end, tz, include_cancelled=True):
+        if start <= occurrence.starts_at < end:
+            professional_id, room_id = resources[occurrence.series_id]
+            entries.append({'appointment_id': None, 'series_id': occurrence.series_id,
+                            'professional_id': professional_id, 'room_id': room_id,
+                            'starts_at': occurrence.starts_at, 'ends_at': occurrence.ends_at,
+                            'status': occurrence.status})
+    return sorted(entries, key=lambda entry: entry['starts_at'])
+
+
+def init_app(app):
+    """Registra a atualização do resumo a cada flush."""
+    if not event.contains(Session, 'after_flush', _summarize_flushed):
+        event.listen(Session, 'after_flush', _summarize_flushed)
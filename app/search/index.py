@@ -0,0 +1,199 @@
+"""
+Índice de busca textual sobre documentos e registros.
+
+Cada objeto pesquisável vira uma linha em ``search_entry``. No SQLite a
+tabela alimenta (via triggers) uma tabela virtual FTS5 com remoção de
+acentos; no PostgreSQL ganha uma coluna ``tsvector`` gerada com a
+configuração ``portuguese_unaccent`` e um índice GIN. A indexação é
+incremental: cada flush da sessão atualiza as entradas alteradas na mesma
+transação.
+"""
+
+import re
+import unicodedata
+from markupsafe import escape
+from sqlalchemy import event, text
+from sqlalchemy.orm import Session
+from .. import db
+
+# Marcadores internos dos trechos destacados (escapados antes de virar <mark>)
+_START, _STOP = '\x02', '\x03'
+_TERM_RE = re.compile(r'\w+', re.UNICODE)
+
+_registry = {}
+
+SQLITE_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS search_fts USING fts5(
+        title, body, content='search_entry', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2')""",
+    """CREATE TRIGGER IF NOT EXISTS search_entry_ai AFTER INSERT ON search_entry BEGIN
+        INSERT INTO search_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS search_entry_ad AFTER DELETE ON search_entry BEGIN
+        INSERT INTO search_fts(search_fts, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS search_entry_au AFTER UPDATE ON search_entry BEGIN
+        INSERT INTO search_fts(search_fts, rowid, title, body)
+        VALUES ('delete', old.id, old.title, old.body);
+        INSERT INTO search_fts(rowid, title, body) VALUES (new.id, new.title, new.body);
+    END""",
+]
+
+POSTGRES_DDL = [
+    "CREATE EXTENSION IF NOT EXISTS unaccent",
+    """DO $$ BEGIN
+        IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'portuguese_unaccent') THEN
+            CREATE TEXT SEARCH CONFIGURATION portuguese_unaccent (COPY = portuguese);
+            ALTER TEXT SEARCH CONFIGURATION portuguese_unaccent
+                ALTER MAPPING FOR hword, hword_part, word WITH unaccent, portuguese_stem;
+        END IF;
+    END $$""",
+    """ALTER TABLE search_entry ADD COLUMN IF NOT EXISTS document tsvector
+        GENERATED ALWAYS AS (
+            setweight(to_tsvector('portuguese_unaccent', coalesce(title, '')), 'A') ||
+            setweight(to_tsvector('portuguese_unaccent', coalesce(body, '')), 'B')
+        ) STORED""",
+    "CREATE INDEX IF NOT EXISTS ix_search_entry_document ON search_entry USING GIN (document)",
+]
+
+
+def register_searchable(model, kind, title, body):
+    """
+    Registra um modelo pesquisável. ``title`` e ``body`` recebem a instância
+    e devolvem o texto a indexar.
+    """
+    _registry[model] = (kind, title, body)
+
+
+def create_search_ddl(connection):
+    """Cria as estruturas específicas do banco (FTS5 ou tsvector/GIN)."""
+    statements = POSTGRES_DDL if connection.dialect.name == 'postgresql' else SQLITE_DDL
+    for statement in statements:
+        connection.execute(text(statement))
+
+
+def upsert_entries(connection, rows):
+    """Insere ou atualiza entradas ``{'kind', 'object_id', 'title', 'body'}`` em lote."""
+    if not rows:
+        return
+    connection.execute(text(
+        "INSERT INTO search_entry (kind, object_id, title, body) "
+        "VALUES (:kind, :object_id, :title, :body) "
+        "ON CONFLICT (kind, object_id) DO UPDATE "
+        "SET title = excluded.title, body = excluded.body"
+    ), rows)
+
+
+def delete_entries(connection, keys):
+    """Remove as entradas ``{'kind', 'object_id'}`` informadas."""
+    if keys:
+        connection.execute(text(
+            "DELETE FROM search_entry WHERE kind = :kind AND object_id = :object_id"
+        ), keys)
+
+
+def normalize(value):
+    """Remove acentos e converte para minúsculas."""
+    decomposed = unicodedata.normalize('NFKD', value or '')
+    return ''.join(c for c in decomposed if not unicodedata.combining(c)).lower()
+
+
+def query_terms(query):
+    return _TERM_RE.findall(normalize(query))
+
+
+def _highlight(snippet):
+    return str(escape(snippet or '')).replace(_START, '<mark>').replace(_STOP, '</mark>')
+
+
+def run_search(connection, query, kind=None, limit=20, offset=0):
+    """
+    Executa a busca ranqueada e retorna dicionários com ``kind``,
+    ``object_id``, ``title``, ``snippet`` (HTML seguro) e ``rank``.
+    """
+    terms = query_terms(query)
+    if not terms:
+        return []
+
+    params = {'kind': kind, 'limit': limit, 'offset': offset}
+    kind_filter = 'AND e.kind = :kind' if kind else ''
+    if connection.dialect.name == 'postgresql':
+        params['query'] = ' & '.join(f'{term}:*' for term in terms)
+        params['options'] = f'StartSel={_START}, StopSel={_STOP}, MaxFragments=2, MaxWords=20'
+        sql = f"""
+            SELECT e.kind, e.object_id, e.title,
+                   ts_headline('portuguese_unaccent', coalesce(nullif(e.body, ''), e.title), q,
+                               :options) AS snippet,
+                   ts_rank_cd(e.document, q) AS rank
+            FROM search_entry e, to_tsquery('portuguese_unaccent', :query) q
+            WHERE e.document @@ q {kind_filter}
+            ORDER BY rank DESC
+            LIMIT :limit OFFSET :offset
+        """
+    else:
+        params['query'] = ' '.join(f'"{term}"*' for term in terms)
+        sql = f"""
+            SELECT e.kind, e.object_id, e.title,
+                   snippet(search_fts, -1, '{_START}', '{_STOP}', '…', 16) AS snippet,
+                   bm25(search_fts, 10.0, 1.0) AS rank
+            FROM search_fts JOIN search_entry e ON e.id = search_fts.rowid
+            WHERE search_fts MATCH :query {kind_filter}
+            ORDER BY rank
+            LIMIT :limit OFFSET :offset
+        """
+
+    rows = connection.execute(text(sql), params).mappings()
+    return [{
+        'kind': row['kind'],
+        'object_id': row['object_id'],
+        'title': row['title'],
+        'snippet': _highlight(row['snippet']),
+        'rank': abs(float(row['rank'])),
+    } for row in rows]
+
+
+def search(query, kind=None, limit=20, offset=0):
+    """Busca usando a conexão da sessão atual."""
+    return run_search(db.session.connection(), query, kind, limit, offset)
+
+
+def _entry_for(instance):
+    kind, title, body = _registry[type(instance)]
+    return {'kind': kind, 'object_id': instance.id,
+            'title': title(instance) or '', 'body': body(instance) or ''}
+
+
+def _index_flushed(session, flush_context):
+    """Atualiza o índice com o que acabou de ser gravado nesta transação."""
+    changed = [obj for obj in session.new if type(obj) in _registry]
+    changed += [obj for obj in session.dirty
+                if type(obj) in _registry and session.is_modified(obj)]
+    deleted = [obj for obj in session.deleted if type(obj) in _registry]
+    if not changed and not deleted:
+        return
+
+    connection = session.connection()
+    upsert_entries(connection, [_entry_for(obj) for obj in changed])
+    delete_entries(connection, [{'kind': _registry[type(obj)][0], 'object_id': obj.id}
+                                for obj in deleted])
+
+
+def init_app(app):
+    """Registra os modelos pesquisáveis e os eventos de indexação."""
+    from ..models import SearchEntry, Upload
+
+    register_searchable(
+        Upload, 'document',
+        title=lambda upload: upload.filename,
+        body=lambda upload: '\n'.join(filter(None, [upload.description, upload.extracted_text]))
+    )
+
+    if not event.contains(SearchEntry.__table__, 'after_create', _after_create):
+        event.listen(SearchEntry.__table__, 'after_create', _after_create)
+    if not event.contains(Session, 'after_flush', _index_flushed):
+        event.listen(Session, 'after_flush', _index_flushed)
+
+
+def _after_create(target, connection, **kw):
+    create_search_ddl(connection)
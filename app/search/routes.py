@@ -0,0 +1,22 @@
+"""
+Rota de busca textual em documentos e registros.
+"""
+
+from flask import Blueprint, request, jsonify
+from flask_login import login_required
+from . import index
+
+search = Blueprint('search', __name__)
+
+
+@search.route('/search')
+@login_required
+def results():
+    """Retorna os resultados ranqueados, com trechos destacados em ``<mark>``."""
+    query = request.args.get('q', '').strip()
+    kind = request.args.get('kind') or None
+    page = max(request.args.get('page', 1, type=int), 1)
+    per_page = min(max(request.args.get('per_page', 20, type=int), 1), 100)
+
+    hits = index.search(query, kind=kind, limit=per_page, offset=(page - 1) * per_page)
+    return jsonify({'query': query, 'page': page, 'results': hits})
@@ -0,0 +1,236 @@
+"""
+Geração de dados sintéticos em volume (usuários, convites e atividades).
+
+Os dados são determinísticos para uma mesma ``seed`` e são gerados e
+gravados em lotes, sem passar pelo ORM: no SQLite via ``executemany`` na
+conexão DBAPI e no PostgreSQL via ``COPY ... FROM STDIN``. As senhas vêm de
+um pequeno pool de hashes pré-calculados da mesma senha (o hash por linha
+custaria ~100 ms cada); sem senha informada, ela é aleatória e ninguém
+entra com essas contas. Regras fixas, úteis para benchmarks:
+
+- ``username``/``email`` são ``user<id>``/``user<id>@example.com``;
+- um a cada dez usuários (id múltiplo de 10) fica desativado;
+- um a cada mil (id terminado em 001) é administrador.
+"""
+
+import csv
+import io
+import random
+import secrets
+from datetime import datetime, timedelta
+from sqlalchemy import text
+from werkzeug.security import generate_password_hash
+
+FIRST_NAMES = ('Ana', 'Bruno', 'Carla', 'Daniel', 'Eduarda', 'Felipe', 'Gabriela', 'Heitor',
+               'Isabela', 'João', 'Larissa', 'Marcos', 'Natália', 'Otávio', 'Paula', 'Rafael',
+               'Sofia', 'Thiago', 'Valéria', 'Yuri')
+LAST_NAMES = ('Silva', 'Santos', 'Oliveira', 'Souza', 'Rodrigues', 'Ferreira', 'Alves', 'Pereira',
+              'Lima', 'Gomes', 'Costa', 'Ribeiro', 'Martins', 'Carvalho', 'Almeida', 'Lopes')
+ACTIONS = ('Criou usuário', 'Desativou usuário', 'Reativou usuário', 'Alterou papel',
+           'Gerou convite', 'Redefiniu senha')
+
+USER_COLUMNS = ('id', 'username', 'email', 'password', 'name', 'is_active', 'role',
+                'two_factor_enabled')
+INVITE_COLUMNS = ('token', 'created_by', 'created_at', 'expires_at', 'is_used', 'used_by', 'used_at')
+ACTIVITY_COLUMNS = ('admin_id', 'action', 'target_user_id', 'timestamp')
+
+
+def password_pool(password, size=8):
+    """Hashes da mesma senha com sais diferentes, reaproveitados entre as linhas."""
+    return [generate_password_hash(password) for _ in range(size)]
+
+
+def is_admin_id(user_id):
+    return user_id % 1000 == 1
+
+
+def generate_users(first_id, count, pool, rng):
+    for user_id in range(first_id, first_id + count):
+        yield (
+            user_id,
+            f'user{user_id}',
+            f'user{user_id}@example.com',
+            pool[user_id % len(pool)],
+            f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}',
+            user_id % 10 != 0,
+            'ADMIN' if is_admin_id(user_id) else 'USER',
+            False,
+        )
+
+
+def generate_invites(first_number, count, admin_ids, max_user_id, rng, now):
+    for number in range(first_number, first_number + count):
+        created_at = now - timedelta(seconds=rng.randrange(365 * 86400))
+        used = rng.random() < 0.3
+        yield (
+            # Número sequencial garante unicidade ao repetir o comando
+            'syn%010d%016x' % (number, rng.getrandbits(64)),
+            rng.choice(admin_ids),
+            created_at,
+            created_at + timedelta(days=7),
+            used,
+            rng.randint(1, max_user_id) if used else None,
+            created_at + timedelta(seconds=rng.randrange(7 * 86400)) if used else None,
+        )
+
+
+def generate_activities(count, admin_ids, max_user_id, rng, now):
+    for _ in range(count):
+        yield (
+            rng.choice(admin_ids),
+            rng.choice(ACTIONS),
+            rng.randint(1, max_user_id),
+            now - timedelta(seconds=rng.randrange(2 * 365 * 86400)),
+        )
+
+
+def _batches(rows, size):
+    batch = []
+    for row in rows:
+        batch.append(row)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
+
+
+class _CsvStream:
+    """Arquivo somente-leitura que produz CSV sob demanda para o ``COPY``."""
+
+    def __init__(self, rows):
+        self.rows = iter(rows)
+        self.buffer = io.StringIO()
+        self.writer = csv.writer(self.buffer)
+        self.pending = ''
+
+    def read(self, size=65536):
+        while len(self.pending) < size:
+            row = next(self.rows, None)
+            if row is None:
+                break
+            self.writer.writerow(row)
+            if self.buffer.tell() > 65536:
+                self.pending += self.buffer.getvalue()
+                self.buffer.seek(0)
+                self.buffer.truncate()
+        if len(self.pending) < size:
+            self.pending += self.buffer.getvalue()
+            self.buffer.seek(0)
+            self.buffer.truncate()
+        chunk, self.pending = self.pending[:size], self.pending[size:]
+        return chunk
+
+
+class _Counter:
+    """Conta as linhas consumidas de um gerador (o COPY não informa o total)."""
+
+    def __init__(self, rows):
+        self.rows = rows
+        self.count = 0
+
+    def __iter__(self):
+        for row in self.rows:
+            self.count += 1
+            yield row
+
+
+def _sqlite_value(value):
+    # Mesmo formato de texto que o SQLAlchemy usa para DateTime no SQLite
+    if isinstance(value, datetime):
+        return value.strftime('%Y-%m-%d %H:%M:%S.%f')
+    return value
+
+
+def insert_rows(connection, table, columns, rows, batch_size=50000):
+    """Grava as linhas pelo caminho mais rápido do dialeto; retorna a quantidade."""
+    dialect = connection.dialect.name
+    column_list = ', '.join(columns)
+    total = 0
+
+    if dialect == 'postgresql':
+        raw = connection.connection.dbapi_connection
+        counted = _Counter(rows)
+        sql = f'COPY "{table}" ({column_list}) FROM STDIN WITH (FORMAT csv)'
+        with raw.cursor() as cursor:
+            if hasattr(cursor, 'copy_expert'):  # psycopg2
+                cursor.copy_expert(sql, _CsvStream(counted))
+            else:  # psycopg 3
+                with cursor.copy(sql) as copy:
+                    for row in counted:
+                        copy.write_row(row)
+        return counted.count
+
+    if dialect == 'sqlite':
+        cursor = connection.connection.dbapi_connection.cursor()
+        sql = f'INSERT INTO "{table}" ({column_list}) VALUES ({", ".join("?" * len(columns))})'
+        for batch in _batches(rows, batch_size):
+            cursor.executemany(sql, [tuple(_sqlite_value(v) for v in row) for row in batch])
+            total += len(batch)
+        cursor.close()
+        return total
+
+    sql = text(f'INSERT INTO "{table}" ({column_list}) VALUES ({", ".join(":" + c for c in columns)})')
+    for batch in _batches(rows, batch_size):
+        connection.execute(sql, [dict(zip(columns, row)) for row in batch])
+        total += len(batch)
+    return total
+
+
+def _seed(connection, counts, users, invites, activities, password, rng, batch_size):
+    now = datetime(2025, 1, 1)  # fixo: mesma seed, mesmos dados
+    first_id = (connection.execute(text('SELECT max(id) FROM "user"')).scalar() or 0) + 1
+    if users:
+        counts['user'] = insert_rows(connection, 'user', USER_COLUMNS,
+                                     generate_users(first_id, users, password_pool(password), rng),
+                                     batch_size)
+        if connection.dialect.name == 'postgresql':
+            connection.execute(text(
+                "SELECT setval(pg_get_serial_sequence('\"user\"', 'id'), (SELECT max(id) FROM \"user\"))"))
+
+    if invites or activities:
+        max_user_id = connection.execute(text('SELECT max(id) FROM "user"')).scalar() or 0
+        admin_ids = [row[0] for row in connection.execute(
+            text('SELECT id FROM "user" WHERE role = \'ADMIN\''))]
+        if not admin_ids:
+            raise ValueError('Convites e atividades precisam de ao menos um administrador.')
+        if invites:
+            first_invite = connection.execute(text('SELECT count(*) FROM invite_token')).scalar()
+            counts['invite_token'] = insert_rows(
+                connection, 'invite_token', INVITE_COLUMNS,
+                generate_invites(first_invite, invites, admin_ids, max_user_id, rng, now),
+                batch_size)
+        if activities:
+            counts['user_activity'] = insert_rows(
+                connection, 'user_activity', ACTIVITY_COLUMNS,
+                generate_activities(activities, admin_ids, max_user_id, rng, now), batch_size)
+
+
+def seed_synthetic(engine, users=0, invites=0, activities=0, password=None,
+                   seed=42, batch_size=50000):
+    """
+    Acrescenta dados sintéticos ao banco numa única transação.
+
+    Os ids dos usuários continuam a partir do maior id existente, então o
+    comando pode ser repetido. Retorna a quantidade gravada por tabela.
+    """
+    rng = random.Random(seed)
+    password = password or secrets.token_urlsafe(16)
+    counts = {'user': 0, 'invite_token': 0, 'user_activity': 0}
+
+    with engine.connect() as connection:
+        sqlite = connection.dialect.name == 'sqlite'
+        if sqlite:
+            # Sem fsync a cada página durante a carga; restaurado ao final
+            connection.exec_driver_sql('PRAGMA synchronous=OFF')
+            connection.commit()
+        try:
+            with connection.begin():
+                _seed(connection, counts, users, invites, activities, password, rng, batch_size)
+        finally:
+            if sqlite:
+                connection.rollback()
+                connection.exec_driver_sql('PRAGMA synchronous=FULL')
+                connection.commit()
+
+    return counts
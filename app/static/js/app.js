@@ -81,3 +81,50 @@ window.notify = {
         return this.show(message, 'info', duration);
     }
 };
+
+// Notificações do servidor via Server-Sent Events
+window.serverEvents = {
+    source: null,
+    lastEventId: null,
+    retryTimer: null,
+
+    connect(url) {
+        if (this.source || !url || !window.EventSource) {
+            return;
+        }
+        // O EventSource reconecta sozinho enviando Last-Event-ID
+        const query = this.lastEventId
+            ? (url.includes('?') ? '&' : '?') + 'last_event_id=' + encodeURIComponent(this.lastEventId)
+            : '';
+        this.source = new EventSource(url + query);
+        this.source.onmessage = (e) => {
+            this.lastEventId = e.lastEventId || this.lastEventId;
+            const data = JSON.parse(e.data);
+            notify.show(data.message, data.kind || 'info');
+        };
+        // Respostas diferentes de 200 (ex.: 503 no limite de conexões)
+        // encerram o EventSource de vez; tenta de novo mais tarde
+        this.source.onerror = () => {
+            if (this.source && this.source.readyState === EventSource.CLOSED) {
+                this.source = null;
+                this.retryTimer = setTimeout(() => {
+                    this.retryTimer = null;
+                    this.connect(url);
+                }, 10000);
+            }
+        };
+    },
+
+    close() {
+        clearTimeout(this.retryTimer);
+        this.retryTimer = null;
+        if (this.source) {
+            this.source.close();
+            this.source = null;
+        }
+    }
+};
+
+document.addEventListener('DOMContentLoaded', () => {
+    window.serverEvents.connect(document.body.dataset.notificationsUrl);
+});
@@ -0,0 +1,301 @@
+"""
+Aplicação dos lotes de alterações feitas offline pelo aplicativo.
+
+Um lote traz todas as alterações pendentes do aparelho e é aplicado numa
+única transação: cada item roda num savepoint próprio, então um item em
+conflito ou recusado volta atrás sozinho e os demais seguem. A resposta
+lista o resultado de cada item, na ordem do lote.
+
+Atendimentos e pacientes usam concorrência otimista: o item informa a
+``version`` que o aparelho leu e só é aplicado se ela ainda for a atual;
+o ``UPDATE`` também confere a versão (``version_id_col``), então uma
+gravação concorrente entre a leitura e o flush vira conflito, não perda.
+No conflito o item devolve o registro atual, para o aplicativo perguntar
+ao usuário. Evoluções só são inseridas; a correção de uma versão já
+corrigida é o conflito delas.
+
+Os valores de cada campo têm tipo e tamanho conferidos antes do flush; o
+que ainda assim o banco recusar vira ``rejected`` só para aquele item.
+
+O lote é idempotente pelo ``batch_id`` gerado no aparelho: a resposta fica
+gravada em ``SyncBatch`` na mesma transação e um reenvio a recebe de volta.
+"""
+
+import json
+from datetime import date, datetime, timezone
+from sqlalchemy.exc import DBAPIError, IntegrityError
+from sqlalchemy.orm.exc import StaleDataError
+from .. import db
+from ..clinical import notes
+from ..models import Appointment, AppointmentStatus, ClinicalNote, Patient, SyncBatch
+from ..models.scheduling import PROFESSIONAL_CONFLICT, ROOM_CONFLICT
+from ..scheduling.booking import to_utc
+
+APPOINTMENT_FIELDS = ('status', 'notes')
+PATIENT_FIELDS = ('name', 'phone', 'email', 'birth_date')
+
+# Texto livre das anotações do atendimento (a coluna não tem limite)
+MAX_NOTES_LENGTH = 20000
+
+
+class Conflict(Exception):
+    """O registro mudou no servidor depois que o aparelho o leu."""
+
+    def __init__(self, current=None):
+        self.current = current  # ``None``: lido depois, fora do savepoint
+        super().__init__('Registro alterado no servidor')
+
+
+class Rejected(Exception):
+    """Item inválido; não será aceito mesmo se reenviado."""
+
+
+class BatchOwnerMismatch(Exception):
+    """O ``batch_id`` já foi usado por outro usuário."""
+
+
+def _iso(value):
+    if isinstance(value, datetime):
+        return to_utc(value).isoformat()
+    return value.isoformat() if isinstance(value, date) else value
+
+
+def appointment_state(appointment):
+    return {
+        'id': appointment.id,
+        'version': appointment.version,
+        'status': appointment.status.value,
+        'notes': appointment.notes,
+        'starts_at': _iso(appointment.starts_at),
+        'ends_at': _iso(appointment.ends_at),
+        'is_deleted': bool(appointment.is_deleted),
+    }
+
+
+def patient_state(patient):
+    return {
+        'id': patient.id,
+        'version': patient.version,
+        'name': patient.name,
+        'phone': patient.phone,
+        'email': patient.email,
+        'birth_date': _iso(patient.birth_date),
+        'is_deleted': bool(patient.is_deleted),
+    }
+
+
+def note_state(note):
+    return {'id': note.id, 'version': note.version, 'title': note.title,
+            'preview': note.preview, 'noted_at': _iso(note.noted_at)}
+
+
+def _required(item, name, kind=int):
+    value = item.get(name)
+    if not isinstance(value, kind) or isinstance(value, bool):
+        raise Rejected(f'Campo obrigatório ausente ou inválido: {name}')
+    return value
+
+
+def _changes(item, allowed):
+    changes = item.get('changes')
+    if not isinstance(changes, dict) or not changes:
+        raise Rejected('Nenhuma alteração informada')
+    unknown = sorted(set(changes) - set(allowed))
+    if unknown:
+        raise Rejected(f'Campos não editáveis offline: {", ".join(unknown)}')
+    return changes
+
+
+def _text(changes, name, max_length, required=False):
+    """Valor de texto da alteração, conferido antes de chegar ao banco."""
+    value = changes[name]
+    if value is None and not required:
+        return None
+    if not isinstance(value, str) or (required and not value.strip()):
+        raise Rejected(f'Campo inválido: {name}')
+    if len(value) > max_length:
+        raise Rejected(f'Campo longo demais: {name} (máximo de {max_length} caracteres)')
+    return value
+
+
+def _check_version(record, item, state):
+    if record.is_deleted or record.version != _required(item, 'version'):
+        raise Conflict(state(record))
+
+
+def update_appointment(item, user_id):
+    appointment = db.session.get(Appointment, _required(item, 'id'))
+    if appointment is None:
+        raise Rejected('Atendimento inexistente')
+    _check_version(appointment, item, appointment_state)
+    changes = _changes(item, APPOINTMENT_FIELDS)
+    if 'status' in changes:
+        try:
+            appointment.status = AppointmentStatus(_text(changes, 'status', 20, required=True))
+        except ValueError:
+            raise Rejected(f'Status inválido: {changes["status"]}') from None
+    if 'notes' in changes:
+        appointment.notes = _text(changes, 'notes', MAX_NOTES_LENGTH)
+    db.session.flush()
+    return {'id': appointment.id, 'version': appointment.version}
+
+
+def update_patient(item, user_id):
+    patient = db.session.get(Patient, _required(item, 'id'))
+    if patient is None:
+        raise Rejected('Paciente inexistente')
+    _check_version(patient, item, patient_state)
+    changes = _changes(item, PATIENT_FIELDS)
+    for name in ('name', 'phone', 'email'):
+        if name in changes:
+            changes[name] = _text(changes, name, getattr(Patient, name).type.length,
+                                  required=name == 'name')
+    if changes.get('birth_date'):
+        try:
+            changes['birth_date'] = date.fromisoformat(changes['birth_date'])
+        except (TypeError, ValueError):
+            raise Rejected('Data de nascimento inválida') from None
+    for name, value in changes.items():
+        setattr(patient, name, value)
+    db.session.flush()
+    return {'id': patient.id, 'version': patient.version}
+
+
+def _content(item):
+    content = item.get('content')
+    if not isinstance(content, str) or not content.strip():
+        raise Rejected('Texto da evolução vazio')
+    return content.strip()
+
+
+def _check_header(**fields):
+    try:
+        notes.check_header(**fields)
+    except notes.InvalidNote as error:
+        raise Rejected(str(error)) from None
+
+
+def create_note(item, user_id):
+    patient_id = _required(item, 'patient_id')
+    if db.session.get(Patient, patient_id) is None:
+        raise Rejected('Paciente inexistente')
+    noted_at = item.get('noted_at')
+    try:
+        noted_at = datetime.fromisoformat(noted_at) if noted_at else None
+    except (TypeError, ValueError):
+        raise Rejected('Horário da evolução inválido') from None
+    _check_header(title=item.get('title'), professional_id=item.get('professional_id'))
+    note = notes.add_note(patient_id, _content(item), author_id=user_id,
+                          professional_id=item.get('professional_id'), title=item.get('title'),
+                          noted_at=noted_at, commit=False)
+    return {'id': note.id, 'version': note.version}
+
+
+def correct_note(item, user_id):
+    note = db.session.get(ClinicalNote, _required(item, 'id'))
+    if note is None:
+        raise Rejected('Evolução inexistente')
+    _check_header(title=item.get('title'), reason=item.get('reason'))
+    try:
+        correction = notes.correct_note(note, _content(item), author_id=user_id,
+                                        title=item.get('title'), reason=item.get('reason'),
+                                        commit=False)
+    except notes.StaleNoteVersion:
+        raise Conflict(None) from None
+    return {'id': correction.id, 'version': correction.version}
+
+
+OPERATIONS = {
+    'appointment.update': update_appointment,
+    'patient.update': update_patient,
+    'clinical_note.create': create_note,
+    'clinical_note.correct': correct_note,
+}
+
+
+def _refreshed(model, record_id, state):
+    record = db.session.get(model, record_id, populate_existing=True)
+    return state(record) if record is not None else None
+
+
+def _latest_note(note_id):
+    note = db.session.get(ClinicalNote, note_id)
+    return note_state(notes.versions(note)[-1]) if note is not None else None
+
+
+# Estado atual do registro, lido depois que o savepoint do item voltou atrás
+CURRENT_STATE = {
+    'appointment.update': lambda record_id: _refreshed(Appointment, record_id, appointment_state),
+    'patient.update': lambda record_id: _refreshed(Patient, record_id, patient_state),
+    'clinical_note.correct': _latest_note,
+}
+
+
+def _current_state(op, item):
+    record_id = item.get('id')
+    if op not in CURRENT_STATE or not isinstance(record_id, int):
+        return None
+    return CURRENT_STATE[op](record_id)
+
+
+def apply_item(index, item, user_id):
+    """Aplica um item num savepoint e devolve o resultado dele."""
+    op = item.get('op') if isinstance(item, dict) else None
+    result = {'index': index, 'op': op}
+    operation = OPERATIONS.get(op)
+    if operation is None:
+        return dict(result, status='rejected', error=f'Operação desconhecida: {op}')
+    try:
+        with db.session.begin_nested():
+            return dict(result, status='applied', **operation(item, user_id))
+    except (Conflict, StaleDataError) as conflict:
+        current = getattr(conflict, 'current', None)
+        return dict(result, status='conflict',
+                    current=current if current is not None else _current_state(op, item))
+    except Rejected as error:
+        return dict(result, status='rejected', error=str(error))
+    except IntegrityError as error:
+        if PROFESSIONAL_CONFLICT in str(error) or ROOM_CONFLICT in str(error):
+            return dict(result, status='rejected', error='Horário ocupado por outro atendimento')
+        return dict(result, status='rejected', error='Alteração recusada pelo banco')
+    except DBAPIError:
+        # Valor que o banco não aceita (tipo ou tamanho): só este item é recusado
+        return dict(result, status='rejected', error='Alteração recusada pelo banco')
+
+
+def apply_batch(batch_id, items, user_id=None):
+    """
+    Aplica o lote numa transação e devolve a resposta (a gravada, se o
+    lote já foi aplicado). Levanta ``BatchOwnerMismatch`` se o ``batch_id``
+    pertence a outro usuário.
+    """
+    applied = db.session.get(SyncBatch, batch_id)
+    if applied is None:
+        applied = SyncBatch(id=batch_id, user_id=user_id, items=len(items))
+        db.session.add(applied)
+        try:
+            # Reserva o id antes de aplicar: um reenvio simultâneo espera por este
+            db.session.flush()
+        except IntegrityError:
+            # Outro envio do mesmo lote terminou antes
+            db.session.rollback()
+            applied = db.session.get(SyncBatch, batch_id)
+            if applied is None:
+                return apply_batch(batch_id, items, user_id)
+        else:
+            results = [apply_item(index, item, user_id) for index, item in enumerate(items)]
+            response = {
+                'batch_id': batch_id,
+                'processed_at': datetime.now(timezone.utc).isoformat(),
+                'applied': sum(result['status'] == 'applied' for result in results),
+                'conflicts': sum(result['status'] == 'conflict' for result in results),
+                'rejected': sum(result['status'] == 'rejected' for result in results),
+                'results': results,
+            }
+            applied.response = json.dumps(response)
+            db.session.commit()
+            return dict(response, replayed=False)
+
+    if applied.user_id != user_id:
+        raise BatchOwnerMismatch(batch_id)
+    return dict(json.loads(applied.response), replayed=True)
@@ -0,0 +1,60 @@
+"""
+Sincronização do aplicativo offline: um lote de alterações por requisição.
+"""
+
+import json
+from flask import Blueprint, current_app, jsonify, request
+from flask_login import current_user, login_required
+from ..utils.compression import BodyTooLarge, decode_request_body
+from . import batch
+
+sync = Blueprint('sync', __name__)
+
+
+def _error(message, status=400):
+    return jsonify({'error': message}), status
+
+
+@sync.route('/batch', methods=['POST'])
+@login_required
+def apply_batch():
+    """
+    Aplica as alterações feitas offline. Corpo JSON (de preferência com
+    ``Content-Encoding: gzip``)::
+
+        {"batch_id": "...", "mutations": [
+            {"op": "appointment.update", "id": 12, "version": 3,
+             "changes": {"status": "completed"}},
+            {"op": "clinical_note.create", "patient_id": 7, "content": "..."}]}
+
+    Responde com o resultado de cada item (``applied``, ``conflict`` com o
+    registro atual, ou ``rejected`` com o motivo). Reenviar o mesmo
+    ``batch_id`` devolve a mesma resposta.
+    """
+    try:
+        body = decode_request_body(request.get_data(cache=False),
+                                   request.headers.get('Content-Encoding'),
+                                   current_app.config['SYNC_MAX_BYTES'])
+        payload = json.loads(body)
+    except BodyTooLarge:
+        return _error('Lote grande demais; divida as alterações em mais de um envio', 413)
+    except (json.JSONDecodeError, UnicodeDecodeError):
+        return _error('JSON inválido')
+    except ValueError as e:
+        return _error(str(e))
+
+    if not isinstance(payload, dict):
+        return _error('O lote deve ser um objeto JSON')
+    batch_id, mutations = payload.get('batch_id'), payload.get('mutations')
+    if not isinstance(batch_id, str) or not 8 <= len(batch_id) <= 64:
+        return _error('batch_id ausente ou inválido (8 a 64 caracteres)')
+    if not isinstance(mutations, list):
+        return _error('mutations deve ser uma lista')
+    if len(mutations) > current_app.config['SYNC_MAX_ITEMS']:
+        return _error('Lote com itens demais; divida as alterações em mais de um envio', 413)
+
+    user_id = current_user.id if current_user.is_authenticated else None
+    try:
+        return jsonify(batch.apply_batch(batch_id, mutations, user_id))
+    except batch.BatchOwnerMismatch:
+        return _error('batch_id já usado por outro usuário', 409)
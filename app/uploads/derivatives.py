@@ -0,0 +1,234 @@
+"""
+Geração de miniaturas e pré-visualizações dos uploads.
+
+O redimensionamento com Pillow roda num pool de processos, fora das threads
+de requisição. Cada derivado é gravado em ``derivatives/<aa>/<hash>-<tam>.<fmt>``
+e, por ser endereçado pelo conteúdo, pode ser servido com cache de longa
+duração. Derivados ausentes são regenerados sob demanda.
+
+O mesmo pool extrai o texto dos documentos (texto puro e, com o PyMuPDF
+instalado, PDF) para ``Upload.extracted_text``; a gravação reindexa o upload
+na busca textual.
+"""
+
+import logging
+import multiprocessing
+import os
+import tempfile
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from flask import current_app
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_SIZES = (128, 512)
+FORMATS = {'webp': 'WEBP', 'jpeg': 'JPEG', 'png': 'PNG'}
+DEFAULT_FORMAT = 'webp'
+
+# Lista fechada: ``image/*`` aceitaria SVG, TIFF, PSD e outros formatos que
+# não queremos decodificar no pool
+SUPPORTED_TYPES = ('image/jpeg', 'image/png', 'image/webp', 'image/gif', 'application/pdf')
+
+TEXT_TYPES = ('text/plain', 'application/pdf')
+MAX_EXTRACTED_CHARS = 200000
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def is_supported(content_type):
+    """Tipos para os quais sabemos gerar derivados."""
+    return content_type in SUPPORTED_TYPES
+
+
+def derivative_path(root, digest, size, fmt):
+    """Caminho do derivado, chaveado por hash do conteúdo, tamanho e formato."""
+    return os.path.join(root, 'derivatives', digest[:2], f'{digest}-{size}.{fmt}')
+
+
+def _init_worker(memory_limit):
+    """Aplica o teto de memória ao processo do pool (um job por vez)."""
+    if memory_limit:
+        try:
+            import resource
+            limit = memory_limit * 1024 * 1024
+            resource.setrlimit(resource.RLIMIT_AS, (limit, limit))
+        except (ImportError, ValueError, OSError):
+            pass
+
+
+def _open_source(source_path, content_type):
+    from PIL import Image
+
+    if content_type == 'application/pdf':
+        # Renderização da primeira página depende do PyMuPDF (opcional)
+        try:
+            import fitz
+        except ImportError:
+            return None
+        with fitz.open(source_path) as document:
+            if not document.page_count:
+                return None
+            pixmap = document.load_page(0).get_pixmap()
+            return Image.frombytes('RGB', (pixmap.width, pixmap.height), pixmap.samples)
+
+    return Image.open(source_path)
+
+
+def render_derivative(source_path, target_path, size, fmt, content_type):
+    """
+    Gera o derivado de ``source_path`` com lado máximo ``size``.
+    Executado nos processos do pool; retorna o caminho gerado ou ``None``.
+    """
+    from PIL import Image, ImageOps
+
+    image = _open_source(source_path, content_type)
+    if image is None:
+        return None
+
+    with image:
+        # draft() reduz JPEGs já na decodificação, poupando memória
+        image.draft('RGB', (size, size))
+        image = ImageOps.exif_transpose(image)
+        image.thumbnail((size, size), Image.LANCZOS)
+        if fmt == 'jpeg' and image.mode not in ('RGB', 'L'):
+            image = image.convert('RGB')
+
+        os.makedirs(os.path.dirname(target_path), exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(target_path))
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                image.save(tmp, FORMATS[fmt])
+            os.replace(tmp_path, target_path)
+        except BaseException:
+            os.unlink(tmp_path)
+            raise
+
+    return target_path
+
+
+def extract_text(source_path, content_type, limit=MAX_EXTRACTED_CHARS):
+    """
+    Texto do documento para a busca, até ``limit`` caracteres. Executado nos
+    processos do pool; retorna ``None`` sem texto ou sem o PyMuPDF (PDF).
+    """
+    if content_type == 'application/pdf':
+        try:
+            import fitz
+        except ImportError:
+            return None
+        parts, size = [], 0
+        with fitz.open(source_path) as document:
+            for page in document:
+                parts.append(page.get_text())
+                size += len(parts[-1])
+                if size >= limit:
+                    break
+        return ''.join(parts)[:limit].strip() or None
+
+    with open(source_path, 'rb') as source:
+        # Até 4 bytes por caractere em UTF-8
+        return source.read(limit * 4).decode('utf-8', errors='replace')[:limit].strip() or None
+
+
+def get_executor(app=None):
+    """Pool de processos criado sob demanda, um por worker do gunicorn."""
+    global _executor
+    if _executor is None:
+        app = app or current_app
+        with _executor_lock:
+            if _executor is None:
+                _executor = ProcessPoolExecutor(
+                    max_workers=app.config['DERIVATIVE_WORKERS'],
+                    mp_context=multiprocessing.get_context('spawn'),
+                    initializer=_init_worker,
+                    initargs=(app.config['DERIVATIVE_MEMORY_LIMIT'],),
+                    max_tasks_per_child=100
+                )
+    return _executor
+
+
+def _log_failure(future):
+    exc = future.exception()
+    if exc is not None:
+        logger.warning('Falha ao gerar derivado: %s', exc)
+
+
+def _log_extraction_failure(future):
+    exc = future.exception()
+    if exc is not None:
+        logger.warning('Falha ao extrair o texto do upload: %s', exc)
+
+
+def submit_derivative(upload, size, fmt=DEFAULT_FORMAT):
+    """Enfileira a geração de um derivado e retorna o ``Future``."""
+    from .storage import get_store
+    from ..utils.metrics import track_job
+
+    store = get_store()
+    target = derivative_path(store.root, upload.sha256, size, fmt)
+    return track_job('derivatives', get_executor().submit(
+        render_derivative, store.path_for(upload.sha256), target, size, fmt,
+        upload.content_type))
+
+
+def schedule_derivatives(upload):
+    """Dispara, em segundo plano, os derivados padrão de um upload recém-criado."""
+    if not is_supported(upload.content_type):
+        return
+    for size in current_app.config['DERIVATIVE_SIZES']:
+        submit_derivative(upload, size).add_done_callback(_log_failure)
+
+
+def _extract_and_save(app, upload_id, source_path, content_type):
+    from .. import db
+    from ..models import Upload
+
+    text = get_executor(app).submit(extract_text, source_path, content_type).result()
+    if not text:
+        return None
+    with app.app_context():
+        try:
+            upload = db.session.get(Upload, upload_id)
+            if upload is not None:
+                upload.extracted_text = text
+                db.session.commit()
+        finally:
+            db.session.remove()
+    return text
+
+
+def schedule_text_extraction(upload):
+    """
+    Extrai em segundo plano o texto de um upload recém-criado e o grava em
+    ``extracted_text``. Retorna o ``Future`` (``None`` para outros tipos).
+    """
+    from .storage import get_store
+    from ..utils import concurrency
+    from ..utils.metrics import track_job
+
+    if upload.content_type not in TEXT_TYPES:
+        return None
+    app = current_app._get_current_object()
+    future = track_job('derivatives', concurrency.get_executor(app).submit(
+        _extract_and_save, app, upload.id, get_store().path_for(upload.sha256),
+        upload.content_type))
+    future.add_done_callback(_log_extraction_failure)
+    return future
+
+
+def ensure_derivative(upload, size, fmt=DEFAULT_FORMAT, timeout=10):
+    """
+    Retorna o caminho do derivado, gerando-o no pool se estiver ausente.
+    Retorna ``None`` quando não é possível gerá-lo.
+    """
+    from .storage import get_store
+
+    path = derivative_path(get_store().root, upload.sha256, size, fmt)
+    if os.path.exists(path):
+        return path
+    try:
+        return submit_derivative(upload, size, fmt).result(timeout=timeout)
+    except Exception as e:
+        logger.warning('Derivado indisponível para upload %s: %s', upload.id, e)
+        return None
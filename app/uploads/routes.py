@@ -0,0 +1,145 @@
+"""
+Rotas de upload e download de arquivos (documentos e fotos de perfil).
+"""
+
+import os
+from flask import Blueprint, request, jsonify, send_file, abort, current_app
+from flask_login import login_required, current_user
+from werkzeug.utils import secure_filename
+from ..models import Role, Upload
+from .. import db, talisman
+from .storage import get_store
+from .derivatives import (FORMATS, ensure_derivative, is_supported, schedule_derivatives,
+                          schedule_text_extraction)
+
+uploads = Blueprint('uploads', __name__)
+
+CATEGORIES = ('documents', 'profiles')
+
+# Tipos que o navegador pode abrir na própria página; o resto (HTML, SVG...)
+# rodaria script na origem do app e vai como download opaco
+INLINE_TYPES = ('image/jpeg', 'image/png', 'image/webp', 'image/gif', 'application/pdf')
+
+
+def _get_readable(upload_id):
+    """
+    Upload que o usuário pode ler: os próprios, fotos de perfil ou qualquer
+    um para administradores. Os demais respondem 404, como se não existissem.
+    """
+    upload = Upload.query.get_or_404(upload_id)
+    if upload.uploaded_by != current_user.id and upload.category != 'profiles' \
+            and current_user.role != Role.ADMIN:
+        abort(404)
+    return upload
+
+
+@uploads.route('/<category>', methods=['POST'])
+@login_required
+def upload_file(category):
+    """
+    Recebe um arquivo e o grava em disco em streaming.
+
+    Aceita multipart (campo ``file``) ou o corpo bruto da requisição, com o
+    nome do arquivo no cabeçalho ``X-Filename``.
+    """
+    if category not in CATEGORIES:
+        abort(404)
+
+    if request.mimetype == 'multipart/form-data':
+        file = request.files.get('file')
+        if file is None:
+            return jsonify({'error': 'Nenhum arquivo enviado'}), 400
+        stream, filename, content_type = file.stream, file.filename, file.mimetype
+        description = request.form.get('description')
+    else:
+        stream = request.stream
+        filename = request.headers.get('X-Filename', '')
+        content_type = request.mimetype or 'application/octet-stream'
+        description = request.headers.get('X-Description')
+
+    filename = secure_filename(filename) or 'arquivo'
+    digest, size = get_store().save_stream(
+        stream, max_size=current_app.config.get('MAX_CONTENT_LENGTH'))
+
+    upload = Upload(
+        sha256=digest,
+        size=size,
+        filename=filename,
+        content_type=content_type,
+        category=category,
+        description=description,
+        uploaded_by=current_user.id
+    )
+    db.session.add(upload)
+    db.session.commit()
+
+    schedule_derivatives(upload)
+    schedule_text_extraction(upload)
+
+    return jsonify({
+        'id': upload.id,
+        'sha256': digest,
+        'size': size,
+        'filename': filename
+    }), 201
+
+
+@uploads.route('/<int:upload_id>')
+@login_required
+@talisman(content_security_policy="default-src 'none'; sandbox")
+def download_file(upload_id):
+    """
+    Entrega o arquivo com suporte a Range, ETag e X-Sendfile.
+    O ETag é o próprio hash do conteúdo, estável entre deploys e workers.
+    O tipo informado no envio vem do cliente: só ``INLINE_TYPES`` abrem no
+    navegador, e sempre sem sniffing e numa origem isolada (CSP sandbox).
+    """
+    upload = _get_readable(upload_id)
+    path = get_store().path_for(upload.sha256)
+    if not os.path.exists(path):
+        abort(404)
+
+    inline = upload.content_type in INLINE_TYPES
+    response = send_file(
+        path,
+        mimetype=upload.content_type if inline else 'application/octet-stream',
+        download_name=upload.filename,
+        as_attachment=not inline or request.args.get('download') == '1',
+        conditional=True,
+        etag=upload.sha256,
+        max_age=current_app.config.get('UPLOAD_MAX_AGE', 3600)
+    )
+    # Documentos de pacientes nunca devem ficar em caches compartilhados
+    response.cache_control.public = False
+    response.cache_control.private = True
+    response.headers['X-Content-Type-Options'] = 'nosniff'
+    return response
+
+
+@uploads.route('/<int:upload_id>/thumb/<int:size>.<fmt>')
+@login_required
+def thumbnail(upload_id, size, fmt):
+    """
+    Entrega a miniatura/pré-visualização do upload. Como o derivado é
+    chaveado pelo hash do conteúdo, pode ficar em cache por um ano.
+    """
+    upload = _get_readable(upload_id)
+    if size not in current_app.config['DERIVATIVE_SIZES'] or fmt not in FORMATS \
+            or not is_supported(upload.content_type):
+        abort(404)
+
+    path = ensure_derivative(upload, size, fmt)
+    if path is None:
+        abort(404)
+
+    response = send_file(
+        path,
+        mimetype=f'image/{fmt}',
+        conditional=True,
+        etag=f'{upload.sha256}-{size}-{fmt}',
+        max_age=31536000
+    )
+    response.cache_control.public = False
+    response.cache_control.private = True
+    response.cache_control.immutable = True
+    return response
@@ -0,0 +1,74 @@
+"""
+Armazenamento de uploads endereçado por conteúdo.
+
+O corpo da requisição é lido em blocos e gravado direto em disco enquanto o
+SHA-256 é calculado; o arquivo final fica em ``objects/<aa>/<hash>``, de modo
+que exames idênticos enviados várias vezes ocupam espaço uma única vez.
+"""
+
+import hashlib
+import os
+import tempfile
+from flask import current_app
+from werkzeug.exceptions import RequestEntityTooLarge
+
+CHUNK_SIZE = 64 * 1024
+
+
+class ContentStore:
+    """Repositório de blobs imutáveis identificados pelo SHA-256 do conteúdo."""
+
+    def __init__(self, root, chunk_size=CHUNK_SIZE):
+        self.root = root
+        self.chunk_size = chunk_size
+        self.objects_dir = os.path.join(root, 'objects')
+        self.tmp_dir = os.path.join(root, 'tmp')
+
+    def path_for(self, digest):
+        """Caminho do blob em disco para o hash informado."""
+        return os.path.join(self.objects_dir, digest[:2], digest)
+
+    def exists(self, digest):
+        return os.path.exists(self.path_for(digest))
+
+    def save_stream(self, stream, max_size=None):
+        """
+        Grava o stream em disco bloco a bloco, calculando o hash no caminho.
+        Retorna ``(digest, size)``. Se o conteúdo já existir, o arquivo
+        temporário é descartado (deduplicação).
+        """
+        os.makedirs(self.tmp_dir, exist_ok=True)
+        sha256 = hashlib.sha256()
+        size = 0
+
+        # O temporário fica no mesmo sistema de arquivos para o rename ser atômico
+        fd, tmp_path = tempfile.mkstemp(dir=self.tmp_dir)
+        try:
+            with os.fdopen(fd, 'wb') as tmp:
+                while True:
+                    chunk = stream.read(self.chunk_size)
+                    if not chunk:
+                        break
+                    size += len(chunk)
+                    if max_size is not None and size > max_size:
+                        raise RequestEntityTooLarge()
+                    sha256.update(chunk)
+                    tmp.write(chunk)
+
+            digest = sha256.hexdigest()
+            final_path = self.path_for(digest)
+            if os.path.exists(final_path):
+                os.unlink(tmp_path)
+            else:
+                os.makedirs(os.path.dirname(final_path), exist_ok=True)
+                os.replace(tmp_path, final_path)
+            return digest, size
+        except BaseException:
+            if os.path.exists(tmp_path):
+                os.unlink(tmp_path)
+            raise
+
+
+def get_store():
+    """Retorna o repositório configurado para a aplicação atual."""
+    return ContentStore(current_app.config['UPLOAD_DIR'])
@@ -0,0 +1,238 @@
+"""
+Middleware WSGI de compressão gzip incremental.
+
+Comprime respostas dinâmicas bloco a bloco, sem bufferizar o corpo inteiro,
+de modo que exportações em streaming também saiam comprimidas. Respostas
+pequenas, já codificadas, servidas via ``sendfile`` ou com tipos fora da
+lista permitida passam sem compressão; as de tipo permitido levam
+``Vary: Accept-Encoding`` mesmo assim.
+"""
+
+import zlib
+from itertools import chain
+
+DEFAULT_MIMETYPES = frozenset([
+    'text/html',
+    'text/css',
+    'text/plain',
+    'text/csv',
+    'text/xml',
+    'text/javascript',
+    'application/json',
+    'application/javascript',
+    'application/xml',
+    'image/svg+xml',
+])
+
+# Status que nunca carregam corpo comprimível
+_SKIP_STATUS = {204, 206, 304}
+
+
+def accepts_gzip(environ):
+    """Indica se o cliente aceita ``gzip`` no cabeçalho Accept-Encoding."""
+    for item in environ.get('HTTP_ACCEPT_ENCODING', '').split(','):
+        token, _, params = item.strip().partition(';')
+        if token.strip().lower() not in ('gzip', '*'):
+            continue
+        params = params.replace(' ', '')
+        if params.startswith('q='):
+            try:
+                return float(params[2:]) > 0
+            except ValueError:
+                return False
+        return True
+    return False
+
+
+class CompressionMiddleware:
+    """
+    Comprime com gzip as respostas elegíveis da aplicação WSGI envolvida.
+
+    :param min_size: tamanho mínimo (bytes) para valer a pena comprimir.
+    :param level: nível de compressão zlib (1 a 9).
+    :param mimetypes: tipos de conteúdo permitidos.
+    """
+
+    def __init__(self, app, min_size=500, level=6, mimetypes=None):
+        self.app = app
+        self.min_size = min_size
+        self.level = level
+        self.mimetypes = frozenset(mimetypes or DEFAULT_MIMETYPES)
+
+    def __call__(self, environ, start_response):
+        # Vary em toda resposta de tipo elegível, comprimida ou não: caches não
+        # podem entregar a versão sem gzip a quem aceita gzip, nem o contrário
+        start_response = self._varying(start_response)
+        if environ.get('REQUEST_METHOD') == 'HEAD' or not accepts_gzip(environ):
+            return self.app(environ, start_response)
+
+        state = _ResponseState(self, start_response)
+        app_iter = self.app(environ, state.start_response)
+
+        if state.passthrough:
+            return app_iter
+
+        # Arquivos entregues via wsgi.file_wrapper usam sendfile no servidor
+        file_wrapper = environ.get('wsgi.file_wrapper')
+        if file_wrapper is not None and isinstance(file_wrapper, type) \
+                and isinstance(app_iter, file_wrapper):
+            state.begin(compress=False)
+            return app_iter
+
+        return self._compress(app_iter, state)
+
+    def _varying(self, start_response):
+        def wrapped(status, headers, exc_info=None):
+            if _content_type(headers) in self.mimetypes:
+                headers = list(headers)
+                _add_vary(headers)
+            return start_response(status, headers, exc_info)
+        return wrapped
+
+    def is_compressible(self, status_code, headers):
+        """Decide, só pelos cabeçalhos, se a resposta é candidata à compressão."""
+        if status_code < 200 or status_code in _SKIP_STATUS:
+            return False
+
+        for name, value in headers:
+            lname = name.lower()
+            if lname in ('content-encoding', 'content-range', 'x-sendfile',
+                         'x-accel-redirect'):
+                return False
+            if lname == 'cache-control' and 'no-transform' in value.lower():
+                return False
+            if lname == 'content-length':
+                try:
+                    if int(value) < self.min_size:
+                        return False
+                except ValueError:
+                    return False
+
+        return _content_type(headers) in self.mimetypes
+
+    def _compress(self, app_iter, state):
+        try:
+            iterator = iter(app_iter)
+            pending = list(state.written)
+            size = sum(len(chunk) for chunk in pending)
+
+            # Sem Content-Length: acumula só até atingir o limite mínimo
+            if state.content_length is None:
+                for chunk in iterator:
+                    pending.append(chunk)
+                    size += len(chunk)
+                    if size >= self.min_size:
+                        break
+                else:
+                    body = b''.join(pending)
+                    state.begin(compress=False, content_length=len(body))
+                    if body:
+                        yield body
+                    return
+
+            state.begin(compress=True)
+            compressor = zlib.compressobj(self.level, zlib.DEFLATED, 31)
+            for chunk in chain(pending, iterator):
+                data = compressor.compress(chunk)
+                if data:
+                    yield data
+            yield compressor.flush()
+        finally:
+            close = getattr(app_iter, 'close', None)
+            if close is not None:
+                close()
+
+
+class _ResponseState:
+    """Guarda status e cabeçalhos até decidir se a resposta será comprimida."""
+
+    def __init__(self, middleware, start_response):
+        self.middleware = middleware
+        self._start_response = start_response
+        self.passthrough = False
+        self.status = None
+        self.headers = None
+        self.exc_info = None
+        self.content_length = None
+        self.written = []
+
+    def start_response(self, status, headers, exc_info=None):
+        status_code = int(status.split(' ', 1)[0])
+        if exc_info is not None or not self.middleware.is_compressible(status_code, headers):
+            self.passthrough = True
+            return self._start_response(status, headers, exc_info)
+
+        self.status = status
+        self.headers = headers
+        self.exc_info = exc_info
+        for name, value in headers:
+            if name.lower() == 'content-length':
+                self.content_length = int(value)
+        return self.written.append
+
+    def begin(self, compress, content_length=None):
+        headers = [(name, value) for name, value in self.headers
+                   if name.lower() != 'content-length' or not (compress or content_length is not None)]
+
+        if compress:
+            headers = [_weak_etag(name, value) for name, value in headers]
+            headers.append(('Content-Encoding', 'gzip'))
+        elif content_length is not None:
+            headers.append(('Content-Length', str(content_length)))
+
+        self._start_response(self.status, headers, self.exc_info)
+
+
+def _weak_etag(name, value):
+    """A representação comprimida difere byte a byte: o ETag vira fraco."""
+    if name.lower() == 'etag' and not value.startswith('W/'):
+        return name, 'W/' + value
+    return name, value
+
+
+def _content_type(headers):
+    for name, value in headers:
+        if name.lower() == 'content-type':
+            return value.split(';', 1)[0].strip().lower()
+    return ''
+
+
+def _add_vary(headers):
+    for index, (name, value) in enumerate(headers):
+        if name.lower() == 'vary':
+            if 'accept-encoding' not in value.lower():
+                headers[index] = (name, value + ', Accept-Encoding')
+            return
+    headers.append(('Vary', 'Accept-Encoding'))
+
+
+class BodyTooLarge(ValueError):
+    """Corpo da requisição maior que o limite depois de descomprimido."""
+
+
+REQUEST_WBITS = {'gzip': 16 + zlib.MAX_WBITS, 'deflate': zlib.MAX_WBITS}
+
+
+def decode_request_body(data, encoding, max_size):
+    """
+    Corpo da requisição segundo o ``Content-Encoding`` (``gzip``, ``deflate``
+    ou nenhum). A descompressão para em ``max_size`` bytes, então um corpo
+    pequeno que se expande demais não chega a ocupar memória.
+    """
+    encoding = (encoding or 'identity').strip().lower()
+    if encoding == 'identity':
+        if len(data) > max_size:
+            raise BodyTooLarge(len(data))
+        return data
+    if encoding not in REQUEST_WBITS:
+        raise ValueError(f'Content-Encoding não suportado: {encoding}')
+    decompressor = zlib.decompressobj(REQUEST_WBITS[encoding])
+    try:
+        body = decompressor.decompress(data, max_size + 1)
+    except zlib.error as error:
+        raise ValueError('Corpo comprimido inválido') from error
+    if len(body) > max_size or decompressor.unconsumed_tail:
+        raise BodyTooLarge(max_size)
+    if not decompressor.eof:
+        raise ValueError('Corpo comprimido incompleto')
+    return body
@@ -0,0 +1,58 @@
+"""
+Suporte a views assíncronas: descarrega trabalho bloqueante (banco,
+arquivos, SMTP) num executor de threads compartilhado pelo processo.
+
+Exemplo::
+
+    @bp.route('/relatorio')
+    async def relatorio():
+        usuarios, arquivo = await asyncio.gather(
+            run_blocking(contar_usuarios),
+            run_blocking(ler_arquivo, caminho),
+        )
+"""
+
+import asyncio
+import contextvars
+import functools
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from flask import current_app
+
+_state = {'pid': None, 'executor': None}
+_lock = threading.Lock()
+
+
+def get_executor(app=None):
+    """Executor do processo atual, recriado se o worker veio de um fork."""
+    if _state['pid'] != os.getpid():
+        app = app or current_app
+        with _lock:
+            if _state['pid'] != os.getpid():
+                _state['executor'] = ThreadPoolExecutor(
+                    max_workers=app.config.get('OFFLOAD_WORKERS', 16),
+                    thread_name_prefix='offload'
+                )
+                _state['pid'] = os.getpid()
+    return _state['executor']
+
+
+async def run_blocking(func, *args, **kwargs):
+    """
+    Executa ``func`` no executor compartilhado e aguarda o resultado.
+
+    A função roda num contexto de aplicação próprio, com sessão do banco
+    própria (removida ao final); por isso não compartilhe instâncias ORM da
+    sessão da requisição com ela — passe ids e recarregue. As contextvars da
+    requisição (request id dos logs, trace) seguem para a thread.
+    """
+    app = current_app._get_current_object()
+
+    def call():
+        with app.app_context():
+            return func(*args, **kwargs)
+
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(get_executor(app),
+                                      functools.partial(contextvars.copy_context().run, call))
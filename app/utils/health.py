@@ -0,0 +1,133 @@
+"""
+Verificações de saúde executadas em segundo plano.
+
+Uma thread por worker atualiza periodicamente o estado do banco, do cache e
+do disco; ``/readyz`` apenas lê o último resultado, de modo que probes
+frequentes não geram consultas nem I/O.
+"""
+
+import os
+import shutil
+import threading
+import time
+from flask import current_app
+from flask.sessions import SecureCookieSessionInterface
+from sqlalchemy import text
+
+# Rotas de probe e de métricas: sem sessão, sem rate limit, sem redirecionamento HTTPS
+PROBE_PATHS = frozenset(['/livez', '/readyz', '/health', '/metrics'])
+
+
+def check_database(app):
+    from .. import db
+
+    with db.engine.connect() as connection:
+        connection.execute(text('SELECT 1'))
+
+
+def check_cache(app):
+    url = app.config.get('CACHE_REDIS_URL') or os.environ.get('REDIS_URL')
+    if not url:
+        return 'skipped'
+    import redis
+    redis.Redis.from_url(url, socket_timeout=1, socket_connect_timeout=1).ping()
+
+
+def check_disk(app):
+    min_free = app.config['HEALTH_MIN_FREE_MB'] * 1024 * 1024
+    for path in (app.config['UPLOAD_DIR'], app.instance_path):
+        if not os.path.isdir(path):
+            continue
+        if not os.access(path, os.W_OK):
+            raise RuntimeError(f'{path} sem permissão de escrita')
+        free = shutil.disk_usage(path).free
+        if free < min_free:
+            raise RuntimeError(f'{path} com apenas {free // (1024 * 1024)} MB livres')
+
+
+CHECKS = {
+    'database': check_database,
+    'cache': check_cache,
+    'disk': check_disk,
+}
+
+
+def run_checks(app):
+    """Executa todas as verificações e retorna o resultado de cada uma."""
+    results = {}
+    with app.app_context():
+        for name, check in CHECKS.items():
+            start = time.perf_counter()
+            try:
+                status = check(app) or 'ok'
+                results[name] = {'status': status}
+            except Exception as e:
+                results[name] = {'status': 'fail', 'error': str(e)}
+            results[name]['latency_ms'] = round((time.perf_counter() - start) * 1000, 2)
+    return results
+
+
+class HealthMonitor(threading.Thread):
+    """Thread que mantém em cache o resultado das verificações."""
+
+    def __init__(self, app, interval=10):
+        super().__init__(name='health-monitor', daemon=True)
+        self.app = app
+        self.interval = interval
+        self.results = None
+        self.checked_at = 0.0
+        self.stopped = threading.Event()
+        self._refresh_lock = threading.Lock()
+
+    def refresh(self, max_age=None):
+        """
+        Executa as verificações. Com ``max_age``, reaproveita um resultado
+        mais novo que isso; chamadas simultâneas esperam a que está rodando.
+        """
+        with self._refresh_lock:
+            if (max_age is not None and self.results is not None
+                    and time.time() - self.checked_at < max_age):
+                return self.results
+            self.results = run_checks(self.app)
+            self.checked_at = time.time()
+            return self.results
+
+    def run(self):
+        while True:
+            self.refresh()
+            if self.stopped.wait(self.interval):
+                break
+
+    def snapshot(self):
+        """Retorna ``(resultados, idade_em_segundos)`` da última verificação."""
+        if self.results is None:
+            return None, None
+        return self.results, time.time() - self.checked_at
+
+    def stop(self):
+        self.stopped.set()
+
+
+def get_monitor(app=None):
+    """Monitor deste processo, iniciado sob demanda (seguro após fork)."""
+    app = app or current_app._get_current_object()
+    state = app.extensions.get('health')
+    if state is None or state['pid'] != os.getpid():
+        monitor = HealthMonitor(app, interval=app.config['HEALTH_CHECK_INTERVAL'])
+        monitor.start()
+        state = app.extensions['health'] = {'pid': os.getpid(), 'monitor': monitor}
+    return state['monitor']
+
+
+class ProbeSessionInterface(SecureCookieSessionInterface):
+    """Não abre nem grava a sessão nas rotas de probe."""
+
+    def open_session(self, app, request):
+        if request.path in PROBE_PATHS:
+            return self.make_null_session(app)
+        return super().open_session(app, request)
+
+    def save_session(self, app, session, response):
+        if session.__class__ is self.null_session_class:
+            return
+        return super().save_session(app, session, response)
@@ -0,0 +1,76 @@
+"""
+Jobs disparados pelo commit da sessão.
+
+Os módulos que reagem a gravações (agregados dos relatórios, encaixes da
+fila de espera) anotam a cada flush o que mudou em ``session.info``, sob uma
+chave própria. ``on_commit`` entrega essas anotações ao módulo depois do
+commit e as descarta no rollback; ``submit`` roda o job no executor
+compartilhado (``app.utils.concurrency``) e ``wait`` espera os jobs de uma
+fila (testes e desligamento).
+"""
+
+import os
+import threading
+from flask import current_app, has_app_context
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+_lock = threading.Lock()
+_handlers = {}
+
+
+def on_commit(key, handler):
+    """Chama ``handler(app, anotações)`` com o que ficou em ``session.info[key]`` no commit."""
+    _handlers[key] = handler
+    for name, listener in (('after_commit', _dispatch), ('after_rollback', _discard)):
+        if not event.contains(Session, name, listener):
+            event.listen(Session, name, listener)
+
+
+def _dispatch(session):
+    for key, handler in list(_handlers.items()):
+        pending = session.info.pop(key, None)
+        if pending and has_app_context():
+            handler(current_app._get_current_object(), pending)
+
+
+def _discard(session):
+    for key in list(_handlers):
+        session.info.pop(key, None)
+
+
+def _futures(app, queue_name):
+    state = app.extensions.get('commit_jobs')
+    if state is None or state['pid'] != os.getpid():  # worker recém-criado por fork
+        state = app.extensions['commit_jobs'] = {'pid': os.getpid(), 'futures': {}}
+    return state['futures'].setdefault(queue_name, set())
+
+
+def submit(app, queue_name, fn, *args):
+    """Roda ``fn(*args)`` no executor compartilhado e devolve o ``Future``."""
+    from .concurrency import get_executor
+    from .metrics import track_job
+
+    future = track_job(queue_name, get_executor(app).submit(fn, *args))
+    with _lock:
+        futures = _futures(app, queue_name)
+        futures.add(future)
+    future.add_done_callback(lambda done: _forget(futures, done))
+    return future
+
+
+def _forget(futures, future):
+    with _lock:
+        futures.discard(future)
+
+
+def wait(queue_name, app=None, timeout=None):
+    """Espera os jobs da fila, inclusive os disparados enquanto espera."""
+    app = app or current_app._get_current_object()
+    while True:
+        with _lock:
+            pending = list(_futures(app, queue_name))
+        if not pending:
+            return
+        for future in pending:
+            future.result(timeout=timeout)
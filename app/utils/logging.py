@@ -1,33 +1,179 @@
-import os
-import json
+"""
+Logging estruturado e não bloqueante.
+
+As threads de requisição apenas enfileiram os registros (``QueueHandler``);
+a formatação JSON e a escrita em arquivo/console acontecem numa thread
+própria (``QueueListener``). Os handlers ficam só no logger raiz, de modo que
+cada linha é emitida uma única vez, e registros DEBUG/INFO podem ser
+amostrados em rotas de alto volume.
+"""
+
 import logging
-from logging.handlers import RotatingFileHandler
+import os
+import queue
+import random
+import sys
+import threading
+from logging.handlers import QueueHandler, QueueListener, RotatingFileHandler
 from pythonjsonlogger import jsonlogger
+from .tracing import RequestIdFilter
+
+try:
+    import fcntl
+except ImportError:  # Windows: sem lock entre processos
+    fcntl = None
+
+logger = logging.getLogger('app')
+
+_state = {'listener': None, 'handler': None, 'handlers': (), 'queue_size': 10000}
+_state_lock = threading.Lock()
+
+
+class StructuredFormatter(jsonlogger.JsonFormatter):
+    """Formatter JSON com os campos padrão do projeto."""
+
+    def add_fields(self, log_record, record, message_dict):
+        super().add_fields(log_record, record, message_dict)
+        log_record.update({
+            "timestamp": record.created,
+            "level": record.levelname,
+            "module": record.module,
+            "function": record.funcName,
+            "line": record.lineno
+        })
+
+
+class SamplingFilter(logging.Filter):
+    """
+    Mantém apenas uma fração dos registros abaixo de WARNING.
+    ``rates`` mapeia o nível para a fração mantida (0.0 a 1.0).
+    """
+
+    def __init__(self, rates):
+        super().__init__()
+        self.rates = rates
+
+    def filter(self, record):
+        if record.levelno >= logging.WARNING:
+            return True
+        rate = self.rates.get(record.levelno, 1.0)
+        return rate >= 1.0 or random.random() < rate
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """Enfileira sem bloquear; descarta (e conta) quando a fila está cheia."""
+
+    dropped = 0
+
+    def prepare(self, record):
+        # Fila em processo: basta resolver a mensagem. A formatação JSON e a
+        # do traceback ficam para a thread do listener.
+        record.msg = record.getMessage()
+        record.args = None
+        return record
+
+    def enqueue(self, record):
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            NonBlockingQueueHandler.dropped += 1
+
+
+class SafeRotatingFileHandler(RotatingFileHandler):
+    """
+    ``RotatingFileHandler`` seguro com vários workers gravando no mesmo
+    arquivo: a escrita e a rotação acontecem sob um lock de arquivo, e o
+    arquivo é reaberto quando outro processo já fez a rotação.
+    """
+
+    def __init__(self, filename, *args, **kwargs):
+        super().__init__(filename, *args, **kwargs)
+        self._lock_file = open(self.baseFilename + '.lock', 'a') if fcntl else None
+
+    def reopen_lock(self):
+        """Abre um novo descritor de lock: o flock herdado no fork seria compartilhado."""
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = open(self.baseFilename + '.lock', 'a')
+
+    def _reopen_if_rotated(self):
+        if self.stream is None:
+            return
+        try:
+            current = os.stat(self.baseFilename).st_ino
+        except FileNotFoundError:
+            current = None
+        if current != os.fstat(self.stream.fileno()).st_ino:
+            self.stream.close()
+            self.stream = self._open()
+
+    def emit(self, record):
+        if self._lock_file is None:
+            return super().emit(record)
+        fcntl.flock(self._lock_file, fcntl.LOCK_EX)
+        try:
+            self._reopen_if_rotated()
+            super().emit(record)
+        finally:
+            fcntl.flock(self._lock_file, fcntl.LOCK_UN)
+
+    def close(self):
+        super().close()
+        if self._lock_file is not None:
+            self._lock_file.close()
+            self._lock_file = None
+
+
+def _start_listener():
+    """(Re)cria fila, handler de fila e listener com os handlers atuais."""
+    log_queue = queue.Queue(maxsize=_state['queue_size'])
+    listener = QueueListener(log_queue, *_state['handlers'], respect_handler_level=True)
+    listener.start()
+
+    handler = _state['handler']
+    if handler is not None:
+        handler.queue = log_queue
+    _state['listener'] = listener
+
+
+def _after_fork_in_child():
+    # A thread do listener não sobrevive ao fork (preload do gunicorn)
+    if _state['listener'] is not None:
+        for handler in _state['handlers']:
+            if isinstance(handler, SafeRotatingFileHandler):
+                handler.reopen_lock()
+        _state['listener'] = None
+        _start_listener()
+
+
+if hasattr(os, 'register_at_fork'):
+    os.register_at_fork(after_in_child=_after_fork_in_child)
+
+
+def shutdown_logging():
+    """Esvazia a fila e encerra o listener (chamado na saída do processo)."""
+    with _state_lock:
+        listener = _state['listener']
+        if listener is not None:
+            listener.stop()
+            _state['listener'] = None
+        for handler in _state['handlers']:
+            handler.close()
+
 
 def setup_logging(app):
-    # Criar diretório de logs se não existir
-    if not os.path.exists('logs'):
-        os.makedirs('logs')
-
-    class StructuredFormatter(jsonlogger.JsonFormatter):
-        def add_fields(self, log_record, record, message_dict):
-            super().add_fields(log_record, record, message_dict)
-            log_record.update({
-                "timestamp": record.created,
-                "level": record.levelname,
-                "module": record.module,
-                "function": record.funcName,
-                "line": record.lineno
-            })
-    
-    # Configurar formato do log
-    formatter = jsonlogger.JsonFormatter(
-        '%(asctime)s %(levelname)s %(name)s %(threadName)s %(message)s'
+    """Configura o pipeline de logging; pode ser chamada mais de uma vez."""
+    log_dir = app.config.get('LOG_DIR', 'logs')
+    os.makedirs(log_dir, exist_ok=True)
+    level = getattr(logging, str(app.config.get('LOG_LEVEL', 'INFO')).upper(), logging.INFO)
+
+    formatter = StructuredFormatter(
+        '%(asctime)s %(levelname)s %(name)s %(threadName)s %(request_id)s %(message)s'
     )
 
     # Handler para arquivo
-    file_handler = RotatingFileHandler(
-        'logs/app.log',
+    file_handler = SafeRotatingFileHandler(
+        os.path.join(log_dir, 'app.log'),
         maxBytes=10485760,  # 10MB
         backupCount=10
     )
@@ -35,17 +181,41 @@ def setup_logging(app):
     file_handler.setLevel(logging.INFO)
 
     # Handler para console
-    console_handler = logging.StreamHandler()
+    console_handler = logging.StreamHandler(sys.stdout)
     console_handler.setFormatter(formatter)
     console_handler.setLevel(logging.DEBUG)
 
-    # Configurar logger raiz
     root_logger = logging.getLogger()
-    root_logger.setLevel(logging.INFO)
-    root_logger.addHandler(file_handler)
-    root_logger.addHandler(console_handler)
-
-    # Logging específico do Flask
-    app.logger.setLevel(logging.INFO)
-    app.logger.addHandler(file_handler)
-    app.logger.addHandler(console_handler)
\ No newline at end of file
+    with _state_lock:
+        if _state['listener'] is not None:
+            _state['listener'].stop()
+        for handler in _state['handlers']:
+            handler.close()
+        if _state['handler'] is not None:
+            root_logger.removeHandler(_state['handler'])
+
+        queue_handler = NonBlockingQueueHandler(queue.Queue())
+        # Lido na thread da requisição, antes de o registro entrar na fila
+        queue_handler.addFilter(RequestIdFilter())
+        queue_handler.addFilter(SamplingFilter({
+            logging.DEBUG: app.config.get('LOG_SAMPLE_DEBUG', 1.0),
+            logging.INFO: app.config.get('LOG_SAMPLE_INFO', 1.0),
+        }))
+
+        _state['handlers'] = (file_handler, console_handler)
+        _state['handler'] = queue_handler
+        _state['queue_size'] = app.config.get('LOG_QUEUE_SIZE', 10000)
+        _start_listener()
+
+    # Um único ponto de saída: o app.logger propaga para o raiz
+    root_logger.setLevel(level)
+    root_logger.addHandler(queue_handler)
+    app.logger.setLevel(level)
+    for handler in list(app.logger.handlers):
+        app.logger.removeHandler(handler)
+    app.logger.propagate = True
+
+    if not _state.get('atexit'):
+        import atexit
+        atexit.register(shutdown_logging)
+        _state['atexit'] = True
@@ -0,0 +1,183 @@
+"""
+Métricas Prometheus da aplicação.
+
+Sob o Gunicorn, ``PROMETHEUS_MULTIPROC_DIR`` (definido em gunicorn.conf.py)
+faz cada worker gravar seus valores em arquivos mapeados em memória; o
+``/metrics`` de qualquer worker agrega todos eles. Fora do Gunicorn usa-se
+o registro padrão, em processo.
+
+Para manter o custo por requisição em poucos microssegundos, os filhos
+rotulados de cada métrica ficam em cache e nenhum trabalho é feito além de
+somar contadores.
+"""
+
+import os
+import time
+from flask import Blueprint, Response, request, current_app
+from prometheus_client import (Counter, Gauge, Histogram, CollectorRegistry,
+                               CONTENT_TYPE_LATEST, REGISTRY, generate_latest)
+from prometheus_client import multiprocess
+from sqlalchemy import event
+from werkzeug.wsgi import ClosingIterator
+
+REQUEST_LATENCY = Histogram(
+    'http_request_duration_seconds', 'Latência das requisições por endpoint',
+    ['endpoint', 'method'],
+    buckets=(0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+)
+REQUEST_COUNT = Counter(
+    'http_requests_total', 'Requisições por endpoint e status',
+    ['endpoint', 'method', 'status']
+)
+IN_FLIGHT = Gauge(
+    'http_requests_in_flight', 'Requisições em andamento', multiprocess_mode='livesum'
+)
+DB_POOL_CHECKOUTS = Counter(
+    'db_pool_checkouts_total', 'Conexões retiradas do pool do SQLAlchemy'
+)
+DB_POOL_CHECKED_OUT = Gauge(
+    'db_pool_checked_out', 'Conexões do pool em uso', multiprocess_mode='livesum'
+)
+DB_POOL_OVERFLOW = Gauge(
+    'db_pool_overflow', 'Conexões abertas além do tamanho do pool', multiprocess_mode='livesum'
+)
+CACHE_REQUESTS = Counter(
+    'cache_requests_total', 'Consultas a caches por resultado (hit/miss)',
+    ['cache', 'result']
+)
+JOB_QUEUE_DEPTH = Gauge(
+    'job_queue_depth', 'Jobs aguardando ou em execução por fila',
+    ['queue'], multiprocess_mode='livesum'
+)
+
+_request_children = {}
+_count_children = {}
+
+metrics = Blueprint('metrics', __name__)
+
+
+def record_cache(cache, hit):
+    """Registra um acesso a cache; a taxa de acerto sai de hit / (hit + miss)."""
+    CACHE_REQUESTS.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+def track_job(queue_name, future):
+    """Conta o job na profundidade da fila até o ``Future`` terminar."""
+    gauge = JOB_QUEUE_DEPTH.labels(queue_name)
+    gauge.inc()
+    future.add_done_callback(lambda _: gauge.dec())
+    return future
+
+
+ENDPOINT_KEY = 'equidade.endpoint'
+
+
+def _mark_endpoint():
+    # O Flask limpa a referência ao Request ao fim da requisição; guardamos só o nome
+    req = request._get_current_object()
+    req.environ[ENDPOINT_KEY] = req.endpoint
+
+
+class MetricsMiddleware:
+    """
+    Mede cada requisição na camada WSGI. O único custo dentro do Flask é o
+    hook que anota o endpoint no environ (ver ``_mark_endpoint``).
+
+    A medição termina no ``close()`` do corpo, não no retorno da aplicação:
+    o ``start_response`` da compressão só é chamado quando o corpo começa a
+    ser lido, e exportações em streaming passam quase todo o tempo ali.
+    """
+
+    def __init__(self, app):
+        self.app = app
+
+    def __call__(self, environ, start_response):
+        start = time.perf_counter()
+        status = ['500']
+
+        def _start_response(status_line, headers, exc_info=None):
+            status[0] = status_line[:3]
+            return start_response(status_line, headers, exc_info)
+
+        def _finish():
+            IN_FLIGHT.dec()
+            self.record(environ, status[0], time.perf_counter() - start)
+
+        IN_FLIGHT.inc()
+        try:
+            app_iter = self.app(environ, _start_response)
+        except BaseException:
+            _finish()
+            raise
+        return ClosingIterator(app_iter, _finish)
+
+    @staticmethod
+    def record(environ, status, elapsed):
+        endpoint = environ.get(ENDPOINT_KEY) or 'unmatched'
+        method = environ.get('REQUEST_METHOD', 'GET')
+
+        key = (endpoint, method)
+        histogram = _request_children.get(key)
+        if histogram is None:
+            histogram = _request_children[key] = REQUEST_LATENCY.labels(endpoint, method)
+        histogram.observe(elapsed)
+
+        key = (endpoint, method, status)
+        counter = _count_children.get(key)
+        if counter is None:
+            counter = _count_children[key] = REQUEST_COUNT.labels(endpoint, method, status)
+        counter.inc()
+
+
+def _on_checkout(dbapi_connection, connection_record, connection_proxy):
+    DB_POOL_CHECKOUTS.inc()
+    DB_POOL_CHECKED_OUT.inc()
+    overflow = getattr(connection_proxy._pool, 'overflow', None)
+    if overflow is not None:
+        DB_POOL_OVERFLOW.set(max(overflow(), 0))
+
+
+def _on_checkin(dbapi_connection, connection_record):
+    DB_POOL_CHECKED_OUT.dec()
+
+
+def instrument_engine(engine):
+    """
+    Liga os eventos do pool de conexões às métricas. Os eventos ficam no
+    engine para sobreviver ao ``dispose()`` feito após o fork.
+    """
+    if not event.contains(engine, 'checkout', _on_checkout):
+        event.listen(engine, 'checkout', _on_checkout)
+        event.listen(engine, 'checkin', _on_checkin)
+
+
+@metrics.route('/metrics')
+def export():
+    """Exposição no formato texto do Prometheus, agregada entre workers."""
+    token = current_app.config.get('METRICS_TOKEN')
+    if token and request.headers.get('Authorization') != f'Bearer {token}':
+        return Response('Não autorizado', status=401)
+
+    if os.environ.get('PROMETHEUS_MULTIPROC_DIR'):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return Response(generate_latest(registry), mimetype=CONTENT_TYPE_LATEST)
+
+
+def init_app(app):
+    """Registra a coleta por requisição e o endpoint ``/metrics``."""
+    from .. import db, limiter, talisman
+
+    # Primeiro hook: roda mesmo quando outro before_request encerra a requisição
+    app.before_request_funcs.setdefault(None, []).insert(0, _mark_endpoint)
+    app.wsgi_app = MetricsMiddleware(app.wsgi_app)
+
+    talisman(force_https=False)(export)
+    limiter.exempt(metrics)
+    app.register_blueprint(metrics)
+
+    with app.app_context():
+        for engine in db.engines.values():
+            instrument_engine(engine)
@@ -0,0 +1,203 @@
+"""
+Profiler por amostragem de pilha, ativado por requisição.
+
+Um administrador obtém um token assinado (``/auth/admin/profile-token``) e o
+envia no cabeçalho ``X-Profile`` (nunca na URL, que vai para logs e
+histórico). O token só vale nas requisições do próprio admin: antes da view
+o usuário logado e o papel de administrador são conferidos, e o perfil é
+descartado se não baterem. Além disso, uma fração do tráfego
+(``PROFILE_SAMPLE_RATE``) é perfilada ao acaso.
+Enquanto a requisição roda, uma thread lê a pilha da thread da requisição a
+cada ``PROFILE_INTERVAL_MS`` e conta as pilhas no formato "collapsed" (o
+mesmo do ``flamegraph.pl``/speedscope), gravado em
+``PROFILE_DIR/<endpoint>/<timestamp>-<request_id>.folded``.
+"""
+
+import os
+import random
+import sys
+import threading
+import time
+from collections import Counter
+from flask import request
+from flask_login import current_user
+from itsdangerous import BadSignature, URLSafeTimedSerializer
+from .metrics import ENDPOINT_KEY
+from .tracing import current_request_id
+
+TOKEN_SALT = 'equidade-profile'
+
+# Estado do profiling da requisição no environ: dono do token e sampler
+ENVIRON_KEY = 'equidade.profile'
+
+_ROOTS = sorted({os.path.dirname(p) for p in sys.path if p}, key=len, reverse=True)
+_labels = {}
+
+
+def _label(code):
+    """Nome do frame: caminho relativo ao sys.path + função."""
+    label = _labels.get(code)
+    if label is None:
+        filename = code.co_filename
+        for root in _ROOTS:
+            if filename.startswith(root + os.sep):
+                filename = filename[len(root) + 1:]
+                break
+        label = f'{filename}:{code.co_name}'.replace(';', ':').replace(' ', '_')
+        _labels[code] = label
+    return label
+
+
+def collapse(frame):
+    """Converte a pilha (raiz primeiro) numa linha "collapsed"."""
+    names = []
+    while frame is not None:
+        names.append(_label(frame.f_code))
+        frame = frame.f_back
+    names.reverse()
+    return ';'.join(names)
+
+
+class StackSampler(threading.Thread):
+    """Amostra periodicamente a pilha de uma thread até ``stop()``."""
+
+    def __init__(self, thread_id, interval=0.005):
+        super().__init__(name='stack-sampler', daemon=True)
+        self.thread_id = thread_id
+        self.interval = interval
+        self.stacks = Counter()
+        self._done = threading.Event()
+
+    def run(self):
+        current_frames = sys._current_frames
+        while not self._done.wait(self.interval):
+            frame = current_frames().get(self.thread_id)
+            if frame is None:
+                break
+            self.stacks[collapse(frame)] += 1
+
+    def stop(self):
+        self._done.set()
+        self.join()
+        return self.stacks
+
+
+def make_token(secret_key, user_id):
+    """Token assinado que habilita o profiling das requisições de um admin."""
+    return URLSafeTimedSerializer(secret_key, salt=TOKEN_SALT).dumps({'uid': user_id})
+
+
+def write_profile(directory, endpoint, request_id, stacks):
+    """Grava as pilhas no formato collapsed; retorna o caminho do arquivo."""
+    folder = os.path.join(directory, endpoint or 'unmatched')
+    os.makedirs(folder, exist_ok=True)
+    path = os.path.join(folder, f'{int(time.time())}-{request_id}.folded')
+    with open(path, 'w') as profile_file:
+        for stack, count in stacks.most_common():
+            profile_file.write(f'{stack} {count}\n')
+    return path
+
+
+def load_profiles(directory, endpoint=None):
+    """Soma as pilhas gravadas por endpoint: ``{endpoint: (perfis, Counter)}``."""
+    result = {}
+    if not os.path.isdir(directory):
+        return result
+    for name in sorted(os.listdir(directory)):
+        folder = os.path.join(directory, name)
+        if not os.path.isdir(folder) or (endpoint and name != endpoint):
+            continue
+        stacks = Counter()
+        files = [f for f in os.listdir(folder) if f.endswith('.folded')]
+        for filename in files:
+            with open(os.path.join(folder, filename)) as profile_file:
+                for line in profile_file:
+                    stack, _, count = line.rstrip('\n').rpartition(' ')
+                    if stack and count.isdigit():
+                        stacks[stack] += int(count)
+        if files:
+            result[name] = (len(files), stacks)
+    return result
+
+
+def hotspots(stacks, top=15):
+    """
+    Frames mais custosos: ``(frame, amostras próprias, amostras inclusivas)``,
+    ordenados pelo tempo próprio (o frame estava no topo da pilha).
+    """
+    own = Counter()
+    inclusive = Counter()
+    for stack, count in stacks.items():
+        frames = stack.split(';')
+        own[frames[-1]] += count
+        for frame in set(frames):
+            inclusive[frame] += count
+    return [(frame, count, inclusive[frame]) for frame, count in own.most_common(top)]
+
+
+class ProfilingMiddleware:
+    """Decide se a requisição será perfilada e grava o resultado ao final."""
+
+    def __init__(self, app, secret_key, directory, sample_rate=0.0,
+                 interval=0.005, max_age=3600):
+        self.app = app
+        self.serializer = URLSafeTimedSerializer(secret_key, salt=TOKEN_SALT)
+        self.directory = directory
+        self.sample_rate = sample_rate
+        self.interval = interval
+        self.max_age = max_age
+
+    def wants_profile(self, environ):
+        """
+        ``{'uid': id}`` para um token válido (o dono é conferido em
+        ``check_owner``), ``{'uid': None}`` pela amostragem ou ``None``.
+        """
+        token = environ.get('HTTP_X_PROFILE')
+        if token:
+            try:
+                return {'uid': self.serializer.loads(token, max_age=self.max_age)['uid']}
+            except (BadSignature, KeyError, TypeError):
+                return None
+        if self.sample_rate > 0 and random.random() < self.sample_rate:
+            return {'uid': None}
+        return None
+
+    def __call__(self, environ, start_response):
+        state = self.wants_profile(environ)
+        if state is None:
+            return self.app(environ, start_response)
+
+        sampler = state['sampler'] = StackSampler(threading.get_ident(), self.interval)
+        environ[ENVIRON_KEY] = state
+        sampler.start()
+        try:
+            return self.app(environ, start_response)
+        finally:
+            stacks = sampler.stop()
+            if stacks and (state['uid'] is None or state.get('allowed')):
+                write_profile(self.directory, environ.get(ENDPOINT_KEY),
+                              current_request_id() or 'sem-id', stacks)
+
+
+def check_owner():
+    """Antes da view: o token só vale para o admin que o emitiu, ainda admin."""
+    state = request.environ.get(ENVIRON_KEY)
+    if state is None or state['uid'] is None:
+        return
+    state['allowed'] = (current_user.is_authenticated and current_user.id == state['uid']
+                        and current_user.is_admin())
+    if not state['allowed']:
+        state['sampler'].stop()
+
+
+def init_app(app):
+    """Instala o middleware (por dentro do tracing, que fornece o request id)."""
+    app.before_request(check_owner)
+    app.wsgi_app = ProfilingMiddleware(
+        app.wsgi_app,
+        app.config['SECRET_KEY'],
+        app.config['PROFILE_DIR'],
+        sample_rate=app.config['PROFILE_SAMPLE_RATE'],
+        interval=app.config['PROFILE_INTERVAL_MS'] / 1000.0,
+        max_age=app.config['PROFILE_TOKEN_MAX_AGE']
+    )
@@ -0,0 +1,147 @@
+"""
+Markdown renderizado na gravação.
+
+Cada campo registrado (``<campo>``) ganha duas colunas ao lado:
+``<campo>_html``, o HTML já sanitizado, e ``<campo>_html_version``, a
+``SANITIZER_VERSION`` com que foi gerado. O HTML é refeito no flush só
+quando o texto muda, e as páginas exibem a coluna pronta (filtro
+``rendered``) sem passar de novo pelo markdown e pelo bleach.
+
+Quando ``ALLOWED_TAGS``/``ALLOWED_ATTRIBUTES`` mudam, a versão muda e o
+``flask rerender-markdown`` refaz só as linhas com versão antiga, em lotes
+renderizados em paralelo por processos.
+"""
+
+import os
+from concurrent.futures import ProcessPoolExecutor
+from markupsafe import Markup
+from sqlalchemy import event, inspect, text
+from security import sanitization
+
+RERENDER_BATCH_SIZE = 500
+
+_fields = []
+
+
+def register_rendered(model, source):
+    """Mantém ``<source>_html`` e ``<source>_html_version`` do modelo em dia."""
+    if (model, source) in _fields:
+        return
+    _fields.append((model, source))
+    event.listen(model, 'before_insert', _render_before_insert)
+    event.listen(model, 'before_update', _render_before_update)
+
+
+def _sources(target):
+    return [source for model, source in _fields if isinstance(target, model)]
+
+
+def _store(target, source):
+    value = getattr(target, source)
+    setattr(target, f'{source}_html', sanitization.cached_markdown(value) if value else None)
+    setattr(target, f'{source}_html_version', sanitization.SANITIZER_VERSION if value else None)
+
+
+def _render_before_insert(mapper, connection, target):
+    for source in _sources(target):
+        _store(target, source)
+
+
+def _render_before_update(mapper, connection, target):
+    state = inspect(target)
+    for source in _sources(target):
+        if state.attrs[source].history.has_changes():
+            _store(target, source)
+
+
+def rendered(obj, source='notes'):
+    """HTML gravado do campo; renderiza (com cache) se estiver velho ou ausente."""
+    html = getattr(obj, f'{source}_html', None)
+    if html is not None and getattr(obj, f'{source}_html_version', None) == \
+            sanitization.SANITIZER_VERSION:
+        return Markup(html)
+    return sanitization.safe_markdown(getattr(obj, source) or '')
+
+
+def _stale_rows(connection, table, source, after_id, batch_size, force):
+    stale = '' if force else f'AND ({source}_html_version IS NULL OR {source}_html_version != :version)'
+    return connection.execute(text(f"""
+        SELECT id, {source} FROM {table}
+        WHERE id > :after_id AND {source} IS NOT NULL {stale}
+        ORDER BY id LIMIT :limit
+    """), {'after_id': after_id, 'version': sanitization.SANITIZER_VERSION,
+           'limit': batch_size}).all()
+
+
+def _write_batch(connection, table, source, rows, html):
+    # Só grava se o texto não mudou desde a leitura; quem editou já renderizou
+    connection.execute(text(f"""
+        UPDATE {table} SET {source}_html = :html, {source}_html_version = :version
+        WHERE id = :id AND {source} = :source
+    """), [{'id': row_id, 'source': value, 'html': rendered_html,
+            'version': sanitization.SANITIZER_VERSION}
+           for (row_id, value), rendered_html in zip(rows, html)])
+
+
+def rerender(connection, batch_size=RERENDER_BATCH_SIZE, workers=None, force=False):
+    """
+    Refaz o HTML gravado com versão diferente da atual (todas com ``force``).
+    Os lotes são lidos por chave e renderizados em ``workers`` processos
+    (``0`` renderiza no processo atual); no máximo ``2 * workers`` lotes
+    ficam em memória. Cada lote é gravado numa transação própria, para não
+    prender a tabela durante a reconstrução. Devolve ``{tabela.campo: linhas}``.
+    """
+    counts = {}
+    if workers is None:
+        workers = os.cpu_count() or 1
+    executor = ProcessPoolExecutor(max_workers=workers) if workers else None
+    try:
+        for model, source in _fields:
+            table = model.__tablename__
+            counts[f'{table}.{source}'] = _rerender_field(
+                connection, executor, table, source, batch_size, force,
+                in_flight=2 * max(workers, 1))
+    finally:
+        if executor:
+            executor.shutdown()
+    return counts
+
+
+def _rerender_field(connection, executor, table, source, batch_size, force, in_flight):
+    from .metrics import track_job
+
+    done, after_id, pending = 0, 0, []
+
+    def drain(limit):
+        nonlocal done
+        while len(pending) > limit:
+            rows, html = pending.pop(0)
+            _write_batch(connection, table, source, rows,
+                         html.result() if executor else html)
+            connection.commit()
+            done += len(rows)
+
+    while True:
+        rows = _stale_rows(connection, table, source, after_id, batch_size, force)
+        if not rows:
+            break
+        after_id = rows[-1][0]
+        texts = [value for _, value in rows]
+        if executor:
+            html = track_job('markdown', executor.submit(sanitization.render_batch, texts))
+        else:
+            html = sanitization.render_batch(texts)
+        pending.append((rows, html))
+        drain(in_flight - 1)
+    drain(0)
+    return done
+
+
+def init_app(app):
+    """Registra os campos renderizados e os filtros de template."""
+    from ..models import Appointment, AppointmentSeries
+
+    register_rendered(Appointment, 'notes')
+    register_rendered(AppointmentSeries, 'notes')
+    app.add_template_filter(sanitization.safe_markdown, 'markdown')
+    app.add_template_filter(rendered, 'rendered')
@@ -0,0 +1,345 @@
+"""
+Tracing leve por requisição, sem coletor externo.
+
+Cada requisição recebe um id (``X-Request-ID``, aceito do proxy ou gerado) e
+um trace com spans por fase: abertura/gravação da sessão, carregamento do
+usuário, validação de formulários, consultas SQL e renderização Jinja. O id
+vai para todas as linhas de log. Traces amostrados (ou lentos) são gravados
+em ``logs/traces.jsonl`` no formato JSON do OTLP, uma requisição por linha,
+prontos para importar em qualquer ferramenta compatível com OpenTelemetry.
+"""
+
+import contextvars
+import functools
+import json
+import logging
+import os
+import queue
+import random
+import re
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from flask import before_render_template, template_rendered
+from sqlalchemy import event
+from .metrics import ENDPOINT_KEY, _mark_endpoint
+
+_current = contextvars.ContextVar('equidade_trace', default=None)
+_REQUEST_ID_RE = re.compile(r'^[A-Za-z0-9._-]{8,64}$')
+
+
+class Trace:
+    """Spans de uma requisição, com pilha para determinar o span pai."""
+
+    __slots__ = ('trace_id', 'request_id', 'spans', 'stack')
+
+    def __init__(self, request_id):
+        self.trace_id = uuid.uuid4().hex
+        self.request_id = request_id
+        self.spans = []
+        self.stack = []
+
+    def start(self, name, attributes=None):
+        span = {
+            'spanId': os.urandom(8).hex(),
+            'parentSpanId': self.stack[-1]['spanId'] if self.stack else '',
+            'name': name,
+            'start': time.time_ns(),
+            'attributes': attributes or {},
+        }
+        self.stack.append(span)
+        return span
+
+    def end(self, span):
+        span['end'] = time.time_ns()
+        # Fecha também spans internos que ficaram abertos (ex.: erro no SQL)
+        while self.stack:
+            top = self.stack.pop()
+            top.setdefault('end', span['end'])
+            self.spans.append(top)
+            if top is span:
+                break
+
+
+def current_request_id():
+    """Id da requisição atual, ou ``None`` fora de uma requisição."""
+    trace = _current.get()
+    return trace.request_id if trace is not None else None
+
+
+@contextmanager
+def span(name, **attributes):
+    """Mede o bloco como um span do trace atual (no-op fora de requisição)."""
+    trace = _current.get()
+    if trace is None:
+        yield None
+        return
+    current = trace.start(name, attributes)
+    try:
+        yield current
+    finally:
+        trace.end(current)
+
+
+def traced(name):
+    """Decorator que registra cada chamada da função como um span."""
+    def decorator(f):
+        @functools.wraps(f)
+        def decorated_function(*args, **kwargs):
+            with span(name):
+                return f(*args, **kwargs)
+        return decorated_function
+    return decorator
+
+
+class RequestIdFilter(logging.Filter):
+    """Acrescenta ``request_id`` a todos os registros de log."""
+
+    def filter(self, record):
+        record.request_id = current_request_id() or '-'
+        return True
+
+
+def _attribute(key, value):
+    if isinstance(value, bool):
+        return {'key': key, 'value': {'boolValue': value}}
+    if isinstance(value, int):
+        return {'key': key, 'value': {'intValue': str(value)}}
+    return {'key': key, 'value': {'stringValue': str(value)}}
+
+
+def to_otlp(trace, service_name='equidade'):
+    """Converte o trace no JSON de ``ExportTraceServiceRequest`` do OTLP."""
+    spans = []
+    for item in trace.spans:
+        spans.append({
+            'traceId': trace.trace_id,
+            'spanId': item['spanId'],
+            'parentSpanId': item['parentSpanId'],
+            'name': item['name'],
+            'kind': 2 if not item['parentSpanId'] else 1,  # SERVER / INTERNAL
+            'startTimeUnixNano': str(item['start']),
+            'endTimeUnixNano': str(item['end']),
+            'attributes': [_attribute(k, v) for k, v in item['attributes'].items()],
+        })
+    return {'resourceSpans': [{
+        'resource': {'attributes': [_attribute('service.name', service_name)]},
+        'scopeSpans': [{'scope': {'name': 'app.utils.tracing'}, 'spans': spans}],
+    }]}
+
+
+class FileExporter:
+    """Grava traces em JSON lines numa thread própria (uma por processo)."""
+
+    def __init__(self, path, service_name='equidade', queue_size=1000):
+        self.path = path
+        self.service_name = service_name
+        self.queue = queue.Queue(maxsize=queue_size)
+        self._pid = None
+        self._lock = threading.Lock()
+
+    def _ensure_thread(self):
+        if self._pid == os.getpid():
+            return
+        with self._lock:
+            if self._pid != os.getpid():
+                self.queue = queue.Queue(maxsize=self.queue.maxsize)
+                threading.Thread(target=self._run, name='trace-exporter', daemon=True).start()
+                self._pid = os.getpid()
+
+    def export(self, trace):
+        self._ensure_thread()
+        try:
+            self.queue.put_nowait(trace)
+        except queue.Full:
+            pass
+
+    def flush(self):
+        """Aguarda a gravação de tudo que já foi enfileirado."""
+        if self._pid == os.getpid():
+            self.queue.join()
+
+    def _run(self):
+        os.makedirs(os.path.dirname(self.path) or '.', exist_ok=True)
+        fd = os.open(self.path, os.O_WRONLY | os.O_CREAT | os.O_APPEND, 0o644)
+        log_queue = self.queue
+        while True:
+            trace = log_queue.get()
+            try:
+                # Uma linha por write com O_APPEND: workers não intercalam linhas
+                line = json.dumps(to_otlp(trace, self.service_name)) + '\n'
+                os.write(fd, line.encode('utf-8'))
+            except Exception:
+                pass
+            finally:
+                log_queue.task_done()
+
+
+class TracingMiddleware:
+    """
+    Abre o trace da requisição antes do Flask (inclui a abertura da sessão)
+    e o fecha no ``close()`` do corpo (ver ``_TracedBody``).
+    """
+
+    def __init__(self, app, exporter, sample_rate=0.01, slow_ms=500):
+        self.app = app
+        self.exporter = exporter
+        self.sample_rate = sample_rate
+        self.slow_ns = slow_ms * 1000000
+
+    def __call__(self, environ, start_response):
+        request_id = environ.get('HTTP_X_REQUEST_ID', '')
+        if not _REQUEST_ID_RE.match(request_id):
+            request_id = uuid.uuid4().hex
+
+        trace = Trace(request_id)
+        method = environ.get('REQUEST_METHOD', 'GET')
+        root = trace.start(method, {
+            'http.method': method,
+            'http.target': environ.get('PATH_INFO', '/'),
+            'request.id': request_id,
+        })
+        token = _current.set(trace)
+        status = ['500']
+
+        def _start_response(status_line, headers, exc_info=None):
+            status[0] = status_line[:3]
+            headers.append(('X-Request-ID', request_id))
+            return start_response(status_line, headers, exc_info)
+
+        def _finish():
+            endpoint = environ.get(ENDPOINT_KEY)
+            if endpoint:
+                root['name'] = f'{method} {endpoint}'
+            root['attributes']['http.status_code'] = int(status[0])
+            trace.end(root)
+
+            slow = root['end'] - root['start'] >= self.slow_ns
+            if slow or random.random() < self.sample_rate:
+                self.exporter.export(trace)
+
+        try:
+            app_iter = self.app(environ, _start_response)
+        except BaseException:
+            _finish()
+            raise
+        finally:
+            _current.reset(token)
+        return _TracedBody(app_iter, trace, _finish)
+
+
+class _TracedBody:
+    """
+    Corpo da resposta com o trace ativo enquanto é lido e fechado: o status
+    final só é definido quando a compressão começa a ler o corpo, e logs e
+    consultas de exportações em streaming continuam na mesma requisição.
+    O contexto é restaurado a cada bloco, então um corpo que o servidor não
+    chegue a fechar não deixa o trace preso na thread.
+    """
+
+    def __init__(self, app_iter, trace, finish):
+        self.app_iter = app_iter
+        self.trace = trace
+        self.finish = finish
+        self._iterator = None
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        token = _current.set(self.trace)
+        try:
+            if self._iterator is None:
+                self._iterator = iter(self.app_iter)
+            return next(self._iterator)
+        finally:
+            _current.reset(token)
+
+    def close(self):
+        token = _current.set(self.trace)
+        try:
+            close = getattr(self.app_iter, 'close', None)
+            if close is not None:
+                close()
+        finally:
+            _current.reset(token)
+            self.finish()
+
+
+class TracedSessionInterface:
+    """Envolve a interface de sessão registrando abertura e gravação como spans."""
+
+    def __init__(self, inner):
+        self.inner = inner
+
+    def __getattr__(self, name):
+        return getattr(self.inner, name)
+
+    def open_session(self, app, request):
+        with span('session.open'):
+            return self.inner.open_session(app, request)
+
+    def save_session(self, app, session, response):
+        with span('session.save'):
+            return self.inner.save_session(app, session, response)
+
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    trace = _current.get()
+    if trace is not None and context is not None:
+        context._trace_span = trace.start('db.query', {
+            'db.system': conn.dialect.name,
+            'db.statement': statement[:500],
+        })
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany):
+    current = getattr(context, '_trace_span', None)
+    trace = _current.get()
+    if current is not None and trace is not None:
+        trace.end(current)
+
+
+def _before_render(sender, template, context, **extra):
+    trace = _current.get()
+    if trace is not None:
+        trace.start('template.render', {'template': template.name or '<string>'})
+
+
+def _template_rendered(sender, template, context, **extra):
+    trace = _current.get()
+    if trace is not None and trace.stack and trace.stack[-1]['name'] == 'template.render':
+        trace.end(trace.stack[-1])
+
+
+def init_app(app):
+    """Liga os pontos de instrumentação e instala o middleware."""
+    from .. import db
+
+    exporter = FileExporter(
+        app.config['TRACE_FILE'],
+        service_name=app.config.get('TRACE_SERVICE_NAME', 'equidade')
+    )
+    app.extensions['tracing'] = exporter
+
+    app.session_interface = TracedSessionInterface(app.session_interface)
+    before_render_template.connect(_before_render, app)
+    template_rendered.connect(_template_rendered, app)
+    with app.app_context():
+        for engine in db.engines.values():
+            if not event.contains(engine, 'before_cursor_execute', _before_cursor_execute):
+                event.listen(engine, 'before_cursor_execute', _before_cursor_execute)
+                event.listen(engine, 'after_cursor_execute', _after_cursor_execute)
+
+    # O endpoint dá nome ao span raiz; o hook é o mesmo das métricas
+    funcs = app.before_request_funcs.setdefault(None, [])
+    if _mark_endpoint not in funcs:
+        funcs.insert(0, _mark_endpoint)
+
+    app.wsgi_app = TracingMiddleware(
+        app.wsgi_app,
+        exporter,
+        sample_rate=app.config['TRACE_SAMPLE_RATE'],
+        slow_ms=app.config['TRACE_SLOW_MS']
+    )
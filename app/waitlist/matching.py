@@ -0,0 +1,233 @@
+"""
+Encaixes da fila de espera.
+
+Quando um atendimento futuro é cancelado (ou excluído), o horário liberado
+vai, depois do commit, para um job no executor compartilhado
+(``app.utils.concurrency``): ele busca os melhores pedidos da fila e
+registra as notificações (``app.notifications.hub.notify``) para quem
+cadastrou cada pedido, ou para o profissional. O cancelamento não espera
+pela busca.
+
+A busca (``find_candidates``) não percorre a fila: lê, pelos índices
+parciais de ``waitlist_window``, as janelas do profissional e as da
+especialidade dele naquele dia da semana que começam até o início do
+horário, e filtra o resto (fim da janela, duração, período e situação do
+pedido) nessas poucas linhas. A ordem é: pedidos para o próprio
+profissional antes dos pedidos pela especialidade, depois prioridade e
+ordem de chegada. Cada ramo e a união param em ``limit`` pedidos, então uma
+especialidade com fila longa não é lida inteira.
+"""
+
+import logging
+from collections import defaultdict
+from datetime import datetime, timedelta, timezone
+from flask import current_app
+from sqlalchemy import bindparam, event, inspect, text
+from sqlalchemy.orm import Session
+from .. import db
+from ..models import (Appointment, AppointmentStatus, Professional, WaitlistEntry,
+                      WaitlistStatus, WaitlistWindow)
+from ..scheduling.booking import find_conflict, to_utc
+from ..scheduling.series import clinic_timezone
+from ..utils import jobs
+
+logger = logging.getLogger(__name__)
+
+SESSION_KEY = 'waitlist_openings'
+JOB_QUEUE = 'waitlist'
+
+# DISTINCT: um pedido com mais de uma janela cobrindo o horário vem uma vez
+# só, e o LIMIT de cada ramo conta pedidos, não janelas
+_BRANCH = """
+    SELECT * FROM (
+    SELECT DISTINCT e.id AS entry_id, e.patient_id AS patient_id, p.name AS patient_name,
+           e.professional_id AS professional_id, e.specialty AS specialty,
+           e.priority AS priority, e.created_at AS created_at, e.created_by AS created_by,
+           e.duration_minutes AS duration_minutes, {rank} AS match_rank
+    FROM waitlist_window w
+    JOIN waitlist_entry e ON e.id = w.entry_id
+    JOIN patient p ON p.id = e.patient_id
+    WHERE {target} AND w.weekday = :weekday AND w.start_minute <= :minute
+      AND w.end_minute >= :minute + e.duration_minutes
+      AND e.duration_minutes <= :length AND e.status = 'WAITING' AND NOT p.is_deleted
+      AND (e.earliest_day IS NULL OR e.earliest_day <= :day)
+      AND (e.latest_day IS NULL OR e.latest_day >= :day)
+    ORDER BY priority DESC, created_at, entry_id
+    LIMIT :limit) AS {alias}
+"""
+
+CANDIDATES_SQL = text(
+    _BRANCH.format(rank=0, target='w.professional_id = :professional_id', alias='own')
+    + ' UNION ALL '
+    + _BRANCH.format(rank=1, target='w.professional_id IS NULL AND w.specialty = :specialty',
+                     alias='by_specialty')
+    + ' ORDER BY match_rank, priority DESC, created_at, entry_id LIMIT :limit'
+).bindparams(bindparam('day', type_=db.Date)).columns(created_at=db.DateTime(timezone=True))
+
+
+class InvalidEntry(ValueError):
+    """Pedido de encaixe incompleto ou inconsistente."""
+
+
+def _minutes(value):
+    return value.hour * 60 + value.minute
+
+
+def add_entry(patient_id, duration_minutes, windows, professional_id=None, specialty=None,
+              priority=0, earliest_day=None, latest_day=None, notes=None, created_by=None):
+    """
+    Põe o paciente na fila. ``windows`` são ``(dia da semana, início, fim)``
+    em minutos desde a meia-noite local (ex.: ``(0, 480, 720)``, segunda de
+    8h ao meio-dia).
+    """
+    if professional_id is None and not specialty:
+        raise InvalidEntry('Informe o profissional ou a especialidade.')
+    if not duration_minutes or duration_minutes <= 0:
+        raise InvalidEntry('Duração inválida.')
+    if not windows:
+        raise InvalidEntry('Informe ao menos uma janela de horário.')
+    if earliest_day and latest_day and latest_day < earliest_day:
+        raise InvalidEntry('Período inválido.')
+    rows = []
+    for weekday, start_minute, end_minute in windows:
+        if not (0 <= weekday <= 6 and 0 <= start_minute < end_minute <= 24 * 60):
+            raise InvalidEntry(f'Janela inválida: {(weekday, start_minute, end_minute)}')
+        if end_minute - start_minute < duration_minutes:
+            raise InvalidEntry('Janela menor que a duração do atendimento.')
+        rows.append(WaitlistWindow(professional_id=professional_id,
+                                   specialty=None if professional_id else specialty,
+                                   weekday=weekday, start_minute=start_minute,
+                                   end_minute=end_minute))
+    entry = WaitlistEntry(patient_id=patient_id, professional_id=professional_id,
+                          specialty=specialty, duration_minutes=duration_minutes,
+                          priority=priority, earliest_day=earliest_day, latest_day=latest_day,
+                          notes=notes, created_by=created_by, windows=rows)
+    db.session.add(entry)
+    db.session.commit()
+    return entry
+
+
+def close_entry(entry, status=WaitlistStatus.REMOVED):
+    """Tira o pedido da fila (encaixado ou desistência); as janelas são apagadas."""
+    entry.status = status
+    entry.windows = []
+    db.session.commit()
+    return entry
+
+
+def find_candidates(professional_id, starts_at, ends_at, limit=5, connection=None):
+    """
+    Melhores pedidos da fila para o horário ``[starts_at, ends_at)`` do
+    profissional, já na ordem de oferta.
+    """
+    tz = clinic_timezone()
+    local = to_utc(starts_at).astimezone(tz)
+    minute = _minutes(local)
+    length = min(int((to_utc(ends_at) - to_utc(starts_at)) // timedelta(minutes=1)),
+                 24 * 60 - minute)
+    connection = connection or db.session.connection()
+    specialty = connection.execute(text('SELECT specialty FROM professional WHERE id = :id'),
+                                   {'id': professional_id}).scalar()
+    return [row._asdict() for row in connection.execute(CANDIDATES_SQL, {
+        'professional_id': professional_id, 'specialty': specialty,
+        'weekday': local.weekday(), 'minute': minute, 'length': length,
+        'day': local.date(), 'limit': limit})]
+
+
+def _recipients(candidates, professional):
+    by_user = defaultdict(list)
+    for candidate in candidates:
+        user_id = candidate['created_by'] or (professional.user_id if professional else None)
+        if user_id is not None:
+            by_user[user_id].append(candidate)
+    return by_user
+
+
+def match_opening(appointment_id, professional_id, starts_at, ends_at):
+    """
+    Busca os pedidos para o horário liberado e registra as notificações.
+    Não faz nada se o horário já passou ou foi ocupado de novo. Devolve os
+    candidatos oferecidos.
+    """
+    from ..notifications.hub import notify
+
+    if to_utc(starts_at) <= datetime.now(timezone.utc):
+        return []
+    if find_conflict('professional', professional_id, starts_at, ends_at) is not None:
+        return []
+    candidates = find_candidates(professional_id, starts_at, ends_at,
+                                 limit=current_app.config['WAITLIST_CANDIDATES'])
+    if not candidates:
+        return []
+
+    professional = db.session.get(Professional, professional_id)
+    local = to_utc(starts_at).astimezone(clinic_timezone())
+    for user_id, offered in _recipients(candidates, professional).items():
+        notify(user_id, f'Horário liberado em {local:%d/%m %H:%M} com '
+                        f'{professional.name if professional else "o profissional"}: '
+                        f'{len(offered)} paciente(s) da fila de espera.',
+               kind='waitlist', appointment_id=appointment_id, professional_id=professional_id,
+               starts_at=to_utc(starts_at).isoformat(), ends_at=to_utc(ends_at).isoformat(),
+               candidates=[{'entry_id': c['entry_id'], 'patient_id': c['patient_id'],
+                            'patient_name': c['patient_name']} for c in offered])
+    (WaitlistEntry.query
+     .filter(WaitlistEntry.id.in_([c['entry_id'] for c in candidates]))
+     .update({'last_offered_at': datetime.now(timezone.utc)}, synchronize_session=False))
+    db.session.commit()
+    return candidates
+
+
+def _match_openings(app, openings):
+    with app.app_context():
+        for opening in openings:
+            try:
+                match_opening(*opening)
+            except Exception as e:
+                db.session.rollback()
+                logger.warning('Falha ao procurar encaixes para o atendimento %s: %s',
+                               opening[0], e)
+
+
+def enqueue(app, openings):
+    """Dispara a busca de encaixes em segundo plano e devolve o ``Future``."""
+    return jobs.submit(app, JOB_QUEUE, _match_openings, app, openings)
+
+
+def wait(app=None, timeout=None):
+    """Espera as buscas em andamento (testes e desligamento)."""
+    jobs.wait(JOB_QUEUE, app, timeout)
+
+
+def _freed(appointment):
+    """O atendimento ocupava o horário antes deste flush e não ocupa mais."""
+    state = inspect(appointment)
+    status, deleted = state.attrs.status.history, state.attrs.is_deleted.history
+    if not (status.has_changes() or deleted.has_changes()):
+        return False
+    previous_status = (status.deleted or status.unchanged or [None])[0]
+    previous_deleted = (deleted.deleted or deleted.unchanged or [False])[0]
+    was_active = previous_status != AppointmentStatus.CANCELLED and not previous_deleted
+    return was_active and not appointment.is_active
+
+
+def _opening(appointment):
+    return (appointment.id, appointment.professional_id, appointment.starts_at,
+            appointment.ends_at)
+
+
+def _collect_openings(session, flush_context):
+    """Anota na sessão os horários liberados neste flush."""
+    openings = session.info.setdefault(SESSION_KEY, [])
+    for appointment in session.dirty:
+        if isinstance(appointment, Appointment) and _freed(appointment):
+            openings.append(_opening(appointment))
+    for appointment in session.deleted:
+        if isinstance(appointment, Appointment) and appointment.is_active:
+            openings.append(_opening(appointment))
+
+
+def init_app(app):
+    """Registra a busca de encaixes após o commit de cancelamentos."""
+    if not event.contains(Session, 'after_flush', _collect_openings):
+        event.listen(Session, 'after_flush', _collect_openings)
+    jobs.on_commit(SESSION_KEY, enqueue)
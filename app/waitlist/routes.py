@@ -0,0 +1,111 @@
+"""
+Fila de espera: cadastro de pedidos e candidatos para um horário liberado.
+"""
+
+from datetime import date
+from flask import Blueprint, abort, current_app, jsonify, request
+from flask_login import current_user, login_required
+from .. import db
+from ..models import Appointment, WaitlistEntry, WaitlistStatus
+from ..scheduling.booking import to_utc
+from . import matching
+
+waitlist = Blueprint('waitlist', __name__)
+
+
+def _error(message, status=400):
+    return jsonify({'error': message}), status
+
+
+def _iso(value):
+    return value.isoformat() if value is not None else None
+
+
+def _entry(entry):
+    return {
+        'id': entry.id,
+        'patient_id': entry.patient_id,
+        'professional_id': entry.professional_id,
+        'specialty': entry.specialty,
+        'duration_minutes': entry.duration_minutes,
+        'priority': entry.priority,
+        'earliest_day': _iso(entry.earliest_day),
+        'latest_day': _iso(entry.latest_day),
+        'status': entry.status.value,
+        'windows': [[w.weekday, w.start_minute, w.end_minute] for w in entry.windows],
+        'last_offered_at': _iso(entry.last_offered_at and to_utc(entry.last_offered_at)),
+    }
+
+
+def _candidate(candidate):
+    return {'entry_id': candidate['entry_id'], 'patient_id': candidate['patient_id'],
+            'patient_name': candidate['patient_name'], 'priority': candidate['priority'],
+            'for_professional': candidate['match_rank'] == 0}
+
+
+@waitlist.route('')
+@login_required
+def list_entries():
+    """Pedidos na fila, por prioridade e chegada (``?professional_id=`` ou ``?specialty=``)."""
+    query = WaitlistEntry.query.filter_by(status=WaitlistStatus.WAITING)
+    professional_id = request.args.get('professional_id', type=int)
+    if professional_id is not None:
+        query = query.filter_by(professional_id=professional_id)
+    if request.args.get('specialty'):
+        query = query.filter_by(specialty=request.args['specialty'])
+    entries = query.order_by(WaitlistEntry.priority.desc(), WaitlistEntry.created_at,
+                             WaitlistEntry.id).limit(500)
+    return jsonify([_entry(entry) for entry in entries])
+
+
+@waitlist.route('', methods=['POST'])
+@login_required
+def add_entry():
+    """
+    Põe um paciente na fila (JSON com ``patient_id``, ``duration_minutes``,
+    ``windows`` como ``[[dia da semana, início, fim], ...]`` em minutos locais
+    e ``professional_id`` ou ``specialty``).
+    """
+    data = request.get_json(silent=True) or {}
+    try:
+        entry = matching.add_entry(
+            int(data['patient_id']), int(data['duration_minutes']),
+            [tuple(int(v) for v in window) for window in data.get('windows') or []],
+            professional_id=data.get('professional_id'), specialty=data.get('specialty'),
+            priority=int(data.get('priority', 0)),
+            earliest_day=data.get('earliest_day') and date.fromisoformat(data['earliest_day']),
+            latest_day=data.get('latest_day') and date.fromisoformat(data['latest_day']),
+            notes=data.get('notes'),
+            created_by=current_user.id if current_user.is_authenticated else None)
+    except matching.InvalidEntry as e:
+        return _error(str(e))
+    except (KeyError, TypeError, ValueError):
+        return _error('Pedido incompleto ou inválido')
+    return jsonify(_entry(entry)), 201
+
+
+@waitlist.route('/<int:entry_id>/close', methods=['POST'])
+@login_required
+def close_entry(entry_id):
+    """Tira o pedido da fila (JSON ``{"status": "booked" | "removed"}``)."""
+    entry = db.session.get(WaitlistEntry, entry_id)
+    if entry is None:
+        abort(404)
+    status = (request.get_json(silent=True) or {}).get('status', 'removed')
+    if status not in ('booked', 'removed'):
+        return _error(f'Situação inválida: {status}')
+    return jsonify(_entry(matching.close_entry(entry, WaitlistStatus(status))))
+
+
+@waitlist.route('/openings/<int:appointment_id>')
+@login_required
+def opening_candidates(appointment_id):
+    """Melhores pedidos da fila para o horário de um atendimento (cancelado)."""
+    appointment = db.session.get(Appointment, appointment_id)
+    if appointment is None:
+        abort(404)
+    candidates = matching.find_candidates(appointment.professional_id, appointment.starts_at,
+                                          appointment.ends_at,
+                                          limit=current_app.config['WAITLIST_CANDIDATES'])
+    return jsonify({'appointment_id': appointment_id,
+                    'candidates': [_candidate(candidate) for candidate in candidates]})
@@ -0,0 +1,14 @@
+"""
+Ponto de entrada ASGI opcional, ao lado de ``run:app``.
+
+    uvicorn asgi:asgi_app --host 0.0.0.0 --port $PORT
+
+O Flask continua WSGI; o adaptador roda cada requisição num pool de threads
+próprio e repassa respostas em streaming (SSE, exportações) bloco a bloco.
+"""
+
+import os
+from a2wsgi import WSGIMiddleware
+from run import app
+
+asgi_app = WSGIMiddleware(app, workers=int(os.environ.get('ASGI_THREADS', 32)))
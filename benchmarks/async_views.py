@@ -0,0 +1,135 @@
+"""
+Benchmark de views I/O-bound: gunicorn (WSGI, gthread) x uvicorn (ASGI).
+
+Uso:
+    python benchmarks/async_views.py --duration 10 --concurrency 32
+
+Sobe cada servidor com um app mínimo que simula três operações bloqueantes
+de 50 ms (consulta lenta, leitura de arquivo, SMTP): ``/io-sync`` as executa
+em sequência e ``/io-async`` as dispara em paralelo com ``run_blocking``.
+Reporta vazão e latências p50/p99 de cada combinação.
+"""
+
+import argparse
+import asyncio
+import http.client
+import os
+import socket
+import subprocess
+import sys
+import threading
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+from flask import Flask
+from app.utils.concurrency import run_blocking
+
+IO_DELAY = 0.05
+
+app = Flask(__name__)
+
+
+def blocking_io():
+    time.sleep(IO_DELAY)
+    return 1
+
+
+@app.route('/io-sync')
+def io_sync():
+    return str(sum(blocking_io() for _ in range(3)))
+
+
+@app.route('/io-async')
+async def io_async():
+    results = await asyncio.gather(*(run_blocking(blocking_io) for _ in range(3)))
+    return str(sum(results))
+
+
+def asgi_factory():
+    from a2wsgi import WSGIMiddleware
+    return WSGIMiddleware(app, workers=32)
+
+
+SERVERS = {
+    'gunicorn': lambda port: [sys.executable, '-m', 'gunicorn', '--workers=2', '--threads=4',
+                              f'--bind=127.0.0.1:{port}', 'async_views:app'],
+    'uvicorn': lambda port: [sys.executable, '-m', 'uvicorn', '--factory', '--workers=2',
+                             '--log-level=warning', f'--port={port}', 'async_views:asgi_factory'],
+}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def wait_for(port, timeout=20):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=0.5):
+                return
+        except OSError:
+            time.sleep(0.1)
+    raise RuntimeError(f'Servidor não respondeu na porta {port}')
+
+
+def load(port, path, duration, concurrency):
+    latencies = []
+    lock = threading.Lock()
+    deadline = time.monotonic() + duration
+
+    def worker():
+        conn = http.client.HTTPConnection('127.0.0.1', port, timeout=30)
+        local = []
+        while time.monotonic() < deadline:
+            start = time.perf_counter()
+            conn.request('GET', path)
+            conn.getresponse().read()
+            local.append(time.perf_counter() - start)
+        conn.close()
+        with lock:
+            latencies.extend(local)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    latencies.sort()
+    return {
+        'rps': len(latencies) / duration,
+        'p50': latencies[len(latencies) // 2] * 1000,
+        'p99': latencies[int(len(latencies) * 0.99)] * 1000,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--concurrency', type=int, default=32)
+    args = parser.parse_args()
+
+    print(f'{"servidor":<10} {"endpoint":<10} {"req/s":>8} {"p50 ms":>8} {"p99 ms":>8}')
+    for name, command in SERVERS.items():
+        port = free_port()
+        env = dict(os.environ, PYTHONPATH=ROOT)
+        process = subprocess.Popen(command(port), cwd=os.path.dirname(__file__), env=env,
+                                   stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+        try:
+            wait_for(port)
+            for path in ('/io-sync', '/io-async'):
+                result = load(port, path, args.duration, args.concurrency)
+                print(f'{name:<10} {path:<10} {result["rps"]:>8.1f} '
+                      f'{result["p50"]:>8.1f} {result["p99"]:>8.1f}')
+        finally:
+            process.terminate()
+            process.wait()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,132 @@
+"""
+Benchmark da busca de horários livres numa clínica inteira.
+
+Uso:
+    python benchmarks/availability.py --professionals 200 --days 90
+
+Semeia expedientes de segunda a sexta (8h-12h e 13h-18h, hora local),
+atendimentos de 50 min ocupando ~75% das horas, ausências em ~5% dos dias
+e ``--rooms`` salas usadas pelos primeiros profissionais. Mede
+``find_free_slots`` sobre toda a janela: primeiros 10 horários com
+qualquer profissional e qualquer sala, um profissional com sala e agenda
+do paciente, e todos os horários livres da janela.
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import datetime, time as clock, timedelta, timezone
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from suite import summarize  # noqa: E402
+
+FIRST_DAY = datetime(2025, 3, 3)  # segunda-feira
+LOCAL_OFFSET = timedelta(hours=3)  # America/Sao_Paulo -> UTC
+HOURS = [8, 9, 10, 11, 13, 14, 15, 16, 17]
+
+
+def generate(professionals, rooms, days, rng):
+    appointments, absences = [], []
+    for professional_id in range(1, professionals + 1):
+        room_id = professional_id if professional_id <= rooms else None
+        for offset in range(days):
+            day = FIRST_DAY + timedelta(days=offset)
+            if day.weekday() >= 5:
+                continue
+            if rng.random() < 0.05:
+                absences.append((professional_id, day + LOCAL_OFFSET, day + LOCAL_OFFSET + timedelta(days=1)))
+                continue
+            for hour in HOURS:
+                if rng.random() < 0.75:
+                    start = day + LOCAL_OFFSET + timedelta(hours=hour)
+                    appointments.append((professional_id, room_id, start, start + timedelta(minutes=50),
+                                         'SCHEDULED', False))
+    return appointments, absences
+
+
+def seed(professionals, rooms, days):
+    from app import db
+    from app.models import Professional, Room, WorkingHours
+    from app.services.synthetic import insert_rows
+
+    db.session.add_all([Professional(name=f'Profissional {n}', specialty='Psicologia')
+                        for n in range(1, professionals + 1)])
+    db.session.add_all([Room(name=f'Sala {n}') for n in range(1, rooms + 1)])
+    db.session.flush()
+    db.session.add_all([WorkingHours(professional_id=p, weekday=weekday, start_time=clock(start),
+                                     end_time=clock(end))
+                        for p in range(1, professionals + 1) for weekday in range(5)
+                        for start, end in ((8, 12), (13, 18))])
+    db.session.commit()
+
+    appointments, absences = generate(professionals, rooms, days, random.Random(42))
+    with db.engine.begin() as connection:
+        insert_rows(connection, 'appointment',
+                    ('professional_id', 'room_id', 'starts_at', 'ends_at', 'status', 'is_deleted'),
+                    appointments)
+        insert_rows(connection, 'absence', ('professional_id', 'starts_at', 'ends_at', 'is_deleted'),
+                    [row + (False,) for row in absences])
+    return len(appointments), len(absences)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--database-url', default=None)
+    parser.add_argument('--professionals', type=int, default=200)
+    parser.add_argument('--rooms', type=int, default=20)
+    parser.add_argument('--days', type=int, default=90)
+    parser.add_argument('--iterations', type=int, default=20)
+    args = parser.parse_args()
+
+    scratch = tempfile.TemporaryDirectory(prefix='equidade-disponibilidade-')
+    os.environ['DATABASE_URL'] = args.database_url or f'sqlite:///{os.path.join(scratch.name, "agenda.db")}'
+    os.environ.setdefault('TRACE_SAMPLE_RATE', '0')
+    from app import create_app, db
+    from app.scheduling.availability import find_free_slots
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        started = time.perf_counter()
+        appointments, absences = seed(args.professionals, args.rooms, args.days)
+        print(f'{appointments} atendimentos e {absences} ausências semeados em '
+              f'{time.perf_counter() - started:.1f}s ({args.professionals} profissionais, {args.days} dias)')
+
+        start = FIRST_DAY.replace(tzinfo=timezone.utc)
+        end = start + timedelta(days=args.days)
+        everyone = list(range(1, args.professionals + 1))
+        all_rooms = list(range(1, args.rooms + 1))
+        patient = [(start + timedelta(days=d, hours=14), start + timedelta(days=d, hours=15))
+                   for d in range(args.days)]
+        common = dict(duration=timedelta(minutes=50), start=start, end=end,
+                      buffer=timedelta(minutes=10), align=timedelta(minutes=30))
+        scenarios = {
+            'qualquer profissional+sala': lambda: find_free_slots(
+                professional_ids=everyone, room_ids=all_rooms, **common),
+            'profissional+sala+paciente': lambda: find_free_slots(
+                professional_ids=[1], room_ids=[1], busy=patient, **common),
+            'todos os inícios livres': lambda: find_free_slots(
+                professional_ids=everyone, limit=None, **common),
+        }
+        for name, scenario in scenarios.items():
+            samples = []
+            for _ in range(args.iterations):
+                began = time.perf_counter()
+                found = scenario()
+                samples.append(time.perf_counter() - began)
+            stats = summarize(samples)
+            print(f'  {name:28} p50 {stats["p50_ms"]:8.2f} ms   p95 {stats["p95_ms"]:8.2f} ms   '
+                  f'{len(found)} horários')
+            db.session.rollback()
+    scratch.cleanup()
+    return 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,289 @@
+"""
+Teste de carga com jornadas de usuário contra o app rodando no gunicorn.
+
+Uso:
+    python benchmarks/loadtest.py --concurrency 32 --duration 60 --workers 4 --threads 8
+    python benchmarks/loadtest.py --url https://homolog.exemplo --concurrency 16
+
+Sem ``--url``, cria um banco SQLite temporário (ou usa ``--database-url``),
+semeia usuários e sobe o gunicorn com ``gunicorn.conf.py``. Cada usuário
+virtual repete a jornada: página de login (lê o token CSRF), login,
+dashboard, perfil, lista de usuários (admins) e logout (POST com o token da
+página). Cookies de sessão são mantidos por usuário virtual. Ao final
+imprime a vazão e p50/p95/p99 por etapa; ``--json`` grava o relatório.
+"""
+
+import argparse
+import http.client
+import json
+import os
+import random
+import re
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlencode, urlsplit
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from suite import ADMIN_EMAIL, PASSWORD, active_user_email, percentile  # noqa: E402
+
+CSRF_RE = re.compile(r'name="csrf_token"[^>]*value="([^"]+)"|value="([^"]+)"[^>]*name="csrf_token"')
+
+
+class VirtualUser:
+    """Conexão keep-alive com cookies próprios, como um navegador."""
+
+    def __init__(self, base_url, timeout=30):
+        parts = urlsplit(base_url)
+        connection_class = (http.client.HTTPSConnection if parts.scheme == 'https'
+                            else http.client.HTTPConnection)
+        self.connection = connection_class(parts.netloc, timeout=timeout)
+        self.cookies = {}
+        # Como atrás de um proxy TLS: evita o redirect do Talisman para HTTPS,
+        # e o CSRF (modo estrito em HTTPS) exige um Referer de mesma origem
+        self.forwarded_proto = 'https'
+        self.origin = f'https://{parts.netloc}'
+        self.referer = None
+        self.location = None
+
+    def request(self, method, path, form=None):
+        headers = {'X-Forwarded-Proto': self.forwarded_proto, 'Connection': 'keep-alive'}
+        if self.referer:
+            headers['Referer'] = self.referer
+        if self.cookies:
+            headers['Cookie'] = '; '.join(f'{k}={v}' for k, v in self.cookies.items())
+        body = None
+        if form is not None:
+            body = urlencode(form)
+            headers['Content-Type'] = 'application/x-www-form-urlencoded'
+        for attempt in (1, 2):
+            try:
+                self.connection.request(method, path, body=body, headers=headers)
+                response = self.connection.getresponse()
+                data = response.read()
+                break
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError):
+                # O servidor fechou a conexão keep-alive ociosa: reconecta uma vez
+                self.connection.close()
+                if attempt == 2:
+                    raise
+            except (http.client.HTTPException, OSError):
+                self.connection.close()
+                raise
+
+        for cookie in response.msg.get_all('Set-Cookie') or ():
+            pair = cookie.split(';', 1)[0]
+            name, _, value = pair.partition('=')
+            if value and 'expires=thu, 01 jan 1970' not in cookie.lower():
+                self.cookies[name.strip()] = value
+            else:
+                self.cookies.pop(name.strip(), None)
+        self.location = response.getheader('Location')
+        if method == 'GET':
+            self.referer = self.origin + path
+        return response.status, data.decode('utf-8', 'replace')
+
+    def close(self):
+        self.connection.close()
+
+
+def csrf_token(html):
+    match = CSRF_RE.search(html)
+    return (match.group(1) or match.group(2)) if match else ''
+
+
+class Recorder:
+    """Latências e erros por etapa, compartilhados entre as threads."""
+
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.samples = defaultdict(list)
+        self.errors = defaultdict(int)
+
+    def record(self, step, elapsed, ok):
+        with self.lock:
+            self.samples[step].append(elapsed)
+            if not ok:
+                self.errors[step] += 1
+
+
+def timed_step(recorder, step, user, method, path, expect, form=None):
+    started = time.perf_counter()
+    try:
+        status, body = user.request(method, path, form)
+    except (http.client.HTTPException, OSError):
+        recorder.record(step, time.perf_counter() - started, False)
+        raise
+    recorder.record(step, time.perf_counter() - started, status in expect)
+    return status, body
+
+
+def journey(base_url, account, recorder, admin_pages):
+    """Uma jornada completa; devolve quando o usuário fez logout."""
+    user = VirtualUser(base_url)
+    try:
+        _, page = timed_step(recorder, 'GET /auth/login', user, 'GET', '/auth/login', (200,))
+        status, _ = timed_step(recorder, 'POST /auth/login', user, 'POST', '/auth/login', (302,), {
+            'csrf_token': csrf_token(page), 'email': account, 'password': PASSWORD})
+        if status != 302 or '/auth/login' in (user.location or ''):
+            return  # credenciais recusadas ou conta desativada
+        _, page = timed_step(recorder, 'GET /dashboard', user, 'GET', '/dashboard', (200,))
+        timed_step(recorder, 'GET /auth/perfil', user, 'GET', '/auth/perfil', (200,))
+        if account == ADMIN_EMAIL:
+            page_number = random.randint(1, admin_pages)
+            timed_step(recorder, 'GET /auth/admin/users', user, 'GET',
+                       f'/auth/admin/users?page={page_number}', (200,))
+        timed_step(recorder, 'POST /auth/logout', user, 'POST', '/auth/logout', (302,),
+                   {'csrf_token': csrf_token(page)})
+    finally:
+        user.close()
+
+
+def worker(base_url, deadline, recorder, users, admin_ratio):
+    admin_pages = max(1, users // 10)
+    while time.monotonic() < deadline:
+        if random.random() < admin_ratio:
+            account = ADMIN_EMAIL
+        else:
+            account = active_user_email(random.randrange(users), users)
+        try:
+            journey(base_url, account, recorder, admin_pages)
+        except (http.client.HTTPException, OSError):
+            time.sleep(0.05)
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def prepare_database(database_url, users):
+    """Cria e semeia o banco descartável num subprocesso (sem carregar o app aqui)."""
+    code = ('import sys; sys.path.insert(0, "benchmarks"); from suite import make_app; '
+            f'make_app({database_url!r}, {users})')
+    subprocess.run([sys.executable, '-c', code], cwd=ROOT, check=True,
+                   env=dict(os.environ, RATELIMIT_ENABLED='0'))
+
+
+def start_server(args, scratch):
+    port = free_port()
+    env = dict(
+        os.environ,
+        DATABASE_URL=args.database_url,
+        PORT=str(port),
+        WEB_CONCURRENCY=str(args.workers),
+        GUNICORN_THREADS=str(args.threads),
+        RATELIMIT_ENABLED='0',
+        LOG_DIR=os.path.join(scratch, 'logs'),
+        LOG_LEVEL=args.log_level,
+        UPLOAD_DIR=os.path.join(scratch, 'uploads'),
+        PROMETHEUS_MULTIPROC_DIR=os.path.join(scratch, 'metrics'),
+    )
+    log = open(os.path.join(scratch, 'gunicorn.log'), 'w')
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py', 'run:app'],
+        cwd=ROOT, env=env, stdout=log, stderr=subprocess.STDOUT)
+
+    base_url = f'http://127.0.0.1:{port}'
+    deadline = time.monotonic() + 60
+    while time.monotonic() < deadline:
+        if process.poll() is not None:
+            raise RuntimeError(f'gunicorn terminou; veja {log.name}')
+        try:
+            probe = VirtualUser(base_url, timeout=2)
+            status, _ = probe.request('GET', '/readyz')
+            probe.close()
+            if status == 200:
+                return process, base_url
+        except OSError:
+            pass
+        time.sleep(0.2)
+    process.terminate()
+    raise RuntimeError('gunicorn não ficou pronto em 60s')
+
+
+def report(recorder, elapsed):
+    total = sum(len(s) for s in recorder.samples.values())
+    errors = sum(recorder.errors.values())
+    result = {
+        'duration_s': round(elapsed, 1),
+        'requests': total,
+        'errors': errors,
+        'throughput_rps': round(total / elapsed, 1) if elapsed else 0.0,
+        'steps': {},
+    }
+    print(f'\n{total} requisições em {elapsed:.1f}s: {result["throughput_rps"]} req/s, {errors} erros')
+    print(f'{"etapa":26} {"n":>7} {"erros":>6} {"p50 ms":>9} {"p95 ms":>9} {"p99 ms":>9}')
+    for step, samples in sorted(recorder.samples.items()):
+        ms = [s * 1000 for s in samples]
+        stats = {
+            'n': len(ms),
+            'errors': recorder.errors[step],
+            'p50_ms': round(percentile(ms, 0.50), 2),
+            'p95_ms': round(percentile(ms, 0.95), 2),
+            'p99_ms': round(percentile(ms, 0.99), 2),
+        }
+        result['steps'][step] = stats
+        print(f'{step:26} {stats["n"]:7} {stats["errors"]:6} {stats["p50_ms"]:9.2f} '
+              f'{stats["p95_ms"]:9.2f} {stats["p99_ms"]:9.2f}')
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--url', default=None, help='servidor já em execução (não sobe o gunicorn)')
+    parser.add_argument('--database-url', default=None)
+    parser.add_argument('--seed-users', type=int, default=10000)
+    parser.add_argument('--concurrency', type=int, default=16, help='usuários virtuais')
+    parser.add_argument('--duration', type=float, default=30, help='segundos')
+    parser.add_argument('--workers', type=int, default=2)
+    parser.add_argument('--threads', type=int, default=4)
+    parser.add_argument('--admin-ratio', type=float, default=0.1)
+    parser.add_argument('--log-level', default='warning')
+    parser.add_argument('--json', default=None, help='arquivo para gravar o relatório')
+    args = parser.parse_args()
+
+    process = None
+    with tempfile.TemporaryDirectory(prefix='equidade-load-') as scratch:
+        base_url = args.url
+        if base_url is None:
+            args.database_url = args.database_url or f'sqlite:///{os.path.join(scratch, "load.db")}'
+            print(f'Semeando {args.seed_users} usuários em {args.database_url}...')
+            prepare_database(args.database_url, args.seed_users)
+            process, base_url = start_server(args, scratch)
+            print(f'gunicorn em {base_url} ({args.workers} workers x {args.threads} threads)')
+
+        recorder = Recorder()
+        deadline = time.monotonic() + args.duration
+        started = time.perf_counter()
+        threads = [threading.Thread(target=worker, daemon=True,
+                                    args=(base_url, deadline, recorder, args.seed_users, args.admin_ratio))
+                   for _ in range(args.concurrency)]
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            elapsed = time.perf_counter() - started
+            if process is not None:
+                process.terminate()
+                process.wait(timeout=30)
+
+        result = report(recorder, elapsed)
+        result.update(concurrency=args.concurrency, workers=args.workers, threads=args.threads)
+        if args.json:
+            with open(args.json, 'w') as output:
+                json.dump(result, output, indent=2)
+    return 1 if result['errors'] else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
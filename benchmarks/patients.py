@@ -0,0 +1,102 @@
+"""
+Benchmark do autocompletar de pacientes.
+
+Uso:
+    python benchmarks/patients.py --patients 500000
+
+Semeia pacientes com nomes brasileiros (com acentos, nomes compostos e
+sobrenomes comuns), CPF e celular, e mede ``typeahead`` com consultas
+típicas da recepção: começo do nome, nome e começo do sobrenome, só um
+sobrenome, fragmentos de CPF e de telefone e buscas sem resultado. A meta
+é p99 abaixo de 10 ms.
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from suite import summarize  # noqa: E402
+
+FIRST = ['Maria', 'José', 'João', 'Ana', 'Antônio', 'Francisco', 'Carlos', 'Paulo', 'Pedro',
+         'Lucas', 'Luíza', 'Márcia', 'Gabriel', 'Júlia', 'Rafael', 'Letícia', 'Sebastião',
+         'Conceição', 'Vitória', 'Inês', 'Cláudio', 'Fábio', 'Mônica', 'Natália', 'Otávio']
+MIDDLE = ['', '', 'Paula', 'Eduardo', 'Aparecida', 'Luís', 'Clara', 'Henrique', 'de Fátima']
+LAST = ['Silva', 'Santos', 'Oliveira', 'Souza', 'Rodrigues', 'Ferreira', 'Alves', 'Pereira',
+        'Lima', 'Gomes', 'Ribeiro', 'Carvalho', 'Araújo', 'Conceição', 'Magalhães', 'Simões',
+        'Gonçalves', 'Brandão', 'Leão', 'Falcão', 'Assunção', 'Peçanha', 'Guimarães', 'Lopes']
+
+QUERIES = ['maria', 'joao sil', 'sebastiao', 'ana paula', 'jose da', 'conceicao',
+           'silva', 'magalhaes', 'fal', 'lu', 'mar sou', 'maria aparecida santos',
+           '987', '123.45', '(11) 9', '11 98', 'mon peç 55', 'zzzz', 'xavier']
+
+
+def generate(count, rng):
+    from app.models.patients import search_fields
+
+    for n in range(1, count + 1):
+        name = ' '.join(filter(None, (rng.choice(FIRST), rng.choice(MIDDLE), rng.choice(LAST),
+                                      rng.choice(LAST))))
+        cpf = f'{(n * 7919) % 1_000_000_000:09d}{n % 100:02d}'
+        cpf = f'{cpf[:3]}.{cpf[3:6]}.{cpf[6:9]}-{cpf[9:]}'
+        phone = f'({rng.randint(11, 99)}) 9{rng.randint(1000, 9999)}-{rng.randint(1000, 9999)}'
+        yield (name, cpf, phone) + search_fields(name, cpf, phone) + (False,)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--database-url', default=None)
+    parser.add_argument('--patients', type=int, default=500000)
+    parser.add_argument('--iterations', type=int, default=200)
+    args = parser.parse_args()
+
+    scratch = tempfile.TemporaryDirectory(prefix='equidade-pacientes-')
+    os.environ['DATABASE_URL'] = args.database_url or f'sqlite:///{os.path.join(scratch.name, "pacientes.db")}'
+    os.environ.setdefault('TRACE_SAMPLE_RATE', '0')
+    from app import create_app, db
+    from app.patients.search import typeahead
+    from app.services.synthetic import insert_rows
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        started = time.perf_counter()
+        with db.engine.begin() as connection:
+            insert_rows(connection, 'patient',
+                        ('name', 'cpf', 'phone', 'search_name', 'search_digits', 'is_deleted'),
+                        generate(args.patients, random.Random(42)))
+        print(f'{args.patients} pacientes semeados em {time.perf_counter() - started:.1f}s')
+
+        rng = random.Random(7)
+        samples, per_query = [], {query: [] for query in QUERIES}
+        with db.engine.connect() as connection:
+            for query in QUERIES:  # aquece o cache de páginas
+                typeahead(connection, query)
+            for _ in range(args.iterations):
+                query = rng.choice(QUERIES)
+                began = time.perf_counter()
+                found = typeahead(connection, query)
+                elapsed = time.perf_counter() - began
+                samples.append(elapsed)
+                per_query[query].append((elapsed, len(found)))
+
+        for query, runs in per_query.items():
+            if runs:
+                stats = summarize([elapsed for elapsed, _ in runs])
+                print(f'  {query!r:26} p50 {stats["p50_ms"]:7.2f} ms   max '
+                      f'{max(e for e, _ in runs) * 1000:7.2f} ms   {runs[0][1]} resultados')
+        stats = summarize(samples)
+        print(f'todas: p50 {stats["p50_ms"]:.2f} ms   p95 {stats["p95_ms"]:.2f} ms   '
+              f'p99 {stats["p99_ms"]:.2f} ms ({stats["n"]} consultas)')
+    scratch.cleanup()
+    return 0 if stats['p99_ms'] < 10 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
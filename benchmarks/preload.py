@@ -0,0 +1,96 @@
+"""
+Mede a memória por worker do Gunicorn com e sem ``preload_app``.
+
+Uso:
+    python benchmarks/preload.py --workers 4 --app run:app
+
+Sobe o servidor com ``gunicorn.conf.py`` duas vezes (GUNICORN_PRELOAD=1 e 0),
+faz algumas requisições para aquecer os workers e lê ``/proc/<pid>/smaps_rollup``
+de cada um. RSS conta páginas compartilhadas em todos os processos; PSS
+divide-as entre quem as compartilha e mostra o ganho real do copy-on-write.
+"""
+
+import argparse
+import os
+import socket
+import subprocess
+import sys
+import time
+import urllib.request
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def children(pid):
+    try:
+        with open(f'/proc/{pid}/task/{pid}/children') as f:
+            return [int(child) for child in f.read().split()]
+    except OSError:
+        return []
+
+
+def memory(pid):
+    """Retorna (rss, pss, privado) em MB."""
+    values = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[0].endswith(':') and parts[1].isdigit():
+                values[parts[0][:-1]] = int(parts[1]) / 1024
+    private = values.get('Private_Clean', 0) + values.get('Private_Dirty', 0)
+    return values.get('Rss', 0), values.get('Pss', 0), private
+
+
+def measure(app, workers, preload, path, requests):
+    port = free_port()
+    env = dict(os.environ, PORT=str(port), WEB_CONCURRENCY=str(workers),
+               GUNICORN_PRELOAD='1' if preload else '0')
+    process = subprocess.Popen(
+        [sys.executable, '-m', 'gunicorn', '--config', 'gunicorn.conf.py', app],
+        cwd=ROOT, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    try:
+        deadline = time.monotonic() + 30
+        while len(children(process.pid)) < workers:
+            if time.monotonic() > deadline:
+                raise RuntimeError('Workers não subiram a tempo')
+            time.sleep(0.2)
+
+        for _ in range(requests):
+            try:
+                urllib.request.urlopen(f'http://127.0.0.1:{port}{path}', timeout=10).read()
+            except OSError:
+                time.sleep(0.2)
+        time.sleep(1)
+        return [memory(pid) for pid in children(process.pid)]
+    finally:
+        process.terminate()
+        process.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--app', default='run:app')
+    parser.add_argument('--workers', type=int, default=4)
+    parser.add_argument('--path', default='/')
+    parser.add_argument('--requests', type=int, default=50)
+    args = parser.parse_args()
+
+    print(f'{"preload":<8} {"RSS/worker":>11} {"PSS/worker":>11} {"privado":>9} {"PSS total":>10}')
+    for preload in (False, True):
+        samples = measure(args.app, args.workers, preload, args.path, args.requests)
+        count = len(samples)
+        rss = sum(s[0] for s in samples) / count
+        pss = sum(s[1] for s in samples) / count
+        private = sum(s[2] for s in samples) / count
+        print(f'{"sim" if preload else "não":<8} {rss:>9.1f}MB {pss:>9.1f}MB '
+              f'{private:>7.1f}MB {pss * count:>8.1f}MB')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,177 @@
+"""
+Benchmark da reserva de atendimentos com a agenda cheia.
+
+Uso:
+    python benchmarks/scheduling.py --professionals 5 --appointments 10000
+    python benchmarks/scheduling.py --database-url postgresql://... --threads 16
+
+Semeia ``--appointments`` atendimentos de 30 min por profissional (dias
+úteis, 8h-18h, deixando um a cada cinco horários livre) e mede, pelo
+serviço de reserva: reserva num horário livre, reserva recusada por
+conflito e a consulta ``find_conflict``. Por fim ``--threads`` reservam em
+paralelo os mesmos horários livres e o script confere que nenhum
+profissional ficou com atendimentos sobrepostos.
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from suite import summarize  # noqa: E402
+
+FIRST_DAY = datetime(2025, 1, 6)
+SLOT = timedelta(minutes=30)
+SLOTS_PER_DAY = 20
+FREE_EVERY = 5
+
+
+def slot_start(index):
+    """Início do n-ésimo horário de 30 min em dias úteis, das 8h às 18h."""
+    day, position = divmod(index, SLOTS_PER_DAY)
+    weeks, weekday = divmod(day, 5)
+    return FIRST_DAY + timedelta(days=weeks * 7 + weekday, hours=8) + position * SLOT
+
+
+def generate_appointments(professionals, per_professional):
+    for professional_id in range(1, professionals + 1):
+        booked = index = 0
+        while booked < per_professional:
+            if index % FREE_EVERY:
+                start = slot_start(index)
+                yield (professional_id, None, start, start + SLOT, 'SCHEDULED', False)
+                booked += 1
+            index += 1
+
+
+def seed(professionals, per_professional):
+    from app import db
+    from app.models import Professional
+    from app.services.synthetic import insert_rows
+
+    db.session.add_all([Professional(name=f'Profissional {n}', specialty='Fonoaudiologia')
+                        for n in range(1, professionals + 1)])
+    db.session.commit()
+    with db.engine.begin() as connection:
+        return insert_rows(connection, 'appointment',
+                           ('professional_id', 'room_id', 'starts_at', 'ends_at', 'status', 'is_deleted'),
+                           generate_appointments(professionals, per_professional))
+
+
+def timed(func, arguments):
+    samples = []
+    for args in arguments:
+        started = time.perf_counter()
+        func(*args)
+        samples.append(time.perf_counter() - started)
+    return summarize(samples)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--database-url', default=None)
+    parser.add_argument('--professionals', type=int, default=5)
+    parser.add_argument('--appointments', type=int, default=10000, help='por profissional')
+    parser.add_argument('--iterations', type=int, default=500)
+    parser.add_argument('--threads', type=int, default=8)
+    args = parser.parse_args()
+
+    scratch = tempfile.TemporaryDirectory(prefix='equidade-agenda-')
+    os.environ['DATABASE_URL'] = args.database_url or f'sqlite:///{os.path.join(scratch.name, "agenda.db")}'
+    os.environ.setdefault('TRACE_SAMPLE_RATE', '0')
+    from app import create_app, db
+    from app.models.scheduling import ACTIVE_SQL
+    from app.scheduling.booking import SchedulingConflict, book_appointment, find_conflict
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        started = time.perf_counter()
+        total = seed(args.professionals, args.appointments)
+        print(f'{total} atendimentos semeados em {time.perf_counter() - started:.1f}s '
+              f'({args.appointments} por profissional)')
+
+        rng = random.Random(42)
+        last_slot = args.appointments * FREE_EVERY // (FREE_EVERY - 1)
+        free = [(p, i) for p in range(1, args.professionals + 1)
+                for i in range(0, last_slot, FREE_EVERY)]
+        rng.shuffle(free)
+        sequential, concurrent = free[:args.iterations], free[args.iterations:args.iterations * 2]
+
+        def busy_slot():
+            index = rng.randrange(last_slot)
+            while index % FREE_EVERY == 0:
+                index = rng.randrange(last_slot)
+            return rng.randint(1, args.professionals), slot_start(index)
+
+        def book(professional_id, start):
+            book_appointment(professional_id, start, start + SLOT)
+
+        def rejected(professional_id, start):
+            try:
+                book_appointment(professional_id, start + SLOT / 2, start + SLOT)
+            except SchedulingConflict:
+                return
+            raise AssertionError('conflito não detectado')
+
+        results = {
+            'find_conflict': timed(lambda p, s: find_conflict('professional', p, s, s + SLOT),
+                                   [busy_slot() for _ in range(args.iterations)]),
+            'book[livre]': timed(book, [(p, slot_start(i)) for p, i in sequential]),
+            'book[conflito]': timed(rejected, [busy_slot() for _ in range(args.iterations)]),
+        }
+
+    # Reservas concorrentes: cada horário livre é disputado por duas threads
+    outcomes = {'ok': 0, 'conflict': 0}
+    lock = threading.Lock()
+    work = [(p, slot_start(i)) for p, i in concurrent] * 2
+    rng.shuffle(work)
+
+    def worker(chunk):
+        with app.app_context():
+            for professional_id, start in chunk:
+                try:
+                    book_appointment(professional_id, start, start + SLOT)
+                    outcome = 'ok'
+                except SchedulingConflict:
+                    outcome = 'conflict'
+                with lock:
+                    outcomes[outcome] += 1
+
+    threads = [threading.Thread(target=worker, args=(work[n::args.threads],))
+               for n in range(args.threads)]
+    started = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - started
+
+    with app.app_context():
+        # Agenda ordenada por profissional: sobreposição = começa antes do fim do anterior
+        overlaps = db.session.execute(db.text(f"""
+            SELECT count(*) FROM (
+                SELECT starts_at, lag(ends_at) OVER (
+                    PARTITION BY professional_id ORDER BY starts_at) AS previous_end
+                FROM appointment WHERE {ACTIVE_SQL}
+            ) AS agenda WHERE previous_end > starts_at""")).scalar()
+
+    for name, stats in results.items():
+        print(f'  {name:16} p50 {stats["p50_ms"]:7.2f} ms   p95 {stats["p95_ms"]:7.2f} ms   '
+              f'p99 {stats["p99_ms"]:7.2f} ms')
+    print(f'  concorrência: {len(work)} reservas em {args.threads} threads ({elapsed:.1f}s): '
+          f'{outcomes["ok"]} aceitas, {outcomes["conflict"]} conflitos, {overlaps} sobreposições')
+    scratch.cleanup()
+    return 1 if overlaps or outcomes['ok'] != len(concurrent) else 0
+
+
+if __name__ == '__main__':
+    sys.exit(main())
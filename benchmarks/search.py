@@ -0,0 +1,122 @@
+"""
+Benchmark do índice de busca textual sobre um corpus sintético.
+
+Uso:
+    python benchmarks/search.py --docs 1000000
+    python benchmarks/search.py --database-url postgresql://... --docs 1000000
+
+Mede a vazão de indexação (em lotes, como no flush da sessão) e a latência
+das consultas (p50/p95/p99) com termos acentuados e prefixos.
+"""
+
+import argparse
+import os
+import random
+import statistics
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.abspath(os.path.join(os.path.dirname(__file__), '..')))
+
+from sqlalchemy import create_engine
+from app.models import SearchEntry
+from app.search.index import create_search_ddl, upsert_entries, run_search
+
+WORDS = (
+    'avaliação fonoaudiológica terapia ocupacional psicologia fisioterapia '
+    'evolução paciente sessão comunicação linguagem motricidade atenção '
+    'comportamento laudo exame hemograma receita relatório escola família '
+    'desenvolvimento autismo integração sensorial coordenação marcha '
+    'alimentação sono ansiedade memória leitura escrita convênio autorização'
+).split()
+
+QUERIES = ['avaliacao', 'fono', 'terapia ocupacional', 'integração sens',
+           'hemograma', 'relatorio escola', 'motricidade', 'ansiedade sono']
+
+
+SYLLABLES = ['ba', 'ca', 'da', 'fe', 'ga', 'li', 'ma', 'no', 'pa', 'ra',
+             'sa', 'ta', 'vo', 'zé', 'ção', 'lho', 'nha', 'que', 'tri', 'pró']
+
+
+def vocabulary(size, rng):
+    """Vocabulário com distribuição de Zipf, como em textos reais."""
+    words = list(WORDS)
+    while len(words) < size:
+        words.append(''.join(rng.choices(SYLLABLES, k=rng.randint(2, 4))))
+    weights = [1 / rank for rank in range(1, len(words) + 1)]
+    rng.shuffle(words)
+    cumulative, total = [], 0
+    for weight in weights:
+        total += weight
+        cumulative.append(total)
+    return words, cumulative
+
+
+def synthetic_rows(count, seed=42, vocab_size=50000):
+    rng = random.Random(seed)
+    words, cumulative = vocabulary(vocab_size, rng)
+    for object_id in range(1, count + 1):
+        yield {
+            'kind': 'document',
+            'object_id': object_id,
+            'title': ' '.join(rng.choices(words, cum_weights=cumulative, k=4)),
+            'body': ' '.join(rng.choices(words, cum_weights=cumulative, k=rng.randint(20, 80))),
+        }
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(len(ordered) * pct / 100))]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--docs', type=int, default=1000000)
+    parser.add_argument('--batch', type=int, default=10000)
+    parser.add_argument('--queries', type=int, default=200)
+    parser.add_argument('--database-url')
+    args = parser.parse_args()
+
+    tmpdir = None
+    url = args.database_url
+    if not url:
+        tmpdir = tempfile.mkdtemp()
+        url = f'sqlite:///{os.path.join(tmpdir, "search.db")}'
+
+    engine = create_engine(url)
+    with engine.begin() as conn:
+        SearchEntry.__table__.drop(conn, checkfirst=True)
+        if conn.dialect.name == 'sqlite':
+            conn.exec_driver_sql('DROP TABLE IF EXISTS search_fts')
+        SearchEntry.__table__.create(conn)
+        create_search_ddl(conn)
+
+    start = time.perf_counter()
+    batch = []
+    with engine.begin() as conn:
+        for row in synthetic_rows(args.docs):
+            batch.append(row)
+            if len(batch) >= args.batch:
+                upsert_entries(conn, batch)
+                batch = []
+        upsert_entries(conn, batch)
+    elapsed = time.perf_counter() - start
+    print(f'Indexação: {args.docs} documentos em {elapsed:.1f}s '
+          f'({args.docs / elapsed:,.0f} docs/s)')
+
+    latencies = []
+    with engine.connect() as conn:
+        for i in range(args.queries):
+            query = QUERIES[i % len(QUERIES)]
+            start = time.perf_counter()
+            run_search(conn, query, limit=20)
+            latencies.append((time.perf_counter() - start) * 1000)
+
+    print(f'Consultas: {args.queries} | média {statistics.mean(latencies):.2f}ms | '
+          f'p50 {percentile(latencies, 50):.2f}ms | p95 {percentile(latencies, 95):.2f}ms | '
+          f'p99 {percentile(latencies, 99):.2f}ms')
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,248 @@
+"""
+Suíte de benchmarks dos fluxos principais sobre um banco semeado.
+
+Uso:
+    python benchmarks/suite.py run --users 10000 100000 1000000
+    python benchmarks/suite.py compare benchmarks/baselines/10000.json novo/10000.json
+
+``run`` semeia (uma vez, com cache em ``benchmarks/.data``) um banco SQLite
+com N usuários e N/100 convites, mede cada cenário pelo cliente de teste do
+Flask (sem rede) e grava ``<saída>/<N>.json`` com média e p50/p95/p99 em ms.
+``--database-url`` aponta para um PostgreSQL já existente (semeado se
+estiver vazio). ``compare`` aponta regressões acima de ``--threshold`` e sai com
+código 1 se houver alguma.
+"""
+
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+
+PASSWORD = 'senha-benchmark'
+ADMIN_EMAIL = 'admin@example.com'
+
+
+def percentile(samples, fraction):
+    ordered = sorted(samples)
+    return ordered[min(len(ordered) - 1, int(fraction * len(ordered)))]
+
+
+def summarize(samples):
+    ms = [s * 1000 for s in samples]
+    return {
+        'n': len(ms),
+        'mean_ms': round(statistics.fmean(ms), 3),
+        'p50_ms': round(percentile(ms, 0.50), 3),
+        'p95_ms': round(percentile(ms, 0.95), 3),
+        'p99_ms': round(percentile(ms, 0.99), 3),
+    }
+
+
+def seed(users):
+    """Admin conhecido (id 1) + usuários e convites sintéticos (``flask seed-synthetic``)."""
+    from app import db
+    from app.models import User, Role
+    from app.services.synthetic import seed_synthetic
+
+    admin = User(username='admin', email=ADMIN_EMAIL, name='Admin', role=Role.ADMIN)
+    admin.set_password(PASSWORD)
+    db.session.add(admin)
+    db.session.commit()
+    seed_synthetic(db.engine, users=users - 1, invites=max(1, users // 100), password=PASSWORD)
+
+
+def active_user_email(number, users):
+    """E-mail de um usuário sintético ativo (ids 2..N; múltiplos de 10 são inativos)."""
+    user_id = 2 + number % (users - 1)
+    if user_id % 10 == 0:
+        user_id -= 1
+    return f'user{user_id}@example.com'
+
+
+def make_app(database_url, users):
+    """Cria o app apontando para o banco semeado (semeando se preciso)."""
+    os.environ['DATABASE_URL'] = database_url
+    os.environ.setdefault('TRACE_SAMPLE_RATE', '0')
+    from app import create_app, db, limiter
+    from app.models import User
+
+    app = create_app()
+    app.config['WTF_CSRF_ENABLED'] = False
+    limiter.enabled = False
+    with app.app_context():
+        db.create_all()
+        if db.session.query(User.id).limit(1).first() is None:
+            started = time.perf_counter()
+            seed(users)
+            print(f'  banco semeado com {users} usuários em {time.perf_counter() - started:.1f}s')
+    return app
+
+
+class Session:
+    """Cliente autenticado; o HTTPS evita o redirect do Talisman."""
+
+    def __init__(self, app, email=None):
+        self.client = app.test_client()
+        self.base_url = 'https://localhost'
+        if email:
+            response = self.post('/auth/login', data={'email': email, 'password': PASSWORD})
+            assert response.status_code == 302, f'login falhou para {email}'
+
+    def get(self, path):
+        return self.client.get(path, base_url=self.base_url)
+
+    def post(self, path, data):
+        return self.client.post(path, data=data, base_url=self.base_url)
+
+
+def timed(func, iterations, expect=(200,)):
+    samples = []
+    for index in range(iterations):
+        started = time.perf_counter()
+        response = func(index)
+        samples.append(time.perf_counter() - started)
+        assert response.status_code in expect, f'status inesperado: {response.status_code}'
+    return summarize(samples)
+
+
+def scenarios(app, users, iterations):
+    """Executa cada cenário e devolve ``{nome: estatísticas}``."""
+    results = {}
+    admin = Session(app, ADMIN_EMAIL)
+    anonymous = Session(app)
+    heavy = max(5, iterations // 10)  # cenários dominados pelo hash de senha
+    last_page = max(1, (users + 9) // 10)
+    run_id = int(time.time())
+
+    # A primeira rodada do monitor de saúde roda em segundo plano
+    deadline = time.monotonic() + 10
+    while anonymous.get('/health').status_code != 200 and time.monotonic() < deadline:
+        time.sleep(0.1)
+
+    results['health'] = timed(lambda i: anonymous.get('/health'), iterations)
+    results['auth.login[GET]'] = timed(lambda i: anonymous.get('/auth/login'), iterations)
+    results['auth.login[POST]'] = timed(
+        lambda i: Session(app).post('/auth/login', data={
+            'email': active_user_email(i * 7919, users), 'password': PASSWORD}),
+        heavy, expect=(302,))
+    results['auth.register[POST]'] = timed(
+        lambda i: Session(app).post('/auth/register', data={
+            'username': f'novo{run_id}-{i}', 'email': f'novo{run_id}-{i}@example.com',
+            'password': PASSWORD, 'password2': PASSWORD}),
+        heavy, expect=(302,))
+    results['auth.admin_users[page=1]'] = timed(lambda i: admin.get('/auth/admin/users?page=1'), iterations)
+    results['auth.admin_users[page=last]'] = timed(
+        lambda i: admin.get(f'/auth/admin/users?page={last_page}'), iterations)
+    results['admin.list_invites'] = timed(lambda i: admin.get('/admin/invites'), max(5, iterations // 10))
+    results['security.enable_2fa[GET]'] = timed(lambda i: admin.get('/security/enable-2fa'), iterations)
+    return results
+
+
+def boot_time(database_url, repeats=5):
+    """Tempo de import + ``create_app`` num interpretador novo (mediana)."""
+    code = ('import time; t = time.perf_counter(); from app import create_app; '
+            'create_app(); print(time.perf_counter() - t)')
+    env = dict(os.environ, DATABASE_URL=database_url)
+    samples = []
+    for _ in range(repeats):
+        output = subprocess.run([sys.executable, '-c', code], cwd=ROOT, env=env,
+                                capture_output=True, text=True, check=True).stdout
+        samples.append(float(output.strip().splitlines()[-1]))
+    return summarize(samples)
+
+
+def run(args):
+    os.makedirs(args.output, exist_ok=True)
+    data_dir = os.path.join(ROOT, 'benchmarks', '.data')
+    os.makedirs(data_dir, exist_ok=True)
+
+    # Cada tamanho roda num subprocesso: o app e o engine são globais
+    if len(args.users) > 1:
+        for users in args.users:
+            command = [sys.executable, __file__, 'run', '--users', str(users),
+                       '--iterations', str(args.iterations), '--output', args.output]
+            if args.database_url:
+                command += ['--database-url', args.database_url]
+            subprocess.run(command, check=True)
+        return 0
+
+    users = args.users[0]
+    database_url = args.database_url or f'sqlite:///{os.path.join(data_dir, f"users-{users}.db")}'
+    print(f'{users} usuários ({database_url.split(":", 1)[0]})')
+    app = make_app(database_url, users)
+    results = scenarios(app, users, args.iterations)
+    results['create_app'] = boot_time(database_url)
+
+    for name, stats in results.items():
+        print(f'  {name:30} p50 {stats["p50_ms"]:9.2f} ms   p95 {stats["p95_ms"]:9.2f} ms   p99 {stats["p99_ms"]:9.2f} ms')
+
+    baseline = {
+        'users': users,
+        'database': database_url.split(':', 1)[0],
+        'created_at': datetime.utcnow().isoformat(timespec='seconds'),
+        'python': platform.python_version(),
+        'machine': platform.machine(),
+        'results': results,
+    }
+    path = os.path.join(args.output, f'{users}.json')
+    with open(path, 'w') as output:
+        json.dump(baseline, output, indent=2, sort_keys=True)
+    print(f'  resultado gravado em {path}')
+    return 0
+
+
+def compare(args):
+    with open(args.baseline) as f:
+        baseline = json.load(f)['results']
+    with open(args.current) as f:
+        current = json.load(f)['results']
+
+    regressions = 0
+    print(f'{"cenário":30} {"base":>10} {"atual":>10} {"variação":>9}')
+    for name in sorted(set(baseline) & set(current)):
+        before = baseline[name][args.metric]
+        after = current[name][args.metric]
+        change = (after - before) / before if before else 0.0
+        flag = ''
+        if change > args.threshold:
+            flag = '  REGRESSÃO'
+            regressions += 1
+        print(f'{name:30} {before:10.2f} {after:10.2f} {change:+9.1%}{flag}')
+    for name in sorted(set(baseline) ^ set(current)):
+        print(f'{name:30} presente em apenas um dos arquivos')
+
+    print(f'\n{regressions} regressão(ões) acima de {args.threshold:.0%} em {args.metric}')
+    return 1 if regressions else 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    run_parser = sub.add_parser('run', help='executa os cenários e grava as baselines')
+    run_parser.add_argument('--users', type=int, nargs='+', default=[10000])
+    run_parser.add_argument('--iterations', type=int, default=200)
+    run_parser.add_argument('--database-url', default=None)
+    run_parser.add_argument('--output', default=os.path.join(ROOT, 'benchmarks', 'baselines'))
+
+    compare_parser = sub.add_parser('compare', help='compara dois resultados')
+    compare_parser.add_argument('baseline')
+    compare_parser.add_argument('current')
+    compare_parser.add_argument('--threshold', type=float, default=0.15)
+    compare_parser.add_argument('--metric', default='p50_ms',
+                                choices=['mean_ms', 'p50_ms', 'p95_ms', 'p99_ms'])
+
+    args = parser.parse_args()
+    return run(args) if args.command == 'run' else compare(args)
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,146 @@
+"""
+Benchmark da fila de espera para encaixes.
+
+Uso:
+    python benchmarks/waitlist.py --entries 50000
+
+Semeia pedidos de encaixe (para um profissional ou para a especialidade,
+com uma a três janelas preferidas na semana) e mede ``find_candidates``
+para horários liberados aleatórios em dias úteis. Depois cancela
+atendimentos de verdade e mede o tempo do commit do cancelamento até as
+notificações gravadas pelo job. A meta é p99 da busca abaixo de 10 ms.
+"""
+
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+from datetime import date, datetime, time as clock, timedelta, timezone
+
+ROOT = os.path.abspath(os.path.join(os.path.dirname(__file__), '..'))
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+
+from suite import summarize  # noqa: E402
+
+SPECIALTIES = ['Fisioterapia', 'Psicologia', 'Fonoaudiologia', 'Nutrição', 'Terapia Ocupacional',
+               'Psicopedagogia', 'Pilates', 'Acupuntura', 'Osteopatia', 'Psiquiatria']
+DURATIONS = [30, 40, 45, 50, 60]
+
+
+def generate(count, professionals, patients, rng):
+    """Linhas de ``waitlist_entry`` e de ``waitlist_window`` (ids explícitos)."""
+    created = datetime(2025, 1, 1, tzinfo=timezone.utc)
+    entries, windows = [], []
+    for n in range(1, count + 1):
+        professional_id = rng.randint(1, professionals) if rng.random() < 0.6 else None
+        specialty = (SPECIALTIES[(professional_id - 1) % len(SPECIALTIES)] if professional_id
+                     else rng.choice(SPECIALTIES))
+        duration = rng.choice(DURATIONS)
+        entries.append((n, rng.randint(1, patients), professional_id, specialty, duration,
+                        rng.choice((0, 0, 0, 1, 2)), 'WAITING', 1,
+                        created + timedelta(minutes=n)))
+        for weekday in rng.sample(range(5), rng.randint(1, 3)):
+            start = rng.randrange(7 * 60, 17 * 60, 30)
+            end = min(start + rng.choice((120, 180, 240, 300)), 21 * 60)
+            windows.append((n, professional_id, None if professional_id else specialty,
+                            weekday, start, end))
+    return entries, windows
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument('--database-url', default=None)
+    parser.add_argument('--entries', type=int, default=50000)
+    parser.add_argument('--professionals', type=int, default=200)
+    parser.add_argument('--iterations', type=int, default=500)
+    parser.add_argument('--cancellations', type=int, default=50)
+    args = parser.parse_args()
+
+    scratch = tempfile.TemporaryDirectory(prefix='equidade-fila-')
+    os.environ['DATABASE_URL'] = args.database_url or f'sqlite:///{os.path.join(scratch.name, "fila.db")}'
+    os.environ.setdefault('TRACE_SAMPLE_RATE', '0')
+    from app import create_app, db
+    from app.models import Notification, User
+    from app.models.patients import search_fields
+    from app.scheduling.booking import book_appointment, cancel_appointment
+    from app.scheduling.series import clinic_timezone
+    from app.services.synthetic import insert_rows
+    from app.waitlist import matching
+
+    app = create_app()
+    with app.app_context():
+        db.create_all()
+        db.session.add(User(username='recepcao', email='recepcao@clinica', password='x'))
+        db.session.commit()
+        rng = random.Random(42)
+        patients = max(args.entries // 2, 1)
+        started = time.perf_counter()
+        entries, windows = generate(args.entries, args.professionals, patients, rng)
+        with db.engine.begin() as connection:
+            insert_rows(connection, 'professional', ('id', 'name', 'specialty'),
+                        ((n, f'Profissional {n}', SPECIALTIES[(n - 1) % len(SPECIALTIES)])
+                         for n in range(1, args.professionals + 1)))
+            insert_rows(connection, 'patient',
+                        ('id', 'name', 'search_name', 'search_digits', 'is_deleted'),
+                        ((n, f'Paciente {n}') + search_fields(f'Paciente {n}')
+                         + (False,) for n in range(1, patients + 1)))
+            insert_rows(connection, 'waitlist_entry',
+                        ('id', 'patient_id', 'professional_id', 'specialty', 'duration_minutes',
+                         'priority', 'status', 'created_by', 'created_at'), entries)
+            insert_rows(connection, 'waitlist_window',
+                        ('entry_id', 'professional_id', 'specialty', 'weekday', 'start_minute',
+                         'end_minute'), windows)
+        print(f'{args.entries} pedidos ({len(windows)} janelas) semeados em '
+              f'{time.perf_counter() - started:.1f}s')
+
+        tz = clinic_timezone()
+        monday = date.today() + timedelta(days=7 - date.today().weekday())
+
+        def opening():
+            day = monday + timedelta(days=rng.randrange(5))
+            starts_at = datetime.combine(day, clock(rng.randrange(8, 18), rng.choice((0, 30))),
+                                         tzinfo=tz)
+            return rng.randint(1, args.professionals), starts_at, \
+                starts_at + timedelta(minutes=rng.choice((30, 60)))
+
+        samples, found = [], 0
+        with db.engine.connect() as connection:
+            for _ in range(20):  # aquece o cache de páginas
+                matching.find_candidates(*opening(), connection=connection)
+            for _ in range(args.iterations):
+                professional_id, starts_at, ends_at = opening()
+                began = time.perf_counter()
+                candidates = matching.find_candidates(professional_id, starts_at, ends_at,
+                                                      connection=connection)
+                samples.append(time.perf_counter() - began)
+                found += bool(candidates)
+        stats = summarize(samples)
+        print(f'busca: p50 {stats["p50_ms"]:.2f} ms   p95 {stats["p95_ms"]:.2f} ms   '
+              f'p99 {stats["p99_ms"]:.2f} ms ({stats["n"]} horários, {found} com candidatos)')
+
+        delays = []
+        for _ in range(args.cancellations):
+            professional_id, starts_at, ends_at = opening()
+            try:
+                appointment = book_appointment(professional_id, starts_at, ends_at)
+            except Exception:
+                db.session.rollback()
+                continue
+            began = time.perf_counter()
+            cancel_appointment(appointment)
+            matching.wait()
+            delays.append(time.perf_counter() - began)
+        if delays:
+            jobs = summarize(delays)
+            print(f'cancelamento até notificar: p50 {jobs["p50_ms"]:.2f} ms   '
+                  f'p99 {jobs["p99_ms"]:.2f} ms ({jobs["n"]} cancelamentos, '
+                  f'{Notification.query.count()} notificações)')
+    scratch.cleanup()
+    return 0 if stats['p99_ms'] < 10 else 1
+
+
+if __name__ == '__main__':
+    sys.exit(main())
@@ -0,0 +1,133 @@
+"""
+Configuração do Gunicorn para produção (carregada automaticamente a partir
+da raiz do projeto, ou via ``gunicorn -c gunicorn.conf.py run:app``).
+
+Variáveis de ambiente:
+    WEB_CONCURRENCY       número de workers (padrão: calculado pelas CPUs e pela
+                          memória do container)
+    GUNICORN_THREADS      threads por worker para requisições comuns (padrão: 4);
+                          somam-se SSE_MAX_CONNECTIONS threads para os streams
+    WORKER_MEMORY_MB      memória estimada por worker, usada no cálculo (padrão: 160)
+    GUNICORN_TIMEOUT      segundos sem heartbeat antes de reciclar o worker (padrão: 30)
+    GUNICORN_PRELOAD      1/0 para carregar o app no master antes do fork (padrão: 1)
+"""
+
+import gc
+import math
+import multiprocessing
+import os
+import shutil
+import tempfile
+
+# Métricas agregadas entre workers: o diretório precisa existir (e estar
+# limpo) antes de o app ser importado, o que acontece logo após este arquivo
+os.environ.setdefault('PROMETHEUS_MULTIPROC_DIR',
+                      os.path.join(tempfile.gettempdir(), 'equidade-metrics'))
+shutil.rmtree(os.environ['PROMETHEUS_MULTIPROC_DIR'], ignore_errors=True)
+os.makedirs(os.environ['PROMETHEUS_MULTIPROC_DIR'], exist_ok=True)
+
+
+def _memory_limit_mb():
+    """Memória disponível para o container (cgroup v2/v1) ou para a máquina."""
+    for path in ('/sys/fs/cgroup/memory.max', '/sys/fs/cgroup/memory/memory.limit_in_bytes'):
+        try:
+            with open(path) as f:
+                value = f.read().strip()
+            if value != 'max' and int(value) < 1 << 60:
+                return int(value) // (1024 * 1024)
+        except (OSError, ValueError):
+            continue
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES') // (1024 * 1024)
+    except (ValueError, OSError, AttributeError):
+        return None
+
+
+def _cpu_limit():
+    """CPUs que o processo pode usar: cota do cgroup (v2/v1), afinidade ou a máquina."""
+    try:
+        cpus = len(os.sched_getaffinity(0))
+    except (AttributeError, OSError):
+        cpus = multiprocessing.cpu_count()
+    for quota_path, period_path in (('/sys/fs/cgroup/cpu.max', None),
+                                    ('/sys/fs/cgroup/cpu/cpu.cfs_quota_us',
+                                     '/sys/fs/cgroup/cpu/cpu.cfs_period_us')):
+        try:
+            with open(quota_path) as f:
+                fields = f.read().split()
+            if period_path:
+                with open(period_path) as f:
+                    fields.append(f.read().strip())
+            quota, period = fields[0], int(fields[1])
+            if quota != 'max' and int(quota) > 0:
+                return max(1, min(cpus, math.ceil(int(quota) / period)))
+        except (OSError, ValueError, IndexError):
+            continue
+    return cpus
+
+
+def _default_workers():
+    by_cpu = _cpu_limit() * 2 + 1
+    memory = _memory_limit_mb()
+    if memory is None:
+        return by_cpu
+    # Reserva ~25% para o master, o pool de miniaturas e o sistema
+    by_memory = int(memory * 0.75) // int(os.environ.get('WORKER_MEMORY_MB', 160))
+    return max(1, min(by_cpu, by_memory))
+
+
+bind = f"0.0.0.0:{os.environ.get('PORT', '5000')}"
+workers = int(os.environ.get('WEB_CONCURRENCY') or _default_workers())
+worker_class = 'gthread'
+# Cada stream SSE ocupa uma thread enquanto está aberto: reserva uma por
+# conexão permitida para os streams não esgotarem as requisições comuns
+threads = (int(os.environ.get('GUNICORN_THREADS', 4))
+           + int(os.environ.get('SSE_MAX_CONNECTIONS', 25)))
+
+# Carrega o app uma vez no master; os workers compartilham as páginas via copy-on-write
+preload_app = os.environ.get('GUNICORN_PRELOAD', '1') == '1'
+
+# Recicla workers periodicamente (vazamentos, fragmentação); o jitter evita
+# que todos reiniciem ao mesmo tempo
+max_requests = 1000
+max_requests_jitter = 100
+
+timeout = int(os.environ.get('GUNICORN_TIMEOUT', 30))
+graceful_timeout = 30
+keepalive = 5
+
+# Heartbeat em memória: /tmp em disco pode travar workers em containers
+if os.path.isdir('/dev/shm'):
+    worker_tmp_dir = '/dev/shm'
+
+accesslog = '-'
+errorlog = '-'
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def pre_fork(server, worker):
+    """Congela os objetos do master para o GC não sujar as páginas compartilhadas."""
+    if preload_app:
+        gc.freeze()
+
+
+def post_fork(server, worker):
+    """
+    Descarta as conexões herdadas do master: cada worker abre o seu próprio
+    pool, sem compartilhar sockets do banco entre processos.
+    """
+    if not preload_app:
+        return
+
+    from app import db
+
+    app = server.app.wsgi()
+    if 'sqlalchemy' not in getattr(app, 'extensions', {}):
+        return
+    with app.app_context():
+        for engine in db.engines.values():
+            engine.dispose(close=False)
@@ -48,4 +48,4 @@ fi
 
 # Iniciar Gunicorn
 echo "🚀 Iniciando servidor..."
-exec gunicorn --workers=2 --threads=4 --timeout=0 --access-logfile=- --error-logfile=- --bind=0.0.0.0:$PORT run:app
\ No newline at end of file
+exec gunicorn --config gunicorn.conf.py run:app
\ No newline at end of file
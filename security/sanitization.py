@@ -1,21 +1,94 @@
+import hashlib
+import json
+import threading
+from collections import OrderedDict
 import bleach
+import markdown as markdown_lib
 from markdown import markdown
-from flask import Markup
+from markupsafe import Markup
 
 # Tags e atributos permitidos
 ALLOWED_TAGS = ['p', 'br', 'strong', 'em', 'a', 'ul', 'ol', 'li']
 ALLOWED_ATTRIBUTES = {'a': ['href', 'title']}
 
-def safe_markdown(text):
-    """Renderiza markdown com sanitização segura."""
+# Muda quando as regras mudam; o HTML gravado com outra versão está velho
+SANITIZER_VERSION = hashlib.sha256(json.dumps(
+    [ALLOWED_TAGS, ALLOWED_ATTRIBUTES, markdown_lib.__version__, bleach.__version__],
+    sort_keys=True).encode()).hexdigest()[:12]
+
+RENDER_CACHE_SIZE = 1024
+
+
+class RenderCache:
+    """LRU de HTML renderizado, indexado pelo hash do texto (não pelo texto)."""
+
+    def __init__(self, maxsize=RENDER_CACHE_SIZE):
+        self.maxsize = maxsize
+        self._items = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        with self._lock:
+            html = self._items.get(key)
+            if html is not None:
+                self._items.move_to_end(key)
+            return html
+
+    def put(self, key, html):
+        with self._lock:
+            self._items[key] = html
+            self._items.move_to_end(key)
+            while len(self._items) > self.maxsize:
+                self._items.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self):
+        return len(self._items)
+
+
+render_cache = RenderCache()
+
+
+def render_markdown(text):
+    """Markdown -> HTML sanitizado, sem cache (o trabalho caro)."""
+    if not text:
+        return ""
+    return bleach.clean(markdown(text), tags=ALLOWED_TAGS, attributes=ALLOWED_ATTRIBUTES)
+
+
+def render_batch(texts):
+    """Renderiza uma lista de textos; roda em processos do ``rerender-markdown``."""
+    return [render_markdown(text) for text in texts]
+
+
+def cached_markdown(text):
+    """``render_markdown`` com o LRU por hash do conteúdo."""
     if not text:
         return ""
-    return Markup(bleach.clean(
-        markdown(text),
-        tags=ALLOWED_TAGS,
-        attributes=ALLOWED_ATTRIBUTES
-    ))
+    from app.utils.metrics import record_cache
+
+    key = hashlib.sha256(text.encode('utf-8')).digest()
+    html = render_cache.get(key)
+    record_cache('markdown', html is not None)
+    if html is None:
+        html = render_markdown(text)
+        render_cache.put(key, html)
+    return html
+
+
+def safe_markdown(text, html=None):
+    """
+    Renderiza markdown com sanitização segura. ``html`` é o HTML gravado
+    junto com o texto (ver ``app.utils.rich_text``); quando presente, nada é
+    renderizado.
+    """
+    if html is not None:
+        return Markup(html)
+    return Markup(cached_markdown(text))
 
 def sanitize_html(html):
     """Sanitiza HTML removendo elementos potencialmente perigosos."""
-    return bleach.clean(html, tags=ALLOWED_TAGS, attributes=ALLOWED_ATTRIBUTES)
\ No newline at end of file
+    return bleach.clean(html, tags=ALLOWED_TAGS, attributes=ALLOWED_ATTRIBUTES)
@@ -0,0 +1,36 @@
+import pytest
+from app import create_app, db
+
+
+# Nome diferente de ``app``: o pytest-flask manteria um contexto aberto entre
+# as requisições e o usuário carregado ficaria em cache no ``g``
+@pytest.fixture
+def app_factory(monkeypatch, tmp_path):
+    """
+    Cria apps com banco SQLite e uploads em ``tmp_path`` e as tabelas já
+    criadas; ``env`` define outras variáveis de ambiente antes do
+    ``create_app()``. Ao fim do teste espera os jobs em segundo plano.
+    """
+    from app.reports import aggregates
+    from app.waitlist import matching
+
+    apps = []
+
+    def factory(**env):
+        monkeypatch.setenv('DATABASE_URL', f'sqlite:///{tmp_path / "app.db"}')
+        monkeypatch.setenv('UPLOAD_DIR', str(tmp_path))
+        monkeypatch.delenv('PROMETHEUS_MULTIPROC_DIR', raising=False)
+        for name, value in env.items():
+            monkeypatch.setenv(name, str(value))
+        app = create_app()
+        app.config['WTF_CSRF_ENABLED'] = False
+        with app.app_context():
+            db.create_all()
+        apps.append(app)
+        return app
+
+    yield factory
+    for app in apps:
+        matching.wait(app)
+        aggregates.wait(app)
+
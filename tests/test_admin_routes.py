@@ -0,0 +1,35 @@
+import pytest
+from app import db, limiter
+from app.models import User, Role, InviteToken
+
+
+@pytest.fixture
+def admin_client(app_factory):
+    app = app_factory()
+    limiter.enabled = False
+    with app.app_context():
+        admin = User(username='admin', email='admin@example.com', role=Role.ADMIN)
+        admin.set_password('senha-admin')
+        db.session.add(admin)
+        db.session.commit()
+        db.session.add(InviteToken(token=InviteToken.generate_token(), created_by=admin.id))
+        db.session.commit()
+
+    client = app.test_client()
+    client.post('/auth/login', base_url='https://localhost',
+                data={'email': 'admin@example.com', 'password': 'senha-admin'})
+    yield client
+    limiter.enabled = True
+
+
+def test_admin_and_security_blueprints_are_registered(admin_client):
+    invites = admin_client.get('/admin/invites', base_url='https://localhost')
+    assert invites.status_code == 200
+    assert 'Ativo' in invites.get_data(as_text=True)
+
+    users = admin_client.get('/auth/admin/users?page=1', base_url='https://localhost')
+    assert users.status_code == 200
+
+    setup = admin_client.get('/security/enable-2fa', base_url='https://localhost')
+    assert setup.status_code == 200
+    assert 'data:image/png;base64,' in setup.get_data(as_text=True)
@@ -0,0 +1,86 @@
+from datetime import date, datetime, time, timedelta, timezone
+import pytest
+from app import db
+from app.models import AgendaDay, AppointmentStatus, Professional, Room, WorkingHours
+from app.scheduling.booking import book_appointment, cancel_appointment, reschedule_appointment
+from app.scheduling.series import clinic_timezone, create_series
+from app.scheduling.summary import calendar_days, rebuild
+
+UTC = timezone.utc
+MONDAY = datetime(2025, 3, 10, 12, tzinfo=UTC)  # 9h em São Paulo
+HOUR = timedelta(hours=1)
+
+
+@pytest.fixture
+def summary_app(app_factory):
+    app = app_factory()
+    with app.app_context():
+        db.session.add_all([Professional(name='Ana'), Professional(name='Bruno'),
+                            Room(name='Sala 1', unit='Centro'), Room(name='Sala 2', unit='Centro')])
+        db.session.flush()
+        db.session.add(WorkingHours(professional_id=1, weekday=0, start_time=time(8),
+                                    end_time=time(12)))
+        db.session.commit()
+        yield app
+
+
+def snapshot():
+    return {(row.scope, row.scope_key, row.day): (
+        row.scheduled, row.completed, row.no_show, row.cancelled, row.booked_minutes,
+        row.first_starts_at, row.last_ends_at) for row in AgendaDay.query}
+
+
+def test_incremental_updates_match_rebuild(summary_app):
+    first = book_appointment(1, MONDAY, MONDAY + HOUR, room_id=1)
+    second = book_appointment(1, MONDAY + 2 * HOUR, MONDAY + 3 * HOUR, room_id=2)
+    third = book_appointment(2, MONDAY, MONDAY + HOUR, room_id=2)
+    moved = book_appointment(2, MONDAY + 4 * HOUR, MONDAY + 5 * HOUR)
+
+    reschedule_appointment(second, MONDAY + timedelta(days=1), MONDAY + timedelta(days=1) + HOUR)
+    cancel_appointment(first)
+    third.status = AppointmentStatus.COMPLETED
+    moved.is_deleted = True
+    db.session.commit()
+
+    row = db.session.get(AgendaDay, ('professional', '1', date(2025, 3, 10)))
+    assert (row.scheduled, row.cancelled, row.booked_minutes, row.first_starts_at) == (0, 1, 0, None)
+    unit = db.session.get(AgendaDay, ('unit', 'Centro', date(2025, 3, 10)))
+    assert (unit.completed, unit.cancelled, unit.booked_minutes) == (1, 1, 60)
+    assert db.session.get(AgendaDay, ('professional', '2', date(2025, 3, 10))).scheduled == 0
+    assert db.session.get(AgendaDay, ('room', '2', date(2025, 3, 11))).scheduled == 1
+
+    incremental = snapshot()
+    with db.engine.begin() as connection:
+        assert rebuild(connection, clinic_timezone()) == len(incremental)
+    db.session.expire_all()
+    assert snapshot() == incremental
+
+
+def test_calendar_days_include_series_and_occupancy(summary_app):
+    book_appointment(1, MONDAY, MONDAY + HOUR)
+    create_series(1, MONDAY + 2 * HOUR, HOUR, 'FREQ=WEEKLY;COUNT=3')
+
+    days = calendar_days('professional', '1', date(2025, 3, 1), date(2025, 3, 31))
+    assert list(days) == [date(2025, 3, 10), date(2025, 3, 17), date(2025, 3, 24)]
+    monday = days[date(2025, 3, 10)]
+    assert (monday['scheduled'], monday['booked_minutes'], monday['occupancy']) == (2, 120, 0.5)
+    assert monday['last_ends_at'] == MONDAY + 3 * HOUR
+
+
+def test_month_and_day_views(summary_app):
+    summary_app.config['LOGIN_DISABLED'] = True
+    book_appointment(2, MONDAY, MONDAY + HOUR, room_id=1)
+    client = summary_app.test_client()
+
+    month = client.get('/agenda/unit/Centro/month/2025/3').get_json()
+    assert [(d['day'], d['scheduled'], d['occupancy']) for d in month['days']] == [
+        ('2025-03-10', 1, None)]
+    week = client.get('/agenda/room/1/week/2025-03-12').get_json()
+    assert week['start'] == '2025-03-10' and len(week['days']) == 1
+
+    detail = client.get('/agenda/professional/2/day/2025-03-10').get_json()
+    assert [e['status'] for e in detail['entries']] == ['scheduled']
+    assert client.get('/agenda/building/1/day/2025-03-10').status_code == 404
+    assert client.get('/agenda/room/1/day/ontem').status_code == 400
+    for path in ('2025/13', '2025/0', '0/3', '10000/3'):
+        assert client.get(f'/agenda/room/1/month/{path}').status_code == 404
@@ -0,0 +1,74 @@
+from datetime import datetime, time, timedelta, timezone
+import numpy as np
+import pytest
+from app import db
+from app.models import Absence, Professional, Room, WorkingHours
+from app.scheduling.availability import SlotGrid, find_free_slots, fits
+from app.scheduling.booking import book_appointment
+
+UTC = timezone.utc
+MONDAY = datetime(2025, 3, 10)  # America/Sao_Paulo = UTC-3
+
+
+@pytest.fixture
+def clinic_app(app_factory):
+    app = app_factory()
+    with app.app_context():
+        db.session.add_all([Professional(name='Ana'), Professional(name='Bruno'), Room(name='Sala 1')])
+        db.session.flush()
+        for weekday in range(5):
+            db.session.add(WorkingHours(professional_id=1, weekday=weekday,
+                                        start_time=time(8), end_time=time(12)))
+            db.session.add(WorkingHours(professional_id=2, weekday=weekday,
+                                        start_time=time(14), end_time=time(18)))
+        db.session.commit()
+        yield app
+
+
+def test_grid_cover_and_fits():
+    grid = SlotGrid(MONDAY, MONDAY + timedelta(hours=1), step=5)
+    busy = grid.cover(2, [0, 1], [MONDAY + timedelta(minutes=7), MONDAY],
+                      [MONDAY + timedelta(minutes=16), MONDAY + timedelta(minutes=5)])
+    assert grid.size == 12
+    assert np.flatnonzero(busy[0]).tolist() == [1, 2, 3]
+    assert np.flatnonzero(busy[1]).tolist() == [0]
+    assert fits(~busy, 3)[0].tolist()[:6] == [False, False, False, False, True, True]
+
+
+def test_slots_respect_hours_bookings_absences_and_buffers(clinic_app):
+    # Ana: 11h-15h UTC; ocupada 11h-12h e ausente 13h-14h
+    book_appointment(1, MONDAY.replace(hour=11), MONDAY.replace(hour=12), room_id=1)
+    db.session.add(Absence(professional_id=1, starts_at=MONDAY.replace(hour=13),
+                           ends_at=MONDAY.replace(hour=14)))
+    db.session.commit()
+
+    slots = find_free_slots(timedelta(minutes=50), MONDAY, MONDAY + timedelta(days=1),
+                            professional_ids=[1], buffer=timedelta(minutes=10),
+                            align=timedelta(minutes=10))
+    # A folga vale para atendimentos e ausências, não para o fim do expediente
+    assert [s.starts_at for s in slots] == [datetime(2025, 3, 10, 14, 10, tzinfo=UTC)]
+
+    slots = find_free_slots(timedelta(minutes=30), MONDAY, MONDAY + timedelta(days=1),
+                            professional_ids=[1])
+    assert slots[0].starts_at == datetime(2025, 3, 10, 12, 0, tzinfo=UTC)
+    assert slots[0].ends_at == datetime(2025, 3, 10, 12, 30, tzinfo=UTC)
+
+
+def test_intersects_groups_and_picks_first_free_resource(clinic_app):
+    # Sala ocupada no começo da tarde de Bruno (17h-21h UTC)
+    book_appointment(1, MONDAY.replace(hour=17), MONDAY.replace(hour=18), room_id=1)
+    slots = find_free_slots(timedelta(hours=1), MONDAY.replace(hour=12), MONDAY + timedelta(days=1),
+                            professional_ids=[1, 2], room_ids=[1], align=timedelta(hours=1),
+                            busy=[(MONDAY.replace(hour=18), MONDAY.replace(hour=19))], limit=3)
+    assert [(s.starts_at.hour, s.professional_id, s.room_id) for s in slots] == [
+        (12, 1, 1), (13, 1, 1), (14, 1, 1)]
+
+    later = find_free_slots(timedelta(hours=1), MONDAY.replace(hour=15), MONDAY + timedelta(days=1),
+                            professional_ids=[1, 2], room_ids=[1], align=timedelta(hours=1),
+                            busy=[(MONDAY.replace(hour=18), MONDAY.replace(hour=19))], limit=2)
+    assert [(s.starts_at.hour, s.professional_id) for s in later] == [(19, 2), (20, 2)]
+
+
+def test_requires_some_resource(clinic_app):
+    with pytest.raises(ValueError):
+        find_free_slots(timedelta(minutes=30), MONDAY, MONDAY + timedelta(days=1))
@@ -0,0 +1,116 @@
+from datetime import datetime, timedelta, timezone
+import pytest
+from sqlalchemy import inspect, text
+from sqlalchemy.exc import DatabaseError
+from app import db
+from app.clinical.notes import (StaleNoteVersion, add_note, correct_note, note_text, timeline,
+                                versions)
+from app.models import ClinicalNote, ClinicalNoteBody, Patient, Role, User
+
+START = datetime(2025, 3, 10, 12, tzinfo=timezone.utc)
+
+
+@pytest.fixture
+def notes_app(app_factory):
+    app = app_factory()
+    with app.app_context():
+        db.session.add_all([Patient(name='Ana'), Patient(name='Bruno')])
+        db.session.commit()
+        yield app
+
+
+def test_long_bodies_are_compressed_and_loaded_lazily(notes_app):
+    long_text = 'Paciente relata melhora do sono. ' * 200
+    note = add_note(1, long_text, title='Sessão 1', noted_at=START)
+    short = add_note(1, 'Retorno em 15 dias.', noted_at=START + timedelta(days=1))
+
+    stored = dict(db.session.execute(text('SELECT note_id, content FROM clinical_note_body')).all())
+    assert stored[note.id][:1] == b'z' and len(stored[note.id]) < len(long_text) // 10
+    assert stored[short.id] == b'pRetorno em 15 dias.'
+
+    db.session.expunge_all()
+    body = db.session.get(ClinicalNoteBody, note.id)
+    assert 'content' in inspect(body).unloaded
+    assert body.content == long_text
+    assert note_text(short.id) == 'Retorno em 15 dias.'
+    assert db.session.get(ClinicalNote, note.id).preview.startswith('Paciente relata melhora')
+
+
+def test_timeline_uses_keyset_pages_of_current_versions(notes_app):
+    ids = [add_note(1, f'Evolução {n}', noted_at=START + timedelta(days=n)).id for n in range(5)]
+    add_note(2, 'Outro paciente', noted_at=START)
+    correction = correct_note(db.session.get(ClinicalNote, ids[3]), 'Evolução 3 corrigida',
+                              reason='Dose errada')
+
+    first, cursor = timeline(1, limit=2)
+    assert [n.id for n in first] == [ids[4], correction.id]
+    second, cursor = timeline(1, limit=2, cursor=cursor)
+    assert [n.id for n in second] == [ids[2], ids[1]]
+    last, cursor = timeline(1, limit=2, cursor=cursor)
+    assert [n.id for n in last] == [ids[0]] and cursor is None
+    with pytest.raises(ValueError):
+        timeline(1, cursor='não é cursor')
+
+
+def test_corrections_are_versions_and_rows_are_never_changed(notes_app):
+    original = add_note(1, 'Pressão 12x8', noted_at=START)
+    second = correct_note(original, 'Pressão 13x8', reason='Digitação')
+    third = correct_note(second, 'Pressão 13x9')
+
+    assert [(n.version, n.root_id) for n in versions(original)] == [
+        (1, None), (2, original.id), (3, original.id)]
+    assert versions(third)[0].id == original.id and third.noted_at == original.noted_at
+    with pytest.raises(StaleNoteVersion):
+        correct_note(original, 'Outra correção')
+
+    original.title = 'Alterado'
+    with pytest.raises(ValueError):
+        db.session.commit()
+    db.session.rollback()
+    for statement in ('UPDATE clinical_note SET title = :v', 'DELETE FROM clinical_note_body'):
+        with pytest.raises(DatabaseError, match='clinical_note_append_only'):
+            db.session.execute(text(statement), {'v': 'x'})
+        db.session.rollback()
+
+
+def test_timeline_route(notes_app):
+    notes_app.config['LOGIN_DISABLED'] = True
+    for n in range(3):
+        add_note(1, f'Evolução {n}', noted_at=START + timedelta(days=n))
+    client = notes_app.test_client()
+
+    page = client.get('/clinical/patients/1/notes?limit=2').get_json()
+    assert [n['preview'] for n in page['notes']] == ['Evolução 2', 'Evolução 1']
+    rest = client.get(f'/clinical/patients/1/notes?limit=2&cursor={page["next_cursor"]}').get_json()
+    assert [n['preview'] for n in rest['notes']] == ['Evolução 0'] and rest['next_cursor'] is None
+
+    note = client.get(f'/clinical/notes/{page["notes"][0]["id"]}').get_json()
+    assert note['content'] == 'Evolução 2' and note['superseded'] is False
+
+
+def test_note_routes_reject_malformed_headers(notes_app):
+    user = User(username='ana', email='ana@clinica', role=Role.USER)
+    user.set_password('segredo-123')
+    db.session.add(user)
+    db.session.commit()
+    original = add_note(1, 'Pressão 12x8', noted_at=START)
+    client = notes_app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user.id)
+
+    for body in ({'content': 'Evolução', 'title': 'x' * 201},
+                 {'content': 'Evolução', 'title': ['lista']},
+                 {'content': 'Evolução', 'professional_id': 999},
+                 {'content': 'Evolução', 'professional_id': '1'},
+                 {'content': ['lista']}):
+        with client.post('/clinical/patients/1/notes', json=body) as response:
+            assert response.status_code == 400
+    for body in ({'content': 'Pressão 13x8', 'reason': 'x' * 201},
+                 {'content': 'Pressão 13x8', 'reason': 5}):
+        with client.post(f'/clinical/notes/{original.id}/corrections', json=body) as response:
+            assert response.status_code == 400
+    assert ClinicalNote.query.count() == 1
+
+    with client.post('/clinical/patients/1/notes',
+                     json={'content': 'Evolução', 'title': 'Retorno'}) as response:
+        assert response.status_code == 201 and response.get_json()['title'] == 'Retorno'
@@ -0,0 +1,78 @@
+import gzip
+from flask import Flask, Response
+from app.utils.compression import CompressionMiddleware
+
+
+def make_app(**kwargs):
+    app = Flask(__name__)
+
+    @app.route('/big')
+    def big():
+        return 'equidade ' * 500
+
+    @app.route('/small')
+    def small():
+        return 'ok'
+
+    @app.route('/stream')
+    def stream():
+        return Response((f'{i};linha\n' for i in range(2000)), mimetype='text/csv')
+
+    @app.route('/png')
+    def png():
+        return Response(b'\x89PNG' * 500, mimetype='image/png')
+
+    app.wsgi_app = CompressionMiddleware(app.wsgi_app, **kwargs)
+    return app
+
+
+def test_compresses_large_html():
+    client = make_app().test_client()
+    response = client.get('/big', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    assert 'Accept-Encoding' in response.headers['Vary']
+    assert gzip.decompress(response.data) == ('equidade ' * 500).encode()
+
+
+def test_skips_small_and_disallowed_types():
+    client = make_app().test_client()
+    small = client.get('/small', headers={'Accept-Encoding': 'gzip'})
+    png = client.get('/png', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in small.headers
+    assert 'Content-Encoding' not in png.headers
+    assert small.data == b'ok'
+
+
+def test_skips_when_client_does_not_accept_gzip():
+    client = make_app().test_client()
+    response = client.get('/big', headers={'Accept-Encoding': 'gzip;q=0, br'})
+    assert 'Content-Encoding' not in response.headers
+
+
+def test_compresses_streamed_response():
+    client = make_app().test_client()
+    response = client.get('/stream', headers={'Accept-Encoding': 'gzip'})
+    assert response.headers['Content-Encoding'] == 'gzip'
+    expected = ''.join(f'{i};linha\n' for i in range(2000)).encode()
+    assert gzip.decompress(response.data) == expected
+
+
+def test_streamed_response_below_threshold_gets_length():
+    client = make_app(min_size=10 ** 6).test_client()
+    response = client.get('/stream', headers={'Accept-Encoding': 'gzip'})
+    assert 'Content-Encoding' not in response.headers
+    assert int(response.headers['Content-Length']) == len(response.data)
+
+
+def test_vary_is_set_on_eligible_types_even_uncompressed():
+    client = make_app(min_size=50).test_client()
+    for path, headers in (('/small', {'Accept-Encoding': 'gzip'}),
+                          ('/big', {'Accept-Encoding': 'identity'}),
+                          ('/big', {})):
+        response = client.get(path, headers=headers)
+        assert 'Content-Encoding' not in response.headers
+        assert response.headers['Vary'] == 'Accept-Encoding'
+    head = client.head('/big', headers={'Accept-Encoding': 'gzip'})
+    assert head.headers['Vary'] == 'Accept-Encoding'
+    png = client.get('/png', headers={'Accept-Encoding': 'gzip'})
+    assert 'Vary' not in png.headers
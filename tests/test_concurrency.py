@@ -0,0 +1,37 @@
+import asyncio
+import contextvars
+import threading
+from flask import Flask, current_app
+from app.utils.concurrency import run_blocking
+
+
+def test_run_blocking_offloads_with_app_context():
+    app = Flask(__name__)
+    app.config['OFFLOAD_WORKERS'] = 4
+
+    def work(value):
+        return current_app.name, threading.current_thread().name, value * 2
+
+    @app.route('/')
+    async def view():
+        results = await asyncio.gather(run_blocking(work, 1), run_blocking(work, 2))
+        return {'results': results}
+
+    response = app.test_client().get('/')
+    results = response.get_json()['results']
+
+    assert [r[2] for r in results] == [2, 4]
+    assert all(r[0] == app.name for r in results)
+    assert all(r[1].startswith('offload') for r in results)
+
+
+def test_run_blocking_carries_the_request_contextvars():
+    app = Flask(__name__)
+    request_id = contextvars.ContextVar('request_id', default='-')
+
+    @app.route('/')
+    async def view():
+        request_id.set('req-1')
+        return {'seen': await run_blocking(request_id.get)}
+
+    assert app.test_client().get('/').get_json() == {'seen': 'req-1'}
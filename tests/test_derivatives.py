@@ -0,0 +1,55 @@
+import io
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+from app import db
+from app.models import Upload, User
+from app.search import index
+from app.uploads import derivatives
+from app.uploads.derivatives import derivative_path, is_supported, render_derivative
+from app.uploads.storage import get_store
+
+
+def test_derivative_path_is_keyed_by_hash_size_and_format(tmp_path):
+    path = derivative_path(str(tmp_path), 'ab' + 'c' * 62, 128, 'webp')
+    assert path.endswith('derivatives/ab/ab' + 'c' * 62 + '-128.webp')
+
+
+def test_only_listed_types_get_derivatives():
+    for content_type in ('image/jpeg', 'image/png', 'image/webp', 'image/gif', 'application/pdf'):
+        assert is_supported(content_type)
+    for content_type in ('image/svg+xml', 'image/tiff', 'image/x-icon', 'text/plain'):
+        assert not is_supported(content_type)
+
+
+def test_render_derivative_fits_requested_size(tmp_path):
+    source = tmp_path / 'foto.png'
+    Image.new('RGBA', (1200, 800), (10, 120, 200, 255)).save(source)
+    target = tmp_path / 'out' / 'thumb.jpeg'
+
+    result = render_derivative(str(source), str(target), 128, 'jpeg', 'image/png')
+
+    assert result == str(target)
+    with Image.open(target) as thumb:
+        assert thumb.format == 'JPEG'
+        assert max(thumb.size) == 128
+
+
+def test_extracted_text_is_indexed_for_search(app_factory, monkeypatch):
+    app = app_factory()
+    monkeypatch.setattr(derivatives, 'get_executor', lambda app=None: ThreadPoolExecutor(1))
+    with app.app_context():
+        user = User(username='ana', email='ana@clinica')
+        user.set_password('senha-forte-1')
+        db.session.add(user)
+        digest, size = get_store().save_stream(io.BytesIO('Laudo de avaliação audiológica'.encode()))
+        upload = Upload(sha256=digest, size=size, filename='laudo.txt', content_type='text/plain',
+                        category='documents', uploaded_by=1)
+        db.session.add(upload)
+        db.session.commit()
+        assert index.search('audiologica') == []
+
+        assert derivatives.schedule_text_extraction(upload).result() == \
+            'Laudo de avaliação audiológica'
+        hits = index.search('audiologica')
+    assert [hit['object_id'] for hit in hits] == [upload.id]
+    assert '<mark>' in hits[0]['snippet']
@@ -0,0 +1,52 @@
+import time
+import pytest
+
+
+@pytest.fixture
+def app(app_factory):
+    return app_factory()
+
+
+def test_livez_skips_https_redirect_and_rate_limit(app):
+    client = app.test_client()
+    for _ in range(60):
+        response = client.get('/livez')
+        assert response.status_code == 200
+    assert 'Set-Cookie' not in response.headers
+
+
+def test_readyz_reports_cached_checks(app):
+    client = app.test_client()
+    response = client.get('/readyz?deep=1')
+    assert response.status_code == 200
+    body = response.get_json()
+    assert body['status'] == 'healthy'
+    assert body['checks']['database']['status'] == 'ok'
+
+    # Leituras seguintes usam o resultado da thread em segundo plano
+    assert client.get('/readyz').status_code == 200
+    assert client.get('/health').status_code == 200
+
+
+def test_readyz_fails_when_database_is_down(app, monkeypatch):
+    from app.utils import health
+
+    def broken(app):
+        raise RuntimeError('banco indisponível')
+
+    monkeypatch.setitem(health.CHECKS, 'database', broken)
+    response = app.test_client().get('/readyz?deep=1')
+    assert response.status_code == 503
+    assert response.get_json()['checks']['database']['error'] == 'banco indisponível'
+
+
+def test_deep_checks_are_throttled(app, monkeypatch):
+    from app.utils import health
+
+    calls = []
+    monkeypatch.setitem(health.CHECKS, 'database', lambda app: calls.append(1))
+    client = app.test_client()
+    for _ in range(5):
+        assert client.get('/readyz?deep=1').status_code == 200
+    # A thread de segundo plano e, no máximo, uma verificação profunda
+    assert len(calls) <= 2
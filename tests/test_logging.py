@@ -0,0 +1,51 @@
+import logging
+from flask import Flask
+from app.utils.logging import (setup_logging, shutdown_logging, SamplingFilter,
+                               SafeRotatingFileHandler, NonBlockingQueueHandler)
+
+
+def make_app(tmp_path, **config):
+    app = Flask(__name__)
+    app.config.update(LOG_DIR=str(tmp_path), **config)
+    return app
+
+
+def test_each_line_is_written_once(tmp_path):
+    app = make_app(tmp_path)
+    setup_logging(app)
+    setup_logging(app)  # create_app chamado de novo não duplica handlers
+
+    app.logger.info('linha unica')
+    shutdown_logging()
+
+    queue_handlers = [h for h in logging.getLogger().handlers
+                      if isinstance(h, NonBlockingQueueHandler)]
+    assert len(queue_handlers) == 1
+    assert app.logger.handlers == []
+    content = (tmp_path / 'app.log').read_text()
+    assert content.count('linha unica') == 1
+
+
+def test_sampling_keeps_warnings():
+    sampler = SamplingFilter({logging.DEBUG: 0.0, logging.INFO: 0.0})
+    make = lambda level: logging.LogRecord('x', level, __file__, 1, 'msg', None, None)
+    assert not sampler.filter(make(logging.DEBUG))
+    assert not sampler.filter(make(logging.INFO))
+    assert sampler.filter(make(logging.WARNING))
+
+
+def test_rotation_by_another_process_is_detected(tmp_path):
+    path = str(tmp_path / 'shared.log')
+    first = SafeRotatingFileHandler(path, maxBytes=200, backupCount=3)
+    second = SafeRotatingFileHandler(path, maxBytes=200, backupCount=3)
+    record = logging.LogRecord('x', logging.INFO, __file__, 1, 'x' * 80, None, None)
+
+    for _ in range(3):
+        first.emit(record)
+    # second nunca rotacionou, mas precisa escrever no arquivo novo
+    second.emit(record)
+    first.close()
+    second.close()
+
+    assert (tmp_path / 'shared.log.1').exists()
+    assert (tmp_path / 'shared.log').read_text().count('x' * 80) >= 1
@@ -0,0 +1,42 @@
+import pytest
+from app import db
+
+
+@pytest.fixture
+def app(app_factory):
+    return app_factory()
+
+
+def test_metrics_exposes_request_and_pool_metrics(app):
+    client = app.test_client()
+    client.get('/livez').close()  # como o servidor WSGI, fecha o corpo
+    with app.app_context():
+        db.session.execute(db.text('SELECT 1'))
+        db.session.remove()
+
+    body = client.get('/metrics').get_data(as_text=True)
+
+    assert 'http_request_duration_seconds_bucket{endpoint="health.livez"' in body
+    assert 'http_requests_total{endpoint="health.livez",method="GET",status="200"}' in body
+    assert 'http_requests_in_flight' in body
+    assert 'db_pool_checkouts_total' in body
+
+
+def test_metrics_token_is_enforced(app):
+    app.config['METRICS_TOKEN'] = 'segredo'
+    client = app.test_client()
+    assert client.get('/metrics').status_code == 401
+    response = client.get('/metrics', headers={'Authorization': 'Bearer segredo'})
+    assert response.status_code == 200
+
+
+def test_status_is_recorded_after_compressed_body(app):
+    client = app.test_client()
+    with client.get('/auth/login', headers={'Accept-Encoding': 'gzip'}) as response:
+        assert response.status_code == 200
+        assert response.headers['Content-Encoding'] == 'gzip'
+        response.get_data()
+
+    body = client.get('/metrics').get_data(as_text=True)
+    assert 'http_requests_total{endpoint="auth.login",method="GET",status="200"}' in body
+    assert 'http_requests_total{endpoint="auth.login",method="GET",status="500"}' not in body
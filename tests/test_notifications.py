@@ -0,0 +1,116 @@
+import json
+import threading
+import time
+from app import db
+from app.models import Notification, User
+from app.notifications import hub as hub_module
+from app.notifications.hub import EVICTED, NotificationHub, format_event, get_hub
+
+
+def test_hub_fans_out_to_every_stream_of_the_user():
+    hub = NotificationHub(max_connections=3)
+    first = hub.subscribe(1)
+    second = hub.subscribe(1)
+    other = hub.subscribe(2)
+
+    hub.publish(1, {'id': 7, 'data': {'message': 'Novo convite'}})
+
+    assert first.get_nowait()['id'] == 7
+    assert second.get_nowait()['id'] == 7
+    assert other.empty()
+
+
+def test_hub_enforces_connection_cap():
+    hub = NotificationHub(max_connections=1)
+    subscription = hub.subscribe(1)
+    assert hub.subscribe(2) is None
+
+    hub.unsubscribe(1, subscription)
+    assert hub.connections == 0
+    assert hub.subscribe(2) is not None
+
+
+def test_hub_evicts_oldest_stream_of_same_user_at_cap():
+    hub = NotificationHub(max_connections=2, queue_size=1)
+    oldest = hub.subscribe(1)
+    middle = hub.subscribe(1)
+    oldest.put_nowait({'id': 1})  # fila cheia: o aviso ainda precisa caber
+
+    newest = hub.subscribe(1)
+
+    assert newest is not None and hub.connections == 2
+    assert oldest.get_nowait() is EVICTED
+    hub.unsubscribe(1, oldest)  # o stream despejado sai sem descontar de novo
+    assert hub.connections == 2
+    hub.publish(1, {'id': 2})
+    assert middle.get_nowait()['id'] == 2 and newest.get_nowait()['id'] == 2
+
+
+def test_format_event_uses_sse_framing():
+    frame = format_event({'id': 3, 'data': {'message': 'ok'}})
+    assert frame == 'id: 3\ndata: {"message": "ok"}\n\n'
+
+
+def test_concurrent_first_requests_share_one_hub(app_factory, monkeypatch):
+    app = app_factory()
+    created = []
+    original = hub_module.NotificationHub
+
+    class SlowHub(original):
+        def __init__(self, *args, **kwargs):
+            time.sleep(0.05)  # alarga a janela entre conferir e gravar o estado
+            super().__init__(*args, **kwargs)
+            created.append(self)
+
+    monkeypatch.setattr(hub_module, 'NotificationHub', SlowHub)
+    barrier = threading.Barrier(4)
+    hubs = []
+
+    def first_request():
+        barrier.wait()
+        hubs.append(get_hub(app))
+
+    threads = [threading.Thread(target=first_request) for _ in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(created) == 1 and all(hub is created[0] for hub in hubs)
+    app.extensions['notifications']['relay'].stop()
+
+
+def test_stream_replays_backlog_and_yields_to_newer_stream(app_factory):
+    app = app_factory(SSE_MAX_CONNECTIONS=1, SSE_HEARTBEAT=1)
+    with app.app_context():
+        user = User(username='ana', email='ana@example.com', name='Ana')
+        user.set_password('senha-forte-1')
+        db.session.add(user)
+        db.session.flush()
+        db.session.add_all([
+            Notification(user_id=user.id, kind=kind, payload=json.dumps({'message': message}))
+            for kind, message in (('info', 'antiga'), ('waitlist', 'Horário liberado'))])
+        db.session.commit()
+        user_id = user.id
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+
+    app.config['SSE_MAX_DURATION'] = 0  # corpo finito: só o replay
+    with client.get('/notifications/stream', headers={'Last-Event-ID': '1'}) as response:
+        body = response.get_data(as_text=True)
+    assert response.status_code == 200 and response.mimetype == 'text/event-stream'
+    retry, event = body.strip().split('\n\n')
+    event_id, data = event.split('\n')
+    assert retry == 'retry: 5000' and event_id == 'id: 2'
+    assert json.loads(data.removeprefix('data: ')) == {'message': 'Horário liberado',
+                                                       'kind': 'waitlist'}
+
+    app.config['SSE_MAX_DURATION'] = 30
+    with client.get('/notifications/stream') as first:
+        with client.get('/notifications/stream') as second:
+            assert second.status_code == 200
+            # O stream antigo encerra em vez de o novo receber 503
+            assert first.get_data(as_text=True) == 'retry: 5000\n\nretry: 60000\n\n'
+    assert get_hub(app).connections == 0
+    app.extensions['notifications']['relay'].stop()
@@ -0,0 +1,69 @@
+import pytest
+from app import db
+from app.models import Patient
+from app.patients.search import parse_query, typeahead
+
+
+@pytest.fixture
+def patients_app(app_factory):
+    app = app_factory()
+    with app.app_context():
+        db.session.add_all([
+            Patient(name='João da Silva', cpf='123.456.789-01', phone='(11) 98765-4321'),
+            Patient(name='Joana Silveira', cpf='987.654.321-00', phone='(21) 99999-0000'),
+            Patient(name='Maria Conceição Simões', cpf='111.222.333-44', phone='(31) 3333-1234'),
+            Patient(name='José Silva Júnior', cpf='555.666.777-88'),
+        ])
+        db.session.commit()
+        yield app
+
+
+def names(query, **kwargs):
+    return [row['name'] for row in typeahead(db.session.connection(), query, **kwargs)]
+
+
+def test_parse_query_splits_names_and_digits():
+    assert parse_query('  JOÃO sil ') == (['joao', 'sil'], '')
+    assert parse_query('123.456') == ([], '123456')
+    assert parse_query('maria 3333') == (['maria'], '3333')
+
+
+def test_matches_prefix_then_any_term_ignoring_accents(patients_app):
+    assert names('joao sil') == ['João da Silva']
+    assert names('JOA') == ['Joana Silveira', 'João da Silva']
+    # Prefixo do nome completo primeiro, depois termos em qualquer posição
+    assert names('sil') == ['João da Silva', 'Joana Silveira', 'José Silva Júnior']
+    assert names('conceiçao simo') == ['Maria Conceição Simões']
+    assert names('silva jun') == ['José Silva Júnior']
+    assert names('x') == [] and names('') == []
+    assert len(names('s', limit=2)) == 2
+
+
+def test_matches_cpf_and_phone_fragments(patients_app):
+    assert names('456.789') == ['João da Silva']
+    assert names('(11) 98765') == ['João da Silva']
+    assert names('98765') == ['João da Silva', 'Joana Silveira']
+    assert names('(31) 3333') == ['Maria Conceição Simões']
+    assert names('jo 555') == ['José Silva Júnior']
+    assert names('12') == []
+
+
+def test_index_follows_updates_and_soft_delete(patients_app):
+    patient = Patient.query.filter_by(cpf='987.654.321-00').one()
+    patient.name = 'Joana Araújo'
+    db.session.commit()
+    assert names('araujo') == ['Joana Araújo']
+    assert names('silveira') == []
+
+    patient.is_deleted = True
+    db.session.commit()
+    assert names('joana') == []
+
+
+def test_typeahead_endpoint(patients_app):
+    patients_app.config['LOGIN_DISABLED'] = True
+    response = patients_app.test_client().get('/patients/typeahead?q=maria&limit=5')
+    assert response.status_code == 200
+    body = response.get_json()
+    assert [row['name'] for row in body['results']] == ['Maria Conceição Simões']
+    assert body['results'][0]['cpf'] == '111.222.333-44'
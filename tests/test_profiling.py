@@ -0,0 +1,77 @@
+import threading
+import time
+import pytest
+from app import db
+from app.models import Role, User
+from app.utils.profiling import StackSampler, hotspots, load_profiles, make_token
+
+
+def busy_loop(seconds):
+    end = time.perf_counter() + seconds
+    while time.perf_counter() < end:
+        sum(range(100))
+
+
+@pytest.fixture
+def profiled_app(app_factory, tmp_path):
+    app = app_factory(PROFILE_DIR=str(tmp_path / 'profiles'), PROFILE_INTERVAL_MS='1')
+
+    @app.route('/_slow')
+    def slow_page():
+        busy_loop(0.05)
+        return 'ok'
+
+    with app.app_context():
+        for name, role in (('admin', Role.ADMIN), ('ana', Role.USER)):
+            user = User(username=name, email=f'{name}@clinica', role=role)
+            user.set_password('senha-forte-1')
+            db.session.add(user)
+        db.session.commit()
+    return app
+
+
+def logged_in(app, user_id):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+    return client
+
+
+def test_sampler_records_the_running_function():
+    sampler = StackSampler(threading.get_ident(), interval=0.001)
+    sampler.start()
+    busy_loop(0.05)
+    stacks = sampler.stop()
+
+    assert sum(stacks.values()) > 5
+    assert any('test_profiling.py:busy_loop' in stack for stack in stacks)
+
+
+def test_signed_token_triggers_profile_and_report(profiled_app):
+    admin_token = make_token(profiled_app.config['SECRET_KEY'], 1)
+    anonymous = profiled_app.test_client()
+    anonymous.get('/_slow')
+    anonymous.get('/_slow', headers={'X-Profile': admin_token})  # token vazado, sem a sessão
+    client = logged_in(profiled_app, 1)
+    client.get('/_slow', headers={'X-Profile': 'token-falso'})
+    client.get(f'/_slow?_profile={admin_token}')  # só pelo cabeçalho
+    user = logged_in(profiled_app, 2)
+    user.get('/_slow', headers={'X-Profile': admin_token})
+    user.get('/_slow', headers={'X-Profile': make_token(profiled_app.config['SECRET_KEY'], 2)})
+    assert load_profiles(profiled_app.config['PROFILE_DIR']) == {}
+
+    client.get('/_slow', headers={'X-Profile': admin_token})
+    client.get('/_slow', headers={'X-Profile': admin_token})
+
+    count, stacks = load_profiles(profiled_app.config['PROFILE_DIR'])['slow_page']
+    assert count == 2
+    frames = [frame for frame, _, _ in hotspots(stacks)]
+    assert any(frame.endswith(':busy_loop') for frame in frames)
+
+    result = profiled_app.test_cli_runner().invoke(args=['profiles', 'report', '--top', '5'])
+    assert 'slow_page: 2 profiles' in result.output
+
+
+def test_hotspots_split_self_and_inclusive_time():
+    stacks = {'main;view;query': 3, 'main;view': 1}
+    assert hotspots(stacks) == [('query', 3, 3), ('view', 1, 4)]
@@ -0,0 +1,161 @@
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+from zoneinfo import ZoneInfo
+import pytest
+from app import db
+from app.models import Appointment, AppointmentSeries, Professional, Room
+from app.scheduling import series as series_module
+from app.scheduling.availability import find_free_slots
+from app.scheduling.booking import SchedulingConflict, book_appointment
+from app.scheduling.recurrence import expand, parse_rule
+from app.scheduling.series import (cancel_occurrence, create_series, move_occurrence,
+                                   reschedule_series, series_occurrences)
+
+UTC = timezone.utc
+SAO_PAULO = ZoneInfo('America/Sao_Paulo')
+HOUR = timedelta(hours=1)
+MONDAY = datetime(2025, 3, 10, 17, tzinfo=UTC)  # 14h em São Paulo
+
+
+@pytest.fixture
+def series_app(app_factory):
+    app = app_factory()
+    with app.app_context():
+        db.session.add_all([Professional(name='Ana'), Professional(name='Bruno'), Room(name='Sala 1')])
+        db.session.commit()
+        yield app
+
+
+def starts(rule, dtstart, window_start, window_end, tz=SAO_PAULO, duration=HOUR):
+    return [s for _, s in expand(parse_rule(rule), dtstart, duration, window_start, window_end, tz)]
+
+
+@pytest.mark.parametrize('rule', ['FREQ=YEARLY', 'FREQ=DAILY;BYDAY=MO', 'FREQ=WEEKLY;BYDAY=XX',
+                                  'FREQ=WEEKLY;COUNT=2;UNTIL=20250101', 'FREQ=DAILY;BYHOUR=9',
+                                  'FREQ=DAILY;INTERVAL=0'])
+def test_parse_rule_rejects_unsupported(rule):
+    with pytest.raises(ValueError):
+        parse_rule(rule)
+
+
+def test_far_window_matches_full_expansion():
+    rule = 'FREQ=WEEKLY;INTERVAL=2;BYDAY=MO,TH;COUNT=40'
+    everything = starts(rule, MONDAY, MONDAY, MONDAY + timedelta(days=3650))
+    assert len(everything) == 40
+    window = (MONDAY + timedelta(days=200), MONDAY + timedelta(days=260))
+    assert starts(rule, MONDAY, *window) == [s for s in everything
+                                             if s + HOUR > window[0] and s < window[1]]
+
+
+def test_monthly_skips_short_months_and_daily_counts():
+    jan31 = datetime(2025, 1, 31, 12, tzinfo=UTC)
+    found = starts('FREQ=MONTHLY;COUNT=3', jan31, jan31, jan31 + timedelta(days=400))
+    assert [s.month for s in found] == [1, 3, 5]
+    daily = starts('FREQ=DAILY;UNTIL=20250314', MONDAY, MONDAY, MONDAY + timedelta(days=30))
+    assert len(daily) == 5
+
+
+def test_keeps_wall_clock_across_dst():
+    new_york = ZoneInfo('America/New_York')
+    first = datetime(2025, 3, 3, 14, tzinfo=new_york)  # 19h UTC antes do horário de verão
+    found = starts('FREQ=WEEKLY;COUNT=3', first, first, first + timedelta(days=30), tz=new_york)
+    assert [s.hour for s in found] == [19, 18, 18]
+    assert all(s.astimezone(new_york).hour == 14 for s in found)
+
+
+def test_exceptions_cancel_and_move_occurrences(series_app):
+    series = create_series(1, MONDAY, HOUR, 'FREQ=WEEKLY;COUNT=4', room_id=1)
+    second, third = MONDAY + timedelta(weeks=1), MONDAY + timedelta(weeks=2)
+    cancel_occurrence(series, second)
+    move_occurrence(series, third, MONDAY + timedelta(days=1), MONDAY + timedelta(days=1) + HOUR)
+
+    window = series_occurrences('professional', [1], MONDAY, MONDAY + timedelta(days=3))
+    assert [(o.starts_at, o.status) for o in window] == [
+        (MONDAY, 'scheduled'), (MONDAY + timedelta(days=1), 'moved')]
+    everything = list(series_occurrences('room', [1], MONDAY, MONDAY + timedelta(days=60),
+                                         include_cancelled=True))
+    assert [o.status for o in everything] == ['scheduled', 'moved', 'cancelled', 'scheduled']
+    assert len(series.exceptions) == 2
+
+    with pytest.raises(ValueError):
+        cancel_occurrence(series, MONDAY + timedelta(days=2))
+
+
+def test_conflicts_between_series_and_bookings(series_app):
+    create_series(1, MONDAY, HOUR, 'FREQ=WEEKLY;BYDAY=MO,WE', room_id=1)
+
+    with pytest.raises(SchedulingConflict) as error:
+        book_appointment(2, MONDAY + timedelta(weeks=30), MONDAY + timedelta(weeks=30) + HOUR,
+                         room_id=1)
+    assert error.value.resource == 'room' and error.value.series_id is not None
+    assert book_appointment(1, MONDAY + timedelta(days=1), MONDAY + timedelta(days=1) + HOUR)
+
+    with pytest.raises(SchedulingConflict):
+        create_series(2, MONDAY + timedelta(weeks=5, days=2, minutes=30), HOUR,
+                      'FREQ=WEEKLY;COUNT=3', room_id=1)
+    with pytest.raises(SchedulingConflict):
+        create_series(1, MONDAY + timedelta(days=8), HOUR, 'FREQ=DAILY;COUNT=2')
+    assert create_series(2, MONDAY + timedelta(days=2, hours=1), HOUR, 'FREQ=WEEKLY', room_id=1)
+
+
+def test_reschedule_series_from_a_date(series_app):
+    series = create_series(1, MONDAY, HOUR, 'FREQ=WEEKLY;COUNT=10')
+    cancel_occurrence(series, MONDAY + timedelta(weeks=6))
+    since = MONDAY + timedelta(weeks=4)
+    replacement = reschedule_series(series, since, since + timedelta(days=1, hours=2))
+
+    assert series.rule.endswith('COUNT=4') and not series.exceptions
+    assert replacement.rule.endswith('COUNT=6')
+    found = list(series_occurrences('professional', [1], MONDAY, MONDAY + timedelta(weeks=20)))
+    assert len(found) == 10
+    assert {o.starts_at.weekday() for o in found[4:]} == {1}
+
+
+def test_free_slots_skip_series_occurrences(series_app):
+    create_series(1, MONDAY, HOUR, 'FREQ=DAILY')
+    day = MONDAY + timedelta(days=100)
+    slots = find_free_slots(HOUR, day, day + 2 * HOUR, professional_ids=[1],
+                            align=HOUR, limit=None)
+    assert [s.starts_at for s in slots] == [day + HOUR]
+
+
+def test_concurrent_series_and_booking_only_one_wins(series_app, monkeypatch):
+    # Cada escritor espera depois de conferir: sem a trava, todos passariam
+    check, find = series_module._check, series_module.find_series_conflict
+
+    def slow_check(*args):
+        check(*args)
+        time.sleep(0.2)
+
+    def slow_find(*args, **kwargs):
+        found = find(*args, **kwargs)
+        time.sleep(0.2)
+        return found
+
+    monkeypatch.setattr(series_module, '_check', slow_check)
+    monkeypatch.setattr(series_module, 'find_series_conflict', slow_find)
+    third = MONDAY + timedelta(weeks=2)
+    writers = [lambda: create_series(1, MONDAY, HOUR, 'FREQ=WEEKLY;COUNT=4'),
+               lambda: create_series(1, MONDAY + timedelta(weeks=1), HOUR, 'FREQ=WEEKLY;COUNT=2'),
+               lambda: book_appointment(1, third, third + HOUR)]
+    barrier = threading.Barrier(len(writers))
+    outcomes = []
+
+    def attempt(write):
+        with series_app.app_context():
+            barrier.wait()
+            try:
+                write()
+                outcomes.append('ok')
+            except SchedulingConflict:
+                outcomes.append('conflict')
+
+    threads = [threading.Thread(target=attempt, args=(write,)) for write in writers]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(outcomes) == ['conflict', 'conflict', 'ok']
+    assert AppointmentSeries.query.count() + Appointment.query.count() == 1
@@ -0,0 +1,178 @@
+import csv
+import hashlib
+import io
+import json
+import zipfile
+from datetime import date, datetime, time, timedelta, timezone
+import pytest
+from app import db
+from app.models import (Appointment, AppointmentStatus, Professional, ReportDay, Role, User,
+                        WorkingHours)
+from app.reports import aggregates, export
+from app.reports.queries import professional_report
+from app.scheduling.booking import book_appointment, cancel_appointment, reschedule_appointment
+from app.scheduling.series import clinic_timezone
+
+UTC = timezone.utc
+MONDAY = datetime(2025, 3, 10, 12, tzinfo=UTC)  # 9h em São Paulo
+HOUR = timedelta(hours=1)
+WEEK = (date(2025, 3, 10), date(2025, 3, 16))
+
+
+@pytest.fixture
+def reports_app(app_factory):
+    app = app_factory()
+    with app.app_context():
+        db.session.add_all([Professional(name='Ana', specialty='Psicologia'),
+                            Professional(name='Bruno', specialty='Psicologia'),
+                            Professional(name='Carla', specialty='Nutrição')])
+        db.session.flush()
+        db.session.add(WorkingHours(professional_id=1, weekday=0, start_time=time(8),
+                                    end_time=time(12)))
+        db.session.commit()
+        yield app
+
+
+def snapshot():
+    return {(row.professional_id, row.day): (
+        row.scheduled, row.completed, row.no_show, row.cancelled, row.booked_minutes,
+        row.revenue_cents) for row in ReportDay.query}
+
+
+def seed():
+    done = book_appointment(1, MONDAY, MONDAY + HOUR, price_cents=15000)
+    missed = book_appointment(1, MONDAY + HOUR, MONDAY + 2 * HOUR, price_cents=15000)
+    book_appointment(1, MONDAY + 2 * HOUR, MONDAY + 3 * HOUR, price_cents=15000)
+    other = book_appointment(2, MONDAY, MONDAY + HOUR, price_cents=20000)
+    book_appointment(3, MONDAY + timedelta(days=1), MONDAY + timedelta(days=1, hours=1),
+                     price_cents=9000)
+    done.status = AppointmentStatus.COMPLETED
+    missed.status = AppointmentStatus.NO_SHOW
+    other.status = AppointmentStatus.COMPLETED
+    db.session.commit()
+    return done, missed, other
+
+
+def test_aggregates_follow_commits_through_the_queue(reports_app):
+    done, missed, other = seed()
+    aggregates.wait()
+    assert snapshot()[(1, date(2025, 3, 10))] == (1, 1, 1, 0, 180, 15000)
+
+    reschedule_appointment(other, MONDAY + timedelta(days=2), MONDAY + timedelta(days=2, hours=1))
+    cancel_appointment(missed)
+    done.price_cents = 18000
+    db.session.commit()
+    db.session.delete(db.session.get(Appointment, 5))
+    db.session.commit()
+    aggregates.wait()
+
+    incremental = snapshot()
+    assert incremental[(1, date(2025, 3, 10))] == (1, 1, 0, 1, 120, 18000)
+    assert (2, date(2025, 3, 10)) not in incremental and (3, date(2025, 3, 11)) not in incremental
+    assert incremental[(2, date(2025, 3, 12))] == (0, 1, 0, 0, 60, 20000)
+
+    with db.engine.begin() as connection:
+        aggregates.rebuild(connection, clinic_timezone())
+    assert snapshot() == incremental
+
+
+def test_rolled_back_changes_are_not_queued(reports_app):
+    book_appointment(1, MONDAY, MONDAY + HOUR)
+    aggregates.wait()
+    appointment = db.session.get(Appointment, 1)
+    appointment.status = AppointmentStatus.NO_SHOW
+    db.session.flush()
+    db.session.rollback()
+    aggregates.wait()
+    assert snapshot()[(1, date(2025, 3, 10))] == (1, 0, 0, 0, 60, 0)
+
+
+def test_failed_refresh_is_queued_again(reports_app, monkeypatch):
+    original = aggregates.refresh
+
+    def failing(connection, days, tz):
+        raise RuntimeError('banco fora do ar')
+
+    monkeypatch.setattr(aggregates, 'refresh', failing)
+    book_appointment(1, MONDAY, MONDAY + HOUR)
+    aggregates.wait()
+    assert snapshot() == {}
+
+    monkeypatch.setattr(aggregates, 'refresh', original)
+    book_appointment(2, MONDAY, MONDAY + HOUR)
+    aggregates.wait()
+    assert set(snapshot()) == {(1, date(2025, 3, 10)), (2, date(2025, 3, 10))}
+
+
+def test_reports_read_the_aggregates(reports_app):
+    seed()
+    aggregates.wait()
+    rows = {row['name']: row for row in professional_report(*WEEK)}
+    assert rows['Ana']['revenue_cents'] == 15000 and rows['Ana']['no_show_rate'] == 0.5
+    assert (rows['Ana']['open_minutes'], rows['Ana']['occupancy']) == (240, 0.75)
+    assert rows['Bruno']['occupancy'] is None
+
+    by_specialty = {row['specialty']: row for row in professional_report(*WEEK, group='specialty')}
+    assert by_specialty['Psicologia']['revenue_cents'] == 35000
+    assert by_specialty['Nutrição']['scheduled'] == 1
+
+    client = login(reports_app, Role.ADMIN)
+    for group in ('professional', 'specialty'):
+        response = client.get(f'/reports/professionals?start=2025-03-10&end=2025-03-16&group={group}')
+        assert response.get_json()['rows'] == json.loads(json.dumps(
+            professional_report(*WEEK, group=group)))
+
+
+def login(app, role):
+    user = User(username=role.value, email=f'{role.value}@clinica', role=role)
+    user.set_password('senha-forte-1')
+    db.session.add(user)
+    db.session.commit()
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user.id)
+    return client
+
+
+def test_reports_are_restricted_to_admins(reports_app):
+    client = login(reports_app, Role.USER)
+    assert client.get('/reports/professionals').status_code == 403
+    assert client.get('/reports/export/daily.csv').status_code == 403
+
+
+def test_csv_cells_never_start_a_formula():
+    rows = [(1, '=HYPERLINK("http://x")', '+55 11', '-1', '@SUM(A1)', 'Ana', -1)]
+    body = b''.join(export.csv_stream(('n', 'a', 'b', 'c', 'd', 'e', 'f'), iter(rows)))
+    assert list(csv.reader(io.StringIO(body.decode('utf-8-sig'))))[1] == [
+        '1', '\'=HYPERLINK("http://x")', "'+55 11", "'-1", "'@SUM(A1)", 'Ana', '-1']
+
+
+def test_exports_are_streamed_in_chunks(reports_app, monkeypatch):
+    seed()
+    aggregates.wait()
+    client = login(reports_app, Role.ADMIN)
+
+    response = client.get('/reports/export/appointments.csv?start=2025-03-10&end=2025-03-16')
+    assert response.is_streamed and response.mimetype == 'text/csv'
+    rows = list(csv.reader(io.StringIO(response.get_data().decode('utf-8-sig'))))
+    assert rows[0][0] == 'Atendimento' and len(rows) == 6
+    assert rows[1][1:] == ['2025-03-10T12:00:00+00:00', '2025-03-10T13:00:00+00:00', 'Ana',
+                           'Psicologia', 'completed', '15000']
+
+    response = client.get('/reports/export/daily.xlsx?start=2025-03-10&end=2025-03-16')
+    with zipfile.ZipFile(io.BytesIO(response.get_data())) as package:
+        assert package.testzip() is None
+        sheet = package.read('xl/worksheets/sheet1.xml').decode()
+    assert sheet.count('<row>') == 4 and '<t>Nutrição</t>' in sheet
+
+    assert client.get('/reports/export/daily.pdf').status_code == 404
+    assert client.get('/reports/professionals?start=2025-03-16&end=2025-03-10').status_code == 400
+
+    monkeypatch.setattr(export, 'CHUNK_SIZE', 4096)
+    rows = [(n, f'<{hashlib.sha256(str(n).encode()).hexdigest()}> & cia') for n in range(5000)]
+    chunks = list(export.xlsx_stream(('n', 'texto'), iter(rows)))
+    assert len(chunks) > 5 and max(len(chunk) for chunk in chunks) < 64 * 1024
+    with zipfile.ZipFile(io.BytesIO(b''.join(chunks))) as package:
+        sheet = package.read('xl/worksheets/sheet1.xml').decode()
+    assert sheet.count('<row>') == 5001 and f'<t>&lt;{rows[-1][1][1:-7]}&gt; &amp; cia</t>' in sheet
+    assert len(list(export.csv_stream(('n', 'texto'), iter(rows)))) > 5
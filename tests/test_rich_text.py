@@ -0,0 +1,84 @@
+from datetime import datetime, timedelta, timezone
+import pytest
+from sqlalchemy import text
+from app import db
+from app.models import Appointment, Professional
+from app.scheduling.booking import book_appointment
+from app.utils import rich_text
+from app.utils.metrics import CACHE_REQUESTS
+from security import sanitization
+
+START = datetime(2025, 3, 10, 12, tzinfo=timezone.utc)
+HOUR = timedelta(hours=1)
+
+
+@pytest.fixture
+def markdown_app(app_factory):
+    app = app_factory()
+    with app.app_context():
+        db.session.add(Professional(name='Ana'))
+        db.session.commit()
+        yield app
+
+
+def cache_count(result):
+    return CACHE_REQUESTS.labels('markdown', result)._value.get()
+
+
+def test_html_is_rendered_on_write_and_only_when_the_text_changes(markdown_app):
+    appointment = book_appointment(1, START, START + HOUR,
+                                   notes='**Jejum** <script>alert(1)</script>')
+    assert appointment.notes_html == '<p><strong>Jejum</strong> &lt;script&gt;alert(1)&lt;/script&gt;</p>'
+    assert appointment.notes_html_version == sanitization.SANITIZER_VERSION
+
+    db.session.execute(text("UPDATE appointment SET notes_html = 'marcado'"))
+    db.session.commit()
+    appointment = db.session.get(Appointment, appointment.id)
+    appointment.ends_at = START + 2 * HOUR
+    db.session.commit()
+    assert appointment.notes_html == 'marcado'
+    assert str(rich_text.rendered(appointment)) == 'marcado'
+
+    appointment.notes = 'Trazer *exames*'
+    db.session.commit()
+    assert appointment.notes_html == '<p>Trazer <em>exames</em></p>'
+    appointment.notes = None
+    db.session.commit()
+    assert (appointment.notes_html, appointment.notes_html_version) == (None, None)
+
+
+def test_ad_hoc_renders_are_cached_by_content(markdown_app):
+    sanitization.render_cache.clear()
+    hits, misses = cache_count('hit'), cache_count('miss')
+    source = 'Texto *único* para o cache'
+    first = sanitization.safe_markdown(source)
+    assert sanitization.safe_markdown(source) == first == '<p>Texto <em>único</em> para o cache</p>'
+    assert (cache_count('hit') - hits, cache_count('miss') - misses) == (1, 1)
+    assert sanitization.safe_markdown(source, html='<p>gravado</p>') == '<p>gravado</p>'
+
+    template = markdown_app.jinja_env.from_string('{{ text|markdown }}')
+    assert template.render(text='**a**') == '<p><strong>a</strong></p>'
+
+
+@pytest.mark.parametrize('workers', [0, 2])
+def test_rerender_rebuilds_only_stale_rows(markdown_app, monkeypatch, workers):
+    for n in range(5):
+        book_appointment(1, START + n * HOUR, START + (n + 1) * HOUR, notes=f'**Nota {n}**')
+    book_appointment(1, START + 6 * HOUR, START + 7 * HOUR)
+    db.session.execute(text("UPDATE appointment SET notes_html_version = 'antiga' WHERE id IN (2, 4)"))
+    db.session.commit()
+
+    with db.engine.connect() as connection:
+        counts = rich_text.rerender(connection, batch_size=1, workers=workers)
+    assert counts == {'appointment.notes': 2, 'appointment_series.notes': 0}
+
+    monkeypatch.setattr(sanitization, 'ALLOWED_TAGS', ['p', 'em'])
+    monkeypatch.setattr(sanitization, 'SANITIZER_VERSION', 'sem-strong')
+    with db.engine.connect() as connection:
+        counts = rich_text.rerender(connection, batch_size=2, workers=workers)
+    assert counts['appointment.notes'] == 5
+    db.session.expire_all()
+    rows = Appointment.query.filter(Appointment.notes.isnot(None)).order_by(Appointment.id).all()
+    assert [row.notes_html for row in rows] == [
+        f'<p>&lt;strong&gt;Nota {n}&lt;/strong&gt;</p>' for n in range(5)]
+    assert {row.notes_html_version for row in rows} == {'sem-strong'}
@@ -0,0 +1,86 @@
+import threading
+from datetime import datetime, timedelta, timezone
+import pytest
+from app import db
+from app.models import Appointment, AppointmentStatus, Professional, Room
+from app.scheduling.booking import (SchedulingConflict, book_appointment, cancel_appointment,
+                                    find_conflict, reschedule_appointment)
+
+START = datetime(2025, 3, 10, 9, 0)
+
+
+def slot(minutes, length=30):
+    return START + timedelta(minutes=minutes), START + timedelta(minutes=minutes + length)
+
+
+@pytest.fixture
+def agenda_app(app_factory):
+    app = app_factory()
+    with app.app_context():
+        db.session.add_all([Professional(name='Ana', specialty='Fonoaudiologia'),
+                            Professional(name='Bruno', specialty='Psicologia'),
+                            Room(name='Sala 1')])
+        db.session.commit()
+        yield app
+
+
+def test_professional_and_room_conflicts_are_rejected(agenda_app):
+    first = book_appointment(1, *slot(0), room_id=1)
+    book_appointment(1, *slot(30))  # encostado no anterior: intervalo semiaberto
+
+    with pytest.raises(SchedulingConflict) as error:
+        book_appointment(1, *slot(5, length=10))
+    assert error.value.resource == 'professional'
+    assert error.value.conflicting_id == first.id
+
+    with pytest.raises(SchedulingConflict) as error:
+        book_appointment(2, *slot(29), room_id=1)
+    assert error.value.resource == 'room'
+
+    assert Appointment.query.count() == 2
+    assert find_conflict('professional', 1, *slot(60)) is None
+
+
+def test_cancel_frees_slot_and_reschedule_is_checked(agenda_app):
+    first = book_appointment(1, *slot(0))
+    second = book_appointment(1, *slot(60))
+
+    with pytest.raises(SchedulingConflict):
+        reschedule_appointment(second, *slot(10))
+    assert db.session.get(Appointment, second.id).starts_at == START + timedelta(minutes=60)
+
+    cancel_appointment(first)
+    assert first.status == AppointmentStatus.CANCELLED
+    moved = reschedule_appointment(db.session.get(Appointment, second.id), *slot(10))
+    assert moved.starts_at == START + timedelta(minutes=10)
+
+
+def test_aware_datetimes_are_stored_in_utc(agenda_app):
+    local = timezone(timedelta(hours=-3))
+    book_appointment(1, datetime(2025, 3, 10, 6, 0, tzinfo=local),
+                     datetime(2025, 3, 10, 6, 30, tzinfo=local))
+    with pytest.raises(SchedulingConflict):
+        book_appointment(1, *slot(0))
+
+
+def test_concurrent_bookings_of_same_slot_only_one_wins(agenda_app):
+    barrier = threading.Barrier(8)
+    outcomes = []
+
+    def attempt():
+        with agenda_app.app_context():
+            barrier.wait()
+            try:
+                book_appointment(1, *slot(0))
+                outcomes.append('ok')
+            except SchedulingConflict:
+                outcomes.append('conflict')
+
+    threads = [threading.Thread(target=attempt) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(outcomes) == ['conflict'] * 7 + ['ok']
+    assert Appointment.query.count() == 1
@@ -0,0 +1,46 @@
+from sqlalchemy import create_engine
+from app.models import SearchEntry
+from app.search.index import create_search_ddl, upsert_entries, delete_entries, run_search
+
+
+def make_engine():
+    engine = create_engine('sqlite://')
+    with engine.begin() as conn:
+        SearchEntry.__table__.create(conn)
+        create_search_ddl(conn)
+    return engine
+
+
+def test_search_is_accent_insensitive_and_highlighted():
+    engine = make_engine()
+    with engine.begin() as conn:
+        upsert_entries(conn, [
+            {'kind': 'document', 'object_id': 1, 'title': 'Avaliação fonoaudiológica',
+             'body': 'Paciente apresenta evolução na comunicação.'},
+            {'kind': 'document', 'object_id': 2, 'title': 'Receita', 'body': 'Sem alterações'},
+        ])
+        hits = run_search(conn, 'avaliacao fono')
+
+    assert [hit['object_id'] for hit in hits] == [1]
+    assert '<mark>' in hits[0]['snippet']
+
+
+def test_upsert_replaces_and_delete_removes():
+    engine = make_engine()
+    with engine.begin() as conn:
+        upsert_entries(conn, [{'kind': 'document', 'object_id': 1, 'title': 'antigo', 'body': ''}])
+        upsert_entries(conn, [{'kind': 'document', 'object_id': 1, 'title': 'novo', 'body': ''}])
+        assert run_search(conn, 'antigo') == []
+        assert len(run_search(conn, 'novo')) == 1
+
+        delete_entries(conn, [{'kind': 'document', 'object_id': 1}])
+        assert run_search(conn, 'novo') == []
+
+
+def test_snippet_escapes_indexed_html():
+    engine = make_engine()
+    with engine.begin() as conn:
+        upsert_entries(conn, [{'kind': 'document', 'object_id': 1, 'title': 'laudo',
+                               'body': '<script>alert(1)</script> laudo'}])
+        hits = run_search(conn, 'laudo')
+    assert '<script>' not in hits[0]['snippet']
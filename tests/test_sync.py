@@ -0,0 +1,145 @@
+import gzip
+import json
+import zlib
+from datetime import datetime, timedelta, timezone
+import pytest
+from sqlalchemy import text
+from sqlalchemy.exc import DataError
+from app import db
+from app.clinical import notes
+from app.clinical.notes import add_note, correct_note
+from app.models import Appointment, AppointmentStatus, ClinicalNote, Patient, Professional
+from app.scheduling.booking import book_appointment
+from app.sync.batch import apply_batch
+from app.utils.compression import BodyTooLarge, decode_request_body
+
+START = datetime(2025, 3, 10, 12, tzinfo=timezone.utc)
+HOUR = timedelta(hours=1)
+
+
+@pytest.fixture
+def sync_app(app_factory):
+    app = app_factory()
+    with app.app_context():
+        db.session.add_all([Professional(name='Ana'), Patient(name='Maria', phone='11 9999-0000')])
+        db.session.commit()
+        yield app
+
+
+def test_versions_turn_stale_edits_into_conflicts(sync_app):
+    first = book_appointment(1, START, START + HOUR)
+    second = book_appointment(1, START + HOUR, START + 2 * HOUR)
+    note = add_note(1, 'Primeira evolução', noted_at=START)
+    correct_note(note, 'Corrigida no consultório')
+    second.notes = 'Editado no servidor'
+    db.session.commit()
+    assert (first.version, second.version) == (1, 2)
+
+    response = apply_batch('lote-0001', [
+        {'op': 'appointment.update', 'id': first.id, 'version': 1,
+         'changes': {'status': 'completed', 'notes': 'Sessão **ok**'}},
+        {'op': 'appointment.update', 'id': second.id, 'version': 1,
+         'changes': {'status': 'no_show'}},
+        {'op': 'patient.update', 'id': 1, 'version': 1, 'changes': {'phone': '11 8888-0000'}},
+        {'op': 'clinical_note.create', 'patient_id': 1, 'content': 'Evolução offline',
+         'noted_at': '2025-03-10T13:00:00+00:00'},
+        {'op': 'clinical_note.correct', 'id': note.id, 'content': 'Correção offline'},
+        {'op': 'appointment.update', 'id': first.id, 'version': 2, 'changes': {'status': 'x'}},
+        {'op': 'patient.delete', 'id': 1},
+    ], user_id=None)
+
+    assert [r['status'] for r in response['results']] == [
+        'applied', 'conflict', 'applied', 'applied', 'conflict', 'rejected', 'rejected']
+    assert (response['applied'], response['conflicts'], response['rejected']) == (3, 2, 2)
+    assert response['results'][0]['version'] == 2
+    assert response['results'][1]['current'] == {
+        'id': second.id, 'version': 2, 'status': 'scheduled', 'notes': 'Editado no servidor',
+        'starts_at': '2025-03-10T13:00:00+00:00', 'ends_at': '2025-03-10T14:00:00+00:00',
+        'is_deleted': False}
+    assert response['results'][4]['current']['version'] == 2
+
+    db.session.expire_all()
+    assert db.session.get(Appointment, first.id).status == AppointmentStatus.COMPLETED
+    assert db.session.get(Appointment, first.id).notes_html == '<p>Sessão <strong>ok</strong></p>'
+    assert db.session.get(Appointment, second.id).status == AppointmentStatus.SCHEDULED
+    patient = db.session.get(Patient, 1)
+    assert (patient.phone, patient.version, patient.search_digits) == ('11 8888-0000', 2, '1188880000')
+    assert ClinicalNote.query.count() == 3
+
+
+def test_concurrent_update_is_caught_at_flush(sync_app):
+    appointment = book_appointment(1, START, START + HOUR)
+    db.session.execute(text('UPDATE appointment SET version = 5'))  # outra gravação, sem a sessão
+    response = apply_batch('lote-0002', [{'op': 'appointment.update', 'id': appointment.id,
+                                          'version': 1, 'changes': {'status': 'completed'}}])
+    result = response['results'][0]
+    assert result['status'] == 'conflict' and result['current']['version'] == 5
+
+
+def test_malformed_values_reject_only_their_item(sync_app, monkeypatch):
+    appointment = book_appointment(1, START, START + HOUR)
+    note = add_note(1, 'Primeira evolução', noted_at=START)
+    response = apply_batch('lote-0005', [
+        {'op': 'patient.update', 'id': 1, 'version': 1, 'changes': {'name': 123}},
+        {'op': 'patient.update', 'id': 1, 'version': 1, 'changes': {'phone': {'ddd': 11}}},
+        {'op': 'patient.update', 'id': 1, 'version': 1, 'changes': {'email': 'x' * 121}},
+        {'op': 'appointment.update', 'id': appointment.id, 'version': 1,
+         'changes': {'status': ['completed']}},
+        {'op': 'appointment.update', 'id': appointment.id, 'version': 1,
+         'changes': {'notes': {'texto': 'ok'}}},
+        {'op': 'clinical_note.create', 'patient_id': 1, 'content': 'Evolução', 'title': ['a']},
+        {'op': 'clinical_note.create', 'patient_id': 1, 'content': 'Evolução',
+         'professional_id': 99},
+        {'op': 'clinical_note.correct', 'id': note.id, 'content': 'Correção', 'reason': 'x' * 201},
+        {'op': 'patient.update', 'id': 1, 'version': 1, 'changes': {'name': 'Maria Souza'}},
+    ])
+    assert [r['status'] for r in response['results']] == ['rejected'] * 8 + ['applied']
+
+    def refused(*args, **kwargs):
+        raise DataError('INSERT INTO clinical_note ...', {}, Exception('value too long'))
+
+    monkeypatch.setattr(notes, 'add_note', refused)
+    response = apply_batch('lote-0006', [
+        {'op': 'clinical_note.create', 'patient_id': 1, 'content': 'Evolução'},
+        {'op': 'appointment.update', 'id': appointment.id, 'version': 1,
+         'changes': {'status': 'completed'}}])
+    assert [r['status'] for r in response['results']] == ['rejected', 'applied']
+
+
+def test_batch_route_accepts_gzip_and_replays(sync_app):
+    sync_app.config['LOGIN_DISABLED'] = True
+    appointment = book_appointment(1, START, START + HOUR)
+    client = sync_app.test_client()
+    payload = {'batch_id': 'lote-0003', 'mutations': [
+        {'op': 'appointment.update', 'id': appointment.id, 'version': 1,
+         'changes': {'status': 'completed'}},
+        {'op': 'clinical_note.create', 'patient_id': 1, 'content': 'Evolução offline'}]}
+    body = gzip.compress(json.dumps(payload).encode())
+
+    first = client.post('/sync/batch', data=body, content_type='application/json',
+                        headers={'Content-Encoding': 'gzip'}).get_json()
+    assert first['applied'] == 2 and first['replayed'] is False
+    again = client.post('/sync/batch', data=body, content_type='application/json',
+                        headers={'Content-Encoding': 'gzip'}).get_json()
+    assert again['replayed'] is True and again['results'] == first['results']
+    assert ClinicalNote.query.count() == 1
+
+    assert client.post('/sync/batch', data=b'{', content_type='application/json').status_code == 400
+    assert client.post('/sync/batch', data=json.dumps({'mutations': []}),
+                       content_type='application/json').status_code == 400
+    sync_app.config['SYNC_MAX_BYTES'] = 1024
+    bomb = gzip.compress(json.dumps({'batch_id': 'lote-0004', 'pad': ' ' * 100000}).encode())
+    assert client.post('/sync/batch', data=bomb, content_type='application/json',
+                       headers={'Content-Encoding': 'gzip'}).status_code == 413
+
+
+def test_decode_request_body_limits():
+    data = b'{"a": 1}'
+    assert decode_request_body(zlib.compress(data), 'deflate', 100) == data
+    assert decode_request_body(data, None, 100) == data
+    with pytest.raises(BodyTooLarge):
+        decode_request_body(gzip.compress(b'x' * 10000), 'gzip', 100)
+    with pytest.raises(ValueError):
+        decode_request_body(gzip.compress(data)[:-8], 'gzip', 100)
+    with pytest.raises(ValueError):
+        decode_request_body(data, 'br', 100)
@@ -0,0 +1,69 @@
+import pytest
+from sqlalchemy import create_engine, text
+from werkzeug.security import check_password_hash
+from app import db
+from app.models import User, Role, InviteToken, UserActivity
+from app.services.synthetic import seed_synthetic
+
+
+@pytest.fixture
+def seeded_app(app_factory):
+    return app_factory(FLASK_ENV='development')
+
+
+def test_cli_seeds_users_invites_and_activities(seeded_app):
+    result = seeded_app.test_cli_runner().invoke(args=[
+        'seed-synthetic', '--users', '2500', '--invites', '40', '--activities', '100',
+        '--password', 'senha-teste', '--batch-size', '1000'])
+    assert '2640 rows' in result.output
+
+    with seeded_app.app_context():
+        assert User.query.count() == 2500
+        assert InviteToken.query.count() == 40
+        assert UserActivity.query.count() == 100
+
+        admin = db.session.get(User, 1001)
+        assert admin.role == Role.ADMIN and admin.is_admin()
+        assert db.session.get(User, 10).is_active is False
+        assert check_password_hash(db.session.get(User, 7).password, 'senha-teste')
+        assert {a.admin_id for a in UserActivity.query} <= {1, 1001, 2001}
+        assert db.session.execute(text('PRAGMA synchronous')).scalar() == 2
+
+
+def test_cli_refuses_production_and_uses_random_password(app_factory):
+    app = app_factory(FLASK_ENV='production')
+    runner = app.test_cli_runner()
+    result = runner.invoke(args=['seed-synthetic', '--users', '2'])
+    assert 'Refusing' in result.output
+    with app.app_context():
+        assert User.query.count() == 0
+
+    result = runner.invoke(args=['seed-synthetic', '--users', '2', '--force'])
+    password = result.output.split('password: ')[1].split()[0]
+    with app.app_context():
+        hashes = [u.password for u in User.query]
+    assert len(hashes) == 2 and all(check_password_hash(h, password) for h in hashes)
+    assert not check_password_hash(hashes[0], 'senha-sintetica')
+
+
+def test_same_seed_gives_same_data_and_reruns_append(seeded_app):
+    with seeded_app.app_context():
+        seed_synthetic(db.engine, users=20, invites=5, seed=7)
+        first = [(u.username, u.name) for u in User.query.order_by(User.id)]
+        tokens = [i.token for i in InviteToken.query.order_by(InviteToken.id)]
+
+        seed_synthetic(db.engine, users=20, invites=5, seed=7)
+        assert User.query.count() == 40
+        assert InviteToken.query.count() == 10
+        assert db.session.get(User, 21).username == 'user21'
+
+    other_db = seeded_app.config['SQLALCHEMY_DATABASE_URI'].replace('app.db', 'other.db')
+    engine = create_engine(other_db)
+    db.metadata.create_all(engine, tables=[User.__table__, InviteToken.__table__,
+                                           UserActivity.__table__])
+    seed_synthetic(engine, users=20, invites=5, seed=7)
+    with engine.connect() as connection:
+        again = [tuple(r) for r in connection.execute(text('SELECT username, name FROM "user" ORDER BY id'))]
+        again_tokens = [r[0] for r in connection.execute(text('SELECT token FROM invite_token ORDER BY id'))]
+    assert again == first
+    assert again_tokens == tokens
@@ -0,0 +1,95 @@
+import json
+import logging
+import pytest
+from flask import Response, render_template_string
+from app import db
+from app.models import User
+from app.utils.tracing import RequestIdFilter, current_request_id, span, Trace, _current
+
+
+@pytest.fixture
+def traced_app(app_factory, tmp_path):
+    return app_factory(TRACE_SAMPLE_RATE='1', TRACE_FILE=str(tmp_path / 'traces.jsonl'))
+
+
+def read_spans(app):
+    app.extensions['tracing'].flush()
+    with open(app.config['TRACE_FILE']) as trace_file:
+        batches = [json.loads(line) for line in trace_file]
+    return [[s for s in batch['resourceSpans'][0]['scopeSpans'][0]['spans']]
+            for batch in batches]
+
+
+def test_request_phases_are_exported_as_otlp(traced_app):
+    @traced_app.route('/_trace')
+    def traced_page():
+        return render_template_string('{{ current_user.username }}')
+
+    with traced_app.app_context():
+        user = User(username='ana', email='ana@example.com', name='Ana')
+        user.set_password('senha-forte-1')
+        db.session.add(user)
+        db.session.commit()
+        user_id = user.id
+
+    client = traced_app.test_client()
+    client.post('/auth/login', data={'email': 'x@example.com', 'password': 'errada'}).close()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+    response = client.get('/_trace', headers={'X-Request-ID': 'req-12345678'})
+    response.close()  # como o servidor WSGI; o trace termina no close() do corpo
+
+    assert response.headers['X-Request-ID'] == 'req-12345678'
+    login, page = read_spans(traced_app)[-2:]
+
+    assert {'form.validate', 'db.query', 'template.render'} <= {s['name'] for s in login}
+
+    names = {s['name'] for s in page}
+    assert {'session.open', 'flask_login.user_loader', 'db.query',
+            'template.render', 'session.save', 'GET traced_page'} <= names
+    root = next(s for s in page if not s['parentSpanId'])
+    assert {'key': 'request.id', 'value': {'stringValue': 'req-12345678'}} in root['attributes']
+    assert all(s['traceId'] == root['traceId'] for s in page)
+
+
+def test_root_span_covers_compressed_body(traced_app):
+    seen = []
+
+    @traced_app.route('/_stream')
+    def streamed():
+        def rows():
+            for n in range(200):
+                seen.append(current_request_id())
+                yield f'linha {n:04d} de um relatório qualquer\n'
+        return Response(rows(), mimetype='text/csv')
+
+    client = traced_app.test_client()
+    with client.get('/_stream', headers={'Accept-Encoding': 'gzip',
+                                         'X-Request-ID': 'req-87654321'}) as response:
+        assert response.headers['Content-Encoding'] == 'gzip'
+        response.get_data()
+
+    root = next(s for s in read_spans(traced_app)[-1] if not s['parentSpanId'])
+    assert {'key': 'http.status_code', 'value': {'intValue': '200'}} in root['attributes']
+    assert set(seen) == {'req-87654321'}
+    assert current_request_id() is None
+
+
+def test_invalid_request_id_is_replaced(traced_app):
+    with traced_app.test_client().get('/livez', headers={'X-Request-ID': 'x;y'}) as response:
+        pass
+    assert len(response.headers['X-Request-ID']) == 32
+
+
+def test_log_records_carry_request_id():
+    record = logging.LogRecord('x', logging.INFO, __file__, 1, 'msg', None, None)
+    RequestIdFilter().filter(record)
+    assert record.request_id == '-'
+
+    token = _current.set(Trace('abc12345'))
+    try:
+        with span('fase'):
+            RequestIdFilter().filter(record)
+    finally:
+        _current.reset(token)
+    assert record.request_id == 'abc12345'
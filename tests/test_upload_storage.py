@@ -0,0 +1,85 @@
+import hashlib
+import io
+import os
+import pytest
+from werkzeug.exceptions import RequestEntityTooLarge
+from app import db
+from app.models import Role, Upload, User
+from app.uploads.storage import ContentStore, get_store
+
+
+def test_save_stream_is_content_addressed(tmp_path):
+    store = ContentStore(str(tmp_path), chunk_size=1024)
+    data = os.urandom(10 * 1024 + 7)
+
+    digest, size = store.save_stream(io.BytesIO(data))
+
+    assert digest == hashlib.sha256(data).hexdigest()
+    assert size == len(data)
+    with open(store.path_for(digest), 'rb') as f:
+        assert f.read() == data
+
+
+def test_identical_content_is_deduplicated(tmp_path):
+    store = ContentStore(str(tmp_path))
+    first, _ = store.save_stream(io.BytesIO(b'exame'))
+    second, _ = store.save_stream(io.BytesIO(b'exame'))
+
+    assert first == second
+    assert os.listdir(os.path.dirname(store.path_for(first))) == [first]
+    assert os.listdir(store.tmp_dir) == []
+
+
+def test_oversized_stream_is_rejected(tmp_path):
+    store = ContentStore(str(tmp_path), chunk_size=4)
+    with pytest.raises(RequestEntityTooLarge):
+        store.save_stream(io.BytesIO(b'x' * 100), max_size=10)
+    assert os.listdir(store.tmp_dir) == []
+
+
+@pytest.fixture
+def uploads_app(app_factory):
+    app = app_factory()
+    with app.app_context():
+        for name, role in (('ana', Role.USER), ('bia', Role.USER), ('admin', Role.ADMIN)):
+            user = User(username=name, email=f'{name}@clinica', role=role)
+            user.set_password('senha-forte-1')
+            db.session.add(user)
+        db.session.commit()
+    # Sem contexto aberto: o usuário logado fica em cache no ``g`` do contexto
+    return app
+
+
+def logged_in(app, user_id):
+    client = app.test_client()
+    with client.session_transaction() as session:
+        session['_user_id'] = str(user_id)
+    return client
+
+
+def test_downloads_are_isolated_and_only_safe_types_open_inline(uploads_app):
+    ana = logged_in(uploads_app, 1)
+    page = ana.post('/uploads/documents', data=b'<script>alert(1)</script>',
+                    content_type='text/html', headers={'X-Filename': 'exame.html'})
+    html_id = page.get_json()['id']
+    with uploads_app.app_context():
+        digest, size = get_store().save_stream(io.BytesIO(b'%PDF-1.4 laudo'))
+        pdf = Upload(sha256=digest, size=size, filename='laudo.pdf',
+                     content_type='application/pdf', category='documents', uploaded_by=1)
+        db.session.add(pdf)
+        db.session.commit()
+        pdf_id = pdf.id
+
+    with ana.get(f'/uploads/{html_id}') as response:
+        assert response.mimetype == 'application/octet-stream'
+        assert response.headers['Content-Disposition'].startswith('attachment')
+        assert response.headers['X-Content-Type-Options'] == 'nosniff'
+        policy = response.headers['Content-Security-Policy']
+        assert 'sandbox' in [directive.strip() for directive in policy.split(';')]
+    with ana.get(f'/uploads/{pdf_id}') as response:
+        assert response.mimetype == 'application/pdf'
+        assert response.headers['Content-Disposition'].startswith('inline')
+
+    assert logged_in(uploads_app, 2).get(f'/uploads/{pdf_id}').status_code == 404
+    with logged_in(uploads_app, 3).get(f'/uploads/{pdf_id}') as response:
+        assert response.status_code == 200
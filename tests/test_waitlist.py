@@ -0,0 +1,131 @@
+import json
+from datetime import date, datetime, time, timedelta
+from zoneinfo import ZoneInfo
+import pytest
+from app import db
+from app.models import (AppointmentStatus, Notification, Patient, Professional, User,
+                        WaitlistEntry, WaitlistStatus)
+from app.scheduling.booking import book_appointment, cancel_appointment
+from app.waitlist import matching
+
+TZ = ZoneInfo('America/Sao_Paulo')
+# Próxima segunda-feira, sempre no futuro
+MONDAY = date.today() + timedelta(days=7 - date.today().weekday())
+MORNING = (0, 8 * 60, 12 * 60)
+
+
+def local(day, hour, minute=0):
+    return datetime.combine(day, time(hour, minute), tzinfo=TZ)
+
+
+@pytest.fixture
+def waitlist_app(app_factory):
+    app = app_factory()
+    with app.app_context():
+        db.session.add_all([
+            User(username='recepcao', email='recepcao@clinica', password='x'),
+            User(username='ana', email='ana@clinica', password='x'),
+            Professional(name='Ana', specialty='Fisioterapia', user_id=2),
+            Professional(name='Bia', specialty='Fisioterapia'),
+            Professional(name='Caio', specialty='Psicologia'),
+        ] + [Patient(name=name) for name in ('Maria', 'João', 'Rita', 'Lia', 'Téo')])
+        db.session.commit()
+        yield app
+
+
+def test_candidates_ranked_by_target_priority_and_arrival(waitlist_app):
+    maria = matching.add_entry(1, 50, [MORNING], specialty='Fisioterapia')
+    joao = matching.add_entry(2, 50, [MORNING], professional_id=1)
+    rita = matching.add_entry(3, 50, [MORNING, (0, 9 * 60, 11 * 60)], specialty='Fisioterapia',
+                              priority=2)
+    matching.add_entry(4, 50, [(0, 10 * 60, 12 * 60)], professional_id=1)  # começa depois
+    matching.add_entry(4, 90, [MORNING], professional_id=1)  # não cabe no horário
+    matching.add_entry(5, 50, [MORNING], specialty='Psicologia')
+    matching.add_entry(5, 50, [MORNING], professional_id=2)
+    matching.add_entry(5, 50, [MORNING], professional_id=1,
+                       earliest_day=MONDAY + timedelta(days=1))
+    matching.add_entry(5, 50, [(1, 8 * 60, 12 * 60)], professional_id=1)  # terça
+    closed = matching.add_entry(5, 50, [MORNING], professional_id=1)
+    matching.close_entry(closed, WaitlistStatus.BOOKED)
+
+    candidates = matching.find_candidates(1, local(MONDAY, 9), local(MONDAY, 10))
+    assert [c['entry_id'] for c in candidates] == [joao.id, rita.id, maria.id]
+    assert [c['match_rank'] for c in candidates] == [0, 1, 1]
+    assert candidates[0]['patient_name'] == 'João'
+    assert matching.find_candidates(1, local(MONDAY, 9), local(MONDAY, 10), limit=1) == candidates[:1]
+    assert matching.find_candidates(1, local(MONDAY, 9), local(MONDAY, 10), limit=2) == candidates[:2]
+    assert matching.find_candidates(1, local(MONDAY, 11, 30), local(MONDAY, 12, 30)) == []
+    assert db.session.get(WaitlistEntry, closed.id).windows == []
+    db.session.get(Patient, 1).is_deleted = True
+    db.session.commit()
+    assert [c['entry_id'] for c in matching.find_candidates(1, local(MONDAY, 9),
+                                                            local(MONDAY, 10))] == [joao.id, rita.id]
+
+    with pytest.raises(matching.InvalidEntry):
+        matching.add_entry(1, 50, [MORNING])
+    with pytest.raises(matching.InvalidEntry):
+        matching.add_entry(1, 50, [(0, 600, 630)], professional_id=1)
+
+
+def test_lookup_uses_window_indexes(waitlist_app):
+    params = {'professional_id': 1, 'specialty': 'Fisioterapia', 'weekday': 0, 'minute': 540,
+              'length': 60, 'day': MONDAY.isoformat(), 'limit': 5}
+    compiled = matching.CANDIDATES_SQL.compile(db.engine)
+    values = tuple(params[name] for name in compiled.positiontup)
+    plan = ' '.join(row[-1] for row in db.session.connection().exec_driver_sql(
+        'EXPLAIN QUERY PLAN ' + compiled.string, values))
+    assert 'ix_waitlist_window_professional' in plan
+    assert 'ix_waitlist_window_specialty' in plan
+
+
+def test_cancellation_notifies_after_commit(waitlist_app):
+    entry = matching.add_entry(1, 50, [MORNING], specialty='Fisioterapia', created_by=1)
+    matching.add_entry(2, 50, [MORNING], professional_id=1)
+    appointment = book_appointment(1, local(MONDAY, 9), local(MONDAY, 10))
+
+    appointment.notes = 'só uma edição'
+    db.session.commit()
+    appointment.status = AppointmentStatus.CANCELLED
+    db.session.flush()
+    db.session.rollback()
+    matching.wait()
+    assert Notification.query.count() == 0
+
+    cancel_appointment(appointment)
+    matching.wait()
+    notifications = {n.user_id: n for n in Notification.query.filter_by(kind='waitlist')}
+    assert set(notifications) == {1, 2}  # quem cadastrou e, sem cadastro, o profissional
+    payload = json.loads(notifications[1].payload)
+    assert payload['appointment_id'] == appointment.id
+    assert [c['patient_name'] for c in payload['candidates']] == ['Maria']
+    assert db.session.get(WaitlistEntry, entry.id).last_offered_at is not None
+
+    # Horário já reocupado: nada a oferecer
+    book_appointment(1, local(MONDAY, 9), local(MONDAY, 10))
+    assert matching.match_opening(appointment.id, 1, appointment.starts_at,
+                                  appointment.ends_at) == []
+
+
+def test_waitlist_routes(waitlist_app):
+    waitlist_app.config['LOGIN_DISABLED'] = True
+    client = waitlist_app.test_client()
+    created = client.post('/waitlist', json={
+        'patient_id': 1, 'duration_minutes': 50, 'professional_id': 1,
+        'windows': [list(MORNING)], 'earliest_day': MONDAY.isoformat()})
+    assert created.status_code == 201
+    entry = created.get_json()
+    assert entry['status'] == 'waiting' and entry['windows'] == [list(MORNING)]
+    assert client.post('/waitlist', json={'patient_id': 1, 'duration_minutes': 50,
+                                          'windows': [list(MORNING)]}).status_code == 400
+    assert client.post('/waitlist', json={'patient_id': 1}).status_code == 400
+    assert [e['id'] for e in client.get('/waitlist?professional_id=1').get_json()] == [entry['id']]
+
+    appointment = book_appointment(1, local(MONDAY, 9), local(MONDAY, 10))
+    opening = client.get(f'/waitlist/openings/{appointment.id}').get_json()
+    assert [c['entry_id'] for c in opening['candidates']] == [entry['id']]
+    assert opening['candidates'][0]['for_professional'] is True
+
+    closed = client.post(f'/waitlist/{entry["id"]}/close', json={'status': 'booked'})
+    assert closed.get_json()['status'] == 'booked'
+    assert client.post(f'/waitlist/{entry["id"]}/close', json={'status': 'x'}).status_code == 400
+    assert client.get('/waitlist').get_json() == []